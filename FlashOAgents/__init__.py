@@ -4,6 +4,21 @@ from .memory import *
 from .models import *
 from .monitoring import *
 from .tools import *
+from .tool_executor import *
+from .retry import *
+from .load_balancer import *
+from .disk_cache import *
+from .llm_cache import *
+from .search_cache import *
+from .chunk_ranker import *
+from .page_store import *
+from .page_prefetch import *
+from .http_client import *
+from .stream_parser import *
+from .checkpoint import *
+from .tool_memo import *
+from .tracing import *
+from .prefetch import *
 from .utils import *
 from .search_tools import *
 from .mm_tools import *
@@ -18,16 +18,22 @@
 # Portions of this file are modifications by OPPO PersonalAI Team.
 # Licensed under the Apache License, Version 2.0.
 
+import asyncio
+import contextvars
 import importlib
 import json
+import math
+import os
 import re
 from copy import deepcopy
 import textwrap
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import FIRST_COMPLETED, Future, InvalidStateError, ThreadPoolExecutor, as_completed, wait
 from collections import deque
+from dataclasses import dataclass
+from functools import lru_cache
 from logging import getLogger
-from typing import Any, Callable, Dict, Generator, List, Optional, Set, Tuple, TypedDict, Union
+from typing import Any, AsyncGenerator, Callable, Dict, Generator, List, Optional, Set, Tuple, TypedDict, Union
 import yaml
 from jinja2 import StrictUndefined, Template
 from rich.panel import Panel
@@ -35,8 +41,18 @@ from rich.rule import Rule
 from rich.text import Text
 
 from .agent_types import AgentType, handle_agent_output_types
+from .checkpoint import checkpoint_path, load_checkpoint, make_checkpoint, restore_steps, save_checkpoint
 from .tools import FinalAnswerTool
-from .memory import ActionStep, AgentMemory, PlanningStep, SummaryStep, SystemPromptStep, TaskStep, ToolCall
+from .memory import (
+    ActionStep,
+    AgentMemory,
+    PlanningStep,
+    SummaryStep,
+    SystemPromptStep,
+    TaskStep,
+    ToolCall,
+    TranscriptRef,
+)
 from .models import (
     ChatMessage,
     MessageRole,
@@ -47,12 +63,18 @@ from .monitoring import (
     LogLevel,
 )
 from .tools import Tool
+from .prefetch import SpeculativePrefetcher, normalize_query
+from .stream_parser import IncrementalToolCallParser
+from .tool_executor import ToolExecutor, get_tool_executor
+from .tool_memo import ToolCallMemo
+from .tracing import trace_span
 import json_repair
 from .utils import (
     AgentError,
     AgentExecutionError,
     AgentGenerationError,
     AgentMaxStepsError,
+    AgentParsingError,
     parse_json_tool_call,
 )
 
@@ -65,8 +87,14 @@ def get_variable_names(self, template: str) -> Set[str]:
     return {match.group(1).strip() for match in pattern.finditer(template)}
 
 
+@lru_cache(maxsize=256)
+def compile_template(template: str) -> Template:
+    """Compiles a Jinja template once per process; compiled templates are safe to render from several threads."""
+    return Template(template, undefined=StrictUndefined)
+
+
 def populate_template(template: str, variables: Dict[str, Any]) -> str:
-    compiled_template = Template(template, undefined=StrictUndefined)
+    compiled_template = compile_template(template)
     try:
         return compiled_template.render(**variables)
     except Exception as e:
@@ -84,6 +112,76 @@ def parse_model_content(content: Union[str, dict]) -> dict:
     else:
         return {"unknown_type": str(content)}
 
+@lru_cache(maxsize=None)
+def _read_prompt_templates(prompts_type: str) -> Dict[str, Any]:
+    prompt_path = importlib.resources.files(f"FlashOAgents.prompts.{prompts_type}").joinpath("toolcalling_agent.yaml")
+    return yaml.safe_load(prompt_path.read_text(encoding="utf-8"))
+
+
+def load_prompt_templates(prompts_type: str) -> Dict[str, Any]:
+    """
+    Returns the prompt set in `prompts/<prompts_type>/toolcalling_agent.yaml`.
+
+    The YAML file is read and parsed once per process; each call returns its own copy of the parsed prompt set.
+    """
+    return deepcopy(_read_prompt_templates(prompts_type))
+
+
+def render_tool_functions_json(tool_list: List[Tool], stable: bool = False) -> str:
+    """
+    Renders the JSON schemas of `tool_list` for the step prompt. With `stable`, tools are sorted by name and all
+    object keys are sorted, so the text is byte-identical for the same tool set whatever order it is given in.
+    """
+    if stable:
+        tool_list = sorted(tool_list, key=lambda tool: tool.name)
+    json_schema_list = []
+    for tool in tool_list:
+        required = []
+        properties = deepcopy(tool.inputs)
+        for key, value in properties.items():
+            if value["type"] == "any":
+                value["type"] = "string"
+            if not ("nullable" in value and value["nullable"]):
+                required.append(key)
+        json_schema_list.append({
+            "name": tool.name,
+            "description": tool.description,
+            "parameters": {
+                "properties": properties,
+                "required": required,
+            }
+        })
+    return json.dumps(json_schema_list, indent=2, ensure_ascii=False, sort_keys=stable)
+
+
+class _ToolSetKey:
+    """Cache key of a tool set: hashed and compared by the tools' schemas, carrying the tools until rendered."""
+
+    def __init__(self, tool_list: List[Tool], stable: bool):
+        entries = [
+            (tool.name, tool.description, json.dumps(tool.inputs, sort_keys=True, default=str)) for tool in tool_list
+        ]
+        self.key = stable, tuple(sorted(entries) if stable else entries)
+        self.tool_list = tool_list
+
+    def __hash__(self) -> int:
+        return hash(self.key)
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, _ToolSetKey) and self.key == other.key
+
+
+@lru_cache(maxsize=64)
+def _cached_tool_functions_json(tool_set: _ToolSetKey) -> str:
+    tool_list, tool_set.tool_list = tool_set.tool_list, None  # the cache keeps the key, not the tools
+    return render_tool_functions_json(tool_list, stable=tool_set.key[0])
+
+
+def get_tool_functions_json(tool_list: List[Tool], stable: bool = False) -> str:
+    """Returns the rendered tool-schema block for `tool_list`, cached per process for the 64 latest tool sets."""
+    return _cached_tool_functions_json(_ToolSetKey(tool_list, stable))
+
+
 class PlanningPromptTemplate(TypedDict):
     """
     Prompt templates for the planning step.
@@ -145,6 +243,16 @@ EMPTY_PROMPT_TEMPLATES = PromptTemplates(
 )
 
 
+# Closing user message of a step prompt in the prefix-cache layout, where the step instruction precedes the history.
+PREFIX_CACHE_STEP_CUE = "Following the instructions above, continue to solve the task with your next action."
+
+# Sent after an action output that could not be parsed, before asking the model again.
+OUTPUT_REPAIR_HINT = (
+    "Your previous response could not be parsed as tool calls ({error}). Respond again with only a JSON object of "
+    'the form {{"think": "...", "tools": [{{"name": "<tool name>", "arguments": {{...}}}}]}} and no other text.'
+)
+
+
 class MultiStepAgent:
     """
     Agent class that solves the given task step by step, using the ReAct framework:
@@ -161,6 +269,18 @@ class MultiStepAgent:
         name (`str`, *optional*): Necessary for a managed agent only - the name by which this agent can be called.
         description (`str`, *optional*): Necessary for a managed agent only - the description of this agent.
         provide_run_summary (`bool`, *optional*): Whether to provide a run summary when called as a managed agent.
+        context_budget (`int`, *optional*): Prompt budget in tokens for the memory; observations covered by a later
+            summary are compacted once it is exceeded. See [`AgentMemory`].
+        memoize_tool_calls (`bool`, default `False`): Serve repeated tool calls of a run from a [`ToolCallMemo`]
+            instead of calling the tool again.
+        checkpoint_dir (`str`, *optional*): Directory where the memory is checkpointed after every completed step, one
+            file per task. `run(task, resume=True)` continues from it, and it is removed once the run finishes.
+        checkpoint_callback (`Callable[[dict], None]`, *optional*): Called with every checkpoint; pass one back as
+            `run(task, resume=checkpoint)` to continue from it.
+        logger ([`AgentLogger`], *optional*): Logger to use, e.g. one writing to a per-agent file or in the background.
+            Defaults to a terminal logger at `verbosity_level`.
+        compact_memory (`bool`, default `False`): Steps keep a [`TranscriptRef`] into the memory transcript instead of
+            a copy of their input messages, and model outputs drop the raw API response unless `debug` is set.
     """
 
     def __init__(
@@ -178,6 +298,12 @@ class MultiStepAgent:
             provide_run_summary: bool = False,
             debug: bool = False,
             prompts_type: Optional[str] = "default",
+            context_budget: Optional[int] = None,
+            memoize_tool_calls: bool = False,
+            checkpoint_dir: Optional[str] = None,
+            checkpoint_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+            logger: Optional[AgentLogger] = None,
+            compact_memory: bool = False,
     ):
         self.agent_name = self.__class__.__name__
         self.model = model
@@ -201,9 +327,15 @@ class MultiStepAgent:
         self.system_prompt = self.initialize_system_prompt()
         self.input_messages = None
         self.task = None
-        self.memory = AgentMemory(self.system_prompt)
-        self.logger = AgentLogger(level=verbosity_level)
+        self.memory = AgentMemory(self.system_prompt, context_budget=context_budget)
+        self.tool_memo = ToolCallMemo() if memoize_tool_calls else None
+        self.checkpoint_dir = checkpoint_dir
+        self.checkpoint_callback = checkpoint_callback
+        self._progress: Optional[Tuple[str, int, int, bool]] = None  # task, steps, step number, mid-iteration
+        self._resume_mid_iteration = False
+        self.logger = logger if logger is not None else AgentLogger(level=verbosity_level)
         self.prompts_type = prompts_type
+        self.compact_memory = compact_memory
 
     @property
     def logs(self):
@@ -225,27 +357,39 @@ class MultiStepAgent:
         Reads past llm_outputs, actions, and observations or errors from the memory into a series of messages
         that can be used as input to the LLM. Adds a number of keywords (such as PLAN, error, etc) to help
         the LLM.
+
+        Without `memory_steps`, the step messages are served from the cached transcript of `self.memory`.
         """
         messages = self.memory.system_prompt.to_messages(summary_mode=summary_mode)
-        for memory_step in memory_steps if memory_steps else self.memory.steps:
+        if not memory_steps:
+            tokens_saved = self.memory.tokens_saved
+            messages.extend(self.memory.get_messages())
+            if self.memory.tokens_saved > tokens_saved:
+                self.logger.log(
+                    lambda: f"Context budget: {self.memory.compacted_steps} steps compacted, "
+                    f"{self.memory.tokens_saved} tokens saved",
+                    level=LogLevel.DEBUG,
+                )
+            return messages
+        for memory_step in memory_steps:
             messages.extend(memory_step.to_messages(summary_mode=summary_mode))
         return messages
 
+    def _recorded_inputs(self, messages: List[Dict[str, Any]], tail: int = 0) -> List[Dict[str, Any]] | TranscriptRef:
+        """
+        What a step keeps of its input `messages`, which hold a head, the whole current transcript and `tail` more
+        messages: a copy of the list, or in compact memory mode a `TranscriptRef` to the same messages.
+        """
+        if not self.compact_memory:
+            return messages.copy()
+        head = len(messages) - tail - self.memory.transcript_length()
+        return self.memory.transcript_ref(messages[:head], messages[len(messages) - tail:])
+
     def visualize(self):
         """Creates a rich tree visualization of the agent's structure."""
         self.logger.visualize_agent_tree(self)
 
-    def provide_final_answer(self, task: str) -> Tuple[str, str]:
-        """
-        Provide the final answer to the task, based on the logs of the agent's interactions.
-
-        Args:
-            task (`str`): Task to perform.
-            images (`list[str]`, *optional*): Paths to image(s).
-
-        Returns:
-            `str`: Final answer to the task.
-        """
+    def _final_answer_messages(self, task: str) -> List[Dict[str, Any]]:
         messages = [
             {
                 "role": MessageRole.SYSTEM,
@@ -257,7 +401,7 @@ class MultiStepAgent:
                 ],
             }
         ]
-        messages += self.write_memory_to_messages()[1:]
+        messages += self.memory.get_messages()
         messages += [
             {
                 "role": MessageRole.USER,
@@ -271,82 +415,164 @@ class MultiStepAgent:
                 ],
             }
         ]
+        return messages
+
+    @staticmethod
+    def _parse_final_answer(chat_message: ChatMessage) -> Tuple[str, str, str]:
+        final_answer = chat_message.content
+        final_cot_think = chat_message.reasoning_content
+        final_answer_json = json_repair.loads(final_answer)
+        final_answer_think, final_answer_res = final_answer_json.get("think", ""), final_answer_json.get("answer", "")
+        return final_cot_think, final_answer_think, final_answer_res
+
+    def provide_final_answer(self, task: str) -> Tuple[str, str]:
+        """
+        Provide the final answer to the task, based on the logs of the agent's interactions.
+
+        Args:
+            task (`str`): Task to perform.
+            images (`list[str]`, *optional*): Paths to image(s).
+
+        Returns:
+            `str`: Final answer to the task.
+        """
+        messages = self._final_answer_messages(task)
         try:
             chat_message: ChatMessage = self.model(messages)
-            final_answer = chat_message.content
-            final_cot_think = chat_message.reasoning_content
-            final_answer_json = json_repair.loads(final_answer)
-            final_answer_think, final_answer_res = final_answer_json.get("think", ""), final_answer_json.get("answer", "")
-            return final_cot_think, final_answer_think, final_answer_res
+            return self._parse_final_answer(chat_message)
         
         except Exception as e:
             return None, None, f"Error in generating final LLM output:\n{e}"
 
+    async def aprovide_final_answer(self, task: str) -> Tuple[str, str]:
+        """Async counterpart of `provide_final_answer`."""
+        messages = self._final_answer_messages(task)
+        try:
+            chat_message: ChatMessage = await self._acall_model(messages)
+            return self._parse_final_answer(chat_message)
+        except Exception as e:
+            return None, None, f"Error in generating final LLM output:\n{e}"
+
+    async def _acall_model(self, messages: List[Dict[str, Any]], **kwargs) -> ChatMessage:
+        """Calls the model without blocking the event loop, natively if the model implements `acall`."""
+        if hasattr(self.model, "acall"):
+            return await self.model.acall(messages, **kwargs)
+        return await asyncio.to_thread(self.model, messages, **kwargs)
+
+    def _get_tool(self, tool_name: str) -> Any:
+        available_tools = {**self.tools, **self.managed_agents}
+        if tool_name not in available_tools:
+            error_msg = f"Unknown tool {tool_name}, should be instead one of {list(available_tools.keys())}."
+            raise AgentExecutionError(error_msg, self.logger)
+        return available_tools[tool_name]
+
+    def _substitute_state(self, arguments: Dict[str, Any]) -> None:
+        for key, value in arguments.items():
+            if isinstance(value, str) and value in self.state:
+                arguments[key] = self.state[value]
+
+    def _tool_call_error(self, tool_name: str, arguments: Any, e: Exception) -> AgentExecutionError:
+        if tool_name in self.managed_agents:
+            error_msg = (
+                f"Error in calling team member: {e}\nYou should only ask this team member with a correct request.\n"
+                f"As a reminder, this team member's description is the following:\n{self.managed_agents[tool_name]}"
+            )
+        else:
+            tool = self.tools[tool_name]
+            error_msg = (
+                f"Error when executing tool {tool_name} with arguments {arguments}: {type(e).__name__}: {e}\nYou should only use this tool with a correct input.\n"
+                f"As a reminder, this tool's description is the following: '{tool.description}'.\nIt takes inputs: {tool.inputs} and returns output type {tool.output_type}"
+            )
+        return AgentExecutionError(error_msg, self.logger)
+
     def execute_tool_call(self, tool_name: str, arguments: Union[Dict[str, str], str]) -> Any:
         """
         Execute tool with the provided input and returns the result.
         This method replaces arguments with the actual values from the state if they refer to state variables.
+        With `memoize_tool_calls`, a call identical to an earlier one of the run returns the memoized observation.
 
         Args:
             tool_name (`str`): Name of the Tool to execute (should be one from self.tools).
             arguments (Dict[str, str]): Arguments passed to the Tool.
         """
-        available_tools = {**self.tools, **self.managed_agents}
-        if tool_name not in available_tools:
-            error_msg = f"Unknown tool {tool_name}, should be instead one of {list(available_tools.keys())}."
-            raise AgentExecutionError(error_msg, self.logger)
+        with trace_span(f"tool:{tool_name}", kind="tool", tool=tool_name, arguments=str(arguments)):
+            if self.tool_memo is not None and self.tool_memo.memoizes(tool_name):
+                return self.tool_memo.call(tool_name, arguments, self._execute_tool_call)
+            return self._execute_tool_call(tool_name, arguments)
+
+    def _execute_tool_call(self, tool_name: str, arguments: Union[Dict[str, str], str]) -> Any:
+        tool = self._get_tool(tool_name)
 
         try:
             if isinstance(arguments, str):
                 if tool_name in self.managed_agents:
-                    observation = available_tools[tool_name].__call__(arguments)
+                    observation = tool.__call__(arguments)
                 else:
-                    observation = available_tools[tool_name].__call__(arguments, sanitize_inputs_outputs=True)
+                    observation = tool.__call__(arguments, sanitize_inputs_outputs=True)
             elif isinstance(arguments, dict):
-                for key, value in arguments.items():
-                    if isinstance(value, str) and value in self.state:
-                        arguments[key] = self.state[value]
+                self._substitute_state(arguments)
                 if tool_name in self.managed_agents:
-                    observation = available_tools[tool_name].__call__(**arguments)
+                    observation = tool.__call__(**arguments)
                 else:
-                    observation = available_tools[tool_name].__call__(**arguments, sanitize_inputs_outputs=True)
+                    observation = tool.__call__(**arguments, sanitize_inputs_outputs=True)
             else:
                 error_msg = f"Arguments passed to tool should be a dict or string: got a {type(arguments)}."
                 raise AgentExecutionError(error_msg, self.logger)
             return observation
         except Exception as e:
-            if tool_name in self.tools:
-                tool = self.tools[tool_name]
-                error_msg = (
-                    f"Error when executing tool {tool_name} with arguments {arguments}: {type(e).__name__}: {e}\nYou should only use this tool with a correct input.\n"
-                    f"As a reminder, this tool's description is the following: '{tool.description}'.\nIt takes inputs: {tool.inputs} and returns output type {tool.output_type}"
-                )
-                raise AgentExecutionError(error_msg, self.logger)
-            elif tool_name in self.managed_agents:
-                error_msg = (
-                    f"Error in calling team member: {e}\nYou should only ask this team member with a correct request.\n"
-                    f"As a reminder, this team member's description is the following:\n{available_tools[tool_name]}"
-                )
+            raise self._tool_call_error(tool_name, arguments, e)
+
+    async def aexecute_tool_call(self, tool_name: str, arguments: Union[Dict[str, str], str]) -> Any:
+        """
+        Async counterpart of `execute_tool_call`. Tools are awaited through `Tool.acall`, which runs natively for tools
+        implementing `aforward`; managed agents run in a worker thread.
+        """
+        with trace_span(f"tool:{tool_name}", kind="tool", tool=tool_name, arguments=str(arguments)):
+            if self.tool_memo is not None and self.tool_memo.memoizes(tool_name):
+                return await self.tool_memo.acall(tool_name, arguments, self._aexecute_tool_call)
+            return await self._aexecute_tool_call(tool_name, arguments)
+
+    async def _aexecute_tool_call(self, tool_name: str, arguments: Union[Dict[str, str], str]) -> Any:
+        tool = self._get_tool(tool_name)
+        if tool_name in self.managed_agents or not isinstance(tool, Tool):
+            return await asyncio.to_thread(self._execute_tool_call, tool_name, arguments)
+
+        try:
+            if isinstance(arguments, str):
+                observation = await tool.acall(arguments, sanitize_inputs_outputs=True)
+            elif isinstance(arguments, dict):
+                self._substitute_state(arguments)
+                observation = await tool.acall(**arguments, sanitize_inputs_outputs=True)
+            else:
+                error_msg = f"Arguments passed to tool should be a dict or string: got a {type(arguments)}."
                 raise AgentExecutionError(error_msg, self.logger)
+            return observation
+        except Exception as e:
+            raise self._tool_call_error(tool_name, arguments, e)
 
     def step(self, memory_step: ActionStep) -> Union[None, Any]:
         """To be implemented in children classes. Should return either None if the step is not final."""
         pass
 
-    def run(
+    async def astep(self, memory_step: ActionStep) -> Union[None, Any]:
+        """Async counterpart of `step`, to be implemented in children classes."""
+        raise NotImplementedError
+
+    def _start_run(
             self,
             task: str,
-            stream: bool = False,
-            reset: bool = True,
             answer: Optional[str] = None,
             images: Optional[List[str]] = None,
-            additional_args: Optional[Dict] = None,
-    ):
+            reset: bool = True,
+            resume: Union[bool, Dict[str, Any]] = False,
+    ) -> None:
         self.task = task
         self.answer = answer
 
         self.system_prompt = self.initialize_system_prompt()
         self.memory.system_prompt = SystemPromptStep(system_prompt=self.system_prompt)
+        if self.tool_memo is not None:
+            self.tool_memo.reset()
 
         self.logger.log_task(
             content=self.task.strip(),
@@ -355,14 +581,104 @@ class MultiStepAgent:
             title=self.name if hasattr(self, "name") else None,
         )
 
+        self._resume_mid_iteration = False
+        if resume is not False and self._restore_progress(task, resume):
+            return
+        if reset:
+            self.memory.reset()
+        self.step_number = 0
+        self._progress = None
         self.memory.steps.append(TaskStep(task=self.task, task_images=images))
 
+    def _restore_progress(self, task: str, resume: Union[bool, Dict[str, Any]]) -> bool:
+        """
+        Restores the memory up to the last completed step of an earlier run of `task`: from the checkpoint `resume`
+        if one is given, else from this agent's own memory, else from `checkpoint_dir`. Returns whether it did.
+        """
+        if not isinstance(resume, dict) and self._progress is not None and self._progress[0] == task:
+            _, num_steps, step_number, mid_iteration = self._progress
+            del self.memory.steps[num_steps:]
+        else:
+            checkpoint = resume if isinstance(resume, dict) else None
+            if checkpoint is None and self.checkpoint_dir is not None:
+                checkpoint = load_checkpoint(checkpoint_path(self.checkpoint_dir, task))
+            if checkpoint is None or checkpoint.get("task") != task:
+                return False
+            self.memory.reset()
+            self.memory.steps.extend(restore_steps(checkpoint))
+            step_number, mid_iteration = checkpoint["step_number"], checkpoint["mid_iteration"]
+        self.step_number = step_number
+        self._resume_mid_iteration = mid_iteration
+        self._progress = (task, len(self.memory.steps), step_number, mid_iteration)
+        self.logger.log(f"Resuming '{task[:80]}' at step {step_number}", level=LogLevel.INFO)
+        return True
+
+    def _save_progress(self, mid_iteration: bool = False) -> None:
+        """Marks the current memory as the last good state of the run and checkpoints it if configured."""
+        self._progress = (self.task, len(self.memory.steps), self.step_number, mid_iteration)
+        if self.checkpoint_dir is None and self.checkpoint_callback is None:
+            return
+        checkpoint = make_checkpoint(self.task, self.memory.steps, self.step_number, mid_iteration)
+        if self.checkpoint_callback is not None:
+            self.checkpoint_callback(checkpoint)
+        if self.checkpoint_dir is not None:
+            save_checkpoint(checkpoint_path(self.checkpoint_dir, self.task), checkpoint)
+
+    def _clear_progress(self) -> None:
+        self._progress = None
+        if self.checkpoint_dir is not None:
+            path = checkpoint_path(self.checkpoint_dir, self.task)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def run(
+            self,
+            task: str,
+            stream: bool = False,
+            reset: bool = True,
+            answer: Optional[str] = None,
+            images: Optional[List[str]] = None,
+            additional_args: Optional[Dict] = None,
+            resume: Union[bool, Dict[str, Any]] = False,
+    ):
+        """
+        Runs the agent on `task`. With `reset=False`, the steps of earlier runs stay in memory.
+
+        With `resume=True`, an interrupted or failed earlier run of the same task continues after its last completed
+        step (see `checkpoint_dir`) instead of starting over; `resume` may also be a checkpoint dict.
+        """
+        self._start_run(task, answer=answer, images=images, reset=reset, resume=resume)
+
         if stream:
             # The steps are returned as they are executed through a generator to iterate on.
             return self._run(task=self.task, images=images)
         # Outputs are returned only at the end as a string. We only look at the last step
         return deque(self._run(task=self.task, images=images), maxlen=1)[0]
 
+    async def arun(
+            self,
+            task: str,
+            stream: bool = False,
+            reset: bool = True,
+            answer: Optional[str] = None,
+            images: Optional[List[str]] = None,
+            additional_args: Optional[Dict] = None,
+            resume: Union[bool, Dict[str, Any]] = False,
+    ):
+        """
+        Async counterpart of `run`: model and tool calls are awaited, so many agents can share one event loop.
+
+        With `stream=True`, returns an async generator of the steps; otherwise returns the final answer.
+        """
+        self._start_run(task, answer=answer, images=images, reset=reset, resume=resume)
+
+        if stream:
+            return self._arun(task=self.task, images=images)
+        final_output = None
+        async for final_output in self._arun(task=self.task, images=images):
+            pass
+        return final_output
+
     def _run(self, task: str, images: List[str] | None = None) -> Generator[ActionStep | AgentType, None, None]:
         """
         Run the agent in streaming mode and returns a generator of all the steps.
@@ -372,16 +688,14 @@ class MultiStepAgent:
             images (`list[str]`): Paths to image(s).
         """
         pass
-    def planning_step(self, task) -> None:
-        """
-        Used periodically by the agent to plan the next steps to reach the objective.
 
-        Args:
-            task (`str`): Task to perform.
-            is_first_step (`bool`): If this step is not the first one, the plan should be an update over a previous plan.
-            step (`int`): The number of the current step, used as an indication for the LLM.
-        """
-        input_messages = [
+    async def _arun(self, task: str, images: List[str] | None = None) -> AsyncGenerator[ActionStep | AgentType, None]:
+        """Async counterpart of `_run`, to be implemented in children classes."""
+        raise NotImplementedError
+        yield
+
+    def _planning_messages(self, task) -> List[Dict[str, Any]]:
+        return [
             {
                 "role": MessageRole.SYSTEM,
                 "content": [
@@ -397,13 +711,16 @@ class MultiStepAgent:
                 ],
             },
         ]
-        task_messages = [{
+
+    def _planning_task_messages(self, task) -> List[Dict[str, Any]]:
+        return [{
             "role": MessageRole.USER,
             "content": [{"type": "text", "text": populate_template(self.prompt_templates["planning"]["task_input"], variables={"task": task})}],
         }]
-        plan_start_time = time.time()
-        chat_message_plan: ChatMessage = self.model(input_messages + task_messages)
-        plan_end_time = time.time()
+
+    def _record_planning_step(
+            self, input_messages, chat_message_plan: ChatMessage, plan_start_time: float, plan_end_time: float
+    ) -> PlanningStep:
         think_content = chat_message_plan.reasoning_content
         plans = chat_message_plan.content
         plans_think, plans_answer = "", plans
@@ -428,21 +745,43 @@ class MultiStepAgent:
             duration=plan_end_time - plan_start_time,
             input_tokens=chat_message_plan.input_token_count,
             output_tokens=chat_message_plan.output_token_count,
+            cached_tokens=chat_message_plan.cached_token_count,
         )
         self.memory.steps.append(planning_step)
 
         return planning_step
 
-
-    def summary_step(self, task, step: int) -> None:
+    def planning_step(self, task) -> None:
         """
-        Used periodically by the agent to summary the steps to reach the objective.
+        Used periodically by the agent to plan the next steps to reach the objective.
 
         Args:
             task (`str`): Task to perform.
+            is_first_step (`bool`): If this step is not the first one, the plan should be an update over a previous plan.
             step (`int`): The number of the current step, used as an indication for the LLM.
         """
-        memory_messages = self.write_memory_to_messages()[1:]
+        input_messages = self._planning_messages(task)
+        task_messages = self._planning_task_messages(task)
+        with trace_span("plan", kind="plan", step=self.step_number) as span:
+            plan_start_time = time.time()
+            chat_message_plan: ChatMessage = self.model(input_messages + task_messages)
+            plan_end_time = time.time()
+            span.set_attributes(**_message_span_attributes(chat_message_plan))
+        return self._record_planning_step(input_messages, chat_message_plan, plan_start_time, plan_end_time)
+
+    async def aplanning_step(self, task) -> None:
+        """Async counterpart of `planning_step`."""
+        input_messages = self._planning_messages(task)
+        task_messages = self._planning_task_messages(task)
+        with trace_span("plan", kind="plan", step=self.step_number) as span:
+            plan_start_time = time.time()
+            chat_message_plan: ChatMessage = await self._acall_model(input_messages + task_messages)
+            plan_end_time = time.time()
+            span.set_attributes(**_message_span_attributes(chat_message_plan))
+        return self._record_planning_step(input_messages, chat_message_plan, plan_start_time, plan_end_time)
+
+    def _summary_messages(self) -> List[Dict[str, Any]]:
+        memory_messages = self.memory.get_messages()
 
         update_pre_messages = {
             "role": MessageRole.SYSTEM,
@@ -452,11 +791,11 @@ class MultiStepAgent:
             "role": MessageRole.USER,
             "content": [{"type": "text", "text": self.prompt_templates["summary"]["update_post_messages"]}],
         }
-        input_messages = [update_pre_messages] + memory_messages + [update_post_messages]
-        summary_start_time = time.time()
-        chat_message_summary: ChatMessage = self.model(input_messages)
-        summary_end_time = time.time()
+        return [update_pre_messages] + memory_messages + [update_post_messages]
 
+    def _record_summary_step(
+            self, input_messages, chat_message_summary: ChatMessage, summary_start_time: float, summary_end_time: float
+    ) -> SummaryStep:
         summary_answer = chat_message_summary.content
         summary_cot_content = chat_message_summary.reasoning_content
 
@@ -477,6 +816,7 @@ class MultiStepAgent:
             duration=summary_end_time - summary_start_time,
             input_tokens=chat_message_summary.input_token_count,
             output_tokens=chat_message_summary.output_token_count,
+            cached_tokens=chat_message_summary.cached_token_count,
         )
         self.memory.steps.append(summary_step)
         self.logger.log(
@@ -486,6 +826,34 @@ class MultiStepAgent:
         )
         return summary_step
 
+    def summary_step(self, task, step: int) -> None:
+        """
+        Used periodically by the agent to summary the steps to reach the objective.
+
+        Args:
+            task (`str`): Task to perform.
+            step (`int`): The number of the current step, used as an indication for the LLM.
+        """
+        input_messages = self._summary_messages()
+        recorded_inputs = self._recorded_inputs(input_messages, tail=1)
+        with trace_span("summary", kind="summary", step=step) as span:
+            summary_start_time = time.time()
+            chat_message_summary: ChatMessage = self.model(input_messages)
+            summary_end_time = time.time()
+            span.set_attributes(**_message_span_attributes(chat_message_summary))
+        return self._record_summary_step(recorded_inputs, chat_message_summary, summary_start_time, summary_end_time)
+
+    async def asummary_step(self, task, step: int) -> None:
+        """Async counterpart of `summary_step`."""
+        input_messages = self._summary_messages()
+        recorded_inputs = self._recorded_inputs(input_messages, tail=1)
+        with trace_span("summary", kind="summary", step=step) as span:
+            summary_start_time = time.time()
+            chat_message_summary: ChatMessage = await self._acall_model(input_messages)
+            summary_end_time = time.time()
+            span.set_attributes(**_message_span_attributes(chat_message_summary))
+        return self._record_summary_step(recorded_inputs, chat_message_summary, summary_start_time, summary_end_time)
+
 
     def to_dict(self) -> Dict[str, Any]:
         """Converts agent into a dictionary."""
@@ -535,7 +903,138 @@ class MultiStepAgent:
 
 
 
+def _message_span_attributes(message: ChatMessage) -> Dict[str, Any]:
+    return {
+        "input_tokens": message.input_token_count,
+        "output_tokens": message.output_token_count,
+        "cached_tokens": message.cached_token_count,
+    }
+
+
+def _add_counts(total: Optional[int], count: Optional[int]) -> Optional[int]:
+    if count is None:
+        return total
+    return count if total is None else total + count
+
+
+def _arguments_key(arguments: Any) -> str:
+    return json.dumps(arguments, sort_keys=True, default=str)
+
+
+@dataclass
+class _EarlyToolCall:
+    name: str
+    arguments_key: str
+    tool_call: ToolCall
+    handle: Any  # `concurrent.futures.Future` or `asyncio.Task`
+
+
+class _EarlyToolDispatcher:
+    """
+    Starts the tool calls of a streamed model response as soon as their JSON objects close.
+
+    Once the full response is parsed, `claim` hands over the early calls it confirms (same position, name and
+    arguments); anything else is cancelled. No call is started once `final_answer` has been seen.
+    """
+
+    def __init__(self, start: Callable[[str, Any, ToolCall], Any]):
+        self.parser = IncrementalToolCallParser()
+        self.start = start
+        self.calls: Dict[int, _EarlyToolCall] = {}
+        self.final_answer_seen = False
+
+    def feed(self, text: str) -> None:
+        tool_calls = self.parser.feed(text)
+        # Several calls can close in one chunk, e.g. when a non-streaming model or a cache hit delivers it whole.
+        first_index = self.parser.num_calls - len(tool_calls)
+        for index, tool_call in enumerate(tool_calls, start=first_index):
+            if self.final_answer_seen:
+                continue
+            if tool_call.get("name", "") == "final_answer":
+                # The step ends with the answer, so the calls started so far are no longer needed.
+                self.final_answer_seen = True
+                self.cancel_all()
+                continue
+            tool_call_obj = ToolCallingAgent.make_tool_call(tool_call)
+            self.calls[index] = _EarlyToolCall(
+                name=tool_call_obj.name,
+                arguments_key=_arguments_key(tool_call_obj.arguments),
+                tool_call=tool_call_obj,
+                handle=self.start(tool_call_obj.name, tool_call_obj.arguments, tool_call_obj),
+            )
+
+    def claim(self, index: int, tool_name: str, tool_arguments: Any) -> Optional[_EarlyToolCall]:
+        early = self.calls.pop(index, None)
+        if early is None:
+            return None
+        if early.name == tool_name and early.arguments_key == _arguments_key(tool_arguments):
+            return early
+        early.handle.cancel()
+        return None
+
+    def cancel_all(self) -> None:
+        for early in self.calls.values():
+            early.handle.cancel()
+        self.calls.clear()
+
+    def reset(self) -> None:
+        """Cancels the started calls and gets ready for a new response."""
+        self.cancel_all()
+        self.parser = IncrementalToolCallParser()
+        self.final_answer_seen = False
+
+
+@dataclass
+class _PendingSummary:
+    input_messages: List[Dict[str, Any]] | TranscriptRef  # as recorded on the summary step
+    handle: Any  # `concurrent.futures.Future` or `asyncio.Task` resolving to (message, start time, end time)
+    stale_steps: int = 0
+
+
+@dataclass
+class _PrefetchMatch:
+    future: Future  # resolves to the search observation, or to the raw page content when `url` is set
+    related_query: Optional[str] = None  # speculative query a search is answered with, if not the requested one
+    url: Optional[str] = None
+    page_query: Optional[str] = None
+
+
 class ToolCallingAgent(MultiStepAgent):
+    """
+    Agent that calls tools through the JSON tool-calling format of its prompts.
+
+    Args:
+        summary_interval (`int`, *optional*): Number of steps between two summaries of the trajectory.
+        prompts_type (`str`, default `"default"`): Prompt set to load from `prompts/`.
+        tool_executor ([`ToolExecutor`], *optional*): Executor for tool calls. Defaults to the process-wide one.
+        stream_tool_calls (`bool`, default `False`): Stream model output and start tool calls as they are generated.
+        async_summary (`bool`, default `False`): Generate summaries in the background from a memory snapshot while the
+            next action steps run, and insert the `SummaryStep` once it is ready.
+        summary_max_staleness (`int`, default `1`): With `async_summary`, number of action steps that may complete
+            after the snapshot before the agent waits for the summary. `0` waits right away, like a blocking summary.
+        speculative_search (`bool`, default `False`): Search for the task text while the initial plan is generated;
+            `web_search` calls of the first action step with the same or an overlapping query are answered from
+            these results.
+        speculative_crawl_top_k (`int`, default `0`): With `speculative_search`, number of top result pages of each
+            speculative search to read ahead for `crawl_page`.
+        prefix_cache_layout (`bool`, default `False`): Lay out step prompts for server-side prefix caching: the step
+            instruction, with tool schemas rendered in a stable order, follows the initial plan instead of the history,
+            and the prompt ends with a short cue. Compaction from `context_budget` rewrites earlier history and costs
+            one cache miss each time it happens.
+        tool_timeouts (`dict[str, float]`, *optional*): Seconds a step waits for a call of each tool, counted from when
+            the step starts collecting results; the key `"*"` applies to tools not listed. A call past its deadline
+            gets a timeout observation and the step goes on with the calls that finished.
+        step_timeout (`float`, *optional*): Seconds a step waits for its whole tool batch.
+        carry_over_late_results (`bool`, default `True`): Add the results of timed-out calls that finish later to the
+            observations of the next step. Otherwise timed-out calls are cancelled if they have not started yet, and
+            their results are discarded.
+        max_output_repairs (`int`, default `2`): Number of times a step asks the model again, with a repair hint, when
+            its output cannot be parsed as tool calls. If it still cannot, the step records an `AgentParsingError`
+            and the run goes on with the next step.
+        response_format (`dict`, *optional*): `response_format` passed with every action-step model call, e.g.
+            `{"type": "json_object"}` on servers that support structured output.
+        **kwargs: Passed to [`MultiStepAgent`].
+    """
 
     def __init__(
             self,
@@ -544,6 +1043,18 @@ class ToolCallingAgent(MultiStepAgent):
             prompt_templates: Optional[PromptTemplates] = None,
             summary_interval: Optional[int] = None,
             prompts_type: Optional[str] = "default",
+            tool_executor: Optional[ToolExecutor] = None,
+            stream_tool_calls: bool = False,
+            async_summary: bool = False,
+            summary_max_staleness: int = 1,
+            speculative_search: bool = False,
+            speculative_crawl_top_k: int = 0,
+            prefix_cache_layout: bool = False,
+            tool_timeouts: Optional[Dict[str, float]] = None,
+            step_timeout: Optional[float] = None,
+            carry_over_late_results: bool = True,
+            max_output_repairs: int = 2,
+            response_format: Optional[Dict[str, Any]] = None,
             **kwargs,
     ):
         super().__init__(
@@ -554,14 +1065,30 @@ class ToolCallingAgent(MultiStepAgent):
             prompts_type=prompts_type,
             **kwargs,
         )
+        self._tool_executor = tool_executor
+        self.stream_tool_calls = stream_tool_calls
+        self.async_summary = async_summary
+        self.summary_max_staleness = summary_max_staleness
+        self._summary_executor = None
+        self.speculative_search = speculative_search
+        self.speculative_crawl_top_k = speculative_crawl_top_k
+        self.prefetcher: Optional[SpeculativePrefetcher] = None
+        self.prefix_cache_layout = prefix_cache_layout
+        self.tool_timeouts = tool_timeouts or {}
+        self.step_timeout = step_timeout
+        self.carry_over_late_results = carry_over_late_results
+        self._late_tool_calls: List[Tuple[ToolCall, str, Any, Any]] = []
+        self.max_output_repairs = max_output_repairs
+        self.response_format = response_format
         try:
-            prompt_path = importlib.resources.files(f"FlashOAgents.prompts.{prompts_type}").joinpath("toolcalling_agent.yaml")
-            self.prompt_templates = prompt_templates or yaml.safe_load(prompt_path.read_text(encoding="utf-8"))
+            self.prompt_templates = prompt_templates or load_prompt_templates(prompts_type)
         except FileNotFoundError:
-            raise AgentError(f"No prompt file：{prompts_type}/toolcalling_agent.yaml")
+            raise AgentError(f"No prompt file：{prompts_type}/toolcalling_agent.yaml", self.logger)
         except yaml.YAMLError as e:
-            raise AgentError(f"Yaml parse error：{e}")
+            raise AgentError(f"Yaml parse error：{e}", self.logger)
         self.summary_interval = summary_interval
+        self._tool_functions_json = None
+        self._step_instruction = None
 
     def initialize_system_prompt(self) -> str:
         system_prompt = populate_template(
@@ -570,6 +1097,33 @@ class ToolCallingAgent(MultiStepAgent):
         )
         return system_prompt
 
+    def _new_action_step(self, images: List[str] | None = None) -> ActionStep:
+        return ActionStep(
+            step_number=self.step_number,
+            start_time=time.time(),
+            observations_images=images,
+        )
+
+    def _finish_action_step(self, memory_step: ActionStep) -> None:
+        memory_step.end_time = time.time()
+        memory_step.duration = memory_step.end_time - memory_step.start_time
+        self.memory.steps.append(memory_step)
+        self.step_number += 1
+
+    def _max_steps_step(self, step_start_time: float, final_output: Tuple[str, str, str]) -> ActionStep:
+        cot_think, final_think, final_answer = final_output
+        final_memory_step = ActionStep(
+            step_number=self.step_number, error=AgentMaxStepsError("Reached max steps.", self.logger)
+        )
+
+        final_memory_step.action_reasoning = cot_think
+        final_memory_step.action_think = final_think
+        final_memory_step.action_output = final_answer
+        final_memory_step.end_time = time.time()
+        final_memory_step.duration = final_memory_step.end_time - step_start_time
+        self.memory.steps.append(final_memory_step)
+        return final_memory_step
+
     def _run(self, task: str, images: List[str] | None = None) -> Generator[ActionStep | AgentType, None, None]:
         """
         Run the agent in streaming mode and returns a generator of all the steps.
@@ -579,226 +1133,750 @@ class ToolCallingAgent(MultiStepAgent):
             images (`list[str]`): Paths to image(s).
         """
         final_answer = None
-        self.step_number = 0
-        while final_answer is None and self.step_number <= self.max_steps:
-            step_start_time = time.time()
-            memory_step = ActionStep(
-                step_number=self.step_number,
-                start_time=step_start_time,
-                observations_images=images,
-            )
-            try:
-                if self.step_number == 0:
-                    self.planning_step(task)
-                    self.step_number += 1
-                elif self.summary_interval is not None and self.step_number % self.summary_interval == 0:
-                    self.summary_step(
-                        task,
-                        step=self.step_number,
-                    )
-                    self.step_number += 1
-                self.logger.log_rule(f"Step {self.step_number}", level=LogLevel.INFO)
-                final_answer = self.step(memory_step)
-            except AgentError as e:
-                memory_step.error = e
-                raise
-            finally:
-                memory_step.end_time = time.time()
-                memory_step.duration = memory_step.end_time - step_start_time
-                self.memory.steps.append(memory_step)
-                self.step_number += 1
-                yield memory_step
+        pending_summary = None
+        # A run resumed from a checkpoint taken after the plan or a summary continues with that iteration's action.
+        resumed_mid_iteration, self._resume_mid_iteration = self._resume_mid_iteration, False
+        try:
+            while final_answer is None and self.step_number <= self.max_steps:
+                memory_step = self._new_action_step(images)
+                completed = False
+                try:
+                    if resumed_mid_iteration:
+                        resumed_mid_iteration = False
+                    elif self.step_number == 0:
+                        self._start_speculative_search(task)
+                        self.planning_step(task)
+                        self.step_number += 1
+                        self._save_progress(mid_iteration=True)
+                    elif self.summary_interval is not None and self.step_number % self.summary_interval == 0:
+                        if self.async_summary:
+                            if pending_summary is not None:
+                                self._insert_summary(pending_summary, pending_summary.handle.result())
+                            pending_summary = self._start_summary()
+                        else:
+                            self.summary_step(
+                                task,
+                                step=self.step_number,
+                            )
+                        self.step_number += 1
+                        self._save_progress(mid_iteration=True)
+                    if pending_summary is not None and self._summary_due(pending_summary):
+                        self._insert_summary(pending_summary, pending_summary.handle.result())
+                        pending_summary = None
+                    self.logger.log_rule(f"Step {self.step_number}", level=LogLevel.INFO)
+                    with trace_span("step", kind="step", step=self.step_number) as span:
+                        final_answer = self.step(memory_step)
+                        span.set_attributes(**self._step_span_attributes(memory_step))
+                    if pending_summary is not None:
+                        pending_summary.stale_steps += 1
+                    completed = True
+                except AgentError as e:
+                    memory_step.error = e
+                    raise
+                finally:
+                    self._finish_action_step(memory_step)
+                    # Speculative results only answer the first action step; later searches go to the tool.
+                    self._stop_speculative_search()
+                    if completed and final_answer is None:
+                        self._save_progress()
+                    yield memory_step
+
+            # A summary still running when the answer is found is dropped; the final-answer call waits for it.
+            if pending_summary is not None and (final_answer is None or pending_summary.handle.done()):
+                self._insert_summary(pending_summary, pending_summary.handle.result())
+                pending_summary = None
+        finally:
+            self._discard_summary(pending_summary)
+            self._stop_speculative_search()
+            self._discard_late_tool_calls()
+            if self.tool_memo is not None:
+                self.logger.log(lambda: f"Tool-call memo: {self.tool_memo.stats()}", level=LogLevel.DEBUG)
 
         if final_answer is None and self.step_number > self.max_steps:
-            error_message = "Reached max steps."
             step_start_time = time.time()
-            cot_think, final_think, final_answer = self.provide_final_answer(task)
+            final_memory_step = self._max_steps_step(step_start_time, self.provide_final_answer(task))
+            final_answer = final_memory_step.action_output
 
-            final_memory_step = ActionStep(
-                step_number=self.step_number, error=AgentMaxStepsError(error_message, self.logger)
-            )
+            yield final_memory_step
+
+        self._clear_progress()
+        yield handle_agent_output_types(final_answer)
+
+    async def _arun(self, task: str, images: List[str] | None = None) -> AsyncGenerator[ActionStep | AgentType, None]:
+        """Async counterpart of `_run`, yielding the same steps."""
+        final_answer = None
+        pending_summary = None
+        # A run resumed from a checkpoint taken after the plan or a summary continues with that iteration's action.
+        resumed_mid_iteration, self._resume_mid_iteration = self._resume_mid_iteration, False
+        try:
+            while final_answer is None and self.step_number <= self.max_steps:
+                memory_step = self._new_action_step(images)
+                completed = False
+                try:
+                    if resumed_mid_iteration:
+                        resumed_mid_iteration = False
+                    elif self.step_number == 0:
+                        self._start_speculative_search(task)
+                        await self.aplanning_step(task)
+                        self.step_number += 1
+                        self._save_progress(mid_iteration=True)
+                    elif self.summary_interval is not None and self.step_number % self.summary_interval == 0:
+                        if self.async_summary:
+                            if pending_summary is not None:
+                                self._insert_summary(pending_summary, await pending_summary.handle)
+                            pending_summary = self._astart_summary()
+                        else:
+                            await self.asummary_step(
+                                task,
+                                step=self.step_number,
+                            )
+                        self.step_number += 1
+                        self._save_progress(mid_iteration=True)
+                    if pending_summary is not None and self._summary_due(pending_summary):
+                        self._insert_summary(pending_summary, await pending_summary.handle)
+                        pending_summary = None
+                    self.logger.log_rule(f"Step {self.step_number}", level=LogLevel.INFO)
+                    with trace_span("step", kind="step", step=self.step_number) as span:
+                        final_answer = await self.astep(memory_step)
+                        span.set_attributes(**self._step_span_attributes(memory_step))
+                    if pending_summary is not None:
+                        pending_summary.stale_steps += 1
+                    completed = True
+                except AgentError as e:
+                    memory_step.error = e
+                    raise
+                finally:
+                    self._finish_action_step(memory_step)
+                    # Speculative results only answer the first action step; later searches go to the tool.
+                    self._stop_speculative_search()
+                    if completed and final_answer is None:
+                        self._save_progress()
+                    yield memory_step
+
+            if pending_summary is not None and (final_answer is None or pending_summary.handle.done()):
+                self._insert_summary(pending_summary, await pending_summary.handle)
+                pending_summary = None
+        finally:
+            self._discard_summary(pending_summary)
+            self._stop_speculative_search()
+            self._discard_late_tool_calls()
+            if self.tool_memo is not None:
+                self.logger.log(lambda: f"Tool-call memo: {self.tool_memo.stats()}", level=LogLevel.DEBUG)
 
-            final_memory_step.action_reasoning = cot_think
-            final_memory_step.action_think = final_think
-            final_memory_step.action_output = final_answer
-            final_memory_step.end_time = time.time()
-            final_memory_step.duration = memory_step.end_time - step_start_time
-            self.memory.steps.append(final_memory_step)
+        if final_answer is None and self.step_number > self.max_steps:
+            step_start_time = time.time()
+            final_memory_step = self._max_steps_step(step_start_time, await self.aprovide_final_answer(task))
+            final_answer = final_memory_step.action_output
 
             yield final_memory_step
 
+        self._clear_progress()
         yield handle_agent_output_types(final_answer)
 
+    def _generate_summary(self, input_messages: List[Dict[str, Any]]) -> Tuple[ChatMessage, float, float]:
+        with trace_span("summary", kind="summary", step=self.step_number, background=True) as span:
+            summary_start_time = time.time()
+            chat_message_summary: ChatMessage = self.model(input_messages)
+            span.set_attributes(**_message_span_attributes(chat_message_summary))
+        return chat_message_summary, summary_start_time, time.time()
+
+    async def _agenerate_summary(self, input_messages: List[Dict[str, Any]]) -> Tuple[ChatMessage, float, float]:
+        with trace_span("summary", kind="summary", step=self.step_number, background=True) as span:
+            summary_start_time = time.time()
+            chat_message_summary: ChatMessage = await self._acall_model(input_messages)
+            span.set_attributes(**_message_span_attributes(chat_message_summary))
+        return chat_message_summary, summary_start_time, time.time()
+
+    def _start_summary(self) -> _PendingSummary:
+        """Starts generating a summary of the current memory in the background."""
+        input_messages = self._summary_messages()
+        if self._summary_executor is None:
+            self._summary_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summary")
+        context = contextvars.copy_context()
+        return _PendingSummary(
+            self._recorded_inputs(input_messages, tail=1), self._summary_executor.submit(context.run, self._generate_summary, input_messages)
+        )
+
+    def _astart_summary(self) -> _PendingSummary:
+        input_messages = self._summary_messages()
+        return _PendingSummary(
+            self._recorded_inputs(input_messages, tail=1), asyncio.ensure_future(self._agenerate_summary(input_messages))
+        )
+
+    def _summary_due(self, pending_summary: _PendingSummary) -> bool:
+        """Whether the pending summary must be inserted now: it is ready, or waiting for it is required by the policy."""
+        return pending_summary.handle.done() or pending_summary.stale_steps >= self.summary_max_staleness
+
+    def _insert_summary(self, pending_summary: _PendingSummary, result: Tuple[ChatMessage, float, float]) -> SummaryStep:
+        chat_message_summary, summary_start_time, summary_end_time = result
+        summary_step = self._record_summary_step(
+            pending_summary.input_messages, chat_message_summary, summary_start_time, summary_end_time
+        )
+        summary_step.stale_steps = pending_summary.stale_steps
+        return summary_step
+
+    def _discard_summary(self, pending_summary: Optional[_PendingSummary]) -> None:
+        if pending_summary is not None:
+            pending_summary.handle.cancel()
+        if self._summary_executor is not None:
+            self._summary_executor.shutdown(wait=False)
+            self._summary_executor = None
+
+    @property
+    def tool_executor(self) -> ToolExecutor:
+        """Executor running this agent's tool calls; defaults to the process-wide one shared by all agents."""
+        return self._tool_executor or get_tool_executor()
+
     def reformulate_tool_fuctions(self, tool_list: List[Tool]) -> str:
-        json_schema_list = []
-        for tool in tool_list:
-            required = []
-            properties = deepcopy(tool.inputs)
-            for key, value in properties.items():
-                if value["type"] == "any":
-                    value["type"] = "string"
-                if not ("nullable" in value and value["nullable"]):
-                    required.append(key)
-            json_schema_list.append({
-                "name": tool.name,
-                "description": tool.description,
-                "parameters": {
-                    "properties": properties,
-                    "required": required,
+        return get_tool_functions_json(tool_list)
+
+    @property
+    def tool_functions_json(self) -> str:
+        if self._tool_functions_json is None:
+            self._tool_functions_json = get_tool_functions_json(list(self.tools.values()), stable=self.prefix_cache_layout)
+        return self._tool_functions_json
+
+    def get_step_instruction(self) -> str:
+        """Renders the per-step instruction once per task; it only depends on the tool set and the task."""
+        if self._step_instruction is None or self._step_instruction[0] != self.task:
+            text = populate_template(
+                self.prompt_templates["step"]["pre_messages"],
+                variables={
+                    "tool_functions_json": self.tool_functions_json,
+                    "task": self.task
                 }
-            })
-        return json.dumps(json_schema_list, indent=2, ensure_ascii=False)
-    
+            )
+            self._step_instruction = (self.task, text)
+        return self._step_instruction[1]
 
-    def step(self, memory_step: ActionStep, memory_messages=None) -> Union[None, Any]:
+    def _prepare_step(self, memory_step: ActionStep, memory_messages=None) -> List[Dict[str, Any]]:
         memory_messages = self.write_memory_to_messages() if memory_messages is None else memory_messages
         self.input_messages = memory_messages
 
         # Add new step in logs
-        memory_step.model_input_messages = memory_messages.copy()
+        memory_step.model_input_messages = self._recorded_inputs(memory_messages)
 
         instruction_message = [{
             "role": MessageRole.USER,
             "content": [{
                 "type": "text",
-                "text": populate_template(
-                    self.prompt_templates["step"]["pre_messages"],
-                    variables={
-                        "tool_functions_json": self.reformulate_tool_fuctions(list(self.tools.values())),
-                        "task": self.task
-                    }
-                )
+                "text": self.get_step_instruction()
             }]
         }]
-        
+        if self.prefix_cache_layout:
+            return self._prefix_cache_layout(memory_messages, instruction_message)
+        return memory_messages + instruction_message
+
+    def _prefix_cache_layout(self, memory_messages, instruction_message) -> List[Dict[str, Any]]:
+        """
+        Places the step instruction right after the initial plan and ends with a short cue, so that everything up to
+        the newest step is byte-identical to the previous step's prompt. `memory_messages` must end with the
+        transcript of `self.memory`.
+        """
+        split_step = next(
+            (index + 1 for index, step in enumerate(self.memory.steps) if isinstance(step, PlanningStep)),
+            next((index + 1 for index, step in enumerate(self.memory.steps) if isinstance(step, TaskStep)), 0),
+        )
+        split = len(memory_messages) - len(self.memory.get_messages(split_step))
+        cue_message = [{"role": MessageRole.USER, "content": [{"type": "text", "text": PREFIX_CACHE_STEP_CUE}]}]
+        return memory_messages[:split] + instruction_message + memory_messages[split:] + cue_message
+
+    @staticmethod
+    def _parse_model_output(content: Optional[str]) -> Tuple[Any, List[Dict[str, Any]]]:
+        """
+        Returns the `think` text and the tool calls of an action output. Raises `ValueError` if the output holds no
+        tool-call structure: no JSON, an empty list, a dict without `tools`, or tool calls that are not objects.
+        """
         try:
-            memory_step.llm_start_time = time.time()
-            model_message: ChatMessage = self.model(
-                memory_messages + instruction_message,
+            content_dict = json_repair.loads(content or "")
+        except Exception as e:
+            raise ValueError(f"invalid JSON: {e}")
+
+        if isinstance(content_dict, list):
+            if not content_dict:
+                raise ValueError("empty list")
+            if isinstance(content_dict[0], dict) and "tools" in content_dict[0]:
+                answer_data = content_dict[0]["tools"]
+                action_think = content_dict[0].get("think", "No 'think' field in response")
+            else:
+                answer_data = content_dict
+                action_think = "No 'think' field in response"
+        elif isinstance(content_dict, dict):
+            if "tools" not in content_dict:
+                raise ValueError("no 'tools' field")
+            answer_data = content_dict["tools"]
+            action_think = content_dict.get("think", "No 'think' field in response")
+        else:
+            raise ValueError("no JSON object in response")
+
+        # Extract tool calls from response
+        if isinstance(answer_data, list):
+            tool_calls_list = answer_data
+        elif isinstance(answer_data, dict):
+            tool_calls_list = [answer_data]
+        elif answer_data is None:
+            tool_calls_list = []
+        else:
+            raise ValueError(f"unsupported 'tools' value of type {type(answer_data).__name__}")
+        if not all(isinstance(tool_call, dict) for tool_call in tool_calls_list):
+            raise ValueError("tool calls must be JSON objects")
+        return action_think, tool_calls_list
+
+    def _record_model_output(self, memory_step: ActionStep, model_message: ChatMessage) -> List[Dict[str, Any]]:
+        """
+        Stores the model output on `memory_step` and returns the tool calls it requests. Token counts add up over the
+        regenerations of a step. Raises `ValueError` if the output cannot be parsed.
+        """
+        memory_step.llm_end_time = time.time()
+        memory_step.llm_duration = memory_step.llm_end_time - memory_step.llm_start_time
+        memory_step.input_tokens = _add_counts(memory_step.input_tokens, model_message.input_token_count)
+        memory_step.output_tokens = _add_counts(memory_step.output_tokens, model_message.output_token_count)
+        memory_step.cached_tokens = _add_counts(memory_step.cached_tokens, model_message.cached_token_count)
+        if self.compact_memory and not self.debug:
+            model_message.raw = None
+        memory_step.model_output_messages = model_message
+        memory_step.action_think, tool_calls_list = self._parse_model_output(model_message.content)
+
+        self.logger.log(
+            lambda: Panel(Text(f"Function calling number: {len(tool_calls_list)} calls: {str(tool_calls_list)}")),
+            level=LogLevel.INFO,
+        )
+        return tool_calls_list
+
+    def _repair_messages(
+            self, input_messages: List[Dict[str, Any]], model_message: ChatMessage, error: ValueError
+    ) -> List[Dict[str, Any]]:
+        return input_messages + [
+            {"role": MessageRole.ASSISTANT, "content": [{"type": "text", "text": model_message.content or ""}]},
+            {"role": MessageRole.USER, "content": [{"type": "text", "text": OUTPUT_REPAIR_HINT.format(error=error)}]},
+        ]
+
+    def _parse_failed(
+            self, memory_step: ActionStep, error: ValueError, dispatcher: Optional[_EarlyToolDispatcher]
+    ) -> bool:
+        """Records a parse failure; returns whether the step may ask the model again."""
+        memory_step.parse_failures += 1
+        if dispatcher is not None:
+            dispatcher.reset()
+        if memory_step.parse_failures <= self.max_output_repairs:
+            self.logger.log(
+                f"Could not parse model output ({error}), asking again "
+                f"({memory_step.parse_failures}/{self.max_output_repairs})",
+                level=LogLevel.INFO,
             )
-            memory_step.llm_end_time = time.time()
-            memory_step.llm_duration = memory_step.llm_end_time - memory_step.llm_start_time
-            memory_step.input_tokens = model_message.input_token_count
-            memory_step.output_tokens = model_message.output_token_count
-            memory_step.model_output_messages = model_message
+            return True
+        memory_step.tool_calls = []
+        memory_step.error = AgentParsingError(f"Could not parse model output as tool calls: {error}", self.logger)
+        return False
+
+    def _generate_tool_calls(
+            self, memory_step: ActionStep, input_messages: List[Dict[str, Any]],
+            dispatcher: Optional[_EarlyToolDispatcher],
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Generates the step's tool calls, asking again with a repair hint while the output cannot be parsed, up to
+        `max_output_repairs` times. Returns `None` if no output could be parsed.
+        """
+        messages = input_messages
+        while True:
+            model_message = self._generate(messages, dispatcher)
             try:
-                content_dict = json_repair.loads(model_message.content)
-            except Exception as e:
-                content_dict = []
-                raise Exception(f"Unsupported step output: {type(content_dict)}: {e}")
-            
-            if isinstance(content_dict, list):
-                if "tools" in content_dict[0]:
-                    answer_data = content_dict[0]['tools']
-                    memory_step.action_think = content_dict[0].get("think", "No 'think' field in response")
-                else:
-                    answer_data = content_dict
-                    memory_step.action_think = "No 'think' field in response"
-            elif isinstance(content_dict, dict):
-                answer_data = content_dict.get("tools", None)
-                memory_step.action_think = content_dict.get("think", "No 'think' field in response")
-            else:
-                answer_data = "No fuction calling in response"
-                memory_step.action_think = "No 'think' field in response"
-            
-            # Extract tool calls from response
-            if isinstance(answer_data, list):
-                tool_calls_list = answer_data
-            elif isinstance(answer_data, dict):
-                tool_calls_list = [answer_data]
-            else:
-                tool_calls_list = []
+                return self._record_model_output(memory_step, model_message)
+            except ValueError as e:
+                if not self._parse_failed(memory_step, e, dispatcher):
+                    return None
+                messages = self._repair_messages(input_messages, model_message, e)
+
+    async def _agenerate_tool_calls(
+            self, memory_step: ActionStep, input_messages: List[Dict[str, Any]],
+            dispatcher: Optional[_EarlyToolDispatcher],
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Async counterpart of `_generate_tool_calls`."""
+        messages = input_messages
+        while True:
+            model_message = await self._agenerate(messages, dispatcher)
+            try:
+                return self._record_model_output(memory_step, model_message)
+            except ValueError as e:
+                if not self._parse_failed(memory_step, e, dispatcher):
+                    return None
+                messages = self._repair_messages(input_messages, model_message, e)
+
+    @staticmethod
+    def _step_span_attributes(memory_step: ActionStep) -> Dict[str, Any]:
+        return {
+            "tool_calls": len(memory_step.tool_calls or []),
+            "input_tokens": memory_step.input_tokens,
+            "output_tokens": memory_step.output_tokens,
+            "cached_tokens": memory_step.cached_tokens,
+            "parse_failures": memory_step.parse_failures or None,
+        }
 
-            memory_step.tool_calls = []
-            final_answer_value = None
-            observations = []
-            
-            # Process each tool call
+    def parse_stats(self) -> Dict[str, int]:
+        """Unparseable action outputs of the current run, and how many steps recovered from them."""
+        action_steps = [step for step in self.memory.steps if isinstance(step, ActionStep)]
+        failed = [step for step in action_steps if step.parse_failures]
+        unrepaired = [step for step in failed if isinstance(step.error, AgentParsingError)]
+        return {
+            "parse_failures": sum(step.parse_failures for step in failed),
+            "repaired_steps": len(failed) - len(unrepaired),
+            "unrepaired_steps": len(unrepaired),
+        }
+
+    @staticmethod
+    def make_tool_call(tool_call: Dict[str, Any]) -> ToolCall:
+        return ToolCall(
+            name=tool_call.get("name", ""),
+            arguments=tool_call.get("arguments", {}),
+            id=tool_call.get("id", ""),
+            goal=tool_call.get("goal", ""),
+            path=tool_call.get("path", ""),
+        )
+
+    def _register_tool_calls(self, memory_step: ActionStep, tool_calls_list: List[Dict[str, Any]]) -> Tuple[bool, Any]:
+        """
+        Records the requested tool calls on `memory_step`. Returns `(True, answer)` as soon as a `final_answer` call is
+        met, in which case no other tool should run, and `(False, None)` otherwise.
+        """
+        memory_step.tool_calls = []
+        for tool_call in tool_calls_list:
+            tool_call_obj = self.make_tool_call(tool_call)
+            memory_step.tool_calls.append(tool_call_obj)
+
+            if tool_call_obj.name == "final_answer":
+                tool_arguments = tool_call_obj.arguments
+                if isinstance(tool_arguments, dict):
+                    answer = tool_arguments.get("answer", tool_arguments)
+                else:
+                    answer = tool_arguments
 
+                self.logger.log(
+                    Text(f"Final answer: {answer}", style=f"bold {YELLOW_HEX}"),
+                    level=LogLevel.INFO,
+                )
+                memory_step.observations = str(answer)
+                return True, answer
+        return False, None
+
+    def _pending_tool_calls(self, tool_calls_list: List[Dict[str, Any]]) -> List[Tuple[int, str, Any]]:
+        pending = []
+        for idx, tool_call in enumerate(tool_calls_list):
+            tool_name = tool_call.get("name", "")
+            if tool_name == "final_answer":
+                continue
+            tool_arguments = tool_call.get("arguments", {})
             self.logger.log(
-                Panel(Text(f"Function calling number: {len(tool_calls_list)} calls: {str(tool_calls_list)}")),
+                lambda: Panel(Text(f"Calling tool: '{tool_name}' with arguments: {tool_arguments}")),
                 level=LogLevel.INFO,
             )
+            pending.append((idx, tool_name, tool_arguments))
+        return pending
+
+    def _format_observation(
+            self, tool_call_obj: ToolCall, tool_name: str, tool_arguments: Any, observation: Any = None,
+            error: Optional[BaseException] = None,
+    ) -> str:
+        if error is not None:
+            updated_information = str(error)
+            self.logger.error(lambda: f"Tool execution error: {updated_information}")
+        else:
+            updated_information = str(observation).strip()
+
+        path_label = f" [{tool_call_obj.goal} / {tool_call_obj.path}]" if tool_call_obj.goal else ""
+        self.logger.log(
+            lambda: f"Observations: {updated_information.replace('[', '|')}",
+            level=LogLevel.INFO,
+        )
+        return f"Results for tool call '{tool_name}'{path_label} with arguments '{tool_arguments}':\n{updated_information}"
+
+    def _timed_tool_call(self, tool_name: str, tool_arguments: Any, tool_call_obj: ToolCall) -> Any:
+        tool_call_obj.start_time = time.time()
+        try:
+            result = self.execute_tool_call(tool_name, tool_arguments)
+        finally:
+            tool_call_obj.end_time = time.time()
+            tool_call_obj.duration = tool_call_obj.end_time - tool_call_obj.start_time
+        return result
+
+    async def _atimed_tool_call(self, tool_name: str, tool_arguments: Any, tool_call_obj: ToolCall) -> Any:
+        match = self._match_prefetch(tool_name, tool_arguments)
+        async with self.tool_executor.async_limit(tool_name if match is None else None):
+            tool_call_obj.start_time = time.time()
+            try:
+                if match is not None:
+                    return await self._aprefetched_call(tool_name, tool_arguments, match)
+                return await self.aexecute_tool_call(tool_name, tool_arguments)
+            finally:
+                tool_call_obj.end_time = time.time()
+                tool_call_obj.duration = tool_call_obj.end_time - tool_call_obj.start_time
+
+    def _submit_tool_call(self, tool_name: str, tool_arguments: Any, tool_call_obj: ToolCall) -> Future:
+        match = self._match_prefetch(tool_name, tool_arguments)
+        if match is not None:
+            return self._start_prefetched_call(tool_name, tool_arguments, tool_call_obj, match)
+        return self.tool_executor.submit(
+            self._timed_tool_call, tool_name, tool_arguments, tool_call_obj, tool_name=tool_name, owner=self
+        )
+
+    def _start_speculative_search(self, task: str) -> None:
+        self.prefetcher = None
+        if not self.speculative_search or "web_search" not in self.tools:
+            return
+        self.prefetcher = SpeculativePrefetcher(self.tools["web_search"], crawl_top_k=self.speculative_crawl_top_k)
+        # Prefetches get their own owner so that tool calls waiting on them never hold the slots they need.
+        owner = (self, "prefetch")
+        self.prefetcher.start(
+            task, lambda fn, *args, tool_name=None: self.tool_executor.submit(fn, *args, tool_name=tool_name, owner=owner)
+        )
+
+    def _stop_speculative_search(self) -> None:
+        if self.prefetcher is not None and not self.prefetcher.closed:
+            self.prefetcher.cancel()
+            self.logger.log(lambda: f"Speculative prefetch: {self.prefetcher.stats()}", level=LogLevel.DEBUG)
+
+    def _match_prefetch(self, tool_name: str, tool_arguments: Any) -> Optional[_PrefetchMatch]:
+        if self.prefetcher is None or not isinstance(tool_arguments, dict):
+            return None
+        if tool_name == "web_search":
+            query = str(tool_arguments.get("query", ""))
+            match = self.prefetcher.match_search(query)
+            if match is None:
+                return None
+            speculative_query, future = match
+            related_query = None if normalize_query(speculative_query) == normalize_query(query) else speculative_query
+            return _PrefetchMatch(future=future, related_query=related_query)
+        if tool_name == "crawl_page" and hasattr(self.tools.get("crawl_page"), "extract"):
+            url = str(tool_arguments.get("url", ""))
+            future = self.prefetcher.match_page(url)
+            if future is not None:
+                return _PrefetchMatch(future=future, url=url, page_query=str(tool_arguments.get("query", "")))
+        return None
+
+    @staticmethod
+    def _search_observation(match: _PrefetchMatch, observation: str) -> str:
+        if match.related_query is None:
+            return observation
+        return f"Results for the related query '{match.related_query}':\n{observation}"
+
+    def _start_prefetched_call(
+            self, tool_name: str, tool_arguments: Any, tool_call_obj: ToolCall, match: _PrefetchMatch
+    ) -> Future:
+        """
+        Answers a tool call from a speculative prefetch. Completion is chained with callbacks, so no worker waits on
+        the prefetch; if it failed, the tool is called normally.
+        """
+        outcome = Future()
+        tool_call_obj.start_time = time.time()
+
+        def _forward(source: Future) -> None:
+            tool_call_obj.end_time = time.time()
+            tool_call_obj.duration = tool_call_obj.end_time - tool_call_obj.start_time
+            try:
+                if source.cancelled():
+                    outcome.cancel()
+                elif source.exception() is not None:
+                    outcome.set_exception(source.exception())
+                else:
+                    outcome.set_result(source.result())
+            except InvalidStateError:
+                pass  # `outcome` was cancelled by the step meanwhile
+
+        def _on_prefetched(prefetched: Future) -> None:
+            value = None if prefetched.cancelled() or prefetched.exception() is not None else prefetched.result()
+            if value is not None and match.url is None:
+                done = Future()
+                done.set_result(self._search_observation(match, value))
+                _forward(done)
+            elif value is not None and not value.startswith("Error"):
+                self.tool_executor.submit(
+                    self.tools["crawl_page"].extract, match.url, match.page_query, value, owner=self
+                ).add_done_callback(_forward)
+            else:
+                self.tool_executor.submit(
+                    self.execute_tool_call, tool_name, tool_arguments, tool_name=tool_name, owner=self
+                ).add_done_callback(_forward)
+
+        match.future.add_done_callback(_on_prefetched)
+        return outcome
+
+    async def _aprefetched_call(self, tool_name: str, tool_arguments: Any, match: _PrefetchMatch) -> Any:
+        try:
+            # Shielded: the prefetch is shared, so cancelling this call must not cancel it.
+            value = await asyncio.shield(asyncio.wrap_future(match.future))
+        except asyncio.CancelledError:
+            if not match.future.cancelled():
+                raise
+            value = None
+        except Exception:
+            value = None
+        if value is not None and match.url is None:
+            return self._search_observation(match, value)
+        if value is not None and not value.startswith("Error"):
+            return await self.tools["crawl_page"].aextract(match.url, match.page_query, value)
+        async with self.tool_executor.async_limit(tool_name):
+            return await self.aexecute_tool_call(tool_name, tool_arguments)
+
+    def _start_async_tool_call(self, tool_name: str, tool_arguments: Any, tool_call_obj: ToolCall) -> asyncio.Task:
+        return asyncio.ensure_future(self._atimed_tool_call(tool_name, tool_arguments, tool_call_obj))
+
+    def _start_tool_calls(
+            self,
+            memory_step: ActionStep,
+            tool_calls_list: List[Dict[str, Any]],
+            start: Callable[[str, Any, ToolCall], Any],
+            dispatcher: Optional[_EarlyToolDispatcher] = None,
+    ) -> List[Tuple[int, str, Any, Any]]:
+        """Starts the non-final tool calls, reusing the ones `dispatcher` already started while the model streamed."""
+        started = []
+        for idx, tool_name, tool_arguments in self._pending_tool_calls(tool_calls_list):
+            early = dispatcher.claim(idx, tool_name, tool_arguments) if dispatcher is not None else None
+            if early is not None:
+                memory_step.tool_calls[idx] = early.tool_call
+                handle = early.handle
+            else:
+                handle = start(tool_name, tool_arguments, memory_step.tool_calls[idx])
+            started.append((idx, tool_name, tool_arguments, handle))
+        return started
+
+    def _tool_deadline(self, tool_name: str, batch_start: float) -> float:
+        timeouts = [self.tool_timeouts.get(tool_name, self.tool_timeouts.get("*")), self.step_timeout]
+        timeouts = [timeout for timeout in timeouts if timeout is not None]
+        return batch_start + min(timeouts) if timeouts else math.inf
+
+    @staticmethod
+    def _outcome(handle: Any) -> Tuple[Any, Optional[BaseException]]:
+        """Result or error of a finished `Future` or `asyncio.Task`."""
+        if handle.cancelled():
+            return None, RuntimeError("Tool call was cancelled.")
+        error = handle.exception()
+        return (None, error) if error is not None else (handle.result(), None)
+
+    def _time_out(self, memory_step: ActionStep, started_call: Tuple[int, str, Any, Any], waited: float) -> TimeoutError:
+        idx, tool_name, tool_arguments, handle = started_call
+        tool_call_obj = memory_step.tool_calls[idx]
+        tool_call_obj.timed_out = True
+        if self.carry_over_late_results:
+            self._late_tool_calls.append((tool_call_obj, tool_name, tool_arguments, handle))
+            outcome = "its result will be added to a later step if it arrives"
+        else:
+            handle.cancel()
+            outcome = "its result is discarded"
+        return TimeoutError(f"Tool call timed out after {waited:.1f}s; {outcome}.")
+
+    def _collect_tool_results(
+            self, memory_step: ActionStep, started: List[Tuple[int, str, Any, Future]]
+    ) -> List[Tuple[Any, Optional[BaseException]]]:
+        """
+        Waits for the started calls, each until its deadline (see `tool_timeouts` and `step_timeout`), and returns
+        `(observation, error)` per call in order. Calls past their deadline get a `TimeoutError`.
+        """
+        batch_start = time.time()
+        deadlines = [self._tool_deadline(tool_name, batch_start) for _, tool_name, _, _ in started]
+        results: List[Tuple[Any, Optional[BaseException]]] = [(None, None)] * len(started)
+        pending = set(range(len(started)))
+        while pending:
+            now = time.time()
+            for i in [i for i in pending if started[i][3].done()]:
+                results[i] = self._outcome(started[i][3])
+                pending.discard(i)
+            for i in [i for i in pending if deadlines[i] <= now]:
+                results[i] = (None, self._time_out(memory_step, started[i], now - batch_start))
+                pending.discard(i)
+            if pending:
+                next_deadline = min(deadlines[i] for i in pending)
+                timeout = None if next_deadline == math.inf else max(next_deadline - now, 0)
+                wait([started[i][3] for i in pending], timeout=timeout, return_when=FIRST_COMPLETED)
+        return results
+
+    async def _acollect_tool_results(
+            self, memory_step: ActionStep, started: List[Tuple[int, str, Any, asyncio.Task]]
+    ) -> List[Tuple[Any, Optional[BaseException]]]:
+        """Async counterpart of `_collect_tool_results`."""
+        batch_start = time.time()
+        deadlines = [self._tool_deadline(tool_name, batch_start) for _, tool_name, _, _ in started]
+        results: List[Tuple[Any, Optional[BaseException]]] = [(None, None)] * len(started)
+        pending = set(range(len(started)))
+        while pending:
+            now = time.time()
+            for i in [i for i in pending if started[i][3].done()]:
+                results[i] = self._outcome(started[i][3])
+                pending.discard(i)
+            for i in [i for i in pending if deadlines[i] <= now]:
+                results[i] = (None, self._time_out(memory_step, started[i], now - batch_start))
+                pending.discard(i)
+            if pending:
+                next_deadline = min(deadlines[i] for i in pending)
+                timeout = None if next_deadline == math.inf else max(next_deadline - now, 0)
+                await asyncio.wait(
+                    [started[i][3] for i in pending], timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+        return results
+
+    def _late_observations(self) -> List[str]:
+        """Observations of the timed-out calls of earlier steps that have finished since."""
+        finished = [entry for entry in self._late_tool_calls if entry[3].done()]
+        self._late_tool_calls = [entry for entry in self._late_tool_calls if not entry[3].done()]
+        observations = []
+        for tool_call_obj, tool_name, tool_arguments, handle in finished:
+            observation, error = self._outcome(handle)
+            observations.append(
+                "[Late result of a tool call that timed out in an earlier step]\n"
+                + self._format_observation(tool_call_obj, tool_name, tool_arguments, observation, error)
+            )
+        return observations
+
+    def _discard_late_tool_calls(self) -> None:
+        for _, _, _, handle in self._late_tool_calls:
+            handle.cancel()
+        self._late_tool_calls = []
+
+    def _generate_kwargs(self) -> Dict[str, Any]:
+        return {"response_format": self.response_format} if self.response_format is not None else {}
+
+    def _generate(self, input_messages: List[Dict[str, Any]], dispatcher: Optional[_EarlyToolDispatcher]) -> ChatMessage:
+        kwargs = self._generate_kwargs()
+        if dispatcher is None:
+            return self.model(input_messages, **kwargs)
+        if hasattr(self.model, "stream"):
+            return self.model.stream(input_messages, on_text=dispatcher.feed, **kwargs)
+        return self.model(input_messages, **kwargs)
+
+    async def _agenerate(
+            self, input_messages: List[Dict[str, Any]], dispatcher: Optional[_EarlyToolDispatcher]
+    ) -> ChatMessage:
+        kwargs = self._generate_kwargs()
+        if dispatcher is None:
+            return await self._acall_model(input_messages, **kwargs)
+        if hasattr(self.model, "astream"):
+            return await self.model.astream(input_messages, on_text=dispatcher.feed, **kwargs)
+        return await self._acall_model(input_messages, **kwargs)
+
+    def step(self, memory_step: ActionStep, memory_messages=None) -> Union[None, Any]:
+        input_messages = self._prepare_step(memory_step, memory_messages)
+        # With streaming, tool calls start as soon as their JSON object is complete, while the model keeps generating.
+        dispatcher = _EarlyToolDispatcher(self._submit_tool_call) if self.stream_tool_calls else None
+
+        try:
+            memory_step.llm_start_time = time.time()
+            tool_calls_list = self._generate_tool_calls(memory_step, input_messages, dispatcher)
+            if tool_calls_list is None:
+                return None
 
             # Check for final_answer first before submitting parallel tasks
-            for tool_call in tool_calls_list:
-                tool_name = tool_call.get("name", "")
-                tool_arguments = tool_call.get("arguments", {})
-                tool_call_id = tool_call.get("id", "")
-
-                tool_goal = tool_call.get("goal", "")
-                tool_path = tool_call.get("path", "")
-                tool_call_obj = ToolCall(name=tool_name, arguments=tool_arguments, id=tool_call_id,
-                                         goal=tool_goal, path=tool_path)
-                memory_step.tool_calls.append(tool_call_obj)
-
-                if tool_name == "final_answer":
-                    if isinstance(tool_arguments, dict):
-                        answer = tool_arguments.get("answer", tool_arguments)
-                    else:
-                        answer = tool_arguments
-
-                    final_answer_value = answer
-                    self.logger.log(
-                        Text(f"Final answer: {final_answer_value}", style=f"bold {YELLOW_HEX}"),
-                        level=LogLevel.INFO,
-                    )
-                    observations.append(str(final_answer_value))
-                    memory_step.observations = "\n\n".join(observations)
-                    return final_answer_value
-
-            # Parallel tool execution
-            non_final_calls = [
-                (idx, tc) for idx, tc in enumerate(tool_calls_list)
-                if tc.get("name", "") != "final_answer"
-            ]
+            is_final, final_answer_value = self._register_tool_calls(memory_step, tool_calls_list)
+            if is_final:
+                return final_answer_value
 
-            def _timed_tool_call(tool_name, tool_arguments, tool_call_obj):
-                tool_call_obj.start_time = time.time()
-                try:
-                    result = self.execute_tool_call(tool_name, tool_arguments)
-                finally:
-                    tool_call_obj.end_time = time.time()
-                    tool_call_obj.duration = tool_call_obj.end_time - tool_call_obj.start_time
-                return result
-
-            if non_final_calls:
-                max_workers = min(len(non_final_calls), 5)
-                with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                    futures = []
-                    for idx, tool_call in non_final_calls:
-                        tool_name = tool_call.get("name", "")
-                        tool_arguments = tool_call.get("arguments", {})
-
-                        self.logger.log(
-                            Panel(Text(f"Calling tool: '{tool_name}' with arguments: {tool_arguments}")),
-                            level=LogLevel.INFO,
-                        )
-
-                        tc_obj = memory_step.tool_calls[idx]
-                        future = executor.submit(_timed_tool_call, tool_name, tool_arguments, tc_obj)
-                        futures.append((idx, future, tool_name, tool_arguments))
-
-                    # Collect results in original order
-                    futures.sort(key=lambda x: x[0])
-
-                    for idx, future, tool_name, tool_arguments in futures:
-                        try:
-                            observation = future.result()
-                            updated_information = str(observation).strip()
-                        except Exception as e:
-                            updated_information = str(e)
-                            self.logger.error(f"Tool execution error: {updated_information}")
-
-                        tc_obj = memory_step.tool_calls[idx]
-                        path_label = f" [{tc_obj.goal} / {tc_obj.path}]" if tc_obj.goal else ""
-                        observations.append(
-                            f"Results for tool call '{tool_name}'{path_label} with arguments '{tool_arguments}':\n{updated_information}"
-                        )
-                        self.logger.log(
-                            f"Observations: {updated_information.replace('[', '|')}",
-                            level=LogLevel.INFO,
-                        )
+            # Parallel tool execution, results collected in original order
+            futures = self._start_tool_calls(memory_step, tool_calls_list, self._submit_tool_call, dispatcher)
+            results = self._collect_tool_results(memory_step, futures)
+
+            observations = []
+            for (idx, tool_name, tool_arguments, _), (observation, error) in zip(futures, results):
+                observations.append(
+                    self._format_observation(memory_step.tool_calls[idx], tool_name, tool_arguments, observation, error)
+                )
+            observations.extend(self._late_observations())
 
             # Set step observations
             memory_step.observations = "\n\n".join(observations) if observations else "No observations"
@@ -806,4 +1884,43 @@ class ToolCallingAgent(MultiStepAgent):
 
         except Exception as e:
             raise AgentGenerationError(f"Error in generating tool call with model:\n{e}", self.logger) from e
+        finally:
+            if dispatcher is not None:
+                dispatcher.cancel_all()
+
+    async def astep(self, memory_step: ActionStep, memory_messages=None) -> Union[None, Any]:
+        """
+        Async counterpart of `step`: the model call is awaited and the step's tool calls run concurrently as tasks,
+        within the per-tool and per-provider limits of `tool_executor`.
+        """
+        input_messages = self._prepare_step(memory_step, memory_messages)
+        dispatcher = _EarlyToolDispatcher(self._start_async_tool_call) if self.stream_tool_calls else None
+
+        try:
+            memory_step.llm_start_time = time.time()
+            tool_calls_list = await self._agenerate_tool_calls(memory_step, input_messages, dispatcher)
+            if tool_calls_list is None:
+                return None
 
+            is_final, final_answer_value = self._register_tool_calls(memory_step, tool_calls_list)
+            if is_final:
+                return final_answer_value
+
+            tasks = self._start_tool_calls(memory_step, tool_calls_list, self._start_async_tool_call, dispatcher)
+            results = await self._acollect_tool_results(memory_step, tasks)
+
+            observations = []
+            for (idx, tool_name, tool_arguments, _), (observation, error) in zip(tasks, results):
+                observations.append(
+                    self._format_observation(memory_step.tool_calls[idx], tool_name, tool_arguments, observation, error)
+                )
+            observations.extend(self._late_observations())
+
+            memory_step.observations = "\n\n".join(observations) if observations else "No observations"
+            return None
+
+        except Exception as e:
+            raise AgentGenerationError(f"Error in generating tool call with model:\n{e}", self.logger) from e
+        finally:
+            if dispatcher is not None:
+                dispatcher.cancel_all()
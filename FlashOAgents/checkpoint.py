@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Copyright 2025 The OPPO Inc. PersonalAI team. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import os
+import tempfile
+from dataclasses import asdict, fields
+from typing import Any, Dict, List, Optional
+
+from . import utils
+from .memory import ActionStep, MemoryStep, PlanningStep, SummaryStep, TaskStep, ToolCall
+from .models import ChatMessage
+
+CHECKPOINT_VERSION = 1
+
+_STEP_TYPES = {cls.__name__: cls for cls in (TaskStep, PlanningStep, ActionStep, SummaryStep)}
+
+
+def _chat_message_to_dict(message: ChatMessage) -> Dict[str, Any]:
+    data = {field.name: getattr(message, field.name) for field in fields(message) if field.name != "raw"}
+    if message.tool_calls:
+        data["tool_calls"] = [asdict(tool_call) for tool_call in message.tool_calls]
+    return data
+
+
+def _restore_error(data: Dict[str, str]) -> utils.AgentError:
+    # Built without `AgentError.__init__`, which would log the error again.
+    cls = getattr(utils, data.get("type", ""), None)
+    if not (isinstance(cls, type) and issubclass(cls, utils.AgentError)):
+        cls = utils.AgentError
+    error = cls.__new__(cls)
+    Exception.__init__(error, data.get("message", ""))
+    error.message = data.get("message", "")
+    return error
+
+
+def step_to_dict(step: MemoryStep) -> Dict[str, Any]:
+    """
+    Serializable form of a memory step. The `model_input_messages` are left out: they repeat the transcript of the
+    earlier steps and are not needed to continue a run.
+    """
+    data = {"type": type(step).__name__}
+    for field in fields(step):
+        value = getattr(step, field.name)
+        if field.name == "model_input_messages":
+            value = None
+        elif isinstance(value, ChatMessage):
+            value = _chat_message_to_dict(value)
+        elif field.name == "tool_calls" and value is not None:
+            value = [asdict(tool_call) for tool_call in value]
+        elif field.name == "error" and value is not None:
+            value = value.dict()
+        data[field.name] = value
+    return data
+
+
+def step_from_dict(data: Dict[str, Any]) -> MemoryStep:
+    data = dict(data)
+    cls = _STEP_TYPES[data.pop("type")]
+    if cls in (PlanningStep, SummaryStep) and data.get("model_input_messages") is None:
+        data["model_input_messages"] = []
+    if data.get("tool_calls") is not None:
+        data["tool_calls"] = [ToolCall(**tool_call) for tool_call in data["tool_calls"]]
+    if data.get("error") is not None:
+        data["error"] = _restore_error(data["error"])
+    if isinstance(data.get("model_output_messages"), dict):
+        data["model_output_messages"] = ChatMessage.from_dict(data["model_output_messages"])
+    known = {field.name for field in fields(cls)}
+    return cls(**{key: value for key, value in data.items() if key in known})
+
+
+def make_checkpoint(task: str, steps: List[MemoryStep], step_number: int, mid_iteration: bool = False) -> Dict[str, Any]:
+    """
+    Checkpoint of a run after its last completed step.
+
+    Args:
+        task (`str`): Task of the run.
+        steps (`list[MemoryStep]`): Memory steps to keep.
+        step_number (`int`): Step number the run continues with.
+        mid_iteration (`bool`, default `False`): Whether the checkpoint was taken after the plan or a summary, before
+            the action step of the same iteration.
+    """
+    return {
+        "version": CHECKPOINT_VERSION,
+        "task": task,
+        "step_number": step_number,
+        "mid_iteration": mid_iteration,
+        "steps": [step_to_dict(step) for step in steps],
+    }
+
+
+def checkpoint_path(checkpoint_dir: str, task: str) -> str:
+    """File of the checkpoint of `task` in `checkpoint_dir`, named after a hash of the task text."""
+    digest = hashlib.sha256(task.encode("utf-8")).hexdigest()[:24]
+    return os.path.join(checkpoint_dir, f"{digest}.json")
+
+
+def save_checkpoint(path: str, checkpoint: Dict[str, Any]) -> None:
+    """Writes `checkpoint` to `path` atomically, so an interrupted write never leaves a truncated file."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(checkpoint, f, ensure_ascii=False, default=str)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def load_checkpoint(path: str) -> Optional[Dict[str, Any]]:
+    """Reads the checkpoint at `path`; returns `None` if there is none or it has another format version."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            checkpoint = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    return checkpoint if checkpoint.get("version") == CHECKPOINT_VERSION else None
+
+
+def restore_steps(checkpoint: Dict[str, Any]) -> List[MemoryStep]:
+    return [step_from_dict(data) for data in checkpoint["steps"]]
+
+
+__all__ = ["make_checkpoint", "save_checkpoint", "load_checkpoint", "checkpoint_path", "restore_steps"]
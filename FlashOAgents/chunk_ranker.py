@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Copyright 2025 The OPPO Inc. PersonalAI team. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import re
+from collections import Counter
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from .memory import estimate_tokens
+
+_CJK_CHARS = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af"
+_TERM = re.compile(f"[{_CJK_CHARS}]+|[^\\W_{_CJK_CHARS}]+")
+_CJK_CHAR = re.compile(f"[{_CJK_CHARS}]")
+_HEADING = re.compile(r"#{1,6}\s")
+_SENTENCE_END = re.compile(r"(?<=[.!?。！？])\s+")
+# Query words that match nearly every chunk of a page and would let filler text into the selection.
+_STOPWORDS = frozenset(
+    "a an and are as at be by did do does for from had has have how in is it of on or that the their this to was "
+    "were what when where which who whom whose why will with".split()
+)
+# Marks the place of chunks left out between two selected ones.
+CHUNK_GAP = "\n\n[...]\n\n"
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lower-case terms of `text` for ranking: words with a plural `s` stripped, and character bigrams for Chinese,
+    Japanese and Korean text, which has no spaces between words.
+    """
+    terms = []
+    for term in _TERM.findall(text.lower()):
+        if _CJK_CHAR.match(term):
+            terms.extend(term[i:i + 2] for i in range(max(len(term) - 1, 1)))
+        elif len(term) > 3 and term.endswith("s") and not term.endswith("ss"):
+            terms.append(term[:-1])
+        else:
+            terms.append(term)
+    return terms
+
+
+def _split_block(block: str, max_chars: int) -> List[str]:
+    """Pieces of one paragraph no longer than `max_chars`, cut at line and then sentence boundaries."""
+    if len(block) <= max_chars:
+        return [block]
+    pieces = []
+    for line in block.split("\n"):
+        for sentence in _SENTENCE_END.split(line) if len(line) > max_chars else [line]:
+            pieces.extend(sentence[i:i + max_chars] for i in range(0, len(sentence), max_chars))
+    return pieces
+
+
+def split_into_chunks(text: str, max_chars: int = 1200) -> List[str]:
+    """
+    Splits page markdown into chunks of at most `max_chars`: paragraphs are packed together in order, a markdown
+    heading always starts a new chunk so that it stays with its section, and longer paragraphs are cut at line and
+    sentence boundaries.
+    """
+    chunks, current = [], ""
+    for block in re.split(r"\n[ \t]*\n", text):
+        block = block.strip()
+        if not block:
+            continue
+        for n, piece in enumerate(_split_block(block, max_chars)):
+            separator = "\n" if n else "\n\n"
+            if current and (len(current) + len(separator) + len(piece) > max_chars or _HEADING.match(piece)):
+                chunks.append(current)
+                current = ""
+            current = f"{current}{separator}{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def bm25_scores(query: str, chunks: List[str], k1: float = 1.5, b: float = 0.75) -> np.ndarray:
+    """Okapi BM25 score of every chunk for the non-stopword terms of `query`, with the page's chunks as the corpus."""
+    terms = list(dict.fromkeys(term for term in tokenize(query) if term not in _STOPWORDS))
+    if not terms or not chunks:
+        return np.zeros(len(chunks))
+    index = {term: i for i, term in enumerate(terms)}
+    frequencies = np.zeros((len(chunks), len(terms)))
+    lengths = np.zeros(len(chunks))
+    for row, chunk in enumerate(chunks):
+        chunk_terms = tokenize(chunk)
+        lengths[row] = len(chunk_terms)
+        for term, count in Counter(term for term in chunk_terms if term in index).items():
+            frequencies[row, index[term]] = count
+    containing = (frequencies > 0).sum(axis=0)
+    idf = np.log((len(chunks) - containing + 0.5) / (containing + 0.5) + 1.0)
+    norm = k1 * (1.0 - b + b * lengths / max(lengths.mean(), 1.0))
+    return (idf * frequencies * (k1 + 1.0) / (frequencies + norm[:, None])).sum(axis=1)
+
+
+def select_relevant_chunks(
+        text: str,
+        query: str,
+        token_budget: int = 4000,
+        max_chunk_chars: int = 1200,
+        token_counter: Optional[Callable[[str], int]] = None,
+) -> str:
+    """
+    The parts of a page most relevant to `query` that fit in `token_budget` tokens.
+
+    A page that fits is returned unchanged. Otherwise it is split with `split_into_chunks`, the chunks are ranked with
+    `bm25_scores`, and the best ones are taken greedily while they fit the budget, then put back in page order with
+    `CHUNK_GAP` where chunks were left out. Chunks that share no term with the query are never taken, unless none
+    does, in which case the page is read from the top as before.
+    """
+    token_counter = token_counter or estimate_tokens
+    if token_counter(text) <= token_budget:
+        return text
+    chunks = split_into_chunks(text, max_chunk_chars)
+    scores = bm25_scores(query, chunks)
+    if scores.max(initial=0.0) > 0:
+        candidates = [int(i) for i in np.argsort(-scores, kind="stable") if scores[i] > 0]
+    else:
+        candidates = list(range(len(chunks)))
+    gap_tokens = token_counter(CHUNK_GAP)
+    selected, used = [], 0
+    for i in candidates:
+        cost = token_counter(chunks[i]) + gap_tokens
+        if used + cost <= token_budget:
+            selected.append(i)
+            used += cost
+    selected.sort()
+    parts = []
+    for position, i in enumerate(selected):
+        if position == 0 and i > 0 or position > 0 and i != selected[position - 1] + 1:
+            parts.append(CHUNK_GAP)
+        elif position > 0:
+            parts.append("\n\n")
+        parts.append(chunks[i])
+    if selected and selected[-1] != len(chunks) - 1:
+        parts.append(CHUNK_GAP)
+    return "".join(parts).strip("\n")
+
+
+__all__ = [
+    "CHUNK_GAP",
+    "tokenize",
+    "split_into_chunks",
+    "bm25_scores",
+    "select_relevant_chunks",
+]
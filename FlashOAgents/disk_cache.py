@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Copyright 2025 The OPPO Inc. PersonalAI team. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Optional
+
+# Reads refresh an entry's access time for the LRU order at most this often, so hot entries do not turn every read
+# into a write.
+_TOUCH_INTERVAL = 60.0
+# Eviction deletes down to this fraction of `max_bytes`, so that it does not run again on the next write.
+_EVICT_TO = 0.9
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL,
+    expires REAL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+CREATE TABLE IF NOT EXISTS totals (id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER NOT NULL);
+INSERT OR IGNORE INTO totals (id, bytes) VALUES (0, 0);
+CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN
+    UPDATE totals SET bytes = bytes + length(NEW.value) WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS entries_update AFTER UPDATE OF value ON entries BEGIN
+    UPDATE totals SET bytes = bytes + length(NEW.value) - length(OLD.value) WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN
+    UPDATE totals SET bytes = bytes - length(OLD.value) WHERE id = 0;
+END;
+"""
+
+
+class DiskCache:
+    """
+    Persistent key-value store in one SQLite file, shared by every thread and process that opens the same path.
+
+    The file runs in WAL mode, so readers never wait for writers and several worker processes can use one cache.
+    Each thread (and each process after a fork) gets its own connection. With `max_bytes`, a write that takes the
+    stored values over the cap evicts the least recently read entries; the running total is kept by triggers, so
+    every process sees the same figure. Entries may expire after `ttl` seconds; expired entries read as missing.
+
+    Args:
+        path (`str`): SQLite file, created with its directory if missing.
+        max_bytes (`int`, *optional*): Cap on the total size of the stored values. Defaults to no cap.
+        ttl (`float`, *optional*): Default lifetime of an entry in seconds. Defaults to no expiry.
+    """
+
+    def __init__(self, path: str, max_bytes: Optional[int] = None, ttl: Optional[float] = None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._local = threading.local()
+        self._counts_lock = threading.Lock()
+        self._counts = Counter()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=60, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._counts_lock:
+            self._counts[name] += n
+
+    def get(self, key: str) -> Optional[bytes]:
+        connection = self._connection()
+        row = connection.execute("SELECT value, accessed, expires FROM entries WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is None:
+            self._count("misses")
+            return None
+        value, accessed, expires = row
+        if expires is not None and expires <= now:
+            connection.execute("DELETE FROM entries WHERE key = ? AND expires <= ?", (key, now))
+            self._count("misses")
+            self._count("expired")
+            return None
+        if now - accessed > _TOUCH_INTERVAL:
+            connection.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+        self._count("hits")
+        return value
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        connection = self._connection()
+        connection.execute(
+            "INSERT INTO entries (key, value, created, accessed, expires) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, created = excluded.created, "
+            "accessed = excluded.accessed, expires = excluded.expires",
+            (key, sqlite3.Binary(value), now, now, now + ttl if ttl is not None else None),
+        )
+        self._count("writes")
+        if self.max_bytes is not None and self.total_bytes() > self.max_bytes:
+            self.evict()
+
+    def delete(self, key: str) -> None:
+        self._connection().execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def evict(self) -> int:
+        """Drops expired entries, then the least recently read ones until the rest fits the cap. Returns the count."""
+        connection = self._connection()
+        now = time.time()
+        evicted = connection.execute("DELETE FROM entries WHERE expires IS NOT NULL AND expires <= ?", (now,)).rowcount
+        if self.max_bytes is not None:
+            excess = self.total_bytes() - self.max_bytes * _EVICT_TO
+            keys = []
+            for key, size in connection.execute("SELECT key, length(value) FROM entries ORDER BY accessed"):
+                if excess <= 0:
+                    break
+                keys.append((key,))
+                excess -= size
+            evicted += connection.executemany("DELETE FROM entries WHERE key = ?", keys).rowcount
+        self._count("evictions", evicted)
+        return evicted
+
+    def total_bytes(self) -> int:
+        return self._connection().execute("SELECT bytes FROM totals WHERE id = 0").fetchone()[0]
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def clear(self) -> None:
+        self._connection().execute("DELETE FROM entries")
+
+    def stats(self) -> Dict[str, Any]:
+        """Hits, misses, writes and evictions of this process, plus the entries and bytes in the shared file."""
+        with self._counts_lock:
+            counts = dict(self._counts)
+        lookups = counts.get("hits", 0) + counts.get("misses", 0)
+        return {
+            "hits": counts.get("hits", 0),
+            "misses": counts.get("misses", 0),
+            "hit_rate": counts.get("hits", 0) / lookups if lookups else 0.0,
+            "writes": counts.get("writes", 0),
+            "expired": counts.get("expired", 0),
+            "evictions": counts.get("evictions", 0),
+            "entries": len(self),
+            "bytes": self.total_bytes(),
+        }
+
+    def close(self) -> None:
+        """Closes the connection of the calling thread."""
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+__all__ = ["DiskCache"]
@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Copyright 2025 The OPPO Inc. PersonalAI team. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import importlib.util
+import threading
+import time
+import weakref
+from collections import defaultdict
+from typing import Any, Dict, Optional, Union
+
+import httpx
+
+# Connection-level events of httpcore's `trace` request extension.
+_CONNECT_STARTED = "connection.connect_tcp.started"
+_CONNECT_COMPLETE = ("connection.connect_tcp.complete", "connection.start_tls.complete")
+
+
+class _ConnectProbe:
+    """Trace extension of one request: notes whether it opened a new connection and how long the handshake took."""
+
+    __slots__ = ("connect_start", "connect_end")
+
+    def __init__(self):
+        self.connect_start = None
+        self.connect_end = None
+
+    def trace(self, name: str, info: Dict[str, Any]) -> None:
+        if name == _CONNECT_STARTED:
+            self.connect_start = time.perf_counter()
+        elif name in _CONNECT_COMPLETE:
+            self.connect_end = time.perf_counter()
+
+    async def atrace(self, name: str, info: Dict[str, Any]) -> None:
+        self.trace(name, info)
+
+
+class _HostStats:
+    __slots__ = ("requests", "new_connections", "connect_time", "errors")
+
+    def __init__(self):
+        self.requests = 0
+        self.new_connections = 0
+        self.connect_time = 0.0
+        self.errors = 0
+
+
+class _Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, _HostStats] = defaultdict(_HostStats)
+
+    def record(self, host: str, probe: _ConnectProbe, failed: bool) -> None:
+        with self._lock:
+            stats = self._hosts[host]
+            stats.requests += 1
+            stats.errors += failed
+            if probe.connect_start is not None:
+                stats.new_connections += 1
+                if probe.connect_end is not None:
+                    stats.connect_time += probe.connect_end - probe.connect_start
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                host: {
+                    "requests": stats.requests,
+                    "new_connections": stats.new_connections,
+                    "reused_connections": stats.requests - stats.new_connections,
+                    "connect_time": stats.connect_time,
+                    "errors": stats.errors,
+                }
+                for host, stats in self._hosts.items()
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._hosts.clear()
+
+
+class _MeteredTransport(httpx.HTTPTransport):
+    def __init__(self, metrics: _Metrics, **kwargs):
+        super().__init__(**kwargs)
+        self._metrics = metrics
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        probe = _ConnectProbe()
+        request.extensions["trace"] = probe.trace
+        failed = True
+        try:
+            response = super().handle_request(request)
+            failed = False
+            return response
+        finally:
+            self._metrics.record(request.url.host, probe, failed)
+
+
+class _AsyncMeteredTransport(httpx.AsyncHTTPTransport):
+    def __init__(self, metrics: _Metrics, **kwargs):
+        super().__init__(**kwargs)
+        self._metrics = metrics
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        probe = _ConnectProbe()
+        request.extensions["trace"] = probe.atrace
+        failed = True
+        try:
+            response = await super().handle_async_request(request)
+            failed = False
+            return response
+        finally:
+            self._metrics.record(request.url.host, probe, failed)
+
+
+# Default timeout of the OpenAI SDK: model calls may generate for minutes, but a dead server is noticed quickly.
+LLM_TIMEOUT = httpx.Timeout(600.0, connect=5.0)
+
+
+class HttpPool:
+    """
+    Shared `httpx` clients with keep-alive connection pools, used by the search tools, the multimodal tools and the
+    OpenAI clients instead of a new connection per request.
+
+    Clients are named so that long model generations do not hold the connections the tools need: tools use
+    `"default"` and model clients `"llm"`. Each name gets its own pool, keyed by host inside httpx, with the same
+    limits. Synchronous clients are shared by all threads; async clients are kept per event loop, since their
+    connections belong to the loop that opened them. Every request is counted per host, together with whether it
+    opened a new connection and how long the TCP and TLS handshake took, see `stats`.
+
+    Args:
+        max_connections (`int`, default `100`): Connections per client, across hosts. Size it to the number of
+            requests in flight, e.g. the agent concurrency or the tool workers.
+        max_keepalive_connections (`int`, *optional*): Idle connections kept open per client. Defaults to
+            `max_connections`.
+        keepalive_expiry (`float`, default `30.0`): Seconds an idle connection is kept open.
+        http2 (`bool`, *optional*): Negotiate HTTP/2 where the server supports it. Defaults to on when the `h2`
+            package is installed.
+        timeout (`float`, default `30.0`): Default request timeout in seconds of the tool clients; callers pass their
+            own per request.
+        llm_timeout (`httpx.Timeout`, default `LLM_TIMEOUT`): Default timeout of the `"llm"` clients. The OpenAI SDK
+            takes its request timeout from the client it is given, so this must leave room for long generations.
+    """
+
+    def __init__(
+            self,
+            max_connections: int = 100,
+            max_keepalive_connections: Optional[int] = None,
+            keepalive_expiry: float = 30.0,
+            http2: Optional[bool] = None,
+            timeout: float = 30.0,
+            llm_timeout: Optional[Union[float, httpx.Timeout]] = None,
+    ):
+        if max_keepalive_connections is None:
+            max_keepalive_connections = max_connections
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        h2_available = importlib.util.find_spec("h2") is not None
+        self.http2 = h2_available if http2 is None else http2 and h2_available
+        self.timeout = timeout
+        self.llm_timeout = LLM_TIMEOUT if llm_timeout is None else llm_timeout
+        self._metrics = _Metrics()
+        self._lock = threading.Lock()
+        self._clients: Dict[str, httpx.Client] = {}
+        self._async_clients: Dict[str, "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]"] = {}
+
+    def _timeout(self, name: str) -> Union[float, httpx.Timeout]:
+        return self.llm_timeout if name == "llm" else self.timeout
+
+    def client(self, name: str = "default") -> httpx.Client:
+        client = self._clients.get(name)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(name)
+                if client is None:
+                    transport = _MeteredTransport(self._metrics, limits=self.limits, http2=self.http2)
+                    client = self._clients[name] = httpx.Client(
+                        transport=transport, timeout=self._timeout(name), follow_redirects=True
+                    )
+        return client
+
+    def async_client(self, name: str = "default") -> httpx.AsyncClient:
+        """Client of the running event loop; must be called from a coroutine."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            clients = self._async_clients.setdefault(name, weakref.WeakKeyDictionary())
+            client = clients.get(loop)
+            if client is None:
+                transport = _AsyncMeteredTransport(self._metrics, limits=self.limits, http2=self.http2)
+                client = clients[loop] = httpx.AsyncClient(
+                    transport=transport, timeout=self._timeout(name), follow_redirects=True
+                )
+        return client
+
+    def stats(self) -> Dict[str, Any]:
+        """Requests, new and reused connections, handshake time and errors per host, plus the totals."""
+        hosts = self._metrics.snapshot()
+        requests = sum(host["requests"] for host in hosts.values())
+        new_connections = sum(host["new_connections"] for host in hosts.values())
+        return {
+            "http2": self.http2,
+            "max_connections": self.limits.max_connections,
+            "requests": requests,
+            "new_connections": new_connections,
+            "connection_reuse_rate": (requests - new_connections) / requests if requests else 0.0,
+            "connect_time": sum(host["connect_time"] for host in hosts.values()),
+            "hosts": hosts,
+        }
+
+    def reset_stats(self) -> None:
+        self._metrics.clear()
+
+    def close(self) -> None:
+        """Closes the synchronous clients. Async clients are closed with their event loop's `aclose`."""
+        with self._lock:
+            clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            client.close()
+
+    async def aclose(self) -> None:
+        """Closes the async clients of the running event loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            clients = [per_loop.pop(loop) for per_loop in self._async_clients.values() if loop in per_loop]
+        for client in clients:
+            await client.aclose()
+
+
+_default_pool: Optional[HttpPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def get_http_pool() -> HttpPool:
+    """Process-wide `HttpPool`, created with the default limits on first use."""
+    global _default_pool
+    if _default_pool is None:
+        with _default_pool_lock:
+            if _default_pool is None:
+                _default_pool = HttpPool()
+    return _default_pool
+
+
+def configure_http_pool(**kwargs) -> HttpPool:
+    """
+    Replaces the process-wide `HttpPool` with one built from `kwargs`. Clients taken from the previous pool keep
+    working; models and tools created afterwards use the new one.
+    """
+    global _default_pool
+    with _default_pool_lock:
+        _default_pool = HttpPool(**kwargs)
+    return _default_pool
+
+
+def get_http_client(name: str = "default") -> httpx.Client:
+    return get_http_pool().client(name)
+
+
+def get_async_http_client(name: str = "default") -> httpx.AsyncClient:
+    return get_http_pool().async_client(name)
+
+
+def http_stats() -> Dict[str, Any]:
+    return get_http_pool().stats()
+
+
+__all__ = [
+    "HttpPool",
+    "LLM_TIMEOUT",
+    "get_http_pool",
+    "configure_http_pool",
+    "get_http_client",
+    "get_async_http_client",
+    "http_stats",
+]
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Copyright 2025 The OPPO Inc. PersonalAI team. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import threading
+from typing import Any, Dict, Optional
+
+from .disk_cache import DiskCache
+
+LLM_CACHE_MODES = ("read_write", "read_only", "record_only")
+
+# Request options that change how a completion is delivered, not what it is.
+_TRANSPORT_KWARGS = ("stream", "stream_options", "timeout", "extra_headers")
+
+
+def completion_key(completion_kwargs: Dict[str, Any]) -> str:
+    """
+    Content address of a completion request: the SHA-256 of its kwargs (model, messages, sampling parameters, tools,
+    ...) as canonical JSON. Streamed and plain requests for the same completion share a key.
+    """
+    request = {key: value for key, value in completion_kwargs.items() if key not in _TRANSPORT_KWARGS}
+    data = json.dumps(request, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    Disk-backed cache of model completions, keyed by `completion_key`, for replaying and re-running the same items
+    without paying for identical calls again.
+
+    Entries are stored in a [`DiskCache`], so one cache file can be shared by all threads and worker processes of a
+    run and by later runs. Sampling is not re-done on a hit: a cached request returns the recorded completion even at
+    a non-zero temperature, which is what makes replays deterministic.
+
+    Modes:
+        - `"read_write"`: serve hits, record misses.
+        - `"read_only"`: serve hits, never write; misses go to the model as usual.
+        - `"record_only"`: always call the model and overwrite the recorded completion.
+
+    Args:
+        path (`str`): SQLite file of the cache.
+        mode (`str`, default `"read_write"`): One of `LLM_CACHE_MODES`.
+        max_bytes (`int`, *optional*): Size cap; the least recently read completions are evicted beyond it.
+    """
+
+    def __init__(self, path: str, mode: str = "read_write", max_bytes: Optional[int] = None):
+        if mode not in LLM_CACHE_MODES:
+            raise ValueError(f"Unknown LLM cache mode {mode!r}, expected one of {LLM_CACHE_MODES}.")
+        self.mode = mode
+        self.store = DiskCache(path, max_bytes=max_bytes)
+
+    def get(self, completion_kwargs: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """The recorded completion of the request as a message dict, or None."""
+        if self.mode == "record_only":
+            return None
+        value = self.store.get(completion_key(completion_kwargs))
+        return json.loads(value) if value is not None else None
+
+    def put(self, completion_kwargs: Dict[str, Any], message: Dict[str, Any]) -> None:
+        if self.mode == "read_only":
+            return
+        value = json.dumps(message, ensure_ascii=False, default=str).encode("utf-8")
+        self.store.set(completion_key(completion_kwargs), value)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"mode": self.mode, **self.store.stats()}
+
+
+_default_cache: Optional[LLMCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """Process-wide `LLMCache` used by models created without one, or None if caching is off (the default)."""
+    return _default_cache
+
+
+def configure_llm_cache(
+        path: Optional[str], mode: str = "read_write", max_bytes: Optional[int] = None
+) -> Optional[LLMCache]:
+    """Sets the process-wide `LLMCache` of models created from now on; `path=None` turns caching off."""
+    global _default_cache
+    with _default_cache_lock:
+        _default_cache = LLMCache(path, mode=mode, max_bytes=max_bytes) if path else None
+    return _default_cache
+
+
+def llm_cache_stats() -> Optional[Dict[str, Any]]:
+    return _default_cache.stats() if _default_cache is not None else None
+
+
+__all__ = [
+    "LLMCache",
+    "LLM_CACHE_MODES",
+    "completion_key",
+    "get_llm_cache",
+    "configure_llm_cache",
+    "llm_cache_stats",
+]
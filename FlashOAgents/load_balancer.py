@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Copyright 2025 The OPPO Inc. PersonalAI team. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from .retry import EndpointGuard, get_endpoint_guard
+
+ROUTING_POLICIES = ("least_outstanding", "latency")
+
+
+class Replica:
+    """One endpoint of a `ReplicaBalancer`: its health guard, requests in flight and observed latency."""
+
+    __slots__ = ("endpoint", "guard", "outstanding", "latency", "requests", "failures")
+
+    def __init__(self, endpoint: str, guard: EndpointGuard):
+        self.endpoint = endpoint
+        self.guard = guard
+        self.outstanding = 0
+        self.latency: Optional[float] = None
+        self.requests = 0
+        self.failures = 0
+
+    def __repr__(self) -> str:
+        return f"Replica({self.endpoint!r}, state={self.guard.state}, outstanding={self.outstanding})"
+
+
+def affinity_key(messages: List[Dict[str, Any]]) -> str:
+    """
+    Key of the conversation `messages` belong to: a hash of the messages up to and including the first user message,
+    i.e. the system prompt and the task, which stay the same across all calls of one agent run.
+    """
+    head = []
+    for message in messages:
+        head.append(message)
+        if message.get("role") == "user":
+            break
+    data = json.dumps(head, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class ReplicaBalancer:
+    """
+    Routes calls across replicas of the same service, e.g. several vLLM servers of one model.
+
+    Each call goes to the healthy replica with the fewest requests in flight (`"least_outstanding"`), or with the
+    lowest observed latency weighted by its requests in flight (`"latency"`, an exponentially weighted moving average
+    per replica; replicas not yet measured are tried first). Health is the replica's `EndpointGuard`, shared with the
+    models calling it: a replica is ejected while its circuit is open or a `Retry-After` holds it back, and re-admitted
+    through the guard's half-open probe. When every replica is ejected, calls go to the least loaded one anyway and
+    wait in its guard.
+
+    With `sticky=True`, calls with the same key go to the same replica as long as it is healthy (rendezvous hashing,
+    so ejecting a replica only moves the keys it held), which keeps a conversation on the server that has its prefix
+    cached. `affinity_key` derives such a key from a conversation's messages.
+
+    Args:
+        endpoints (`list[str]`): Base URLs of the replicas.
+        routing (`str`, default `"least_outstanding"`): `"least_outstanding"` or `"latency"`.
+        sticky (`bool`, default `False`): Keep calls with the same key on the same replica.
+        latency_alpha (`float`, default `0.3`): Weight of the newest sample in the latency average.
+        rng (`random.Random`, *optional*): Breaks ties between equally loaded replicas.
+    """
+
+    def __init__(
+            self,
+            endpoints: List[str],
+            routing: str = "least_outstanding",
+            sticky: bool = False,
+            latency_alpha: float = 0.3,
+            rng: Optional[random.Random] = None,
+    ):
+        if not endpoints:
+            raise ValueError("ReplicaBalancer needs at least one endpoint.")
+        if routing not in ROUTING_POLICIES:
+            raise ValueError(f"Unknown routing policy {routing!r}, expected one of {ROUTING_POLICIES}.")
+        self.replicas = [Replica(endpoint, get_endpoint_guard(endpoint)) for endpoint in dict.fromkeys(endpoints)]
+        self.routing = routing
+        self.sticky = sticky
+        self.latency_alpha = latency_alpha
+        self.rng = rng or random.Random()
+        self._lock = threading.Lock()
+
+    def _score(self, replica: Replica) -> float:
+        if self.routing == "latency":
+            return (replica.latency or 0.0) * (replica.outstanding + 1)
+        return replica.outstanding
+
+    def choose(self, key: Optional[str] = None, exclude: Iterable[Replica] = ()) -> Replica:
+        """
+        The replica for the next call, skipping `exclude` (e.g. replicas that already failed this call) unless
+        nothing else is left.
+        """
+        exclude = set(map(id, exclude))
+        candidates = [r for r in self.replicas if id(r) not in exclude] or self.replicas
+        healthy = [r for r in candidates if r.guard.available()]
+        with self._lock:
+            if not healthy:
+                return min(candidates, key=lambda r: r.outstanding)
+            if self.sticky and key is not None:
+                return max(healthy, key=lambda r: hashlib.blake2b(f"{key}|{r.endpoint}".encode("utf-8")).digest())
+            best = min(self._score(r) for r in healthy)
+            return self.rng.choice([r for r in healthy if self._score(r) == best])
+
+    @contextmanager
+    def track(self, replica: Replica) -> Iterator[Replica]:
+        """Counts a call as in flight on `replica`, recording its latency if it succeeds."""
+        with self._lock:
+            replica.outstanding += 1
+            replica.requests += 1
+        start = time.perf_counter()
+        try:
+            yield replica
+        except BaseException:
+            with self._lock:
+                replica.failures += 1
+            raise
+        else:
+            latency = time.perf_counter() - start
+            with self._lock:
+                if replica.latency is None:
+                    replica.latency = latency
+                else:
+                    replica.latency += self.latency_alpha * (latency - replica.latency)
+        finally:
+            with self._lock:
+                replica.outstanding -= 1
+
+    def call(self, fn: Callable[[str], Any], key: Optional[str] = None) -> Any:
+        """
+        Returns `fn(endpoint)` for a chosen replica, waiting in its guard and recording the outcome on it. Meant for
+        callers without a model of their own that reports to the guard, such as a plain OpenAI client.
+        """
+        replica = self.choose(key)
+        while (wait := replica.guard.acquire()) > 0:
+            time.sleep(wait)
+        with self.track(replica):
+            try:
+                result = fn(replica.endpoint)
+            except Exception:
+                replica.guard.record_failure()
+                raise
+        replica.guard.record_success()
+        return result
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                replica.endpoint: {
+                    "state": replica.guard.state,
+                    "outstanding": replica.outstanding,
+                    "requests": replica.requests,
+                    "failures": replica.failures,
+                    "latency": replica.latency,
+                }
+                for replica in self.replicas
+            }
+
+
+__all__ = ["ReplicaBalancer", "Replica", "affinity_key"]
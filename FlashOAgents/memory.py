@@ -18,9 +18,9 @@
 # Portions of this file are modifications by OPPO PersonalAI Team.
 # Licensed under the Apache License, Version 2.0.
 
-from dataclasses import asdict, dataclass
+from dataclasses import asdict, dataclass, fields, replace
 from logging import getLogger
-from typing import Any, Dict, List, TypedDict, Union
+from typing import Any, Callable, Dict, List, TypedDict, Union
 
 from .models import ChatMessage, MessageRole
 from .monitoring import AgentLogger, LogLevel
@@ -29,12 +29,57 @@ from .utils import AgentError, make_json_serializable
 
 logger = getLogger(__name__)
 
+# Text a compacted step is rendered with instead of the content a later summary covers.
+COMPACTED_OBSERVATION = "[Omitted to fit the context budget; covered by a later summary.]"
+COMPACTED_SUMMARY = "[Superseded by a later summary.]"
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of `text` (about four characters per token), used when no tokenizer is given."""
+    return (len(text) + 3) // 4
+
 
 class Message(TypedDict):
     role: MessageRole
     content: str | list[dict]
 
-@dataclass
+
+class TranscriptRef:
+    """
+    Stands in for the input messages of a step in compact memory mode: `head`, then the transcript of the first
+    `end_step` steps of `memory`, then `tail`. It holds a few pointers where a copy of the prompt would hold one entry
+    per message, so the memory of a run no longer grows with the square of its length.
+
+    `messages()` rebuilds the list from the transcript as it is now: steps compacted to fit the context budget since
+    then are rendered as their stubs, and the reference is meaningless once the memory is reset.
+    """
+
+    __slots__ = ("memory", "end_step", "head", "tail")
+
+    def __init__(
+            self, memory: "AgentMemory", end_step: int, head: List[Message] | None = None,
+            tail: List[Message] | None = None,
+    ):
+        self.memory = memory
+        self.end_step = end_step
+        self.head = tuple(head or ())
+        self.tail = tuple(tail or ())
+
+    def messages(self) -> List[Message]:
+        return list(self.head) + self.memory.get_messages(0, self.end_step) + list(self.tail)
+
+    def __len__(self) -> int:
+        return len(self.head) + self.memory.transcript_length(self.end_step) + len(self.tail)
+
+    def __repr__(self) -> str:
+        return f"TranscriptRef(end_step={self.end_step}, head={len(self.head)}, tail={len(self.tail)})"
+
+
+def resolve_messages(messages: List[Message] | TranscriptRef | None) -> List[Message] | None:
+    """The message list behind `messages`, which may be a `TranscriptRef`."""
+    return messages.messages() if isinstance(messages, TranscriptRef) else messages
+
+@dataclass(slots=True)
 class ToolCall:
     name: str
     arguments: Any
@@ -44,6 +89,7 @@ class ToolCall:
     start_time: float | None = None
     end_time: float | None = None
     duration: float | None = None
+    timed_out: bool = False
 
     def dict(self):
         return {
@@ -54,20 +100,29 @@ class ToolCall:
             "start_time": self.start_time,
             "end_time": self.end_time,
             "duration": self.duration,
+            "timed_out": self.timed_out,
         }
 
-@dataclass
+@dataclass(slots=True)
 class MemoryStep:
     def dict(self):
-        return asdict(self)
+        refs = {
+            f.name: getattr(self, f.name) for f in fields(self) if isinstance(getattr(self, f.name), TranscriptRef)
+        }
+        if not refs:
+            return asdict(self)
+        # `asdict` would deep-copy the whole memory behind a reference.
+        data = asdict(replace(self, **{name: None for name in refs}))
+        data.update({name: ref.messages() for name, ref in refs.items()})
+        return data
 
     def to_messages(self, **kwargs) -> List[Dict[str, Any]]:
         raise NotImplementedError
 
 
-@dataclass
+@dataclass(slots=True)
 class ActionStep(MemoryStep):
-    model_input_messages: List[Message] | None = None
+    model_input_messages: List[Message] | TranscriptRef | None = None
     model_output_messages: List[Message] | None = None
     tool_calls: List[ToolCall] | None = None
     start_time: float | None = None
@@ -84,13 +139,16 @@ class ActionStep(MemoryStep):
     evaluate_thought: str | None = None
     input_tokens: int | None = None
     output_tokens: int | None = None
+    cached_tokens: int | None = None
     llm_start_time: float | None = None
     llm_end_time: float | None = None
     llm_duration: float | None = None
+    compacted: bool = False  # observations replaced by a stub because a later summary covers them
+    parse_failures: int = 0  # model outputs of this step that could not be parsed as tool calls
 
     def dict(self):
         return {
-            "model_input_messages": self.model_input_messages,
+            "model_input_messages": resolve_messages(self.model_input_messages),
             "model_output_messages": self.model_output_messages,
             "tool_calls": [tc.dict() for tc in self.tool_calls] if self.tool_calls else [],
             "start_time": self.start_time,
@@ -106,15 +164,18 @@ class ActionStep(MemoryStep):
             "evaluate_thought": self.evaluate_thought,
             "input_tokens": self.input_tokens,
             "output_tokens": self.output_tokens,
+            "cached_tokens": self.cached_tokens,
             "llm_start_time": self.llm_start_time,
             "llm_end_time": self.llm_end_time,
             "llm_duration": self.llm_duration,
+            "compacted": self.compacted,
+            "parse_failures": self.parse_failures,
         }
 
     def to_messages(self, summary_mode: bool = False, show_model_input_messages: bool = False) -> List[Message]:
         messages = []
         if self.model_input_messages is not None and show_model_input_messages:
-            messages.append(Message(role=MessageRole.SYSTEM, content=self.model_input_messages))
+            messages.append(Message(role=MessageRole.SYSTEM, content=resolve_messages(self.model_input_messages)))
 
         if self.tool_calls is not None:
             tool_output = {
@@ -137,13 +198,14 @@ class ActionStep(MemoryStep):
             )
 
         if self.observations is not None:
+            observations = COMPACTED_OBSERVATION if self.compacted else self.observations
             messages.append(
                 Message(
                     role=MessageRole.TOOL_RESPONSE,
                     content=[
                         {
                             "type": "text",
-                            "text": f"Tool calling observation:\n{self.observations}",
+                            "text": f"Tool calling observation:\n{observations}",
                         }
                     ],
                 )
@@ -162,9 +224,9 @@ class ActionStep(MemoryStep):
         return messages
 
 
-@dataclass
+@dataclass(slots=True)
 class PlanningStep(MemoryStep):
-    model_input_messages: List[Message]
+    model_input_messages: List[Message] | TranscriptRef
     plan: str
     plan_think: str
     plan_reasoning: str
@@ -173,6 +235,7 @@ class PlanningStep(MemoryStep):
     duration: float | None = None
     input_tokens: int | None = None
     output_tokens: int | None = None
+    cached_tokens: int | None = None
 
     def to_messages(self, summary_mode: bool, **kwargs) -> List[Message]:
         messages = []
@@ -188,9 +251,9 @@ class PlanningStep(MemoryStep):
         )
         return messages
     
-@dataclass
+@dataclass(slots=True)
 class SummaryStep(MemoryStep):
-    model_input_messages: List[Message]
+    model_input_messages: List[Message] | TranscriptRef
     summary: str
     summary_reasoning: str
     start_time: float | None = None
@@ -198,8 +261,12 @@ class SummaryStep(MemoryStep):
     duration: float | None = None
     input_tokens: int | None = None
     output_tokens: int | None = None
+    cached_tokens: int | None = None
+    stale_steps: int = 0  # action steps completed between the memory snapshot and the insertion of this summary
+    compacted: bool = False  # replaced by a stub because a later summary covers it
 
     def to_messages(self, summary_mode: bool, **kwargs) -> List[Message]:
+        summary = COMPACTED_SUMMARY if self.compacted else self.summary.strip()
         messages = []
         messages.append(
             Message(
@@ -208,12 +275,12 @@ class SummaryStep(MemoryStep):
         )
         messages.append(
             Message(
-                role=MessageRole.ASSISTANT, content=[{"type": "text", "text": f"[SUMMARY]:\n{self.summary.strip()}"}]
+                role=MessageRole.ASSISTANT, content=[{"type": "text", "text": f"[SUMMARY]:\n{summary}"}]
             )
         )
         return messages
 
-@dataclass
+@dataclass(slots=True)
 class TaskStep(MemoryStep):
     task: str
     task_images: List[str] | None = None
@@ -224,7 +291,7 @@ class TaskStep(MemoryStep):
         return [Message(role=MessageRole.USER, content=content)]
 
 
-@dataclass
+@dataclass(slots=True)
 class SystemPromptStep(MemoryStep):
     system_prompt: str
 
@@ -235,12 +302,180 @@ class SystemPromptStep(MemoryStep):
 
 
 class AgentMemory:
-    def __init__(self, system_prompt: str):
+    """
+    Holds the steps of a run together with an append-only message transcript.
+
+    Each step is rendered with `to_messages()` exactly once, the first time the transcript is requested after the
+    step was appended. Later calls only render the new steps and serve slices of the cached transcript, which keeps
+    the per-step cost of building model inputs independent of the run length.
+
+    Steps are expected to be complete when they are appended to `steps`. If a step that was already rendered is
+    modified in place, call `invalidate_transcript` with its index so that it is rendered again.
+
+    With a `context_budget`, the estimated size of the system prompt plus the transcript is kept under that many
+    tokens where possible: once it is exceeded, the observations of action steps and the earlier summaries that a
+    later `SummaryStep` covers are compacted to short stubs, oldest first. Content no summary covers yet is never
+    compacted, so the budget can still be exceeded; `budget_stats` reports this and the tokens saved so far.
+
+    Args:
+        system_prompt (`str`): System prompt of the agent.
+        context_budget (`int`, *optional*): Prompt budget in tokens. `None` disables compaction.
+        token_counter (`Callable[[str], int]`, *optional*): Counts the tokens of a text. Defaults to
+            `estimate_tokens`.
+    """
+
+    def __init__(
+            self,
+            system_prompt: str,
+            context_budget: int | None = None,
+            token_counter: Callable[[str], int] | None = None,
+    ):
         self.system_prompt = SystemPromptStep(system_prompt=system_prompt)
         self.steps: List[Union[TaskStep, ActionStep, PlanningStep, SummaryStep]] = []
+        self.context_budget = context_budget
+        self.token_counter = token_counter or estimate_tokens
+        self.tokens_saved = 0
+        self.compacted_steps = 0
+        self._transcript: List[Message] = []
+        self._rendered_steps: List[MemoryStep] = []
+        self._step_offsets: List[int] = []
+        self._step_tokens: List[int] = []
+        self._system_prompt_tokens = (None, 0)
 
     def reset(self):
         self.steps = []
+        self.tokens_saved = 0
+        self.compacted_steps = 0
+        self.invalidate_transcript()
+
+    def invalidate_transcript(self, from_step: int = 0):
+        """Drops the cached messages of the steps at index `from_step` and after."""
+        if from_step < len(self._rendered_steps):
+            del self._transcript[self._step_offsets[from_step]:]
+            del self._rendered_steps[from_step:]
+            del self._step_offsets[from_step:]
+            del self._step_tokens[from_step:]
+
+    def _sync_transcript(self):
+        # `steps` is a public list: detect truncation or replaced entries by identity before rendering new steps.
+        diverged_at = min(len(self._rendered_steps), len(self.steps))
+        for index in range(diverged_at):
+            if self._rendered_steps[index] is not self.steps[index]:
+                diverged_at = index
+                break
+        self.invalidate_transcript(diverged_at)
+        for step in self.steps[len(self._rendered_steps):]:
+            messages = step.to_messages(summary_mode=False)
+            self._step_offsets.append(len(self._transcript))
+            self._step_tokens.append(self._count_tokens(messages))
+            self._transcript.extend(messages)
+            self._rendered_steps.append(step)
+        if self.context_budget is not None:
+            self._enforce_budget()
+
+    def _count_tokens(self, messages: List[Message]) -> int:
+        total = 0
+        for message in messages:
+            content = message["content"]
+            if isinstance(content, str):
+                total += self.token_counter(content)
+            else:
+                total += sum(self.token_counter(part.get("text", "")) for part in content if isinstance(part, dict))
+            total += 4  # role and message framing
+        return total
+
+    def prompt_tokens(self) -> int:
+        """Estimated tokens of the system prompt plus the transcript."""
+        self._sync_transcript()
+        return self._prompt_tokens()
+
+    def _prompt_tokens(self) -> int:
+        system_prompt, tokens = self._system_prompt_tokens
+        if system_prompt is not self.system_prompt:
+            tokens = self._count_tokens(self.system_prompt.to_messages())
+            self._system_prompt_tokens = (self.system_prompt, tokens)
+        return tokens + sum(self._step_tokens)
+
+    def _compactable_steps(self) -> List[int]:
+        """Indices of the not yet compacted steps whose content a later `SummaryStep` covers, oldest first."""
+        covered_until = 0
+        for index, step in enumerate(self.steps):
+            if not isinstance(step, SummaryStep):
+                continue
+            # A background summary was generated before its last `stale_steps` action steps completed.
+            boundary, uncovered = index, step.stale_steps
+            while uncovered and boundary > 0:
+                boundary -= 1
+                if isinstance(self.steps[boundary], ActionStep):
+                    uncovered -= 1
+            covered_until = max(covered_until, boundary)
+        return [
+            index
+            for index, step in enumerate(self.steps[:covered_until])
+            if not getattr(step, "compacted", True)
+            and (isinstance(step, SummaryStep) or step.observations is not None)
+        ]
+
+    def _enforce_budget(self):
+        total = self._prompt_tokens()
+        if total <= self.context_budget:
+            return
+        for index in self._compactable_steps():
+            step = self.steps[index]
+            step.compacted = True
+            messages = step.to_messages(summary_mode=False)
+            start = self._step_offsets[index]
+            end = self._step_offsets[index + 1] if index + 1 < len(self._step_offsets) else len(self._transcript)
+            # A compacted step renders the same number of messages, so the offsets of later steps stay valid. The
+            # slice is replaced rather than the message dicts mutated, since callers may hold earlier slices.
+            self._transcript[start:end] = messages
+            tokens = self._count_tokens(messages)
+            saved = self._step_tokens[index] - tokens
+            self._step_tokens[index] = tokens
+            self.tokens_saved += saved
+            self.compacted_steps += 1
+            total -= saved
+            if total <= self.context_budget:
+                break
+
+    def budget_stats(self) -> Dict[str, Any]:
+        """Prompt size against the context budget and what compaction saved so far."""
+        prompt_tokens = self.prompt_tokens()
+        return {
+            "context_budget": self.context_budget,
+            "prompt_tokens": prompt_tokens,
+            "tokens_saved": self.tokens_saved,
+            "compacted_steps": self.compacted_steps,
+            "over_budget": self.context_budget is not None and prompt_tokens > self.context_budget,
+        }
+
+    def transcript_length(self, end_step: int | None = None) -> int:
+        """Number of transcript messages of `steps[:end_step]`."""
+        self._sync_transcript()
+        if end_step is None or end_step >= len(self._step_offsets):
+            return len(self._transcript)
+        return self._step_offsets[end_step]
+
+    def transcript_ref(
+            self, head: List[Message] | None = None, tail: List[Message] | None = None
+    ) -> TranscriptRef:
+        """A `TranscriptRef` to `head`, the current transcript and `tail`."""
+        self._sync_transcript()
+        return TranscriptRef(self, len(self._rendered_steps), head, tail)
+
+    def get_messages(self, start_step: int = 0, end_step: int | None = None) -> List[Message]:
+        """
+        Returns the transcript messages of `steps[start_step:end_step]`, without the system prompt.
+
+        The returned list is new, but the message dicts are shared with the cache and must not be mutated.
+        """
+        self._sync_transcript()
+        end_step = len(self._rendered_steps) if end_step is None else min(end_step, len(self._rendered_steps))
+        if start_step >= end_step:
+            return []
+        start = self._step_offsets[start_step]
+        end = self._step_offsets[end_step] if end_step < len(self._step_offsets) else len(self._transcript)
+        return self._transcript[start:end]
 
     def get_succinct_steps(self) -> list[dict]:
         return [
@@ -22,10 +22,10 @@ import uuid
 from typing import Optional
 import openai
 
-import requests
 from dotenv import load_dotenv
 from PIL import Image
 
+from .http_client import get_http_client
 from .tools import Tool
 from .models import Model, MessageRole
 from .mm_tools_utils import MarkdownConverter
@@ -81,25 +81,20 @@ This tool supports the following image formats: [".jpg", ".jpeg", ".png", ".gif"
     def _encode_image(self, image_path: str) -> str:
         if image_path.startswith("http"):
             user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36 Edg/119.0.0.0"
-            request_kwargs = {
-                "headers": {"User-Agent": user_agent},
-                "stream": True,
-            }
-
-            response = requests.get(image_path, **request_kwargs)
-            response.raise_for_status()
-            content_type = response.headers.get("content-type", "")
+            with get_http_client().stream("GET", image_path, headers={"User-Agent": user_agent}) as response:
+                response.raise_for_status()
+                content_type = response.headers.get("content-type", "")
 
-            extension = mimetypes.guess_extension(content_type)
-            if extension is None:
-                extension = ".download"
+                extension = mimetypes.guess_extension(content_type)
+                if extension is None:
+                    extension = ".download"
 
-            fname = str(uuid.uuid4()) + extension
-            download_path = os.path.abspath(os.path.join("downloads", fname))
+                fname = str(uuid.uuid4()) + extension
+                download_path = os.path.abspath(os.path.join("downloads", fname))
 
-            with open(download_path, "wb") as fh:
-                for chunk in response.iter_content(chunk_size=512):
-                    fh.write(chunk)
+                with open(download_path, "wb") as fh:
+                    for chunk in response.iter_bytes(chunk_size=512):
+                        fh.write(chunk)
 
             image_path = download_path
 
@@ -135,10 +130,11 @@ This tool supports the following image formats: [".jpg", ".jpeg", ".png", ".gif"
                 "Authorization": f"Bearer {self.gpt_key}"
             }
 
-            response = requests.post(
+            response = get_http_client("llm").post(
                 f"{self.gpt_url}/chat/completions",
                 headers=headers,
-                json=payload
+                json=payload,
+                timeout=None,
             )
             response.raise_for_status()
             description = response.json()["choices"][0]["message"]["content"]
@@ -474,7 +470,7 @@ This tool supports the following audio formats: [".mp3", ".m4a", ".wav"]. For ot
 
     def transcribe_audio(self, file_path: str) -> str:
         """Transcribe audio using OpenAI Whisper API"""
-        client = openai.OpenAI(api_key=self.api_key, base_url=self.base_url)
+        client = openai.OpenAI(api_key=self.api_key, base_url=self.base_url, http_client=get_http_client("llm"))
         try:
             with open(file_path, "rb") as audio_file:
                 transcription = client.audio.transcriptions.create(
@@ -18,12 +18,13 @@
 # Portions of this file are modifications by OPPO PersonalAI Team.
 # Licensed under the Apache License, Version 2.0.
 
+import asyncio
 import json
 import logging
 from copy import deepcopy
 from dataclasses import asdict, dataclass
 from enum import Enum
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
 from huggingface_hub import InferenceClient
 from huggingface_hub.utils import is_torch_available
@@ -36,8 +37,14 @@ from openai import (
     OpenAIError,
 )
 import time
+import weakref
 
+from .http_client import get_async_http_client, get_http_client
+from .llm_cache import LLMCache, get_llm_cache
+from .load_balancer import Replica, ReplicaBalancer, affinity_key
+from .retry import EndpointGuard, RetryPolicy, get_endpoint_guard, retry_after_seconds
 from .tools import Tool
+from .tracing import trace_span
 from .utils import encode_image_base64, make_image_url
 
 
@@ -109,6 +116,7 @@ class ChatMessage:
     raw: Optional[Any] = None  # Stores the raw output from the API
     input_token_count: Optional[int] = None
     output_token_count: Optional[int] = None
+    cached_token_count: Optional[int] = None  # prompt tokens served from the server's prefix cache
 
     def model_dump_json(self):
         return json.dumps(get_dict_from_nested_dataclasses(self, ignore_key="raw"))
@@ -141,6 +149,12 @@ class ChatMessage:
         return json.dumps(get_dict_from_nested_dataclasses(self))
 
 
+def get_cached_token_count(usage) -> Optional[int]:
+    """Returns `usage.prompt_tokens_details.cached_tokens`, or `None` if the server does not report it."""
+    details = getattr(usage, "prompt_tokens_details", None)
+    return getattr(details, "cached_tokens", None)
+
+
 def parse_json_if_needed(arguments: Union[str, dict]) -> Union[str, dict]:
     if isinstance(arguments, dict):
         return arguments
@@ -215,6 +229,10 @@ def get_clean_message_list(
     Subsequent messages with the same role will be concatenated to a single message.
     output_message_list is a list of messages that will be used to generate the final message that is chat template compatible with transformers LLM chat template.
 
+    The input is never mutated and is not copied either: only the outer message dicts (and the content lists of
+    merged messages) are new, the content blocks themselves are shared with `message_list`. Image blocks are the
+    exception and are replaced by new, encoded blocks.
+
     Args:
         message_list (`list[dict[str, str]]`): List of chat messages.
         role_conversions (`dict[MessageRole, MessageRole]`, *optional* ): Mapping to convert roles.
@@ -222,44 +240,49 @@ def get_clean_message_list(
         flatten_messages_as_text (`bool`, default `False`): Whether to flatten messages as text.
     """
     output_message_list = []
-    message_list = deepcopy(message_list)  # Avoid modifying the original list
+    supported_roles = MessageRole.roles()
     for message in message_list:
         role = message["role"]
-        if role not in MessageRole.roles():
-            raise ValueError(f"Incorrect role {role}, only {MessageRole.roles()} are supported for now.")
+        if role not in supported_roles:
+            raise ValueError(f"Incorrect role {role}, only {supported_roles} are supported for now.")
 
         if role in role_conversions:
-            message["role"] = role_conversions[role]
+            role = role_conversions[role]
+        content = message["content"]
         # encode images if needed
-        if isinstance(message["content"], list):
-            for element in message["content"]:
-                if element["type"] == "image":
-                    assert not flatten_messages_as_text, f"Cannot use images with {flatten_messages_as_text=}"
-                    if convert_images_to_image_urls:
-                        element.update(
-                            {
-                                "type": "image_url",
-                                "image_url": {"url": make_image_url(encode_image_base64(element.pop("image")))},
-                            }
-                        )
-                    else:
-                        element["image"] = encode_image_base64(element["image"])
-
-        if len(output_message_list) > 0 and message["role"] == output_message_list[-1]["role"]:
-            assert isinstance(message["content"], list), "Error: wrong content:" + str(message["content"])
+        if isinstance(content, list) and any(element["type"] == "image" for element in content):
+            assert not flatten_messages_as_text, f"Cannot use images with {flatten_messages_as_text=}"
+            content = [_encode_image_element(element, convert_images_to_image_urls) for element in content]
+
+        if len(output_message_list) > 0 and role == output_message_list[-1]["role"]:
+            assert isinstance(content, list), "Error: wrong content:" + str(content)
             if flatten_messages_as_text:
-                output_message_list[-1]["content"] += message["content"][0]["text"]
+                output_message_list[-1]["content"] += content[0]["text"]
             else:
-                output_message_list[-1]["content"] += message["content"]
+                # Concatenate into a new list: the previous content may still be the caller's list.
+                output_message_list[-1]["content"] = output_message_list[-1]["content"] + content
         else:
             if flatten_messages_as_text:
-                content = message["content"][0]["text"]
-            else:
-                content = message["content"]
-            output_message_list.append({"role": message["role"], "content": content})
+                content = content[0]["text"]
+            output_message_list.append({"role": role, "content": content})
     return output_message_list
 
 
+def _encode_image_element(element: Dict[str, Any], convert_images_to_image_urls: bool) -> Dict[str, Any]:
+    if element["type"] != "image":
+        return element
+    if convert_images_to_image_urls:
+        encoded = {key: value for key, value in element.items() if key != "image"}
+        encoded.update(
+            {
+                "type": "image_url",
+                "image_url": {"url": make_image_url(encode_image_base64(element["image"]))},
+            }
+        )
+        return encoded
+    return {**element, "image": encode_image_base64(element["image"])}
+
+
 class Model:
     def __init__(self, **kwargs):
         self.last_input_token_count = None
@@ -352,6 +375,53 @@ class Model:
         """
         pass  # To be implemented in child classes!
 
+    async def acall(
+        self,
+        messages: List[Dict[str, str]],
+        stop_sequences: Optional[List[str]] = None,
+        grammar: Optional[str] = None,
+        tools_to_call_from: Optional[List[Tool]] = None,
+        **kwargs,
+    ) -> ChatMessage:
+        """Async counterpart of `__call__`. Runs `__call__` in a worker thread unless a child class overrides it."""
+        return await asyncio.to_thread(
+            self.__call__,
+            messages,
+            stop_sequences=stop_sequences,
+            grammar=grammar,
+            tools_to_call_from=tools_to_call_from,
+            **kwargs,
+        )
+
+    def stream(
+        self,
+        messages: List[Dict[str, str]],
+        on_text: Optional[Callable[[str], None]] = None,
+        stop_sequences: Optional[List[str]] = None,
+        **kwargs,
+    ) -> ChatMessage:
+        """
+        Generates a response like `__call__`, passing each piece of content text to `on_text` as soon as it is
+        available. Models without a streaming API pass the whole content at once.
+        """
+        message = self(messages, stop_sequences=stop_sequences, **kwargs)
+        if on_text is not None and message.content:
+            on_text(message.content)
+        return message
+
+    async def astream(
+        self,
+        messages: List[Dict[str, str]],
+        on_text: Optional[Callable[[str], None]] = None,
+        stop_sequences: Optional[List[str]] = None,
+        **kwargs,
+    ) -> ChatMessage:
+        """Async counterpart of `stream`; `on_text` is called on the event loop."""
+        message = await self.acall(messages, stop_sequences=stop_sequences, **kwargs)
+        if on_text is not None and message.content:
+            on_text(message.content)
+        return message
+
     def to_dict(self) -> Dict:
         """
         Converts the model into a JSON-compatible dictionary.
@@ -417,8 +487,20 @@ class OpenAIServerModel(Model):
         custom_role_conversions (`dict[str, str]`, *optional*):
             Custom role conversion mapping to convert message roles in others.
             Useful for specific models that do not support specific message roles like "system".
+        retry_policy ([`RetryPolicy`], *optional*):
+            Attempts per request and the jittered backoff between them. Defaults to `RetryPolicy()`.
+        endpoint_guard ([`EndpointGuard`], *optional*):
+            Circuit breaker, rate limit and retry metrics of the endpoint. Defaults to the guard shared by every model
+            using `api_base`, see `get_endpoint_guard`.
+        cache ([`LLMCache`], *optional*):
+            Disk cache of completions; identical requests are answered from it without calling the server. Defaults to
+            the process-wide cache of `configure_llm_cache`, which is off unless configured.
         **kwargs:
             Additional keyword arguments to pass to the OpenAI API.
+
+    Connection errors, timeouts, 408/409/429/5xx responses and empty completions are retried; other errors are raised
+    at once. Requests go through the `"llm"` clients of the process-wide [`HttpPool`], so connections to the server are
+    kept alive across calls and shared by every model pointing at it.
     """
 
     def __init__(
@@ -429,6 +511,9 @@ class OpenAIServerModel(Model):
         organization: Optional[str] | None = None,
         project: Optional[str] | None = None,
         custom_role_conversions: Optional[Dict[str, str]] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        endpoint_guard: Optional[EndpointGuard] = None,
+        cache: Optional[LLMCache] = None,
         **kwargs,
     ):
         try:
@@ -440,13 +525,23 @@ class OpenAIServerModel(Model):
 
         super().__init__(**kwargs)
         self.model_id = model_id
-        self.client = openai.OpenAI(
-            base_url=api_base,
-            api_key=api_key,
-            organization=organization,
-            project=project,
-        )
+        self.client_kwargs = {
+            "base_url": api_base,
+            "api_key": api_key,
+            "organization": organization,
+            "project": project,
+            "max_retries": 0,  # retries are done by `retry_policy`, not by the OpenAI client
+        }
+        self.client = openai.OpenAI(**self.client_kwargs, http_client=get_http_client("llm"))
+        self._async_clients = weakref.WeakKeyDictionary()
         self.custom_role_conversions = custom_role_conversions
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.endpoint_guard = endpoint_guard or get_endpoint_guard(str(self.client.base_url))
+        self.cache = cache or get_llm_cache()
+
+    def retry_stats(self) -> Dict[str, Any]:
+        """Attempts, retries per error type, backoff time and circuit state of this model's endpoint."""
+        return self.endpoint_guard.stats()
 
     @staticmethod
     def truncate_content_based_on_stop_sequences(content: str, stop_sequences: List[str]) -> str:
@@ -459,14 +554,27 @@ class OpenAIServerModel(Model):
                 content = content[:index + len(stop_seq)]
                 break  # Only keep the first match
         return content
-    def __call__(
+    @property
+    def async_client(self):
+        """`openai.AsyncOpenAI` client sharing this model's configuration, one per event loop."""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            import openai
+
+            client = self._async_clients[loop] = openai.AsyncOpenAI(
+                **self.client_kwargs, http_client=get_async_http_client("llm")
+            )
+        return client
+
+    def _prepare_openai_kwargs(
         self,
         messages: List[Dict[str, str]],
         stop_sequences: Optional[List[str]] = None,
         grammar: Optional[str] = None,
         tools_to_call_from: Optional[List[Tool]] = None,
         **kwargs,
-    ) -> ChatMessage:
+    ) -> Dict:
         completion_kwargs = self._prepare_completion_kwargs(
             messages=messages,
             stop_sequences=stop_sequences,
@@ -482,58 +590,532 @@ class OpenAIServerModel(Model):
         if 'o3' in self.model_id.lower() or 'o4' in self.model_id.lower():
             # Remove stop_sequences from completion_kwargs
             completion_kwargs.pop('stop', None)
+        return completion_kwargs
+
+    def _to_chat_message(
+        self,
+        response,
+        stop_sequences: Optional[List[str]] = None,
+        tools_to_call_from: Optional[List[Tool]] = None,
+    ) -> ChatMessage:
+        self.last_input_token_count = response.usage.prompt_tokens
+        self.last_output_token_count = response.usage.completion_tokens
+
+        if not response.choices[0].message.content and not getattr(response.choices[0].message, 'tool_calls', None):  # o1 o3-mini
+            raise EmptyContentError(response)
+
+        message = ChatMessage.from_dict(
+            response.choices[0].message.model_dump(include={"role", "content", "tool_calls", "reasoning_content"})
+        )
+        message.raw = response
+        message.input_token_count = response.usage.prompt_tokens
+        message.output_token_count = response.usage.completion_tokens
+        message.cached_token_count = get_cached_token_count(response.usage)
+
+        # If model_id contains 'o3' or 'o4', manually truncate content based on stop_sequences
+        if 'o3' in self.model_id.lower() or 'o4' in self.model_id.lower():
+            message.content = self.truncate_content_based_on_stop_sequences(message.content, stop_sequences)
+
+        if tools_to_call_from is not None:
+            return parse_tool_args_if_needed(message)
+        return message
 
-        # response = self.client.chat.completions.create(**completion_kwargs)
+    def _retry_delay(self, error: Exception, attempt: int) -> float:
+        """
+        Records the failed attempt on the endpoint guard and returns how many seconds to wait before the next one, or
+        re-raises `error` when it is not retryable or the attempts are used up.
+        """
+        retryable, trips = _classify_error(error)
+        if isinstance(error, APIStatusError) and not retryable:
+            self.endpoint_guard.record_success()  # the endpoint is up, the request is wrong
+        else:
+            self.endpoint_guard.record_failure(trip=trips)
+        if not retryable:
+            if isinstance(error, BadRequestError):
+                logger.error(f"Bad Request Error: {error}")
+            elif isinstance(error, OpenAIError):
+                logging.error(f"API error occurred: {error}.")
+            else:
+                logging.error(f"An unexpected error occurred: {error}.")
+            raise error
+        if attempt + 1 >= self.retry_policy.max_attempts:
+            logging.error(f"Failed to complete request after {attempt + 1} attempts.")
+            raise error
+        retry_after = retry_after_seconds(error)
+        delay = self.retry_policy.backoff(attempt, retry_after)
+        self.endpoint_guard.record_retry(error, delay, retry_after)
+        logging.warning(f"{type(error).__name__} occurred: {error}. Retrying in {delay:.1f} seconds...")
+        return delay
+
+    def _cached_message(self, completion_kwargs: Dict[str, Any]) -> Optional[ChatMessage]:
+        """The recorded completion of the request, if the cache has one."""
+        if self.cache is None:
+            return None
+        data = self.cache.get(completion_kwargs)
+        if data is None:
+            return None
+        message = ChatMessage.from_dict(data)
+        self.last_input_token_count = message.input_token_count
+        self.last_output_token_count = message.output_token_count
+        return message
+
+    def _record_message(self, completion_kwargs: Dict[str, Any], message: ChatMessage) -> None:
+        if self.cache is not None:
+            self.cache.put(completion_kwargs, get_dict_from_nested_dataclasses(message, ignore_key="raw"))
+
+    def _wait_for_endpoint(self) -> None:
+        while (delay := self.endpoint_guard.acquire()) > 0:
+            time.sleep(delay)
+
+    async def _await_endpoint(self) -> None:
+        while (delay := self.endpoint_guard.acquire()) > 0:
+            await asyncio.sleep(delay)
 
-        max_retries = 5
-        retry_delay = 5  # seconds
-        for attempt in range(max_retries):
+    def __call__(
+        self,
+        messages: List[Dict[str, str]],
+        stop_sequences: Optional[List[str]] = None,
+        grammar: Optional[str] = None,
+        tools_to_call_from: Optional[List[Tool]] = None,
+        **kwargs,
+    ) -> ChatMessage:
+        completion_kwargs = self._prepare_openai_kwargs(
+            messages, stop_sequences=stop_sequences, grammar=grammar, tools_to_call_from=tools_to_call_from, **kwargs
+        )
+
+        with trace_span("llm", kind="llm", model=self.model_id) as span:
+            message = self._cached_message(completion_kwargs)
+            if message is not None:
+                span.set_attributes(cache_hit=True)
+                return _traced_message(span, message)
+            for attempt in range(self.retry_policy.max_attempts):
+                self._wait_for_endpoint()
+                try:
+                    with trace_span("chat.completions", kind="http", attempt=attempt):
+                        response = self.client.chat.completions.create(**completion_kwargs)
+                    message = self._to_chat_message(response, stop_sequences, tools_to_call_from)
+                    self.endpoint_guard.record_success()
+                    self._record_message(completion_kwargs, message)
+                    return _traced_message(span, message)
+                except Exception as e:
+                    time.sleep(self._retry_delay(e, attempt))
+
+    async def acall(
+        self,
+        messages: List[Dict[str, str]],
+        stop_sequences: Optional[List[str]] = None,
+        grammar: Optional[str] = None,
+        tools_to_call_from: Optional[List[Tool]] = None,
+        **kwargs,
+    ) -> ChatMessage:
+        """Same as `__call__`, but uses `openai.AsyncOpenAI` and does not block the event loop while waiting."""
+        completion_kwargs = self._prepare_openai_kwargs(
+            messages, stop_sequences=stop_sequences, grammar=grammar, tools_to_call_from=tools_to_call_from, **kwargs
+        )
+
+        with trace_span("llm", kind="llm", model=self.model_id) as span:
+            message = await asyncio.to_thread(self._cached_message, completion_kwargs)
+            if message is not None:
+                span.set_attributes(cache_hit=True)
+                return _traced_message(span, message)
+            for attempt in range(self.retry_policy.max_attempts):
+                await self._await_endpoint()
+                try:
+                    with trace_span("chat.completions", kind="http", attempt=attempt):
+                        response = await self.async_client.chat.completions.create(**completion_kwargs)
+                    message = self._to_chat_message(response, stop_sequences, tools_to_call_from)
+                    self.endpoint_guard.record_success()
+                    await asyncio.to_thread(self._record_message, completion_kwargs, message)
+                    return _traced_message(span, message)
+                except Exception as e:
+                    await asyncio.sleep(self._retry_delay(e, attempt))
+
+    def _prepare_stream_kwargs(self, messages, stop_sequences=None, **kwargs) -> Dict:
+        completion_kwargs = self._prepare_openai_kwargs(messages, stop_sequences=stop_sequences, **kwargs)
+        completion_kwargs["stream"] = True
+        completion_kwargs["stream_options"] = {"include_usage": True}
+        return completion_kwargs
+
+    def _stream_to_chat_message(self, stream_state: "_StreamState", stop_sequences: Optional[List[str]]) -> ChatMessage:
+        content = "".join(stream_state.content)
+        if not content:
+            raise EmptyContentError(stream_state.usage)
+        message = ChatMessage(
+            role=stream_state.role or "assistant",
+            content=content,
+            reasoning_content="".join(stream_state.reasoning) or None,
+        )
+        if stream_state.usage is not None:
+            message.input_token_count = stream_state.usage.prompt_tokens
+            message.output_token_count = stream_state.usage.completion_tokens
+            message.cached_token_count = get_cached_token_count(stream_state.usage)
+        self.last_input_token_count = message.input_token_count
+        self.last_output_token_count = message.output_token_count
+        if 'o3' in self.model_id.lower() or 'o4' in self.model_id.lower():
+            message.content = self.truncate_content_based_on_stop_sequences(message.content, stop_sequences)
+        return message
+
+    def stream(
+        self,
+        messages: List[Dict[str, str]],
+        on_text: Optional[Callable[[str], None]] = None,
+        stop_sequences: Optional[List[str]] = None,
+        **kwargs,
+    ) -> ChatMessage:
+        """
+        Streams the completion and passes each content delta to `on_text` as it arrives. Requests are retried like in
+        `__call__` only as long as no text has been passed on; a failure mid-stream is raised to the caller.
+        """
+        if kwargs.get("tools_to_call_from") is not None:
+            return super().stream(messages, on_text=on_text, stop_sequences=stop_sequences, **kwargs)
+        completion_kwargs = self._prepare_stream_kwargs(messages, stop_sequences=stop_sequences, **kwargs)
+
+        with trace_span("llm", kind="llm", model=self.model_id, stream=True) as span:
+            message = self._cached_message(completion_kwargs)
+            if message is not None:
+                span.set_attributes(cache_hit=True)
+                if on_text is not None and message.content:
+                    on_text(message.content)
+                return _traced_message(span, message)
+            for attempt in range(self.retry_policy.max_attempts):
+                self._wait_for_endpoint()
+                stream_state = _StreamState()
+                try:
+                    with trace_span("chat.completions", kind="http", attempt=attempt):
+                        for chunk in self.client.chat.completions.create(**completion_kwargs):
+                            text = stream_state.add(chunk)
+                            if text and on_text is not None:
+                                on_text(text)
+                    message = self._stream_to_chat_message(stream_state, stop_sequences)
+                    self.endpoint_guard.record_success()
+                    self._record_message(completion_kwargs, message)
+                    return _traced_message(span, message)
+                except Exception as e:
+                    if stream_state.content:
+                        self.endpoint_guard.record_failure(trip=_classify_error(e)[1])
+                        raise
+                    time.sleep(self._retry_delay(e, attempt))
+
+    async def astream(
+        self,
+        messages: List[Dict[str, str]],
+        on_text: Optional[Callable[[str], None]] = None,
+        stop_sequences: Optional[List[str]] = None,
+        **kwargs,
+    ) -> ChatMessage:
+        """Async counterpart of `stream`, using `openai.AsyncOpenAI`."""
+        if kwargs.get("tools_to_call_from") is not None:
+            return await super().astream(messages, on_text=on_text, stop_sequences=stop_sequences, **kwargs)
+        completion_kwargs = self._prepare_stream_kwargs(messages, stop_sequences=stop_sequences, **kwargs)
+
+        with trace_span("llm", kind="llm", model=self.model_id, stream=True) as span:
+            message = await asyncio.to_thread(self._cached_message, completion_kwargs)
+            if message is not None:
+                span.set_attributes(cache_hit=True)
+                if on_text is not None and message.content:
+                    on_text(message.content)
+                return _traced_message(span, message)
+            for attempt in range(self.retry_policy.max_attempts):
+                await self._await_endpoint()
+                stream_state = _StreamState()
+                try:
+                    with trace_span("chat.completions", kind="http", attempt=attempt):
+                        async for chunk in await self.async_client.chat.completions.create(**completion_kwargs):
+                            text = stream_state.add(chunk)
+                            if text and on_text is not None:
+                                on_text(text)
+                    message = self._stream_to_chat_message(stream_state, stop_sequences)
+                    self.endpoint_guard.record_success()
+                    await asyncio.to_thread(self._record_message, completion_kwargs, message)
+                    return _traced_message(span, message)
+                except Exception as e:
+                    if stream_state.content:
+                        self.endpoint_guard.record_failure(trip=_classify_error(e)[1])
+                        raise
+                    await asyncio.sleep(self._retry_delay(e, attempt))
+
+
+class LoadBalancedModel(Model):
+    """
+    An [`OpenAIServerModel`] spread over several replicas of the same model, e.g. vLLM servers on different nodes.
+
+    Calls are routed by a [`ReplicaBalancer`], by requests in flight or by observed latency, skipping replicas whose
+    circuit is open. A retryable error is retried at once on another healthy replica, and after a backoff only once
+    every replica has failed the call; `retry_policy.max_attempts` counts attempts across replicas. With `sticky=True`,
+    all calls of one agent run (same system prompt and task) go to the same replica while it is healthy, so the
+    server's prefix cache is reused from step to step.
+
+    Parameters:
+        model_id (`str`):
+            The model identifier served by every replica.
+        api_bases (`list[str]`):
+            Base URLs of the replicas.
+        api_key (`str`, *optional*):
+            The API key used for every replica.
+        routing (`str`, default `"least_outstanding"`):
+            `"least_outstanding"` or `"latency"`, see [`ReplicaBalancer`].
+        sticky (`bool`, default `False`):
+            Keep the calls of one conversation on one replica.
+        retry_policy ([`RetryPolicy`], *optional*):
+            Attempts per request across replicas and the backoff once all have failed. Defaults to `RetryPolicy()`.
+        custom_role_conversions (`dict[str, str]`, *optional*):
+            Custom role conversion mapping, as for [`OpenAIServerModel`].
+        cache ([`LLMCache`], *optional*):
+            Completion cache shared by all replicas, as for [`OpenAIServerModel`].
+        **kwargs:
+            Additional keyword arguments to pass to the OpenAI API.
+    """
+
+    def __init__(
+        self,
+        model_id: str,
+        api_bases: List[str],
+        api_key: Optional[str] = None,
+        routing: str = "least_outstanding",
+        sticky: bool = False,
+        retry_policy: Optional[RetryPolicy] = None,
+        custom_role_conversions: Optional[Dict[str, str]] = None,
+        cache: Optional[LLMCache] = None,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.model_id = model_id
+        self.api_base = list(api_bases)
+        self.balancer = ReplicaBalancer(api_bases, routing=routing, sticky=sticky)
+        self.retry_policy = retry_policy or RetryPolicy()
+        # Replicas do not retry themselves: failing over is this model's job.
+        self.models = {
+            replica.endpoint: OpenAIServerModel(
+                model_id,
+                api_base=replica.endpoint,
+                api_key=api_key,
+                custom_role_conversions=custom_role_conversions,
+                retry_policy=RetryPolicy(max_attempts=1),
+                endpoint_guard=replica.guard,
+                cache=cache,
+                **kwargs,
+            )
+            for replica in self.balancer.replicas
+        }
+
+    def replica_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Requests in flight and served, failures, latency and circuit state per replica."""
+        return self.balancer.stats()
+
+    def _affinity_key(self, messages: List[Dict[str, Any]]) -> Optional[str]:
+        return affinity_key(messages) if self.balancer.sticky else None
+
+    def _failover_delay(self, error: Exception, attempt: int, replica: Replica, failed: List[Replica]) -> float:
+        """
+        Seconds to wait before the next attempt: none while a healthy replica has not failed this call yet, otherwise
+        the policy's backoff. Re-raises `error` when it is not retryable or the attempts are used up.
+        """
+        if not _classify_error(error)[0]:
+            raise error
+        if attempt + 1 >= self.retry_policy.max_attempts:
+            logging.error(f"Failed to complete request after {attempt + 1} attempts on {len(self.models)} replicas.")
+            raise error
+        failed.append(replica)
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            # Holds back this replica only; the others are still tried right away.
+            replica.guard.record_retry(error, self.retry_policy.backoff(attempt, retry_after), retry_after)
+        if any(r.guard.available() for r in self.balancer.replicas if r not in failed):
+            logging.warning(f"{type(error).__name__} occurred on {replica.endpoint}: {error}. Failing over.")
+            return 0.0
+        failed.clear()
+        delay = self.retry_policy.backoff(attempt, retry_after)
+        logging.warning(f"{type(error).__name__} occurred on all replicas: {error}. Retrying in {delay:.1f} seconds...")
+        return delay
+
+    def _record_counts(self, model: OpenAIServerModel) -> None:
+        self.last_input_token_count = model.last_input_token_count
+        self.last_output_token_count = model.last_output_token_count
+
+    def _route(self, messages: List[Dict[str, Any]], call: Callable[[OpenAIServerModel], ChatMessage]) -> ChatMessage:
+        key = self._affinity_key(messages)
+        failed: List[Replica] = []
+        for attempt in range(self.retry_policy.max_attempts):
+            replica = self.balancer.choose(key, exclude=failed)
+            model = self.models[replica.endpoint]
+            try:
+                with self.balancer.track(replica):
+                    message = call(model)
+            except Exception as e:
+                time.sleep(self._failover_delay(e, attempt, replica, failed))
+                continue
+            self._record_counts(model)
+            return message
+
+    async def _aroute(self, messages: List[Dict[str, Any]], call) -> ChatMessage:
+        key = self._affinity_key(messages)
+        failed: List[Replica] = []
+        for attempt in range(self.retry_policy.max_attempts):
+            replica = self.balancer.choose(key, exclude=failed)
+            model = self.models[replica.endpoint]
+            try:
+                with self.balancer.track(replica):
+                    message = await call(model)
+            except Exception as e:
+                await asyncio.sleep(self._failover_delay(e, attempt, replica, failed))
+                continue
+            self._record_counts(model)
+            return message
+
+    def __call__(
+        self,
+        messages: List[Dict[str, str]],
+        stop_sequences: Optional[List[str]] = None,
+        grammar: Optional[str] = None,
+        tools_to_call_from: Optional[List[Tool]] = None,
+        **kwargs,
+    ) -> ChatMessage:
+        return self._route(
+            messages,
+            lambda model: model(
+                messages,
+                stop_sequences=stop_sequences,
+                grammar=grammar,
+                tools_to_call_from=tools_to_call_from,
+                **kwargs,
+            ),
+        )
+
+    async def acall(
+        self,
+        messages: List[Dict[str, str]],
+        stop_sequences: Optional[List[str]] = None,
+        grammar: Optional[str] = None,
+        tools_to_call_from: Optional[List[Tool]] = None,
+        **kwargs,
+    ) -> ChatMessage:
+        return await self._aroute(
+            messages,
+            lambda model: model.acall(
+                messages,
+                stop_sequences=stop_sequences,
+                grammar=grammar,
+                tools_to_call_from=tools_to_call_from,
+                **kwargs,
+            ),
+        )
+
+    def stream(
+        self,
+        messages: List[Dict[str, str]],
+        on_text: Optional[Callable[[str], None]] = None,
+        stop_sequences: Optional[List[str]] = None,
+        **kwargs,
+    ) -> ChatMessage:
+        """Like `OpenAIServerModel.stream`; once text has been passed to `on_text`, errors are raised, not retried."""
+        on_text, started = _track_text(on_text)
+
+        def call(model):
             try:
-                response = self.client.chat.completions.create(**completion_kwargs)
+                return model.stream(messages, on_text=on_text, stop_sequences=stop_sequences, **kwargs)
+            except Exception as e:
+                raise _NotRetried(e) if started() else e
 
-                self.last_input_token_count = response.usage.prompt_tokens
-                self.last_output_token_count = response.usage.completion_tokens
+        try:
+            return self._route(messages, call)
+        except _NotRetried as e:
+            raise e.error from None
 
-                if not response.choices[0].message.content and not getattr(response.choices[0].message, 'tool_calls', None):  # o1 o3-mini
-                    raise EmptyContentError(response)
+    async def astream(
+        self,
+        messages: List[Dict[str, str]],
+        on_text: Optional[Callable[[str], None]] = None,
+        stop_sequences: Optional[List[str]] = None,
+        **kwargs,
+    ) -> ChatMessage:
+        on_text, started = _track_text(on_text)
 
-                message = ChatMessage.from_dict(
-                    response.choices[0].message.model_dump(include={"role", "content", "tool_calls", "reasoning_content"})
-                )
-                message.raw = response
-                message.input_token_count = response.usage.prompt_tokens
-                message.output_token_count = response.usage.completion_tokens
-
-                # If model_id contains 'o3' or 'o4', manually truncate content based on stop_sequences
-                if 'o3' in self.model_id.lower() or 'o4' in self.model_id.lower():
-                    message.content = self.truncate_content_based_on_stop_sequences(message.content, stop_sequences)
-
-                if tools_to_call_from is not None:
-                    return parse_tool_args_if_needed(message)
-                return message
-            except BadRequestError as e:
-                logger.error("Bad Request Error:", e)
-                raise
-            except APIConnectionError as e:
-                if attempt < max_retries:
-                    logging.warning(f"Network error occurred: {e}. Retrying in {retry_delay} seconds...")
-                    time.sleep(retry_delay)
-                else:
-                    logging.error(f"Failed to complete request after {max_retries} retries.")
-                    raise
-            except (APIStatusError, EmptyContentError) as e:
-                if attempt < max_retries:
-                    logging.warning(f"API status error occurred: {e}. Retrying in 60 seconds...")
-                    time.sleep(60)
-                else:
-                    logging.error(f"Failed to complete request after {max_retries} retries.")
-                    raise
-            except OpenAIError as e:
-                logging.error(f"API error occurred: {e}.")
-                raise
+        async def call(model):
+            try:
+                return await model.astream(messages, on_text=on_text, stop_sequences=stop_sequences, **kwargs)
             except Exception as e:
-                logging.error(f"An unexpected error occurred: {e}.")
-                raise
+                raise _NotRetried(e) if started() else e
+
+        try:
+            return await self._aroute(messages, call)
+        except _NotRetried as e:
+            raise e.error from None
+
+
+class _NotRetried(Exception):
+    """Carries an error out of a failover loop without retrying it, e.g. after part of a stream was delivered."""
+
+    def __init__(self, error: Exception):
+        super().__init__(str(error))
+        self.error = error
+
+
+def _track_text(on_text: Optional[Callable[[str], None]]):
+    """Wraps `on_text` to note whether any text has been delivered; returns the wrapper and a check for it."""
+    delivered = []
+
+    def track(text: str) -> None:
+        delivered.append(True)
+        if on_text is not None:
+            on_text(text)
+
+    return track, lambda: bool(delivered)
+
+
+# Statuses worth retrying: the request may succeed as is once the server has recovered or the rate limit has passed.
+_RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+
+def _classify_error(error: Exception) -> Tuple[bool, bool]:
+    """
+    Whether a failed request is retried, and whether the failure counts towards opening the endpoint's circuit:
+    connection errors, timeouts and 5xx do; rate limiting and empty completions are retried without tripping it.
+    """
+    if isinstance(error, APIConnectionError):
+        return True, True
+    if isinstance(error, EmptyContentError):
+        return True, False
+    if isinstance(error, APIStatusError):
+        if error.status_code >= 500:
+            return True, True
+        return error.status_code in _RETRYABLE_STATUS_CODES, False
+    return False, False
+
+
+def _traced_message(span, message: ChatMessage) -> ChatMessage:
+    """Records the token counts of `message` on its `llm` span and returns it."""
+    span.set_attributes(
+        input_tokens=message.input_token_count,
+        output_tokens=message.output_token_count,
+        cached_tokens=message.cached_token_count,
+    )
+    return message
+
+
+class _StreamState:
+    """Accumulates the deltas of a streamed chat completion."""
+
+    def __init__(self):
+        self.role = None
+        self.content: List[str] = []
+        self.reasoning: List[str] = []
+        self.usage = None
+
+    def add(self, chunk) -> Optional[str]:
+        """Adds a chunk and returns its content text, if any."""
+        if getattr(chunk, "usage", None) is not None:
+            self.usage = chunk.usage
+        if not chunk.choices:
+            return None
+        delta = chunk.choices[0].delta
+        self.role = self.role or getattr(delta, "role", None)
+        reasoning = getattr(delta, "reasoning_content", None)
+        if reasoning:
+            self.reasoning.append(reasoning)
+        if delta.content:
+            self.content.append(delta.content)
+        return delta.content
+
 
 __all__ = [
     "MessageRole",
@@ -541,5 +1123,6 @@ __all__ = [
     "get_clean_message_list",
     "Model",
     "OpenAIServerModel",
+    "LoadBalancedModel",
     "ChatMessage",
 ]
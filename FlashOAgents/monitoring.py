@@ -15,20 +15,29 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import atexit
+import io
 import json
+import queue
+import sys
+import threading
+import time
 from enum import IntEnum
-from typing import List, Optional
+from functools import partial
+from typing import Any, Callable, List, Optional
 
 from rich import box
 from rich.console import Console, Group
+from rich.errors import MarkupError
 from rich.panel import Panel
 from rich.rule import Rule
 from rich.syntax import Syntax
 from rich.table import Table
+from rich.text import Text
 from rich.tree import Tree
 
 
-__all__ = ["AgentLogger", "LogLevel"]
+__all__ = ["AgentLogger", "LogLevel", "flush_logs"]
 
 YELLOW_HEX = "#d4b702"
 
@@ -39,10 +48,109 @@ class LogLevel(IntEnum):
     DEBUG = 2  # Detailed output
 
 
+class _LogWriter:
+    """Process-wide thread that renders and writes log messages in the order they were queued."""
+
+    def __init__(self, max_pending: int = 10000):
+        self._queue: "queue.Queue[Callable[[], None]]" = queue.Queue(maxsize=max_pending)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, write: Callable[[], None]) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="agent-log-writer", daemon=True)
+                    self._thread.start()
+        # Blocks only when the writer is `max_pending` messages behind.
+        self._queue.put(write)
+
+    def _run(self) -> None:
+        while True:
+            write = self._queue.get()
+            try:
+                write()
+            except Exception as e:
+                sys.__stderr__.write(f"Failed to write log message: {e}\n")
+            finally:
+                self._queue.task_done()
+
+    def flush(self) -> None:
+        if self._thread is not None:
+            self._queue.join()
+
+
+_writer = _LogWriter()
+atexit.register(_writer.flush)
+_stdout_lock = threading.Lock()
+
+
+def flush_logs() -> None:
+    """Waits until the background log writer has written every queued message."""
+    _writer.flush()
+
+
+def _plain_text(renderable: Any) -> str:
+    if isinstance(renderable, str):
+        try:
+            return Text.from_markup(renderable).plain
+        except MarkupError:
+            return renderable
+    if isinstance(renderable, Text):
+        return renderable.plain
+    if isinstance(renderable, Panel):
+        return _plain_text(renderable.renderable)
+    if isinstance(renderable, Rule):
+        return _plain_text(renderable.title)
+    if isinstance(renderable, Syntax):
+        return renderable.code
+    if isinstance(renderable, Group):
+        return "\n".join(_plain_text(item) for item in renderable.renderables)
+    console = Console(file=io.StringIO(), width=120, no_color=True)
+    console.print(renderable)
+    return console.file.getvalue().rstrip("\n")
+
+
 class AgentLogger:
-    def __init__(self, level: LogLevel = LogLevel.INFO):
+    """
+    Logs agent activity to the terminal or to a file.
+
+    Arguments to `log` may be zero-argument callables building the message; they are only called when `level` lets
+    the message through, so filtered-out messages cost nothing to format.
+
+    Args:
+        level (`LogLevel`, default `LogLevel.INFO`): Most verbose level written.
+        log_file (`str`, *optional*): Append to this file instead of printing to the terminal.
+        jsonl (`bool`, default `False`): Write each message as one JSON line (`time`, `level`, `agent`, `message`) of
+            plain text instead of rendering it with rich.
+        background (`bool`, default `False`): Render and write messages on a shared background thread, so that
+            agents never wait on the terminal or on each other's output.
+        name (`str`, *optional*): Agent name recorded in JSON lines.
+    """
+
+    def __init__(
+        self,
+        level: LogLevel = LogLevel.INFO,
+        log_file: Optional[str] = None,
+        jsonl: bool = False,
+        background: bool = False,
+        name: Optional[str] = None,
+    ):
         self.level = level
-        self.console = Console()
+        self.log_file = log_file
+        self.jsonl = jsonl
+        self.background = background
+        self.name = name
+        self._file = open(log_file, "a", encoding="utf-8") if log_file else None
+        if self._file is not None:
+            self.console = Console(file=self._file, width=120, no_color=True, force_terminal=False)
+        else:
+            self.console = Console()
+
+    def enabled(self, level: str | LogLevel = LogLevel.INFO) -> bool:
+        if isinstance(level, str):
+            level = LogLevel[level.upper()]
+        return level <= self.level
 
     def error(self, *args, **kwargs) -> None:
         self.log(*args, level=LogLevel.ERROR,** kwargs)
@@ -55,8 +163,40 @@ class AgentLogger:
         """
         if isinstance(level, str):
             level = LogLevel[level.upper()]
-        if level <= self.level:
-            self.console.print(*args, **kwargs)
+        if level > self.level:
+            return
+        args = tuple(arg() if callable(arg) else arg for arg in args)
+        if self.jsonl:
+            write = partial(self._write_json_line, time.time(), level, args)
+        else:
+            write = partial(self.console.print, *args, **kwargs)
+        if self.background:
+            _writer.submit(write)
+        else:
+            write()
+
+    def _write_json_line(self, timestamp: float, level: LogLevel, args: tuple) -> None:
+        record = {
+            "time": timestamp,
+            "level": level.name,
+            "agent": self.name,
+            "message": "\n".join(_plain_text(arg) for arg in args),
+        }
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        if self._file is not None:
+            self._file.write(line)
+        else:
+            with _stdout_lock:
+                sys.stdout.write(line)
+
+    def close(self) -> None:
+        """Writes the queued messages and closes the log file, if any; later messages are dropped."""
+        if self.background:
+            _writer.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self.level = LogLevel.OFF
 
     def log_markdown(self, content: str, title: Optional[str] = None, level=LogLevel.INFO, style=YELLOW_HEX) -> None:
         markdown_content = Syntax(
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Copyright 2025 The OPPO Inc. PersonalAI team. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from .page_store import canonical_url, get_page_store
+
+# Prefetches waiting for a worker, beyond which new ones are dropped: a backlog would only fetch pages the agent
+# has moved past.
+_QUEUE_PER_WORKER = 4
+
+
+class PagePrefetcher:
+    """
+    Reads the top result pages of every web search in the background, while the model decides on its next step, so
+    that a following `crawl_page` on one of them does not wait for the fetch.
+
+    Fetched pages go to the process-wide `PageStore` when one is configured, and are kept here until claimed
+    otherwise. `read_page` first asks `claim` for the URL: a finished prefetch is served at once and one still in
+    flight is awaited instead of fetched a second time. All searches of the process share `max_concurrency` fetch
+    workers. Unclaimed pages kept here may take up `max_bytes`; beyond that, the oldest ones are evicted. Pages that
+    are already stored, already queued, or that arrive while the queue is full are skipped.
+
+    Args:
+        top_n (`int`, default `3`): Number of top results of each search to prefetch.
+        max_concurrency (`int`, default `4`): Pages fetched at the same time.
+        max_bytes (`int`, default 256 MiB): Total size of the unclaimed pages kept in memory.
+    """
+
+    def __init__(self, top_n: int = 3, max_concurrency: int = 4, max_bytes: int = 256 << 20):
+        self.top_n = top_n
+        self.max_concurrency = max_concurrency
+        self.max_bytes = max_bytes
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="page-prefetch")
+        self._lock = threading.Lock()
+        self._pages: Dict[str, Future] = {}
+        # Finished, unclaimed pages kept in memory and their sizes, oldest first.
+        self._held: "OrderedDict[str, int]" = OrderedDict()
+        self._pending = 0
+        self._bytes = 0
+        self._counts = Counter()
+
+    def schedule(self, urls: Iterable[str], fetch: Callable[[str], Optional[str]]) -> int:
+        """
+        Queues the first `top_n` of `urls`, in order, to be read with `fetch`, which returns the page content or
+        None on failure. Returns the number of pages queued.
+        """
+        store = get_page_store()
+        queued = 0
+        for url in list(urls)[: self.top_n]:
+            if not url.startswith(("http://", "https://")):
+                continue
+            key = canonical_url(url)
+            stored = store is not None and key in store
+            with self._lock:
+                if stored:
+                    self._counts["skipped_stored"] += 1
+                    continue
+                if key in self._pages:
+                    continue
+                if self._pending >= self.max_concurrency * _QUEUE_PER_WORKER:
+                    self._counts["skipped_busy"] += 1
+                    continue
+                self._pending += 1
+                self._counts["scheduled"] += 1
+                future = self._pages[key] = self._executor.submit(self._fetch, url, fetch)
+            # Outside the lock: a future that is already done runs the callback right here.
+            future.add_done_callback(lambda done, key=key: self._finished(key, done))
+            queued += 1
+        return queued
+
+    def _fetch(self, url: str, fetch: Callable[[str], Optional[str]]) -> Optional[str]:
+        try:
+            text = fetch(url)
+        except Exception:
+            text = None
+        with self._lock:
+            self._pending -= 1
+            self._counts["failed" if text is None else "fetched"] += 1
+        return text
+
+    def _finished(self, key: str, future: Future) -> None:
+        text = None if future.cancelled() else future.result()
+        with self._lock:
+            if future.cancelled():
+                self._pending -= 1
+            if self._pages.get(key) is not future:
+                return  # claimed meanwhile
+            if text is None or get_page_store() is not None:
+                # Failed, or in the page store now; `claim` only needed to cover the fetch.
+                del self._pages[key]
+                return
+            size = len(text.encode("utf-8"))
+            self._held[key] = size
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                evicted, evicted_size = self._held.popitem(last=False)
+                del self._pages[evicted]
+                self._bytes -= evicted_size
+                self._counts["evicted"] += 1
+
+    def claim(self, url: str) -> Optional[Future]:
+        """
+        Takes the prefetch of `url` if there is one: a future of its content, or of None if the fetch failed.
+        Each prefetch is handed out once; later reads go through the page store.
+        """
+        key = canonical_url(url)
+        with self._lock:
+            future = self._pages.pop(key, None)
+            self._bytes -= self._held.pop(key, 0)
+            if future is not None and future.cancelled():
+                return None
+            if future is not None:
+                self._counts["hits" if future.done() else "joined"] += 1
+        return future
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Queued, fetched, skipped and evicted prefetches, pages served from them (`hits` finished, `joined` in flight)
+        and the size of the unclaimed pages kept in memory.
+        """
+        with self._lock:
+            counts = dict(self._counts)
+            held_bytes, pending = self._bytes, self._pending
+        return {
+            **{name: counts.get(name, 0) for name in (
+                "scheduled", "fetched", "failed", "hits", "joined", "evicted", "skipped_stored", "skipped_busy"
+            )},
+            "pending": pending,
+            "held_bytes": held_bytes,
+        }
+
+    def shutdown(self, wait: bool = False) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+_default_prefetcher: Optional[PagePrefetcher] = None
+_default_prefetcher_lock = threading.Lock()
+
+
+def get_page_prefetcher() -> Optional[PagePrefetcher]:
+    """Process-wide `PagePrefetcher` used by the web search tools, or None if prefetching is off (the default)."""
+    return _default_prefetcher
+
+
+def configure_page_prefetcher(
+        top_n: int = 0, max_concurrency: int = 4, max_bytes: int = 256 << 20
+) -> Optional[PagePrefetcher]:
+    """Sets the process-wide `PagePrefetcher`; `top_n=0` turns prefetching off."""
+    global _default_prefetcher
+    with _default_prefetcher_lock:
+        if _default_prefetcher is not None:
+            _default_prefetcher.shutdown()
+        _default_prefetcher = PagePrefetcher(top_n, max_concurrency, max_bytes) if top_n > 0 else None
+    return _default_prefetcher
+
+
+def page_prefetch_stats() -> Optional[Dict[str, Any]]:
+    return _default_prefetcher.stats() if _default_prefetcher is not None else None
+
+
+__all__ = [
+    "PagePrefetcher",
+    "get_page_prefetcher",
+    "configure_page_prefetcher",
+    "page_prefetch_stats",
+]
@@ -0,0 +1,375 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Copyright 2025 The OPPO Inc. PersonalAI team. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import codecs
+import hashlib
+import mmap
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, Optional
+from urllib.parse import parse_qsl, quote, unquote, urlencode, urlsplit, urlunsplit
+
+try:
+    import zstandard
+except ImportError:  # zlib is always available; zstd is smaller and faster when installed
+    zstandard = None
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+# Query parameters that track the visitor and never change the page.
+_TRACKING_PARAMS = re.compile(r"^(utm_\w+|fbclid|gclid|dclid|msclkid|mc_cid|mc_eid|_ga|ref_src)$", re.IGNORECASE)
+_MOBILE_WIKI = re.compile(r"^(\w+)\.m\.(wiki[a-z]+\.org)$")
+_PATH_SAFE = "/:@!$&'()*+,;=-._~"
+_STREAM_CHUNK = 1 << 16
+_EVICT_TO = 0.9
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    fetched REAL NOT NULL,
+    accessed REAL NOT NULL,
+    etag TEXT,
+    last_modified TEXT
+);
+CREATE INDEX IF NOT EXISTS pages_accessed ON pages (accessed);
+CREATE INDEX IF NOT EXISTS pages_digest ON pages (digest);
+CREATE TABLE IF NOT EXISTS blobs (
+    digest TEXT PRIMARY KEY,
+    codec TEXT NOT NULL,
+    raw_bytes INTEGER NOT NULL,
+    stored_bytes INTEGER NOT NULL
+);
+"""
+
+
+def canonical_url(url: str) -> str:
+    """
+    Store key of a page URL: lower-case scheme and host without `www.`, default port or fragment, mobile Wikipedia
+    hosts mapped to the desktop ones, percent-encoding normalized, duplicate and trailing slashes dropped, tracking
+    parameters removed and the remaining query parameters sorted.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower().rstrip(".")
+    host = _MOBILE_WIKI.sub(r"\1.\2", host)
+    if host.startswith("www."):
+        host = host[4:]
+    netloc = host if parts.port in (None, _DEFAULT_PORTS.get(scheme)) else f"{host}:{parts.port}"
+    path = re.sub(r"/{2,}", "/", quote(unquote(parts.path), safe=_PATH_SAFE))
+    if len(path) > 1:
+        path = path.rstrip("/")
+    query = sorted(
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not _TRACKING_PARAMS.match(key)
+    )
+    return urlunsplit((scheme, netloc, path or "/", urlencode(query), ""))
+
+
+@dataclass
+class StoredPage:
+    """Index entry of a stored page."""
+
+    url: str
+    digest: str
+    codec: str
+    fetched: float
+    etag: Optional[str]
+    last_modified: Optional[str]
+    raw_bytes: int
+    stored_bytes: int
+    fresh: bool
+
+    def validators(self) -> Dict[str, str]:
+        """Conditional request headers that let the server answer 304 if the page has not changed."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class PageStore:
+    """
+    Local store of fetched page content, shared across items, runs and worker processes.
+
+    Pages are keyed by `canonical_url`. Bodies are content-addressed: each distinct body is compressed once (zstd
+    when the `zstandard` package is installed, zlib otherwise) into `root/blobs/`, and URLs with the same content
+    share it. The SQLite index in `root/index.db` keeps the fetch time and the `ETag` / `Last-Modified` validators
+    of each URL. A page younger than `max_age` is served as is; an older one is revalidated with a conditional
+    request when it has validators, and fetched again otherwise. Once the compressed bodies exceed `max_bytes`, the
+    least recently read pages are evicted. Bodies are decompressed from a memory map of their file, and
+    `iter_text` streams them in chunks so that a large page never has to be held whole.
+
+    Args:
+        root (`str`): Directory of the store, created if missing.
+        max_bytes (`int`, default 2 GiB): Cap on the compressed size of the stored bodies.
+        max_age (`float`, default one week): Seconds a page is served without revalidation.
+        level (`int`, default `3`): Compression level.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 2 << 30, max_age: float = 7 * 24 * 3600, level: int = 3):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.level = level
+        self.codec = "zst" if zstandard is not None else "zlib"
+        os.makedirs(os.path.join(root, "blobs"), exist_ok=True)
+        self._local = threading.local()
+        self._counts_lock = threading.Lock()
+        self._counts = Counter()
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread and per process, as in `DiskCache`.
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            path = os.path.join(self.root, "index.db")
+            connection = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._counts_lock:
+            self._counts[name] += n
+
+    def _blob_path(self, digest: str, codec: str) -> str:
+        return os.path.join(self.root, "blobs", digest[:2], f"{digest}.{codec}")
+
+    def lookup(self, url: str) -> Optional[StoredPage]:
+        """The index entry of `url`, fresh or not, or None if the page is not stored."""
+        row = self._connection().execute(
+            "SELECT p.url, p.digest, b.codec, p.fetched, p.etag, p.last_modified, b.raw_bytes, b.stored_bytes "
+            "FROM pages p JOIN blobs b ON b.digest = p.digest WHERE p.url = ?",
+            (canonical_url(url),),
+        ).fetchone()
+        if row is None:
+            self._count("misses")
+            return None
+        page = StoredPage(*row, fresh=time.time() - row[3] < self.max_age)
+        if not page.fresh:
+            self._count("stale")
+        return page
+
+    def read(self, page: StoredPage) -> Optional[str]:
+        """The content of a stored page, or None if its body is gone or cannot be decoded here."""
+        path = self._blob_path(page.digest, page.codec)
+        try:
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                text = self._decompress(page.codec, data).decode("utf-8")
+        except (OSError, ValueError, zlib.error):
+            self._forget(page)
+            return None
+        self._touch(page.url)
+        self._count("hits")
+        self._count("bytes_served", page.raw_bytes)
+        return text
+
+    def iter_text(self, page: StoredPage, chunk_bytes: int = _STREAM_CHUNK) -> Iterator[str]:
+        """Streams the content of a stored page in pieces of about `chunk_bytes`, without decompressing it whole."""
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        with open(self._blob_path(page.digest, page.codec), "rb") as f:
+            if page.codec == "zst":
+                reader = zstandard.ZstdDecompressor().stream_reader(f)
+                while chunk := reader.read(chunk_bytes):
+                    yield decoder.decode(chunk)
+            else:
+                decompressor = zlib.decompressobj()
+                while chunk := f.read(chunk_bytes):
+                    yield decoder.decode(decompressor.decompress(chunk))
+                yield decoder.decode(decompressor.flush())
+        yield decoder.decode(b"", final=True)
+        self._touch(page.url)
+        self._count("hits")
+
+    def __contains__(self, url: str) -> bool:
+        """Whether a fresh copy of `url` is stored; does not count as a lookup."""
+        row = self._connection().execute("SELECT fetched FROM pages WHERE url = ?", (canonical_url(url),)).fetchone()
+        return row is not None and time.time() - row[0] < self.max_age
+
+    def get(self, url: str) -> Optional[str]:
+        """The content of `url` if it is stored and fresh."""
+        page = self.lookup(url)
+        return self.read(page) if page is not None and page.fresh else None
+
+    def put(self, url: str, text: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> StoredPage:
+        """Stores the fetched content of `url` with its validators, replacing an older version."""
+        raw = text.encode("utf-8")
+        digest = hashlib.sha256(raw).hexdigest()
+        connection = self._connection()
+        known = connection.execute("SELECT codec, stored_bytes FROM blobs WHERE digest = ?", (digest,)).fetchone()
+        if known is not None and os.path.exists(self._blob_path(digest, known[0])):
+            codec, stored_bytes = known
+        else:
+            codec, stored_bytes = self.codec, self._write_blob(digest, raw)
+        now = time.time()
+        connection.execute(
+            # A row whose file is gone is rewritten, possibly with another codec than the process that wrote it.
+            "INSERT INTO blobs (digest, codec, raw_bytes, stored_bytes) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(digest) DO UPDATE SET codec = excluded.codec, stored_bytes = excluded.stored_bytes",
+            (digest, codec, len(raw), stored_bytes),
+        )
+        connection.execute(
+            "INSERT INTO pages (url, digest, fetched, accessed, etag, last_modified) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(url) DO UPDATE SET digest = excluded.digest, fetched = excluded.fetched, "
+            "accessed = excluded.accessed, etag = excluded.etag, last_modified = excluded.last_modified",
+            (canonical_url(url), digest, now, now, etag, last_modified),
+        )
+        self._count("writes")
+        if self.total_bytes() > self.max_bytes:
+            self.evict()
+        return StoredPage(canonical_url(url), digest, codec, now, etag, last_modified, len(raw), stored_bytes, True)
+
+    def revalidate(self, page: StoredPage) -> Optional[str]:
+        """Marks a stale page as fresh after the server confirmed it is unchanged (304), and returns its content."""
+        self._connection().execute("UPDATE pages SET fetched = ? WHERE url = ?", (time.time(), page.url))
+        self._count("revalidated")
+        return self.read(page)
+
+    def _compress(self, raw: bytes) -> bytes:
+        if self.codec == "zst":
+            return zstandard.ZstdCompressor(level=self.level).compress(raw)
+        return zlib.compress(raw, self.level)
+
+    @staticmethod
+    def _decompress(codec: str, data) -> bytes:
+        if codec == "zst":
+            if zstandard is None:
+                raise ValueError("zstandard is not installed")
+            return zstandard.ZstdDecompressor().decompress(data)
+        return zlib.decompress(data)
+
+    def _write_blob(self, digest: str, raw: bytes) -> int:
+        path = self._blob_path(digest, self.codec)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = self._compress(raw)
+        # Written under a temporary name and renamed, so readers in other processes never see a partial body.
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return len(data)
+
+    def _touch(self, url: str) -> None:
+        self._connection().execute("UPDATE pages SET accessed = ? WHERE url = ?", (time.time(), url))
+
+    def _forget(self, page: StoredPage) -> None:
+        """
+        Drops a body that is missing or unreadable, e.g. evicted by another process, with every page that uses it, so
+        that the pages are fetched and stored again.
+        """
+        connection = self._connection()
+        connection.execute("DELETE FROM pages WHERE digest = ?", (page.digest,))
+        connection.execute("DELETE FROM blobs WHERE digest = ?", (page.digest,))
+        try:
+            os.remove(self._blob_path(page.digest, page.codec))
+        except FileNotFoundError:
+            pass
+        self._count("broken")
+
+    def total_bytes(self) -> int:
+        return self._connection().execute("SELECT COALESCE(SUM(stored_bytes), 0) FROM blobs").fetchone()[0]
+
+    def evict(self) -> int:
+        """Drops the least recently read pages, and the bodies no page uses any more, until the store fits its cap."""
+        connection = self._connection()
+        excess = self.total_bytes() - self.max_bytes * _EVICT_TO
+        evicted = 0
+        rows = connection.execute(
+            "SELECT p.url, b.stored_bytes FROM pages p JOIN blobs b ON b.digest = p.digest ORDER BY p.accessed"
+        ).fetchall()
+        for url, stored_bytes in rows:
+            if excess <= 0:
+                break
+            connection.execute("DELETE FROM pages WHERE url = ?", (url,))
+            excess -= stored_bytes
+            evicted += 1
+        orphans = connection.execute(
+            "SELECT digest, codec FROM blobs WHERE digest NOT IN (SELECT digest FROM pages)"
+        ).fetchall()
+        for digest, codec in orphans:
+            connection.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+            try:
+                os.remove(self._blob_path(digest, codec))
+            except FileNotFoundError:
+                pass
+        self._count("evictions", evicted)
+        return evicted
+
+    def stats(self) -> Dict[str, Any]:
+        """Hits, misses, revalidations and evictions of this process, plus the pages and bytes in the store."""
+        with self._counts_lock:
+            counts = dict(self._counts)
+        pages, raw_bytes, stored_bytes = self._connection().execute(
+            "SELECT (SELECT COUNT(*) FROM pages), COALESCE(SUM(raw_bytes), 0), COALESCE(SUM(stored_bytes), 0) "
+            "FROM blobs"
+        ).fetchone()
+        lookups = counts.get("hits", 0) + counts.get("misses", 0) + counts.get("stale", 0)
+        return {
+            "hits": counts.get("hits", 0),
+            "misses": counts.get("misses", 0),
+            "stale": counts.get("stale", 0),
+            "revalidated": counts.get("revalidated", 0),
+            "hit_rate": counts.get("hits", 0) / lookups if lookups else 0.0,
+            "writes": counts.get("writes", 0),
+            "evictions": counts.get("evictions", 0),
+            "pages": pages,
+            "codec": self.codec,
+            "raw_bytes": raw_bytes,
+            "stored_bytes": stored_bytes,
+            "compression_ratio": raw_bytes / stored_bytes if stored_bytes else 0.0,
+        }
+
+
+_default_store: Optional[PageStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_page_store() -> Optional[PageStore]:
+    """Process-wide `PageStore` used by `read_page`, or None if pages are not stored (the default)."""
+    return _default_store
+
+
+def configure_page_store(root: Optional[str], **kwargs) -> Optional[PageStore]:
+    """Sets the process-wide `PageStore`; `root=None` turns the store off."""
+    global _default_store
+    with _default_store_lock:
+        _default_store = PageStore(root, **kwargs) if root else None
+    return _default_store
+
+
+def page_store_stats() -> Optional[Dict[str, Any]]:
+    return _default_store.stats() if _default_store is not None else None
+
+
+__all__ = [
+    "PageStore",
+    "StoredPage",
+    "canonical_url",
+    "get_page_store",
+    "configure_page_store",
+    "page_store_stats",
+]
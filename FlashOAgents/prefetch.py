@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Copyright 2025 The OPPO Inc. PersonalAI team. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import re
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from .search_tools import format_search_results, read_page
+
+# Words dropped when turning a question into a keyword query.
+STOPWORDS = frozenset(
+    """
+    a an and are as at be been but by can could did do does for from had has have how i if in into is it its
+    me my of on or our please should so than that the their them then there these they this those to was
+    we were what when where which who whom whose why will with would you your find name tell give identify
+    """.split()
+)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def query_tokens(query: str) -> Set[str]:
+    """Lower-cased word tokens of `query`, without stopwords."""
+    return {token for token in _TOKEN_RE.findall(query.lower()) if token not in STOPWORDS}
+
+
+def query_overlap(first: str, second: str) -> float:
+    """Jaccard similarity of the token sets of two queries, in [0, 1]."""
+    first_tokens, second_tokens = query_tokens(first), query_tokens(second)
+    if not first_tokens or not second_tokens:
+        return 0.0
+    return len(first_tokens & second_tokens) / len(first_tokens | second_tokens)
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def speculative_queries(task: str, max_query_chars: int = 300, max_keywords: int = 12) -> List[str]:
+    """
+    Queries a first action step is likely to issue for `task`: the task text itself, truncated to `max_query_chars`
+    at a word boundary, and a keyword version of it keeping the first `max_keywords` non-stopword tokens.
+    """
+    text = " ".join(task.split())
+    if len(text) > max_query_chars:
+        text = text[:max_query_chars].rsplit(" ", 1)[0]
+    keywords, seen = [], set()
+    for token in _TOKEN_RE.findall(text):
+        if token.lower() not in STOPWORDS and token.lower() not in seen:
+            seen.add(token.lower())
+            keywords.append(token)
+    queries = [text] if text else []
+    keyword_query = " ".join(keywords[:max_keywords])
+    if keyword_query and normalize_query(keyword_query) != normalize_query(text):
+        queries.append(keyword_query)
+    return queries
+
+
+class SpeculativePrefetcher:
+    """
+    Runs the searches a first action step is likely to need while the initial plan is being generated.
+
+    `start` submits one `web_search` per speculative query (and, with `crawl_top_k`, reads the top result pages)
+    through `submit`, usually the agent's `ToolExecutor`. Tool calls then ask `match_search` / `match_page` for a
+    future holding the prefetched result: a search matches when its normalized query is the same as a speculative
+    one, or when their token overlap reaches `overlap_threshold`. Once `cancel` is called nothing matches anymore.
+
+    Args:
+        search_tool (`Tool`): The agent's `web_search` tool. If it has a `search` method returning structured
+            results, the result links are available for crawling.
+        crawl_top_k (`int`, default `0`): Number of top result pages of each speculative search to read.
+        overlap_threshold (`float`, default `0.5`): Minimum token overlap for a non-identical query to match.
+        fetch_page (`Callable[[str], str]`, default `read_page`): Reads the raw content of a page.
+    """
+
+    def __init__(
+        self,
+        search_tool,
+        crawl_top_k: int = 0,
+        overlap_threshold: float = 0.5,
+        fetch_page: Optional[Callable[[str], str]] = None,
+    ):
+        self.search_tool = search_tool
+        self.crawl_top_k = crawl_top_k
+        self.overlap_threshold = overlap_threshold
+        self.fetch_page = fetch_page or read_page
+        self._lock = threading.Lock()
+        self._searches: Dict[str, Tuple[str, Future]] = {}
+        self._pages: Dict[str, Future] = {}
+        self._submit = None
+        self.closed = False
+        self._stats = {"searches": 0, "pages": 0, "search_hits": 0, "overlap_hits": 0, "page_hits": 0, "misses": 0}
+
+    def start(self, task: str, submit: Callable[..., Future]) -> None:
+        """Starts the speculative searches for `task`; `submit(fn, *args, tool_name=...)` must return a `Future`."""
+        self._submit = submit
+        for query in speculative_queries(task):
+            key = normalize_query(query)
+            with self._lock:
+                if key in self._searches:
+                    continue
+                self._searches[key] = (query, submit(self._search, query, tool_name="web_search"))
+                self._stats["searches"] += 1
+
+    def _search(self, query: str) -> str:
+        if not hasattr(self.search_tool, "search"):
+            return str(self.search_tool(query=query))
+        search_results, error_msg = self.search_tool.search(query)
+        if error_msg:
+            return error_msg
+        if self.crawl_top_k:
+            for result in search_results[: self.crawl_top_k]:
+                self._prefetch_page(result["link"])
+        return format_search_results(search_results)
+
+    def _prefetch_page(self, url: str) -> None:
+        if not url.startswith(("http://", "https://")):
+            return
+        with self._lock:
+            if url in self._pages:
+                return
+            self._pages[url] = self._submit(self.fetch_page, url, tool_name="crawl_page")
+            self._stats["pages"] += 1
+
+    def match_search(self, query: str) -> Optional[Tuple[str, Future]]:
+        """Returns `(speculative query, future observation)` for a matching prefetched search, or `None`."""
+        key = normalize_query(query)
+        with self._lock:
+            if self.closed:
+                return None
+            if key in self._searches:
+                self._stats["search_hits"] += 1
+                return self._searches[key]
+            best, best_overlap = None, 0.0
+            for speculative_query, future in self._searches.values():
+                overlap = query_overlap(query, speculative_query)
+                if overlap >= self.overlap_threshold and overlap > best_overlap:
+                    best, best_overlap = (speculative_query, future), overlap
+            self._stats["overlap_hits" if best else "misses"] += 1
+            return best
+
+    def match_page(self, url: str) -> Optional[Future]:
+        """Returns the future raw content of a prefetched page, or `None`."""
+        with self._lock:
+            if self.closed:
+                return None
+            future = self._pages.get(url)
+            self._stats["page_hits" if future is not None else "misses"] += 1
+            return future
+
+    def cancel(self) -> None:
+        """Cancels the prefetches that have not started yet and stops matching tool calls."""
+        with self._lock:
+            self.closed = True
+            for _, future in self._searches.values():
+                future.cancel()
+            for future in self._pages.values():
+                future.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats)
+
+
+__all__ = ["SpeculativePrefetcher", "speculative_queries", "query_overlap"]
@@ -7,10 +7,12 @@ import time
 from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from typing import Dict, Optional
 
+from functools import lru_cache
+
 import json_repair
 import yaml
-from jinja2 import StrictUndefined, Template
 
+from .agents import compile_template
 from .report_dag import ReportOutline, ReportSection, SectionStatus
 from .models import OpenAIServerModel
 
@@ -20,10 +22,11 @@ CONTEXT_THRESHOLD = 60000
 
 
 def _render_template(template_str: str, variables: dict) -> str:
-    compiled = Template(template_str, undefined=StrictUndefined)
+    compiled = compile_template(template_str)
     return compiled.render(**variables)
 
 
+@lru_cache(maxsize=1)
 def _load_report_prompts() -> dict:
     prompts_path = os.path.join(
         os.path.dirname(__file__), "prompts", "report", "report_prompts.yaml"
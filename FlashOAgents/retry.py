@@ -0,0 +1,283 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Copyright 2025 The OPPO Inc. PersonalAI team. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import random
+import threading
+import time
+from collections import Counter
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+# Wait of a caller that finds the circuit half-open while another call probes the endpoint.
+_PROBE_POLL_INTERVAL = 0.5
+
+
+class RetryPolicy:
+    """
+    How often a model request is attempted and how long to wait in between: exponential backoff with full jitter
+    (a random delay between 0 and `base_delay * 2**attempt`, capped at `max_delay`), so that callers failing together
+    do not retry together. A `Retry-After` sent by the server replaces the computed delay.
+
+    Args:
+        max_attempts (`int`, default `5`): Attempts per request, including the first one.
+        base_delay (`float`, default `1.0`): Upper bound of the first backoff, in seconds.
+        max_delay (`float`, default `60.0`): Upper bound of any computed backoff.
+        max_retry_after (`float`, default `120.0`): Longest `Retry-After` that is honoured as is.
+        rng (`random.Random`, *optional*): Source of the jitter.
+    """
+
+    def __init__(
+            self,
+            max_attempts: int = 5,
+            base_delay: float = 1.0,
+            max_delay: float = 60.0,
+            max_retry_after: float = 120.0,
+            rng: Optional[random.Random] = None,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.rng = rng or random.Random()
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Seconds to wait after the failed attempt number `attempt` (0-based)."""
+        if retry_after is not None:
+            return min(max(retry_after, 0.0), self.max_retry_after)
+        return self.rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """The `retry-after-ms` or `Retry-After` (seconds or HTTP date) of the response behind `error`, if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value is not None:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return parsedate_to_datetime(value).timestamp() - time.time()
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Allows `rate` calls per second on average and bursts of up to `burst` calls.
+
+    Args:
+        rate (`float`): Tokens added per second.
+        burst (`int`, *optional*): Bucket size. Defaults to `max(1, rate)`.
+    """
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+
+    def take(self, now: float) -> float:
+        """Takes a token and returns 0, or returns the seconds until one is available. Not thread-safe."""
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+
+class EndpointGuard:
+    """
+    Circuit breaker, rate limiter and retry metrics of one model endpoint, shared by every model client using it.
+
+    Before each attempt, callers sleep for what `acquire` returns until it returns 0. The circuit opens after
+    `failure_threshold` consecutive failed attempts (connection errors, timeouts, 5xx and other retryable errors):
+    calls then wait `reset_timeout` seconds, after which a single probe call is let through. Its success closes the
+    circuit, its failure opens it again. A `Retry-After` received by one caller holds back all callers of the endpoint
+    for that long, so a burst of 429s does not turn into a burst of retries. With a `rate`, attempts are spaced by a
+    `TokenBucket`.
+
+    Args:
+        name (`str`): Endpoint name, used in the stats.
+        failure_threshold (`int`, default `5`): Consecutive failures that open the circuit.
+        reset_timeout (`float`, default `30.0`): Seconds the circuit stays open before a probe call.
+        rate (`float`, *optional*): Attempts per second allowed on the endpoint.
+        burst (`int`, *optional*): Burst size of the rate limit.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            failure_threshold: int = 5,
+            reset_timeout: float = 30.0,
+            rate: Optional[float] = None,
+            burst: Optional[int] = None,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._hold_until = 0.0
+        self._attempts = 0
+        self._successes = 0
+        self._failures = 0
+        self._retries = Counter()
+        self._backoff_time = 0.0
+        self._retry_after_used = 0
+        self._breaker_opens = 0
+        self._guard_wait_time = 0.0
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def acquire(self) -> float:
+        """Returns 0 and counts an attempt if a call may start now, else the seconds to wait before asking again."""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(self._hold_until - now, 0.0)
+            if self._state == "open":
+                reopen_at = self._opened_at + self.reset_timeout
+                if now < reopen_at:
+                    wait = max(wait, reopen_at - now)
+                else:
+                    self._state = "half_open"
+            if self._state == "half_open" and self._probe_in_flight:
+                wait = max(wait, _PROBE_POLL_INTERVAL)
+            if wait == 0 and self.bucket is not None:
+                wait = self.bucket.take(now)
+            if wait > 0:
+                self._guard_wait_time += wait
+                return wait
+            if self._state == "half_open":
+                self._probe_in_flight = True
+            self._attempts += 1
+            return 0.0
+
+    def available(self) -> bool:
+        """Whether a call could start now, ignoring the rate limit. Unlike `acquire`, it changes nothing."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._hold_until:
+                return False
+            if self._state == "open":
+                return now >= self._opened_at + self.reset_timeout
+            return not (self._state == "half_open" and self._probe_in_flight)
+
+    def record_success(self) -> None:
+        """The endpoint answered; client errors such as a 400 count as well."""
+        with self._lock:
+            self._successes += 1
+            self._consecutive_failures = 0
+            self._state = "closed"
+            self._probe_in_flight = False
+
+    def record_failure(self, trip: bool = True) -> None:
+        """A failed attempt. Failures with `trip=False`, such as rate limiting, do not move the circuit."""
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if not trip:
+                return
+            self._consecutive_failures += 1
+            if self._state == "half_open" or (
+                self._state == "closed" and self._consecutive_failures >= self.failure_threshold
+            ):
+                self._state = "open"
+                self._opened_at = time.monotonic()
+                self._breaker_opens += 1
+
+    def record_retry(self, error: Exception, delay: float, retry_after: Optional[float]) -> None:
+        with self._lock:
+            self._retries[type(error).__name__] += 1
+            self._backoff_time += delay
+            if retry_after is not None:
+                self._retry_after_used += 1
+                self._hold_until = max(self._hold_until, time.monotonic() + delay)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "endpoint": self.name,
+                "state": self._state,
+                "attempts": self._attempts,
+                "successes": self._successes,
+                "failures": self._failures,
+                "retries": sum(self._retries.values()),
+                "retries_by_error": dict(self._retries),
+                "backoff_time": self._backoff_time,
+                "retry_after_used": self._retry_after_used,
+                "breaker_opens": self._breaker_opens,
+                "guard_wait_time": self._guard_wait_time,
+            }
+
+
+_guards: Dict[str, EndpointGuard] = {}
+_guard_options: Dict[str, Any] = {}
+_guards_lock = threading.Lock()
+
+
+def get_endpoint_guard(endpoint: str) -> EndpointGuard:
+    """The `EndpointGuard` shared by all clients of `endpoint`, created with the configured options on first use."""
+    with _guards_lock:
+        guard = _guards.get(endpoint)
+        if guard is None:
+            guard = _guards[endpoint] = EndpointGuard(endpoint, **_guard_options)
+        return guard
+
+
+def configure_endpoint_guards(**kwargs) -> None:
+    """
+    Sets the `EndpointGuard` options of endpoints used from now on. Guards already handed out keep their options
+    and stay registered, so their clients still share them and `endpoint_stats` still reports them.
+    """
+    global _guard_options
+    with _guards_lock:
+        _guard_options = dict(kwargs)
+
+
+def endpoint_stats() -> Dict[str, Dict[str, Any]]:
+    """Retry, circuit-breaker and rate-limit stats of every endpoint."""
+    with _guards_lock:
+        guards = list(_guards.values())
+    return {guard.name: guard.stats() for guard in guards}
+
+
+__all__ = [
+    "RetryPolicy",
+    "TokenBucket",
+    "EndpointGuard",
+    "retry_after_seconds",
+    "get_endpoint_guard",
+    "configure_endpoint_guards",
+    "endpoint_stats",
+]
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Copyright 2025 The OPPO Inc. PersonalAI team. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import re
+import threading
+import unicodedata
+from typing import Any, Dict, Optional
+
+from .disk_cache import DiskCache
+
+# Punctuation that changes what a search engine returns: exact phrases, exclusions, operators such as `site:`,
+# domains and file types. Everything else is dropped from the cache key.
+_KEPT_PUNCTUATION = set('"-:./@#&+_')
+_TOKEN_EDGE_DOTS = re.compile(r"(?<!\S)\.+|\.+(?!\S)")
+
+
+def normalize_search_query(query: str) -> str:
+    """
+    Cache key form of a search query: Unicode-normalized, case-folded, without punctuation that does not change the
+    results (commas, question marks, brackets, apostrophes, dots ending a word) and with whitespace collapsed.
+    """
+    text = unicodedata.normalize("NFKC", query).casefold()
+    text = "".join(
+        " " if unicodedata.category(char).startswith("P") and char not in _KEPT_PUNCTUATION else char
+        for char in text
+    )
+    text = _TOKEN_EDGE_DOTS.sub(" ", text)
+    return " ".join(text.split())
+
+
+class SearchCache:
+    """
+    On-disk cache of raw search engine responses, shared by all threads and worker processes that open the same
+    file, so repeated queries across items and runs skip the API call.
+
+    Entries are keyed by the normalized query (see `normalize_search_query`), the number of results and the search
+    location, and expire after `ttl` seconds so that results do not go stale. Only responses with results are stored.
+
+    Args:
+        path (`str`): SQLite file of the cache.
+        ttl (`float`, default one week): Lifetime of an entry in seconds; `None` keeps entries until evicted.
+        max_bytes (`int`, *optional*): Size cap; the least recently read responses are evicted beyond it.
+    """
+
+    def __init__(self, path: str, ttl: Optional[float] = 7 * 24 * 3600, max_bytes: Optional[int] = None):
+        self.store = DiskCache(path, max_bytes=max_bytes, ttl=ttl)
+
+    @staticmethod
+    def key(query: str, serp_num: int, location: Optional[str]) -> str:
+        return json.dumps([normalize_search_query(query), serp_num, (location or "").casefold()], ensure_ascii=False)
+
+    def get(self, query: str, serp_num: int, location: Optional[str]) -> Optional[Dict[str, Any]]:
+        value = self.store.get(self.key(query, serp_num, location))
+        return json.loads(value) if value is not None else None
+
+    def put(self, query: str, serp_num: int, location: Optional[str], response: bytes) -> None:
+        self.store.set(self.key(query, serp_num, location), response)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.store.stats()
+
+
+_default_cache: Optional[SearchCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> Optional[SearchCache]:
+    """Process-wide `SearchCache` used by the web search functions, or None if caching is off (the default)."""
+    return _default_cache
+
+
+def configure_search_cache(
+        path: Optional[str], ttl: Optional[float] = 7 * 24 * 3600, max_bytes: Optional[int] = None
+) -> Optional[SearchCache]:
+    """Sets the process-wide `SearchCache`; `path=None` turns caching off."""
+    global _default_cache
+    with _default_cache_lock:
+        _default_cache = SearchCache(path, ttl=ttl, max_bytes=max_bytes) if path else None
+    return _default_cache
+
+
+def search_cache_stats() -> Optional[Dict[str, Any]]:
+    return _default_cache.stats() if _default_cache is not None else None
+
+
+__all__ = [
+    "SearchCache",
+    "normalize_search_query",
+    "get_search_cache",
+    "configure_search_cache",
+    "search_cache_stats",
+]
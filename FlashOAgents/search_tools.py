@@ -15,19 +15,29 @@
 # limitations under the License.
 
 from typing import List, Dict, Any, Optional, Tuple
+import asyncio
 import os
-import requests
+import httpx
 import json
 import time
 from .tools import Tool
 from .models import OpenAIServerModel
+from .chunk_ranker import select_relevant_chunks
+from .http_client import get_async_http_client, get_http_client
+from .page_prefetch import get_page_prefetcher
+from .page_store import StoredPage, get_page_store
+from .search_cache import get_search_cache
+from .tracing import trace_span
 
 custom_role_conversions = {"tool-call": "assistant", "tool-response": "user"}
 
-def read_page(url: str) -> str:
-    """Read and return the content of a webpage using Jina reader."""
-    jina_url = f'https://r.jina.ai/{url}'
-    headers = {
+JINA_READER_URL = "https://r.jina.ai/"
+SERPER_SEARCH_URL = "https://google.serper.dev/search"
+SERPER_LOCATION = "United States"
+
+
+def _jina_headers() -> Dict[str, str]:
+    return {
         'Authorization': f'Bearer {os.getenv("JINA_API_KEY")}',
         'X-Engine': 'browser',
         'X-Return-Format': 'markdown',
@@ -37,64 +47,235 @@ def read_page(url: str) -> str:
         'X-Token-Budget': '200000',
     }
 
+
+def _stored_page(url: str) -> Tuple[Optional[StoredPage], Optional[str]]:
+    """The `PageStore` entry of `url`, if any, and its content if it is fresh enough to skip the fetch."""
+    store = get_page_store()
+    page = store.lookup(url) if store is not None else None
+    if page is not None and page.fresh:
+        return page, store.read(page)
+    return page, None
+
+
+def _page_headers(page: Optional[StoredPage]) -> Dict[str, str]:
+    return {**_jina_headers(), **page.validators()} if page is not None else _jina_headers()
+
+
+def _store_response(url: str, page: Optional[StoredPage], response: httpx.Response) -> Optional[str]:
+    """
+    Content of a reader response: a 304 revalidates the stored copy, anything else is stored and returned. None means
+    the stored copy disappeared after the 304 and the page has to be fetched again.
+    """
+    store = get_page_store()
+    if page is not None and response.status_code == 304:
+        return store.revalidate(page)
+    response.raise_for_status()
+    if store is not None and response.text:
+        store.put(
+            url, response.text,
+            etag=response.headers.get("etag"), last_modified=response.headers.get("last-modified"),
+        )
+    return response.text
+
+
+def _fetch_page(url: str, page: Optional[StoredPage] = None) -> str:
+    """Reads `url` through Jina reader, revalidating the stored `page` if given, and stores the result."""
     try:
-        response = requests.get(jina_url, headers=headers, timeout=15)
-        response.raise_for_status()
-        return response.text
-    except requests.RequestException as e:
+        with trace_span("jina.read", kind="http", url=url) as span:
+            response = get_http_client().get(f'{JINA_READER_URL}{url}', headers=_page_headers(page), timeout=15)
+            span.set_attributes(status_code=response.status_code, response_bytes=len(response.content))
+            text = _store_response(url, page, response)
+        return text if text is not None else _fetch_page(url)
+    except httpx.HTTPError as e:
         return f"Error reading page: {str(e)}"
 
-def web_search_google_serper(
-    query: str, 
-    filter_year: Optional[int] = None, 
-    serp_num: int = 3, 
-    max_retries: int = 3
-) -> Tuple[List[Dict[str, Any]], str]:
-    """Perform web search using Google Serper API."""
-    if not query.strip():
-        return [], "Query is empty. Please provide a valid search query."
-    
-    url = "https://google.serper.dev/search"
+
+def _prefetch_page(url: str) -> Optional[str]:
+    """Fetch function of the `PagePrefetcher`: like `read_page`, without claiming the prefetch itself."""
+    page, text = _stored_page(url)
+    if text is None:
+        text = _fetch_page(url, page)
+    return None if text.startswith("Error reading page") else text
+
+
+def _prefetch_results(search_results: List[Dict[str, Any]]) -> None:
+    """Starts reading the top result pages of a search in the background, if a `PagePrefetcher` is configured."""
+    prefetcher = get_page_prefetcher()
+    if prefetcher is not None:
+        prefetcher.schedule([result["link"] for result in search_results], _prefetch_page)
+
+
+def read_page(url: str) -> str:
+    """
+    Read and return the content of a webpage using Jina reader, through the `PageStore` if one is configured and from
+    the background read of the `PagePrefetcher` if the page was a top search result.
+    """
+    page, text = _stored_page(url)
+    if text is not None:
+        return text
+    prefetcher = get_page_prefetcher()
+    prefetched = prefetcher.claim(url) if prefetcher is not None else None
+    if prefetched is not None and (text := prefetched.result()) is not None:
+        return text
+    return _fetch_page(url, page)
+
+
+async def _afetch_page(url: str, page: Optional[StoredPage] = None) -> str:
+    """Async counterpart of `_fetch_page`."""
+    try:
+        with trace_span("jina.read", kind="http", url=url) as span:
+            response = await get_async_http_client().get(
+                f'{JINA_READER_URL}{url}', headers=_page_headers(page), timeout=15
+            )
+            span.set_attributes(status_code=response.status_code, response_bytes=len(response.content))
+            text = await asyncio.to_thread(_store_response, url, page, response)
+        return text if text is not None else await _afetch_page(url)
+    except httpx.HTTPError as e:
+        return f"Error reading page: {str(e)}"
+
+
+async def aread_page(url: str) -> str:
+    """Async counterpart of `read_page`."""
+    page, text = await asyncio.to_thread(_stored_page, url)
+    if text is not None:
+        return text
+    prefetcher = get_page_prefetcher()
+    prefetched = prefetcher.claim(url) if prefetcher is not None else None
+    if prefetched is not None and (text := await asyncio.wrap_future(prefetched)) is not None:
+        return text
+    return await _afetch_page(url, page)
+
+
+def _serper_request(query: str, serp_num: int, location: str) -> Tuple[Dict[str, str], str]:
     payload = json.dumps({
         "q": query,
-        "location": "United States",
+        "location": location,
         "num": serp_num
     })
     headers = {
-        'X-API-KEY': os.getenv("SERPER_API_KEY"),
+        'X-API-KEY': os.getenv("SERPER_API_KEY", ""),
         'Content-Type': 'application/json'
     }
+    return headers, payload
+
+
+def _parse_serper_results(
+    results: Dict[str, Any], query: str, filter_year: Optional[int]
+) -> Tuple[List[Dict[str, Any]], str]:
+    if "organic" not in results or not results["organic"]:
+        year_filter_msg = f" with year filter={filter_year}" if filter_year else ""
+        return [], f"No results found for '{query}'{year_filter_msg}. Try a more general query."
+
+    search_results = []
+    for idx, page in enumerate(results["organic"], 1):
+        search_results.append({
+            "idx": idx,
+            "title": page.get("title", "No title"),
+            "date": f"\nDate published: {page['date']}" if "date" in page else "",
+            "snippet": f"\n{page.get('snippet', 'No snippet')}",
+            "source": f"\nSource: {page.get('source', 'Unknown source')}",
+            "link": page.get('link', '#')
+        })
+
+    return search_results, ""
+
+
+def _cache_response(
+    query: str, serp_num: int, location: str, response: httpx.Response, results: Dict[str, Any]
+) -> None:
+    """Stores a search response that has results in the `SearchCache`, if one is configured."""
+    cache = get_search_cache()
+    if cache is not None and results.get("organic"):
+        cache.put(query, serp_num, location, response.content)
+
+
+def web_search_google_serper(
+    query: str, 
+    filter_year: Optional[int] = None, 
+    serp_num: int = 3, 
+    max_retries: int = 3,
+    location: str = SERPER_LOCATION,
+) -> Tuple[List[Dict[str, Any]], str]:
+    """Perform web search using Google Serper API, answering from the `SearchCache` when one is configured."""
+    if not query.strip():
+        return [], "Query is empty. Please provide a valid search query."
+
+    cache = get_search_cache()
+    if cache is not None:
+        cached = cache.get(query, serp_num, location)
+        if cached is not None:
+            return _parse_serper_results(cached, query, filter_year)
+
+    headers, payload = _serper_request(query, serp_num, location)
 
     for attempt in range(max_retries):
         try:
-            response = requests.post(url, headers=headers, data=payload, timeout=10)
-            response.raise_for_status()
+            with trace_span("serper.search", kind="http", query=query, attempt=attempt) as span:
+                response = get_http_client().post(SERPER_SEARCH_URL, headers=headers, content=payload, timeout=10)
+                span.set_attribute("status_code", response.status_code)
+                response.raise_for_status()
             results = response.json()
-
-            if "organic" not in results or not results["organic"]:
-                year_filter_msg = f" with year filter={filter_year}" if filter_year else ""
-                return [], f"No results found for '{query}'{year_filter_msg}. Try a more general query."
-            
-            search_results = []
-            for idx, page in enumerate(results["organic"], 1):
-                search_results.append({
-                    "idx": idx,
-                    "title": page.get("title", "No title"),
-                    "date": f"\nDate published: {page['date']}" if "date" in page else "",
-                    "snippet": f"\n{page.get('snippet', 'No snippet')}",
-                    "source": f"\nSource: {page.get('source', 'Unknown source')}",
-                    "link": page.get('link', '#')
-                })
-            
-            return search_results, ""
+            _cache_response(query, serp_num, location, response, results)
+            return _parse_serper_results(results, query, filter_year)
         
-        except (requests.RequestException, json.JSONDecodeError) as e:
+        except (httpx.HTTPError, json.JSONDecodeError) as e:
             if attempt == max_retries - 1:
                 return [], f"Search failed after {max_retries} attempts: {str(e)}"
             time.sleep(1)
     
     return [], "Unexpected error in web search"
 
+
+async def aweb_search_google_serper(
+    query: str,
+    filter_year: Optional[int] = None,
+    serp_num: int = 3,
+    max_retries: int = 3,
+    location: str = SERPER_LOCATION,
+) -> Tuple[List[Dict[str, Any]], str]:
+    """Async counterpart of `web_search_google_serper`."""
+    if not query.strip():
+        return [], "Query is empty. Please provide a valid search query."
+
+    cache = get_search_cache()
+    if cache is not None:
+        cached = await asyncio.to_thread(cache.get, query, serp_num, location)
+        if cached is not None:
+            return _parse_serper_results(cached, query, filter_year)
+
+    headers, payload = _serper_request(query, serp_num, location)
+
+    for attempt in range(max_retries):
+        try:
+            with trace_span("serper.search", kind="http", query=query, attempt=attempt) as span:
+                response = await get_async_http_client().post(
+                    SERPER_SEARCH_URL, headers=headers, content=payload, timeout=10
+                )
+                span.set_attribute("status_code", response.status_code)
+                response.raise_for_status()
+            results = response.json()
+            await asyncio.to_thread(_cache_response, query, serp_num, location, response, results)
+            return _parse_serper_results(results, query, filter_year)
+
+        except (httpx.HTTPError, json.JSONDecodeError) as e:
+            if attempt == max_retries - 1:
+                return [], f"Search failed after {max_retries} attempts: {str(e)}"
+            await asyncio.sleep(1)
+
+    return [], "Unexpected error in web search"
+
+
+def format_search_results(search_results: List[Dict[str, Any]]) -> str:
+    formatted_results = []
+    for result in search_results:
+        formatted_results.append(
+            f"{result['idx']}. [{result['title']}]({result['link']})"
+            f"{result['date']}{result['source']}\n"
+            f"   {result['snippet'].strip()}"
+        )
+
+    return "\n\n".join(formatted_results) if formatted_results else "No search results found"
+
 class WikiSearchTool(Tool):
     name = "wiki_search"
     description = "Retrieve relevant knowledge from Wikipedia and return the search results."
@@ -125,8 +306,9 @@ class WikiSearchTool(Tool):
         }
 
         try:
-            response = requests.get(base_url, params=params, timeout=10)
-            response.raise_for_status()
+            with trace_span("wikipedia.query", kind="http", query=query):
+                response = get_http_client().get(base_url, params=params, timeout=10)
+                response.raise_for_status()
             data = response.json()
 
             if 'error' in data:
@@ -151,9 +333,9 @@ class WikiSearchTool(Tool):
 
             return "\n\n".join(results) if results else f"No relevant information found for: {query}"
         
-        except requests.Timeout:
+        except httpx.TimeoutException:
             return "Request to Wikipedia API timed out. Please try again later."
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             return f"Network error occurred: {str(e)}"
         except Exception as e:
             return f"Unexpected error: {str(e)}"
@@ -173,22 +355,28 @@ class WebSearchTool(Tool):
         super().__init__()
         self.tool_name = "web_search"
 
+    def search(self, query: str) -> Tuple[List[Dict[str, Any]], str]:
+        """Returns the structured search results for `query` and an error message (empty on success)."""
+        return web_search_google_serper(query, serp_num=5)
+
     def forward(self, query: str) -> str:
         """Execute web search and return formatted results."""
-        search_results, error_msg = web_search_google_serper(query, serp_num=5)
+        search_results, error_msg = self.search(query)
         
         if error_msg:
             return error_msg
         
-        formatted_results = []
-        for result in search_results:
-            formatted_results.append(
-                f"{result['idx']}. [{result['title']}]({result['link']})"
-                f"{result['date']}{result['source']}\n"
-                f"   {result['snippet'].strip()}"
-            )
-        
-        return "\n\n".join(formatted_results) if formatted_results else "No search results found"
+        _prefetch_results(search_results)
+        return format_search_results(search_results)
+
+    async def aforward(self, query: str) -> str:
+        search_results, error_msg = await aweb_search_google_serper(query, serp_num=5)
+
+        if error_msg:
+            return error_msg
+
+        _prefetch_results(search_results)
+        return format_search_results(search_results)
 
 class CrawlPageTool(Tool):
     name = "crawl_page"
@@ -205,16 +393,25 @@ class CrawlPageTool(Tool):
     }
     output_type = "string"
     
-    def __init__(self, model: OpenAIServerModel):
+    def __init__(self, model: OpenAIServerModel, token_budget: Optional[int] = None):
         super().__init__()
         self.tool_name = "crawl_page"
         self.model = model
+        # Page tokens sent to the summarizing model; longer pages are cut down to the chunks most relevant to the
+        # query. None (the default) sends the first 60,000 characters instead.
+        self.token_budget = token_budget
 
     @staticmethod
     def truncate_text(text: str, max_length: int = 60000) -> str:
         """Truncate text to specified length."""
         return text if len(text) <= max_length else text[:max_length] + "...(truncated)"
 
+    def select_content(self, query: str, page_content: str) -> str:
+        """The part of the page that goes into the summary prompt."""
+        if self.token_budget is None:
+            return self.truncate_text(page_content)
+        return select_relevant_chunks(page_content, query, token_budget=self.token_budget)
+
     def get_summary_prompt(self, query: str, url: str, content: str) -> str:
         """Generate prompt for content summarization."""
         return (
@@ -246,6 +443,24 @@ class CrawlPageTool(Tool):
         
         return "Content extraction failed after multiple attempts"
 
+    async def aretry_predict(self, prompt: str, max_retries: int = 3) -> str:
+        """Async counterpart of `retry_predict`."""
+        messages = [{"role": "user", "content": prompt}]
+
+        for attempt in range(max_retries):
+            try:
+                response = await self.model.acall(messages)
+                if hasattr(response, 'content'):
+                    content = response.content
+                    return content.strip() if isinstance(content, str) else str(content)
+                return str(response)
+            except Exception as e:
+                if attempt == max_retries - 1:
+                    return f"Content extraction failed: {str(e)}"
+                await asyncio.sleep(2 ** attempt)
+
+        return "Content extraction failed after multiple attempts"
+
     def forward(self, url: str, query: str) -> str:
         """Crawl webpage and extract relevant content."""
         # Validate URL
@@ -256,10 +471,31 @@ class CrawlPageTool(Tool):
         if page_content.startswith("Error"):
             return page_content
         
-        truncated_content = self.truncate_text(page_content)
-        prompt = self.get_summary_prompt(query, url, truncated_content)
+        return self.extract(url, query, page_content)
+
+    def extract(self, url: str, query: str, page_content: str) -> str:
+        """Extract the content relevant to `query` from an already fetched page."""
+        content = self.select_content(query, page_content)
+        prompt = self.get_summary_prompt(query, url, content)
         
         return self.retry_predict(prompt)
+
+    async def aforward(self, url: str, query: str) -> str:
+        if not url.startswith(('http://', 'https://')):
+            return "Invalid URL format. Must start with http:// or https://"
+
+        page_content = await aread_page(url)
+        if page_content.startswith("Error"):
+            return page_content
+
+        return await self.aextract(url, query, page_content)
+
+    async def aextract(self, url: str, query: str, page_content: str) -> str:
+        """Async counterpart of `extract`."""
+        content = self.select_content(query, page_content)
+        prompt = self.get_summary_prompt(query, url, content)
+
+        return await self.aretry_predict(prompt)
     
 __all__ = [
     "WikiSearchTool",
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Copyright 2025 The OPPO Inc. PersonalAI team. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import json_repair
+
+
+@dataclass
+class _Frame:
+    kind: str  # "{" or "["
+    start: int
+    key: Optional[str] = None
+    expect_key: bool = False
+    holds_tools: bool = False  # array whose objects are tool calls
+    emits: bool = False  # object that is a tool call
+    top_level_item: bool = False  # object directly inside a top-level array
+    in_call: bool = False  # nested inside a tool call's arguments
+
+
+class IncrementalToolCallParser:
+    """
+    Incremental parser for the tool-calling output format of `ToolCallingAgent`.
+
+    Text is fed chunk by chunk as the model streams it; `feed` returns every tool call whose JSON object closed in
+    that chunk, so it can be started before the rest of the response is generated. The accepted layouts are the ones
+    `ToolCallingAgent.step` accepts once the full response is known:
+
+        {"think": "...", "tools": [{"name": ..., "arguments": ...}, ...]}
+        {"think": "...", "tools": {"name": ..., "arguments": ...}}
+        [{"think": "...", "tools": [...]}]
+        [{"name": ..., "arguments": ...}, ...]
+
+    Text before the first `{` or `[` (e.g. a Markdown code fence) is skipped, and scanning stops once the top-level
+    value closes. Tool calls are returned in order; `num_calls` counts them.
+    """
+
+    def __init__(self):
+        self._buffer: List[str] = []
+        self._position = 0
+        self._stack: List[_Frame] = []
+        self._in_string = False
+        self._escape = False
+        self._key_chars: Optional[List[str]] = None
+        self._done = False
+        self.num_calls = 0
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        completed = []
+        for char in text:
+            if self._done:
+                break
+            self._buffer.append(char)
+            self._consume(char, completed)
+            self._position += 1
+        return completed
+
+    def _consume(self, char: str, completed: List[Dict[str, Any]]) -> None:
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._in_string = False
+                if self._key_chars is not None:
+                    self._stack[-1].key = "".join(self._key_chars)
+                    self._key_chars = None
+            elif self._key_chars is not None:
+                self._key_chars.append(char)
+            return
+
+        top = self._stack[-1] if self._stack else None
+        if char == '"':
+            if top is None:
+                return
+            self._in_string = True
+            if top.kind == "{" and top.expect_key:
+                self._key_chars = []
+        elif char == ":":
+            if top is not None and top.kind == "{":
+                top.expect_key = False
+        elif char == ",":
+            if top is not None and top.kind == "{":
+                top.expect_key = True
+        elif char in "{[":
+            self._stack.append(self._open(char, top))
+        elif char in "}]":
+            if top is None:
+                return
+            frame = self._stack.pop()
+            if frame.emits:
+                tool_call = self._decode(frame.start)
+                # Objects of a top-level array may be {"tools": [...]} wrappers whose calls were already emitted.
+                if isinstance(tool_call, dict) and not (frame.top_level_item and "tools" in tool_call):
+                    completed.append(tool_call)
+                    self.num_calls += 1
+            if not self._stack:
+                self._done = True
+
+    def _open(self, char: str, parent: Optional[_Frame]) -> _Frame:
+        frame = _Frame(kind=char, start=self._position, expect_key=char == "{")
+        if parent is None:
+            frame.holds_tools = char == "["
+            return frame
+        tools_value = parent.kind == "{" and parent.key == "tools" and not parent.expect_key
+        if parent.in_call or (parent.emits and not (parent.top_level_item and tools_value)):
+            frame.in_call = True
+        elif char == "[":
+            frame.holds_tools = tools_value
+        else:
+            frame.emits = tools_value or parent.holds_tools
+            frame.top_level_item = parent.holds_tools and len(self._stack) == 1
+        return frame
+
+    def _decode(self, start: int) -> Any:
+        text = "".join(self._buffer[start:])
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            return json_repair.loads(text)
+
+
+__all__ = ["IncrementalToolCallParser"]
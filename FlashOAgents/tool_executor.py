@@ -0,0 +1,334 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Copyright 2025 The OPPO Inc. PersonalAI team. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import contextlib
+import contextvars
+import logging
+import threading
+import time
+import weakref
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Tool name -> provider whose quota the tool consumes.
+DEFAULT_TOOL_PROVIDERS = {
+    "web_search": "serper",
+    "crawl_page": "jina",
+    "wiki_search": "wikipedia",
+}
+
+DEFAULT_PROVIDER_LIMITS = {
+    "serper": 10,
+    "jina": 10,
+}
+
+
+@dataclass
+class _ToolTask:
+    fn: Callable[..., Any]
+    args: tuple
+    kwargs: dict
+    future: Future
+    owner: Hashable
+    tool_name: Optional[str] = None
+    provider: Optional[str] = None
+    enqueued_at: float = field(default_factory=time.time)
+    # Context of the submitting code, so that context variables such as the current trace span carry over.
+    context: contextvars.Context = field(default_factory=contextvars.copy_context)
+
+
+class ToolExecutor:
+    """
+    Long-lived thread pool shared by all agents of a process to run tool calls.
+
+    Pending calls are queued per owner (usually one agent) and dispatched round-robin across owners, so a single
+    agent's fan-out cannot starve the others. A call only starts when it fits every limit that applies to it.
+
+    Args:
+        max_workers (`int`, default `32`): Maximum number of tool calls running at the same time, across all agents.
+        tool_limits (`dict[str, int]`, *optional*): Maximum number of concurrent calls per tool name.
+        provider_limits (`dict[str, int]`, *optional*): Maximum number of concurrent calls per provider.
+            Merged over `DEFAULT_PROVIDER_LIMITS`.
+        tool_providers (`dict[str, str]`, *optional*): Tool name to provider mapping. Merged over
+            `DEFAULT_TOOL_PROVIDERS`.
+        provider_rates (`dict[str, float]`, *optional*): Maximum number of calls started per second per provider.
+            Starts are spaced evenly instead of being released in bursts.
+        owner_limit (`int`, *optional*, default `5`): Maximum number of concurrent calls per owner.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 32,
+        tool_limits: Optional[Dict[str, int]] = None,
+        provider_limits: Optional[Dict[str, int]] = None,
+        tool_providers: Optional[Dict[str, str]] = None,
+        provider_rates: Optional[Dict[str, float]] = None,
+        owner_limit: Optional[int] = 5,
+    ):
+        if max_workers <= 0:
+            raise ValueError("max_workers must be greater than 0")
+        self.max_workers = max_workers
+        self.tool_limits = dict(tool_limits or {})
+        self.provider_limits = {**DEFAULT_PROVIDER_LIMITS, **(provider_limits or {})}
+        self.tool_providers = {**DEFAULT_TOOL_PROVIDERS, **(tool_providers or {})}
+        self.provider_rates = dict(provider_rates or {})
+        self.owner_limit = owner_limit
+
+        self._condition = threading.Condition()
+        self._queues: "OrderedDict[Hashable, deque[_ToolTask]]" = OrderedDict()
+        self._threads = []
+        self._idle_workers = 0
+        self._shutdown = False
+        self._running_tools = Counter()
+        self._running_providers = Counter()
+        self._running_owners = Counter()
+        self._next_provider_start: Dict[str, float] = {}
+        self._async_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[tuple, asyncio.Semaphore]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+        self._queue_depth = 0
+        self._max_queue_depth = 0
+        self._running = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._cancelled = 0
+        self._total_wait_time = 0.0
+
+    def submit(
+        self,
+        fn: Callable[..., Any],
+        *args,
+        tool_name: Optional[str] = None,
+        owner: Hashable = None,
+        **kwargs,
+    ) -> Future:
+        """Queues `fn(*args, **kwargs)` and returns a `Future`; pending calls can be cancelled with `Future.cancel()`."""
+        task = _ToolTask(
+            fn=fn,
+            args=args,
+            kwargs=kwargs,
+            future=Future(),
+            owner=owner,
+            tool_name=tool_name,
+            provider=self.tool_providers.get(tool_name),
+        )
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("Cannot submit tool calls after shutdown")
+            self._queues.setdefault(owner, deque()).append(task)
+            self._submitted += 1
+            self._queue_depth += 1
+            self._max_queue_depth = max(self._max_queue_depth, self._queue_depth)
+            if self._idle_workers == 0 and len(self._threads) < self.max_workers:
+                worker = threading.Thread(target=self._worker, name=f"tool-executor-{len(self._threads)}", daemon=True)
+                self._threads.append(worker)
+                worker.start()
+            self._condition.notify_all()
+        return task.future
+
+    @contextlib.asynccontextmanager
+    async def async_limit(self, tool_name: Optional[str]) -> AsyncIterator[None]:
+        """
+        Applies the per-tool and per-provider concurrency limits to a tool call awaited on the running event loop.
+
+        Used by the async agent path, which awaits tools instead of handing them to worker threads. Limits are
+        enforced per event loop.
+        """
+        loop = asyncio.get_running_loop()
+        provider = self.tool_providers.get(tool_name)
+        with self._condition:
+            loop_semaphores = self._async_semaphores.setdefault(loop, {})
+            semaphores = []
+            for key, limit in (
+                (("tool", tool_name), self.tool_limits.get(tool_name)),
+                (("provider", provider), self.provider_limits.get(provider)),
+            ):
+                if limit is not None:
+                    if key not in loop_semaphores:
+                        loop_semaphores[key] = asyncio.Semaphore(limit)
+                    semaphores.append(loop_semaphores[key])
+        async with contextlib.AsyncExitStack() as stack:
+            for semaphore in semaphores:
+                await stack.enter_async_context(semaphore)
+            yield
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of tool calls waiting for a worker or for a limit to free up."""
+        return self._queue_depth
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            started = self._completed + self._failed + self._running
+            return {
+                "queue_depth": self._queue_depth,
+                "max_queue_depth": self._max_queue_depth,
+                "running": self._running,
+                "workers": len(self._threads),
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "cancelled": self._cancelled,
+                "avg_wait_time": self._total_wait_time / started if started else 0.0,
+                "running_per_tool": dict(self._running_tools),
+                "running_per_provider": dict(self._running_providers),
+            }
+
+    def shutdown(self, wait: bool = True, cancel_pending: bool = False) -> None:
+        with self._condition:
+            self._shutdown = True
+            if cancel_pending:
+                for queue in self._queues.values():
+                    for task in queue:
+                        if task.future.cancel():
+                            self._cancelled += 1
+                    self._queue_depth -= len(queue)
+                self._queues.clear()
+            self._condition.notify_all()
+        if wait:
+            for worker in list(self._threads):
+                worker.join()
+
+    def _is_eligible(self, task: _ToolTask, now: float) -> bool:
+        tool_limit = self.tool_limits.get(task.tool_name)
+        if tool_limit is not None and self._running_tools[task.tool_name] >= tool_limit:
+            return False
+        provider_limit = self.provider_limits.get(task.provider)
+        if provider_limit is not None and self._running_providers[task.provider] >= provider_limit:
+            return False
+        return self._next_provider_start.get(task.provider, 0.0) <= now
+
+    def _next_task(self, now: float) -> Optional[_ToolTask]:
+        for owner in list(self._queues.keys()):
+            queue = self._queues[owner]
+            while queue and queue[0].future.cancelled():
+                queue.popleft()
+                self._queue_depth -= 1
+                self._cancelled += 1
+            if not queue:
+                del self._queues[owner]
+                continue
+            if self.owner_limit is not None and self._running_owners[owner] >= self.owner_limit:
+                continue
+            for task in queue:
+                if not task.future.cancelled() and self._is_eligible(task, now):
+                    queue.remove(task)
+                    # Round-robin: the owner that just got a worker goes to the back of the line.
+                    if queue:
+                        self._queues.move_to_end(owner)
+                    else:
+                        del self._queues[owner]
+                    return task
+        return None
+
+    def _wait_timeout(self, now: float) -> Optional[float]:
+        # Only rate-limited providers need a timed wake-up; every other limit is released by notify_all.
+        pending_starts = [start for start in self._next_provider_start.values() if start > now]
+        return min(pending_starts) - now if pending_starts and self._queue_depth else None
+
+    def _start(self, task: _ToolTask, now: float) -> None:
+        self._queue_depth -= 1
+        self._running += 1
+        self._running_tools[task.tool_name] += 1
+        self._running_providers[task.provider] += 1
+        self._running_owners[task.owner] += 1
+        self._total_wait_time += now - task.enqueued_at
+        rate = self.provider_rates.get(task.provider)
+        if rate:
+            self._next_provider_start[task.provider] = max(now, self._next_provider_start.get(task.provider, 0.0)) + 1.0 / rate
+
+    def _finish(self, task: _ToolTask, outcome: str) -> None:
+        self._running -= 1
+        for counter, key in (
+            (self._running_tools, task.tool_name),
+            (self._running_providers, task.provider),
+            (self._running_owners, task.owner),
+        ):
+            counter[key] -= 1
+            if counter[key] <= 0:
+                del counter[key]
+        if outcome == "failed":
+            self._failed += 1
+        elif outcome == "cancelled":
+            self._cancelled += 1
+        else:
+            self._completed += 1
+
+    def _worker(self) -> None:
+        while True:
+            with self._condition:
+                while True:
+                    now = time.time()
+                    task = self._next_task(now)
+                    if task is not None:
+                        break
+                    if self._shutdown and not self._queues:
+                        return
+                    self._idle_workers += 1
+                    self._condition.wait(timeout=self._wait_timeout(now))
+                    self._idle_workers -= 1
+                self._start(task, now)
+
+            outcome = "cancelled"
+            if task.future.set_running_or_notify_cancel():
+                try:
+                    task.future.set_result(task.context.run(task.fn, *task.args, **task.kwargs))
+                    outcome = "completed"
+                except BaseException as e:
+                    outcome = "failed"
+                    task.future.set_exception(e)
+            with self._condition:
+                self._finish(task, outcome)
+                self._condition.notify_all()
+
+
+_default_executor: Optional[ToolExecutor] = None
+_default_executor_lock = threading.Lock()
+
+
+def get_tool_executor() -> ToolExecutor:
+    """Returns the process-wide `ToolExecutor`, creating it with default limits on first use."""
+    global _default_executor
+    if _default_executor is None:
+        with _default_executor_lock:
+            if _default_executor is None:
+                _default_executor = ToolExecutor()
+    return _default_executor
+
+
+def configure_tool_executor(**kwargs) -> ToolExecutor:
+    """Replaces the process-wide `ToolExecutor` with one built from `kwargs`; already queued calls still run."""
+    global _default_executor
+    with _default_executor_lock:
+        previous = _default_executor
+        _default_executor = ToolExecutor(**kwargs)
+    if previous is not None:
+        previous.shutdown(wait=False)
+    return _default_executor
+
+
+__all__ = [
+    "ToolExecutor",
+    "get_tool_executor",
+    "configure_tool_executor",
+]
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Copyright 2025 The OPPO Inc. PersonalAI team. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import json
+import threading
+from collections import Counter
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Collection, Dict, Optional, Tuple
+
+# Prepended to an observation served from the memo instead of a new tool call.
+MEMO_NOTE = "[Note: identical to an earlier tool call in this task; its result is repeated below.]"
+
+# Arguments whose case does not change the result, per tool: search engines ignore the case of the query.
+CASE_INSENSITIVE_ARGUMENTS = {"web_search": {"query"}, "wiki_search": {"query"}}
+
+
+def _normalize_value(value: Any) -> Any:
+    if isinstance(value, str):
+        text = " ".join(value.split())
+        if text.startswith(("http://", "https://")):
+            # Fragments and a trailing slash do not change the fetched page.
+            return text.split("#", 1)[0].rstrip("/")
+        return text
+    if isinstance(value, dict):
+        return {str(key).strip().lower(): _normalize_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize_value(item) for item in value]
+    return value
+
+
+def tool_call_key(tool_name: str, arguments: Any) -> Tuple[str, str]:
+    """
+    Memo key of a tool call: the normalized tool name and arguments. Strings are whitespace-collapsed, and those in
+    `CASE_INSENSITIVE_ARGUMENTS` are case-folded; URLs lose any fragment and trailing slash.
+    """
+    tool_name = tool_name.strip().lower()
+    arguments = _normalize_value(arguments)
+    if isinstance(arguments, dict):
+        for name in CASE_INSENSITIVE_ARGUMENTS.get(tool_name, ()):
+            if isinstance(arguments.get(name), str):
+                arguments[name] = arguments[name].casefold()
+    return tool_name, json.dumps(arguments, sort_keys=True, default=str)
+
+
+class ToolCallMemo:
+    """
+    Per-run memo of tool observations, keyed by `tool_call_key`.
+
+    The first call with a key runs the tool; later calls with the same key get its observation prefixed with
+    `MEMO_NOTE`. A call whose key is still running (e.g. a duplicate in the same step's parallel batch) waits for that
+    call instead of starting another one. Failed calls and observations starting with "Error" are not memoized, so
+    they are retried.
+
+    Args:
+        tools (`Collection[str]`, *optional*): Names of the tools to memoize. Defaults to every tool but
+            `final_answer`.
+    """
+
+    def __init__(self, tools: Optional[Collection[str]] = None):
+        self.tools = set(tools) if tools is not None else None
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, str], Future] = {}
+        self._calls = Counter()
+        self._hits = Counter()
+        self._coalesced = Counter()
+
+    def memoizes(self, tool_name: str) -> bool:
+        if tool_name == "final_answer":
+            return False
+        return self.tools is None or tool_name in self.tools
+
+    def reset(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._calls.clear()
+            self._hits.clear()
+            self._coalesced.clear()
+
+    def _claim(self, tool_name: str, arguments: Any) -> Tuple[Tuple[str, str], Future, bool]:
+        """Returns `(key, future, owner)`; the owner runs the tool and resolves the future."""
+        key = tool_call_key(tool_name, arguments)
+        with self._lock:
+            self._calls[tool_name] += 1
+            future = self._entries.get(key)
+            if future is None:
+                future = self._entries[key] = Future()
+                return key, future, True
+            (self._hits if future.done() else self._coalesced)[tool_name] += 1
+            return key, future, False
+
+    def _resolve(self, key: Tuple[str, str], future: Future, observation: Any = None, error: Exception = None) -> None:
+        if error is not None or (isinstance(observation, str) and observation.startswith("Error")):
+            with self._lock:
+                if self._entries.get(key) is future:
+                    del self._entries[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(observation)
+
+    @staticmethod
+    def _noted(observation: Any) -> Any:
+        return f"{MEMO_NOTE}\n{observation}" if isinstance(observation, str) else observation
+
+    def call(self, tool_name: str, arguments: Any, execute: Callable[[str, Any], Any]) -> Any:
+        """Returns the memoized observation of the call, running `execute(tool_name, arguments)` if there is none."""
+        key, future, owner = self._claim(tool_name, arguments)
+        if not owner:
+            return self._noted(future.result())
+        try:
+            observation = execute(tool_name, arguments)
+        except Exception as e:
+            self._resolve(key, future, error=e)
+            raise
+        self._resolve(key, future, observation)
+        return observation
+
+    async def acall(self, tool_name: str, arguments: Any, execute: Callable[[str, Any], Awaitable[Any]]) -> Any:
+        """Async counterpart of `call`; duplicates are awaited without blocking the event loop."""
+        key, future, owner = self._claim(tool_name, arguments)
+        if not owner:
+            return self._noted(await asyncio.shield(asyncio.wrap_future(future)))
+        try:
+            observation = await execute(tool_name, arguments)
+        except BaseException as e:
+            self._resolve(key, future, error=e if isinstance(e, Exception) else RuntimeError("Tool call cancelled"))
+            raise
+        self._resolve(key, future, observation)
+        return observation
+
+    def stats(self) -> Dict[str, Any]:
+        """Calls, memo hits and coalesced in-flight duplicates, in total and per tool."""
+        with self._lock:
+            calls = sum(self._calls.values())
+            saved = sum(self._hits.values()) + sum(self._coalesced.values())
+            return {
+                "calls": calls,
+                "hits": sum(self._hits.values()),
+                "coalesced": sum(self._coalesced.values()),
+                "hit_rate": saved / calls if calls else 0.0,
+                "per_tool": {
+                    name: {"calls": count, "saved": self._hits[name] + self._coalesced[name]}
+                    for name, count in self._calls.items()
+                },
+            }
+
+
+__all__ = ["ToolCallMemo", "tool_call_key"]
@@ -18,6 +18,7 @@
 # Portions of this file are modifications by OPPO PersonalAI Team.
 # Licensed under the Apache License, Version 2.0.
 
+import asyncio
 import inspect
 import logging
 from functools import wraps
@@ -169,6 +170,31 @@ class Tool:
             outputs = handle_agent_output_types(outputs, self.output_type)
         return outputs
 
+    async def aforward(self, *args, **kwargs):
+        """
+        Async counterpart of `forward`. Runs `forward` in a worker thread; override it in tools that have a native
+        async implementation (e.g. an async HTTP client).
+        """
+        return await asyncio.to_thread(self.forward, *args, **kwargs)
+
+    async def acall(self, *args, sanitize_inputs_outputs: bool = False, **kwargs):
+        """Same as `__call__`, but awaits `aforward`."""
+        if not self.is_initialized:
+            self.setup()
+
+        if len(args) == 1 and len(kwargs) == 0 and isinstance(args[0], dict):
+            potential_kwargs = args[0]
+            if all(key in self.inputs for key in potential_kwargs):
+                args = ()
+                kwargs = potential_kwargs
+
+        if sanitize_inputs_outputs:
+            args, kwargs = handle_agent_input_types(*args, **kwargs)
+        outputs = await self.aforward(*args, **kwargs)
+        if sanitize_inputs_outputs:
+            outputs = handle_agent_output_types(outputs, self.output_type)
+        return outputs
+
     def setup(self):
         """
         Overwrite this method here for any operation that is expensive and needs to be executed before you start using
@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Copyright 2025 The OPPO Inc. PersonalAI team. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# OTLP span kinds: INTERNAL for agent structure, CLIENT for calls leaving the process.
+_OTLP_KIND = {"llm": 3, "http": 3}
+_OTLP_KIND_INTERNAL = 1
+
+
+@dataclass
+class Span:
+    """
+    A timed operation of a run. Spans nest: an `item` span holds `plan`, `step` and `summary` spans, which hold `llm`
+    and `tool` spans, which hold `http` spans.
+    """
+
+    name: str
+    kind: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    start_time: float = 0.0
+    end_time: Optional[float] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+    thread_id: int = 0
+    thread_name: str = ""
+
+    @property
+    def duration(self) -> Optional[float]:
+        return None if self.end_time is None else self.end_time - self.start_time
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_attributes(self, **attributes: Any) -> None:
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+
+class _NoopSpan:
+    """Stands in for a span while no tracer is installed."""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, **attributes: Any) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+_current_span: ContextVar[Optional[Span]] = ContextVar("flash_current_span", default=None)
+
+
+class TraceHook:
+    """Base class of tracer hooks; override the callbacks you need. Exceptions raised by hooks are logged and ignored."""
+
+    def on_span_start(self, span: Span) -> None:
+        pass
+
+    def on_span_end(self, span: Span) -> None:
+        pass
+
+
+class Tracer:
+    """
+    Records nested spans and hands them to hooks.
+
+    The current span is tracked in a context variable, so spans opened in asyncio tasks and in `ToolExecutor` workers
+    nest under the span that started them.
+
+    Args:
+        hooks (`list[TraceHook]`, *optional*): Hooks called when a span starts and ends.
+        keep_spans (`bool`, default `True`): Keep finished spans for `export_chrome_trace` / `export_otlp_json`. Turn
+            it off when hooks consume the spans, so long runs do not accumulate them.
+    """
+
+    def __init__(self, hooks: Optional[List[TraceHook]] = None, keep_spans: bool = True):
+        self.hooks = list(hooks or [])
+        self.keep_spans = keep_spans
+        self._lock = threading.Lock()
+        self._spans: List[Span] = []
+
+    def add_hook(self, hook: TraceHook) -> None:
+        self.hooks.append(hook)
+
+    def _call_hooks(self, callback: str, span: Span) -> None:
+        for hook in self.hooks:
+            try:
+                getattr(hook, callback)(span)
+            except Exception as e:
+                logger.warning(f"Trace hook {type(hook).__name__}.{callback} failed: {e}")
+
+    @contextmanager
+    def span(self, name: str, kind: str = "internal", **attributes: Any) -> Iterator[Span]:
+        parent = _current_span.get()
+        thread = threading.current_thread()
+        span = Span(
+            name=name,
+            kind=kind,
+            trace_id=parent.trace_id if parent is not None else secrets.token_hex(16),
+            span_id=secrets.token_hex(8),
+            parent_id=parent.span_id if parent is not None else None,
+            start_time=time.time(),
+            thread_id=thread.ident or 0,
+            thread_name=thread.name,
+        )
+        span.set_attributes(**attributes)
+        self._call_hooks("on_span_start", span)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_time = time.time()
+            if self.keep_spans:
+                with self._lock:
+                    self._spans.append(span)
+            self._call_hooks("on_span_end", span)
+
+    def spans(self) -> List[Span]:
+        """Finished spans, in the order they ended."""
+        with self._lock:
+            return list(self._spans)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._spans.clear()
+
+    def export_chrome_trace(self, path: str) -> None:
+        """Writes the finished spans as Chrome trace JSON, for `chrome://tracing` or Perfetto."""
+        _write_json(path, chrome_trace(self.spans()))
+
+    def export_otlp_json(self, path: str, service_name: str = "flash-searcher") -> None:
+        """Writes the finished spans as an OTLP/JSON `ExportTraceServiceRequest`, one request per line."""
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(otlp_trace(self.spans(), service_name), ensure_ascii=False) + "\n")
+
+
+_tracer: Optional[Tracer] = None
+
+
+def set_tracer(tracer: Optional[Tracer]) -> None:
+    """Installs the process-wide tracer; `None` turns tracing off."""
+    global _tracer
+    _tracer = tracer
+
+
+def get_tracer() -> Optional[Tracer]:
+    return _tracer
+
+
+@contextmanager
+def trace_span(name: str, kind: str = "internal", **attributes: Any) -> Iterator[Any]:
+    """Opens a span on the installed tracer; without one, yields a span that ignores its attributes."""
+    tracer = _tracer
+    if tracer is None:
+        yield _NOOP_SPAN
+        return
+    with tracer.span(name, kind, **attributes) as span:
+        yield span
+
+
+def _json_value(value: Any) -> Any:
+    return value if isinstance(value, (str, int, float, bool)) or value is None else str(value)
+
+
+def _write_json(path: str, data: Any) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+def chrome_trace(spans: List[Span]) -> Dict[str, Any]:
+    """Chrome trace event format: one complete (`"X"`) event per span, plus the names of the threads."""
+    pid = os.getpid()
+    events = []
+    threads = {}
+    for span in spans:
+        threads[span.thread_id] = span.thread_name
+        args = {key: _json_value(value) for key, value in span.attributes.items()}
+        args.update(span_id=span.span_id, parent_id=span.parent_id, trace_id=span.trace_id)
+        if span.error is not None:
+            args["error"] = span.error
+        events.append({
+            "name": span.name,
+            "cat": span.kind,
+            "ph": "X",
+            "ts": span.start_time * 1e6,
+            "dur": ((span.end_time or span.start_time) - span.start_time) * 1e6,
+            "pid": pid,
+            "tid": span.thread_id,
+            "args": args,
+        })
+    for thread_id, thread_name in threads.items():
+        events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": thread_id, "args": {"name": thread_name}})
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def otlp_trace(spans: List[Span], service_name: str = "flash-searcher") -> Dict[str, Any]:
+    """OTLP/JSON encoding of `spans`, as accepted by the OpenTelemetry collector's `otlpjsonfile` receiver."""
+    otlp_spans = []
+    for span in spans:
+        attributes = [{"key": "span.kind", "value": {"stringValue": span.kind}}]
+        attributes += [{"key": key, "value": _otlp_value(value)} for key, value in span.attributes.items()]
+        otlp_span = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": _OTLP_KIND.get(span.kind, _OTLP_KIND_INTERNAL),
+            "startTimeUnixNano": str(int(span.start_time * 1e9)),
+            "endTimeUnixNano": str(int((span.end_time or span.start_time) * 1e9)),
+            "attributes": attributes,
+            "status": {"code": 2, "message": span.error} if span.error is not None else {"code": 1},
+        }
+        if span.parent_id is not None:
+            otlp_span["parentSpanId"] = span.parent_id
+        otlp_spans.append(otlp_span)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+            "scopeSpans": [{"scope": {"name": "FlashOAgents"}, "spans": otlp_spans}],
+        }]
+    }
+
+
+__all__ = ["Span", "TraceHook", "Tracer", "set_tracer", "get_tracer", "trace_span"]
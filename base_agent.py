@@ -17,7 +17,7 @@
 from dotenv import load_dotenv
 from utils import safe_json_loads
 
-from FlashOAgents import ToolCallingAgent
+from FlashOAgents import ToolCallingAgent, AgentGenerationError, trace_span
 from FlashOAgents import ActionStep, PlanningStep, TaskStep, SummaryStep
 from FlashOAgents import WebSearchTool, CrawlPageTool, VisualInspectorTool, AudioInspectorTool, TextInspectorTool
 
@@ -43,12 +43,14 @@ class BaseAgent:
             elif isinstance(step, PlanningStep):
                 traj = {"name": "plan", "value": step.plan, "think": step.plan_think, "cot_think": step.plan_reasoning,
                         "start_time": step.start_time, "end_time": step.end_time, "duration": step.duration,
-                        "input_tokens": step.input_tokens, "output_tokens": step.output_tokens}
+                        "input_tokens": step.input_tokens, "output_tokens": step.output_tokens,
+                        "cached_tokens": step.cached_tokens}
                 trajectory.append(traj)
             elif isinstance(step, SummaryStep):
                 traj = {"name": "summary", "value": step.summary, "cot_think": step.summary_reasoning,
                         "start_time": step.start_time, "end_time": step.end_time, "duration": step.duration,
-                        "input_tokens": step.input_tokens, "output_tokens": step.output_tokens}
+                        "input_tokens": step.input_tokens, "output_tokens": step.output_tokens,
+                        "cached_tokens": step.cached_tokens, "stale_steps": step.stale_steps}
                 trajectory.append(traj)
             elif isinstance(step, ActionStep):
                 safe_tool_calls = step.tool_calls if step.tool_calls is not None else []
@@ -56,59 +58,121 @@ class BaseAgent:
                         "think": step.action_think, "cot_think": step.action_reasoning,
                         "start_time": step.start_time, "end_time": step.end_time, "duration": step.duration,
                         "input_tokens": step.input_tokens, "output_tokens": step.output_tokens,
-                        "llm_start_time": step.llm_start_time, "llm_end_time": step.llm_end_time,
-                        "llm_duration": step.llm_duration}
+                        "cached_tokens": step.cached_tokens, "llm_start_time": step.llm_start_time,
+                        "llm_end_time": step.llm_end_time, "llm_duration": step.llm_duration,
+                        "parse_failures": step.parse_failures}
                 trajectory.append(traj)
             else:
                 raise ValueError("[capture_trajectory] Unknown Step:", step)
 
+        result = {"agent_trajectory": trajectory}
+        if self.agent_fn.memory.context_budget is not None:
+            result["context_budget"] = self.agent_fn.memory.budget_stats()
+        if self.agent_fn.tool_memo is not None:
+            result["tool_memo"] = self.agent_fn.tool_memo.stats()
+        parse_stats = self.agent_fn.parse_stats()
+        if parse_stats["parse_failures"]:
+            result["output_parsing"] = parse_stats
+        return result
+
+    def _format_result(self, result, return_json):
+        if return_json and isinstance(result, str):
+            result = safe_json_loads(result)
+        elif not return_json and isinstance(result, dict):
+            result = str(result)
         return {
-            "agent_trajectory": trajectory,
+            "agent_result": result, **self.capture_trajectory()
         }
 
     def forward(self, task, answer=None, return_json=False, max_retries=3):
+        # The first attempt picks up an interrupted run of the task from its checkpoint, if any. A retry after a
+        # generation error resumes from the last completed step; other errors restart the task from scratch.
         last_error = None
-        for _ in range(max_retries):
-            try:
-                if answer is not None:
-                    result = self.agent_fn.run(task, answer=answer)
-                else:
-                    result = self.agent_fn.run(task)
-                if return_json and isinstance(result, str):
-                    result = safe_json_loads(result)
-                elif not return_json and isinstance(result, dict):
-                    result = str(result)
-                return {
-                    "agent_result": result, **self.capture_trajectory()
-                }
-            except Exception as e:
-                last_error = e
-                print(f"[BaseAgent] error: {e}")
-                continue
-        return {"error": str(last_error)}
+        resume = True
+        with trace_span("item", kind="item", task=task[:200]) as span:
+            for attempt in range(max_retries):
+                span.set_attribute("attempts", attempt + 1)
+                try:
+                    if answer is not None:
+                        result = self.agent_fn.run(task, answer=answer, resume=resume)
+                    else:
+                        result = self.agent_fn.run(task, resume=resume)
+                    return self._format_result(result, return_json)
+                except Exception as e:
+                    last_error = e
+                    resume = isinstance(e, AgentGenerationError)
+                    print(f"[BaseAgent] error: {e}")
+                    continue
+            span.set_attribute("last_error", str(last_error))
+            return {"error": str(last_error)}
+
+    async def aforward(self, task, answer=None, return_json=False, max_retries=3):
+        """Async counterpart of `forward`, driving the agent with `arun` on the caller's event loop."""
+        last_error = None
+        resume = True
+        with trace_span("item", kind="item", task=task[:200]) as span:
+            for attempt in range(max_retries):
+                span.set_attribute("attempts", attempt + 1)
+                try:
+                    if answer is not None:
+                        result = await self.agent_fn.arun(task, answer=answer, resume=resume)
+                    else:
+                        result = await self.agent_fn.arun(task, resume=resume)
+                    return self._format_result(result, return_json)
+                except Exception as e:
+                    last_error = e
+                    resume = isinstance(e, AgentGenerationError)
+                    print(f"[BaseAgent] error: {e}")
+                    continue
+            span.set_attribute("last_error", str(last_error))
+            return {"error": str(last_error)}
 
 
 class SearchAgent(BaseAgent):
-    def __init__(self, model, summary_interval, prompts_type, max_steps, **kwargs):
+    def __init__(self, model, summary_interval, prompts_type, max_steps, stream_tool_calls=False, async_summary=False,
+                 summary_max_staleness=1, speculative_search=False, speculative_crawl_top_k=0, context_budget=None,
+                 prefix_cache_layout=False, memoize_tool_calls=False, tool_timeouts=None, step_timeout=None,
+                 carry_over_late_results=True, checkpoint_dir=None, max_output_repairs=2,
+                 response_format=None, logger=None, compact_memory=False, crawl_token_budget=None, **kwargs):
         super().__init__(model)
 
         web_tool = WebSearchTool()
-        crawl_tool = CrawlPageTool(model=model)
+        crawl_tool = CrawlPageTool(model=model, token_budget=crawl_token_budget)
         tools = [web_tool, crawl_tool]
         self.agent_fn = ToolCallingAgent(
             model=model,
             tools=tools,
             summary_interval=summary_interval,
             max_steps=max_steps,
-            prompts_type=prompts_type
+            prompts_type=prompts_type,
+            stream_tool_calls=stream_tool_calls,
+            async_summary=async_summary,
+            summary_max_staleness=summary_max_staleness,
+            speculative_search=speculative_search,
+            speculative_crawl_top_k=speculative_crawl_top_k,
+            context_budget=context_budget,
+            prefix_cache_layout=prefix_cache_layout,
+            memoize_tool_calls=memoize_tool_calls,
+            tool_timeouts=tool_timeouts,
+            step_timeout=step_timeout,
+            carry_over_late_results=carry_over_late_results,
+            checkpoint_dir=checkpoint_dir,
+            max_output_repairs=max_output_repairs,
+            response_format=response_format,
+            logger=logger,
+            compact_memory=compact_memory,
         )
 
 class MMSearchAgent(BaseAgent):
-    def __init__(self, model, summary_interval, prompts_type, max_steps, **kwargs):
+    def __init__(self, model, summary_interval, prompts_type, max_steps, stream_tool_calls=False, async_summary=False,
+                 summary_max_staleness=1, speculative_search=False, speculative_crawl_top_k=0, context_budget=None,
+                 prefix_cache_layout=False, memoize_tool_calls=False, tool_timeouts=None, step_timeout=None,
+                 carry_over_late_results=True, checkpoint_dir=None, max_output_repairs=2,
+                 response_format=None, logger=None, compact_memory=False, crawl_token_budget=None, **kwargs):
         super().__init__(model)
 
         web_tool = WebSearchTool()
-        crawl_tool = CrawlPageTool(model=model)
+        crawl_tool = CrawlPageTool(model=model, token_budget=crawl_token_budget)
         visual_tool = VisualInspectorTool(model, 100000)
         text_tool = TextInspectorTool(model, 100000)
         audio_tool = AudioInspectorTool(model, 100000)
@@ -120,5 +184,21 @@ class MMSearchAgent(BaseAgent):
             tools=tools,
             summary_interval=summary_interval,
             max_steps=max_steps,
-            prompts_type=prompts_type
+            prompts_type=prompts_type,
+            stream_tool_calls=stream_tool_calls,
+            async_summary=async_summary,
+            summary_max_staleness=summary_max_staleness,
+            speculative_search=speculative_search,
+            speculative_crawl_top_k=speculative_crawl_top_k,
+            context_budget=context_budget,
+            prefix_cache_layout=prefix_cache_layout,
+            memoize_tool_calls=memoize_tool_calls,
+            tool_timeouts=tool_timeouts,
+            step_timeout=step_timeout,
+            carry_over_late_results=carry_over_late_results,
+            checkpoint_dir=checkpoint_dir,
+            max_output_repairs=max_output_repairs,
+            response_format=response_format,
+            logger=logger,
+            compact_memory=compact_memory,
         )
\ No newline at end of file
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Memory benchmark: resident memory per in-flight agent, with and without compact memory.
+
+Runs N ToolCallingAgents concurrently against a scripted model and a fake search tool. Every action step returns
+`--obs_chars` characters of observation, and every model output carries a raw response object of about the size of
+an OpenAI completion. Once all agents have reached their last step, they wait while the RSS of the process is read,
+so the figure covers N agents that hold a full `--steps`-step memory at the same time. Each (mode, concurrency) pair
+runs in a fresh interpreter so the runs do not share allocator state.
+
+Usage:
+    python bench_memory.py --concurrency 15 30 50 --steps 40 --obs_chars 8000
+"""
+
+import argparse
+import gc
+import json
+import os
+import resource
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from FlashOAgents.agents import ToolCallingAgent
+from FlashOAgents.models import ChatMessage
+from FlashOAgents.monitoring import LogLevel
+from FlashOAgents.tool_executor import ToolExecutor
+from FlashOAgents.tools import Tool
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # Peak rather than current RSS where /proc is unavailable (kilobytes on Linux, bytes on macOS).
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+class FakeSearchTool(Tool):
+    name = "web_search"
+    description = "Fake search tool."
+    inputs = {"query": {"type": "string", "description": "Search query."}}
+    output_type = "string"
+
+    def __init__(self, obs_chars: int):
+        super().__init__()
+        self.obs_chars = obs_chars
+
+    def forward(self, query: str) -> str:
+        return f"results for {query}\n" + "x" * self.obs_chars
+
+
+class ScriptedModel:
+    """Searches on every action step; the last one waits at `ready` until the main thread has measured, then answers."""
+
+    model_id = "scripted"
+
+    def __init__(self, steps: int, ready: threading.Barrier, release: threading.Event):
+        self.steps = steps
+        self.ready = ready
+        self.release = release
+        self.action_calls = 0
+
+    def _message(self, content: str) -> ChatMessage:
+        # Stands in for the OpenAI response object: a second copy of the content plus the response envelope.
+        raw = SimpleNamespace(
+            id="chatcmpl-bench",
+            choices=[SimpleNamespace(message={"role": "assistant", "content": "".join(list(content))})],
+            usage={"prompt_tokens": 1000, "completion_tokens": 100},
+        )
+        return ChatMessage(role="assistant", content=content, raw=raw, input_token_count=1000, output_token_count=100)
+
+    def __call__(self, messages, **kwargs):
+        last_text = messages[-1]["content"][0]["text"]
+        if "# Tool List" not in last_text:
+            return self._message("PLAN or SUMMARY " + "p" * 2000)
+        self.action_calls += 1
+        if self.action_calls == self.steps:
+            self.ready.wait()
+            self.release.wait()
+            tools = [{"name": "final_answer", "arguments": {"answer": "42"}}]
+        else:
+            tools = [{"name": "web_search", "arguments": {"query": f"query {self.action_calls}"}}]
+        return self._message(json.dumps({"think": "t" * 500, "tools": tools}))
+
+
+def measure(concurrency: int, steps: int, obs_chars: int, summary_interval: int, compact: bool) -> dict:
+    ready = threading.Barrier(concurrency + 1)
+    release = threading.Event()
+    executor = ToolExecutor(max_workers=concurrency, owner_limit=None)
+    agents = [
+        ToolCallingAgent(
+            tools=[FakeSearchTool(obs_chars)],
+            model=ScriptedModel(steps, ready, release),
+            max_steps=2 * steps,  # summaries count towards the step number
+            summary_interval=summary_interval,
+            verbosity_level=LogLevel.OFF,
+            tool_executor=executor,
+            compact_memory=compact,
+        )
+        for _ in range(concurrency)
+    ]
+    gc.collect()
+    baseline = rss_mb()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(agent.run, f"question {n}") for n, agent in enumerate(agents)]
+        ready.wait()
+        gc.collect()
+        in_flight = rss_mb()
+        release.set()
+        for future in futures:
+            future.result()
+    return {
+        "mode": "compact" if compact else "default",
+        "concurrency": concurrency,
+        "rss_mb": in_flight,
+        "per_agent_mb": (in_flight - baseline) / concurrency,
+    }
+
+
+def main(args):
+    if args.worker:
+        print(json.dumps(measure(args.concurrency[0], args.steps, args.obs_chars, args.summary_interval, args.compact)))
+        return
+    print(f"{'agents':>7} {'default MB/agent':>17} {'compact MB/agent':>17} {'saved':>7}")
+    for concurrency in args.concurrency:
+        results = {}
+        for compact in (False, True):
+            command = [
+                sys.executable, os.path.abspath(__file__), "--worker", "--concurrency", str(concurrency),
+                "--steps", str(args.steps), "--obs_chars", str(args.obs_chars),
+                "--summary_interval", str(args.summary_interval),
+            ] + (["--compact"] if compact else [])
+            output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+            results[compact] = json.loads(output.strip().splitlines()[-1])["per_agent_mb"]
+        saved = 1 - results[True] / results[False] if results[False] > 0 else 0.0
+        print(f"{concurrency:>7} {results[False]:>17.2f} {results[True]:>17.2f} {saved:>6.0%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark resident memory per in-flight agent")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[15, 30, 50], help="Agents running at once")
+    parser.add_argument("--steps", type=int, default=40, help="Action steps per agent")
+    parser.add_argument("--obs_chars", type=int, default=8000, help="Characters per tool observation")
+    parser.add_argument("--summary_interval", type=int, default=8, help="Action steps between summaries")
+    parser.add_argument("--compact", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    main(parser.parse_args())
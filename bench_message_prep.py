@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Micro-benchmark for the per-call cost of preparing model messages.
+
+Builds a ToolCallingAgent-like history (plan, then one assistant tool-call message and one large tool observation
+per step) and times `get_clean_message_list` on it for growing history lengths. The "deepcopy" column reproduces
+the previous behaviour, which deep-copied the whole history before role conversion and merging.
+
+Usage:
+    python bench_message_prep.py --steps 5 10 20 40 --obs_chars 20000 --repeat 20
+"""
+
+import argparse
+import os
+import sys
+import timeit
+from copy import deepcopy
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from FlashOAgents.models import MessageRole, get_clean_message_list, tool_role_conversions
+
+
+def build_history(num_steps: int, obs_chars: int) -> list:
+    messages = [
+        {"role": MessageRole.SYSTEM, "content": [{"type": "text", "text": "system prompt " * 200}]},
+        {"role": MessageRole.USER, "content": [{"type": "text", "text": "New task:\nquestion"}]},
+        {"role": MessageRole.ASSISTANT, "content": [{"type": "text", "text": "[PLAN]:\n" + "plan " * 300}]},
+    ]
+    for step in range(num_steps):
+        messages.append(
+            {"role": MessageRole.ASSISTANT, "content": [{"type": "text", "text": f"Calling tools:\n{step} " * 50}]}
+        )
+        messages.append(
+            {
+                "role": MessageRole.TOOL_RESPONSE,
+                "content": [{"type": "text", "text": "Tool calling observation:\n" + "x" * obs_chars}],
+            }
+        )
+    messages.append({"role": MessageRole.USER, "content": [{"type": "text", "text": "instructions " * 300}]})
+    return messages
+
+
+def main(args):
+    print(f"{'steps':>6} {'messages':>9} {'deepcopy (ms)':>14} {'shared (ms)':>12} {'speedup':>8}")
+    for num_steps in args.steps:
+        history = build_history(num_steps, args.obs_chars)
+
+        def with_deepcopy():
+            get_clean_message_list(deepcopy(history), role_conversions=tool_role_conversions)
+
+        def shared():
+            get_clean_message_list(history, role_conversions=tool_role_conversions)
+
+        copy_ms = min(timeit.repeat(with_deepcopy, number=1, repeat=args.repeat)) * 1000
+        shared_ms = min(timeit.repeat(shared, number=1, repeat=args.repeat)) * 1000
+        print(f"{num_steps:>6} {len(history):>9} {copy_ms:>14.3f} {shared_ms:>12.3f} {copy_ms / shared_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark message preparation per model call")
+    parser.add_argument("--steps", type=int, nargs="+", default=[5, 10, 20, 40], help="History lengths in steps")
+    parser.add_argument("--obs_chars", type=int, default=20000, help="Characters per tool observation")
+    parser.add_argument("--repeat", type=int, default=20, help="Timing repetitions (best is reported)")
+    main(parser.parse_args())
@@ -16,10 +16,13 @@
 
 from typing import List, Dict, Any, Optional, Tuple
 import os
-import requests
+import httpx
 import json
 import time
 from utils import openai_service
+from FlashOAgents.http_client import get_http_client
+from FlashOAgents.page_store import get_page_store
+from FlashOAgents.search_cache import get_search_cache
 
 def read_page(url: str) -> str:
     """Read and return the content of a webpage using Jina reader."""
@@ -34,11 +37,19 @@ def read_page(url: str) -> str:
         'X-Token-Budget': '200000',
     }
 
+    store = get_page_store()
+    if store is not None:
+        text = store.get(url)
+        if text is not None:
+            return text
+
     try:
-        response = requests.get(jina_url, headers=headers, timeout=15)
+        response = get_http_client().get(jina_url, headers=headers, timeout=15)
         response.raise_for_status()
+        if store is not None and response.text:
+            store.put(url, response.text)
         return response.text
-    except requests.RequestException as e:
+    except httpx.HTTPError as e:
         return f"Error reading page: {str(e)}"
 
 def web_search_google_serper(
@@ -58,15 +69,20 @@ def web_search_google_serper(
         "num": serp_num
     })
     headers = {
-        'X-API-KEY': os.getenv("SERPER_API_KEY"),
+        'X-API-KEY': os.getenv("SERPER_API_KEY", ""),
         'Content-Type': 'application/json'
     }
 
+    cache = get_search_cache()
     for attempt in range(max_retries):
         try:
-            response = requests.post(url, headers=headers, data=payload, timeout=10)
-            response.raise_for_status()
-            results = response.json()
+            results = cache.get(query, serp_num, "United States") if cache is not None else None
+            if results is None:
+                response = get_http_client().post(url, headers=headers, content=payload, timeout=10)
+                response.raise_for_status()
+                results = response.json()
+                if cache is not None and results.get("organic"):
+                    cache.put(query, serp_num, "United States", response.content)
 
             if "organic" not in results or not results["organic"]:
                 year_filter_msg = f" with year filter={filter_year}" if filter_year else ""
@@ -85,7 +101,7 @@ def web_search_google_serper(
             
             return search_results, ""
         
-        except (requests.RequestException, json.JSONDecodeError) as e:
+        except (httpx.HTTPError, json.JSONDecodeError) as e:
             if attempt == max_retries - 1:
                 return [], f"Search failed after {max_retries} attempts: {str(e)}"
             time.sleep(1)
@@ -26,6 +26,9 @@ from dotenv import load_dotenv
 import logging
 import os
 from utils import read_jsonl, write_jsonl, openai_service
+from FlashOAgents.load_balancer import ReplicaBalancer
+from FlashOAgents.page_store import configure_page_store, page_store_stats
+from FlashOAgents.search_cache import configure_search_cache, search_cache_stats
 
 
 FINAL_PROMPT = '''
@@ -110,7 +113,7 @@ def get_search_results_with_format(tool, tool_args):
     else:
         return "Unsupported tool"
     
-def process_single_data(item, args):
+def process_single_data(item, args, balancer):
     
     query = item.get("question")
 
@@ -128,11 +131,14 @@ def process_single_data(item, args):
             truncated_history = system_msg + truncated_msgs
 
             try:
-                final_content = openai_service(
-                    messages=truncated_history,
-                    api_key=args.vllm_api_key, 
-                    base_url=args.vllm_url, 
-                    model=args.model_name,
+                final_content = balancer.call(
+                    lambda base_url: openai_service(
+                        messages=truncated_history,
+                        api_key=args.vllm_api_key,
+                        base_url=base_url,
+                        model=args.model_name,
+                    ),
+                    key=query if args.sticky_routing else None,
                 )
                 
                 conversation_history.append({
@@ -239,6 +245,8 @@ def process_single_data(item, args):
 
 
 def main(args):
+    configure_search_cache(args.search_cache, ttl=args.search_cache_ttl_hours * 3600)
+    configure_page_store(args.page_store, max_age=args.page_max_age_hours * 3600)
     if args.infile.lower().endswith('.json'):
         with open(args.infile, 'r') as f:
             data = json.load(f)
@@ -255,6 +263,7 @@ def main(args):
     data_to_run = [item for item in data if item.get("question") not in done_questions]
     logger.info(f"Total data: {len(data)}, Completed: {len(done_questions)}, Remaining to run: {len(data_to_run)}")
     
+    balancer = ReplicaBalancer(args.vllm_url, routing=args.routing, sticky=args.sticky_routing)
     results = []
     file_lock = threading.Lock()
 
@@ -265,13 +274,19 @@ def main(args):
     with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
 
         futures = [
-            executor.submit(process_single_data, item, args) for item in data_to_run
+            executor.submit(process_single_data, item, args, balancer) for item in data_to_run
         ]
         for future in tqdm(as_completed(futures), total=len(futures), desc="Processing"):
             result = future.result()
             results.append(result)
             safe_write(result)
 
+    if args.search_cache:
+        logger.info(f"Search cache stats: {search_cache_stats()}")
+    if args.page_store:
+        logger.info(f"Page store stats: {page_store_stats()}")
+    if len(balancer.replicas) > 1:
+        logger.info(f"Replica stats: {balancer.stats()}")
     logger.info(f"Processing complete. Newly added: {len(results)}, Total completed: {len(done_questions) + len(results)}")
 
 if __name__ == '__main__':
@@ -284,7 +299,13 @@ if __name__ == '__main__':
     parser.add_argument('--concurrency', type=int, default=15, help='num of concurrency')
     parser.add_argument('--model_name', type=str, required=True, help='vllm model name')
     parser.add_argument('--max_steps', type=int, default=40, help='max steps')
-    parser.add_argument('--vllm_url', type=str, required=True, help='URL for vllm service')
+    parser.add_argument('--vllm_url', type=str, nargs='+', required=True, help='URL for vllm service; several URLs are load-balanced')
+    parser.add_argument('--routing', type=str, default='least_outstanding', choices=['least_outstanding', 'latency'], help='routing across vllm urls')
+    parser.add_argument('--sticky_routing', action='store_true', help='keep each question on one vllm url to reuse its prefix cache')
+    parser.add_argument('--search_cache', type=str, default=None, help='sqlite file caching search results across runs')
+    parser.add_argument('--search_cache_ttl_hours', type=float, default=168, help='lifetime of cached search results')
+    parser.add_argument('--page_store', type=str, default=None, help='directory storing crawled pages across runs')
+    parser.add_argument('--page_max_age_hours', type=float, default=168, help='age after which a stored page is fetched again')
     parser.add_argument('--vllm_api_key', type=str, default="EMPTY", help='service api key')
     args = parser.parse_args()
     
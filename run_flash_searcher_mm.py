@@ -14,7 +14,6 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import os
 import random
 import argparse
 import json
@@ -23,10 +22,9 @@ from tqdm import tqdm
 import threading
 from dotenv import load_dotenv
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from FlashOAgents import OpenAIServerModel
-from FlashOAgents import VisualInspectorTool, TextInspectorTool, AudioInspectorTool, get_zip_description, get_single_file_description
+from FlashOAgents import configure_tool_executor, VisualInspectorTool, TextInspectorTool, AudioInspectorTool, get_zip_description, get_single_file_description
 from base_agent import MMSearchAgent
-from utils import read_jsonl, write_jsonl
+from utils import read_jsonl, write_jsonl, agent_options, item_logger, setup_tracing, setup_http_pool, setup_llm_endpoints, setup_llm_cache, setup_search_cache, setup_page_store, setup_page_prefetch, log_run_stats, export_traces, build_model
 
 logging.basicConfig(
     level=logging.INFO,
@@ -41,13 +39,17 @@ load_dotenv(override=True)
 
 
 
-def process_item(item, model, summary_interval, prompts_type, max_steps, visual_tool, text_tool, audio_tool):
+def process_item(item, model, summary_interval, prompts_type, max_steps, visual_tool, text_tool, audio_tool, log_options=None,
+                 **agent_kwargs):
 
+    agent_logger = item_logger(item["question"], **(log_options or {}))
     search_agent = MMSearchAgent(
         model, 
         summary_interval=summary_interval, 
         prompts_type=prompts_type, 
-        max_steps=max_steps
+        max_steps=max_steps,
+        logger=agent_logger,
+        **agent_kwargs,
     )
 
     question = item["question"]
@@ -71,6 +73,8 @@ def process_item(item, model, summary_interval, prompts_type, max_steps, visual_
     except Exception as e:
         logger.error(f"Exception occurred while calling multi_agent: {str(e)}")
         return None
+    finally:
+        agent_logger.close()
 
     return {
         "question": question,
@@ -80,19 +84,23 @@ def process_item(item, model, summary_interval, prompts_type, max_steps, visual_
 
 
 def main(args):
-    custom_role_conversions = {"tool-call": "assistant", "tool-response": "user"}
-    model = OpenAIServerModel(
-        os.environ.get("DEFAULT_MODEL"),
-        custom_role_conversions=custom_role_conversions,
-        max_completion_tokens=32768,
-        api_key=os.environ.get("OPENAI_API_KEY"),
-        api_base=os.environ.get("OPENAI_API_BASE"),
-    )
+    setup_http_pool(args)
+    setup_llm_endpoints(args)
+    setup_llm_cache(args)
+    setup_search_cache(args)
+    setup_page_store(args)
+    setup_page_prefetch(args)
+    model = build_model(args)
 
     visual_tool = VisualInspectorTool(model, 100000)
     text_tool = TextInspectorTool(model, 100000)
     audio_tool = AudioInspectorTool(model, 100000)
 
+    tool_executor = configure_tool_executor(
+        max_workers=args.tool_workers,
+        provider_limits={"serper": args.provider_concurrency, "jina": args.provider_concurrency},
+    )
+
     if args.infile.lower().endswith('.json'):
         with open(args.infile, 'r') as f:
             data = json.load(f)
@@ -130,7 +138,8 @@ def main(args):
                 args.max_steps, 
                 visual_tool, 
                 text_tool, 
-                audio_tool
+                audio_tool,
+                **agent_options(args),
             ) for item in data_to_run
         ]
         
@@ -140,6 +149,8 @@ def main(args):
                 results.append(result)
                 safe_write(result)
 
+    logger.info(f"Tool executor stats: {tool_executor.stats()}")
+    log_run_stats(args, model)
     logger.info(f"Processing completed. Newly added: {len(results)}, Total completed: {len(done_questions) + len(results)}")
 
 
@@ -153,8 +164,54 @@ if __name__ == '__main__':
     parser.add_argument('--prompts_type', type=str, default="default", help='Type of prompts to use')
     parser.add_argument('--concurrency', type=int, default=15, help='Number of concurrency')
     parser.add_argument('--max_steps', type=int, default=40, help='Maximum number of steps')
+    parser.add_argument('--tool_workers', type=int, default=32, help='Maximum number of tool calls running at once, shared by all items')
+    parser.add_argument('--llm_max_attempts', type=int, default=5, help='Attempts per LLM request, with jittered exponential backoff or the server\'s Retry-After in between')
+    parser.add_argument('--llm_rate_limit', type=float, default=None, help='Maximum LLM requests per second per endpoint, shared by all items (default: unlimited)')
+    parser.add_argument('--llm_failure_threshold', type=int, default=5, help='Consecutive connection errors, timeouts or 5xx that open the circuit breaker of an LLM endpoint')
+    parser.add_argument('--llm_endpoints', type=str, nargs='+', default=None, help='Base URLs of several replicas serving DEFAULT_MODEL, e.g. vLLM servers; calls are load-balanced across them (default: OPENAI_API_BASE only)')
+    parser.add_argument('--llm_routing', type=str, default='least_outstanding', choices=['least_outstanding', 'latency'], help='How --llm_endpoints calls are routed: fewest requests in flight, or lowest observed latency')
+    parser.add_argument('--llm_sticky', action='store_true', help='Keep all calls of one item on the same --llm_endpoints replica to reuse its prefix cache')
+    parser.add_argument('--llm_cache', type=str, default=None, help='SQLite file caching model completions by request content; identical calls in this and later runs are answered from it')
+    parser.add_argument('--llm_cache_mode', type=str, default='read_write', choices=['read_write', 'read_only', 'record_only'], help='read_write serves and records, read_only never writes, record_only always calls the model and overwrites')
+    parser.add_argument('--llm_cache_size_mb', type=int, default=None, help='Size cap of --llm_cache; least recently used completions are evicted beyond it (default: no cap)')
+    parser.add_argument('--search_cache', type=str, default=None, help='SQLite file caching Serper results by normalized query, result count and location, shared across processes and runs')
+    parser.add_argument('--search_cache_ttl_hours', type=float, default=168, help='Lifetime of a cached search result in hours')
+    parser.add_argument('--page_store', type=str, default=None, help='Directory storing compressed crawled pages by canonical URL, shared across processes and runs')
+    parser.add_argument('--page_store_size_mb', type=int, default=2048, help='Size cap of --page_store; least recently read pages are evicted beyond it')
+    parser.add_argument('--page_max_age_hours', type=float, default=168, help='Age in hours after which a stored page is revalidated or fetched again')
+    parser.add_argument('--prefetch_top_n', type=int, default=0, help='Read the top N result pages of every web search in the background, so a following crawl_page skips the fetch (0: off)')
+    parser.add_argument('--prefetch_concurrency', type=int, default=4, help='Pages prefetched at the same time across all agents of a process')
+    parser.add_argument('--prefetch_budget_mb', type=int, default=256, help='Size of the unclaimed prefetched pages a process keeps in memory without --page_store; the oldest are evicted beyond it')
+    parser.add_argument('--provider_concurrency', type=int, default=10, help='Maximum number of concurrent calls per search/crawl provider')
+    parser.add_argument('--http_pool_size', type=int, default=None, help='Keep-alive connections per shared HTTP client (default: twice the larger of --concurrency and --tool_workers)')
+    parser.add_argument('--stream_tool_calls', action='store_true', help='Stream model output and start each tool call as soon as it is generated')
+    parser.add_argument('--async_summary', action='store_true', help='Generate summaries in the background while the next steps run')
+    parser.add_argument('--summary_max_staleness', type=int, default=1, help='Steps that may run before waiting for a background summary')
+    parser.add_argument('--speculative_search', action='store_true', help='Search for the task text while the initial plan is generated')
+    parser.add_argument('--speculative_crawl_top_k', type=int, default=0, help='With --speculative_search, number of top result pages to read ahead')
+    parser.add_argument('--context_budget', type=int, default=None, help='Prompt budget in tokens; observations covered by a summary are compacted beyond it')
+    parser.add_argument('--prefix_cache_layout', action='store_true', help='Keep the prompt prefix byte-stable across steps for server-side prefix caching')
+    parser.add_argument('--memoize_tool_calls', action='store_true', help='Reuse the observations of repeated tool calls within a task')
+    parser.add_argument('--tool_timeout', type=float, default=None, help='Seconds a step waits for each tool call before recording a timeout')
+    parser.add_argument('--step_timeout', type=float, default=None, help='Seconds a step waits for its whole tool batch')
+    parser.add_argument('--drop_late_results', action='store_true', help='Discard results of timed-out tool calls instead of adding them to the next step')
+    parser.add_argument('--checkpoint_dir', type=str, default=None, help='Directory for per-step checkpoints; interrupted items resume from their last completed step')
+    parser.add_argument('--max_output_repairs', type=int, default=2, help='Times a step re-asks the model when its output cannot be parsed as tool calls')
+    parser.add_argument('--json_response_format', action='store_true', help='Request JSON output (response_format json_object) for action steps')
+    parser.add_argument('--compact_memory', action='store_true', help='Keep transcript references instead of prompt copies in memory steps, and drop raw API responses')
+    parser.add_argument('--crawl_token_budget', type=int, default=None, help='Tokens of a crawled page sent for summarization, e.g. 4000; longer pages are cut to the chunks ranked most relevant to the query by BM25 (default: first 60,000 characters)')
+    parser.add_argument('--trace_file', type=str, default=None, help='Write a Chrome trace JSON of item, step, LLM, tool and HTTP spans')
+    parser.add_argument('--otlp_file', type=str, default=None, help='Write the same spans as an OTLP/JSON file')
+    parser.add_argument('--log_dir', type=str, default=None, help='Write each item\'s agent log to its own file in this directory instead of the terminal')
+    parser.add_argument('--log_level', type=str, default="info", choices=["off", "error", "info", "debug"], help='Agent log level')
+    parser.add_argument('--log_jsonl', action='store_true', help='Write agent logs as plain-text JSON lines instead of rich panels')
+    parser.add_argument('--background_logging', action='store_true', help='Render and write agent logs on a background thread')
 
     args = parser.parse_args()
-    
-    main(args)
+
+    tracer = setup_tracing(args)
+    try:
+        main(args)
+    finally:
+        export_traces(tracer, args)
     
\ No newline at end of file
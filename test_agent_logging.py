@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Tests for AgentLogger sinks and lazy messages.
+
+Covers:
+  1. Callable messages are only built when the level lets them through
+  2. The background writer keeps order and does not block the caller
+  3. Per-agent log files and JSON-lines mode
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+import pytest
+from rich.panel import Panel
+from rich.rule import Rule
+from rich.text import Text
+
+# Ensure project root is on sys.path
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import FlashOAgents.agents as agents_module
+from FlashOAgents.agents import ToolCallingAgent
+from FlashOAgents.models import ChatMessage
+from FlashOAgents.monitoring import AgentLogger, LogLevel, flush_logs
+from FlashOAgents.tool_executor import ToolExecutor
+from FlashOAgents.tools import Tool
+
+
+class EchoTool(Tool):
+    name = "web_search"
+    description = "Fake search tool."
+    inputs = {"query": {"type": "string", "description": "Search query."}}
+    output_type = "string"
+
+    def forward(self, query: str) -> str:
+        return f"results for [{query}]"
+
+
+class ScriptedModel:
+    model_id = "scripted"
+
+    def __init__(self):
+        self.action_calls = 0
+
+    def __call__(self, messages, **kwargs):
+        if "# Tool List" not in json.dumps(messages):
+            return ChatMessage(role="assistant", content="PLAN")
+        self.action_calls += 1
+        if self.action_calls == 1:
+            tools = [{"name": "web_search", "arguments": {"query": "a"}}]
+        else:
+            tools = [{"name": "final_answer", "arguments": {"answer": "42"}}]
+        return ChatMessage(role="assistant", content=json.dumps({"think": "t", "tools": tools}))
+
+
+def _agent(logger):
+    return ToolCallingAgent(
+        tools=[EchoTool()],
+        model=ScriptedModel(),
+        max_steps=5,
+        logger=logger,
+        tool_executor=ToolExecutor(max_workers=2, owner_limit=None),
+    )
+
+
+# ──────────────────────────────────────────────
+# 1. Lazy messages
+# ──────────────────────────────────────────────
+class TestLazy:
+    def test_filtered_message_not_built(self, capsys):
+        calls = []
+        logger = AgentLogger(level=LogLevel.ERROR)
+        logger.log(lambda: calls.append("built") or "message", level=LogLevel.INFO)
+        assert calls == [] and capsys.readouterr().out == ""
+        logger.error(lambda: calls.append("built") or "failure")
+        assert calls == ["built"] and "failure" in capsys.readouterr().out
+
+    def test_agent_skips_panels_when_quiet(self, monkeypatch):
+        built = []
+        monkeypatch.setattr(agents_module, "Panel", lambda *args, **kwargs: built.append(args) or Panel(*args, **kwargs))
+        assert _agent(AgentLogger(level=LogLevel.ERROR)).run("question") == "42"
+        assert built == []
+
+
+# ──────────────────────────────────────────────
+# 2. Background writer
+# ──────────────────────────────────────────────
+class TestBackground:
+    def test_order_and_non_blocking(self):
+        logger = AgentLogger(background=True)
+        written = []
+
+        def slow_print(*args, **kwargs):
+            time.sleep(0.02)
+            written.append(args[0])
+
+        logger.console.print = slow_print
+        start = time.time()
+        for i in range(10):
+            logger.log(f"message {i}")
+        assert time.time() - start < 0.1
+        flush_logs()
+        assert written == [f"message {i}" for i in range(10)]
+
+    def test_concurrent_agents_keep_their_order(self, tmp_path):
+        loggers = [AgentLogger(log_file=str(tmp_path / f"{i}.log"), background=True) for i in range(4)]
+
+        def write(logger, n):
+            for j in range(50):
+                logger.log(f"{n}-{j}")
+
+        threads = [threading.Thread(target=write, args=(logger, n)) for n, logger in enumerate(loggers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for n, logger in enumerate(loggers):
+            logger.close()
+            lines = (tmp_path / f"{n}.log").read_text().split()
+            assert lines == [f"{n}-{j}" for j in range(50)]
+
+
+# ──────────────────────────────────────────────
+# 3. Sinks
+# ──────────────────────────────────────────────
+class TestSinks:
+    def test_agent_log_file(self, tmp_path, capsys):
+        path = tmp_path / "agent.log"
+        logger = AgentLogger(log_file=str(path))
+        assert _agent(logger).run("question") == "42"
+        logger.close()
+        content = path.read_text()
+        assert "Observations: results for |a]" in content and "Final answer: 42" in content
+        assert "\x1b[" not in content
+        assert capsys.readouterr().out == ""
+
+    def test_jsonl(self, tmp_path):
+        path = tmp_path / "agent.jsonl"
+        logger = AgentLogger(log_file=str(path), jsonl=True, name="searcher")
+        logger.log(Panel(Text("inside a panel")))
+        logger.log(Rule("[bold]Step 1"), level=LogLevel.INFO)
+        logger.log("[bold red]failure[/bold red]", level=LogLevel.ERROR)
+        logger.log("not written", level=LogLevel.DEBUG)
+        logger.close()
+        records = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [record["message"] for record in records] == ["inside a panel", "Step 1", "failure"]
+        assert [record["level"] for record in records] == ["INFO", "INFO", "ERROR"]
+        assert all(record["agent"] == "searcher" for record in records)
+
+    def test_closed_logger_drops_messages(self, tmp_path):
+        logger = AgentLogger(log_file=str(tmp_path / "agent.log"))
+        logger.close()
+        logger.log("after close")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Tests for the asyncio execution path of ToolCallingAgent.
+
+Covers:
+  1. arun produces the same trajectory as run
+  2. Tool calls of one step are awaited concurrently
+  3. Natively async tools are awaited on the event loop
+  4. ToolExecutor.async_limit enforces provider limits
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+
+import pytest
+
+# Ensure project root is on sys.path
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from FlashOAgents.agents import ToolCallingAgent
+from FlashOAgents.memory import ActionStep, PlanningStep, SummaryStep, TaskStep
+from FlashOAgents.models import ChatMessage
+from FlashOAgents.monitoring import LogLevel
+from FlashOAgents.tool_executor import ToolExecutor
+from FlashOAgents.tools import Tool
+
+
+class SleepySearchTool(Tool):
+    name = "web_search"
+    description = "Fake search tool."
+    inputs = {"query": {"type": "string", "description": "Search query."}}
+    output_type = "string"
+
+    def __init__(self, delay: float = 0.2):
+        super().__init__()
+        self.delay = delay
+
+    def forward(self, query: str) -> str:
+        time.sleep(self.delay)
+        return f"results for {query}"
+
+
+class AsyncSearchTool(SleepySearchTool):
+    def __init__(self, delay: float = 0.2):
+        super().__init__(delay)
+        self.async_calls = 0
+
+    async def aforward(self, query: str) -> str:
+        self.async_calls += 1
+        await asyncio.sleep(self.delay)
+        return f"results for {query}"
+
+
+class ScriptedModel:
+    """Plans, then issues `fanout` searches per step for `search_steps` steps, then answers."""
+
+    model_id = "scripted"
+
+    def __init__(self, search_steps: int = 2, fanout: int = 3):
+        self.search_steps = search_steps
+        self.fanout = fanout
+        self.calls = 0
+        self.action_calls = 0
+        self.async_calls = 0
+
+    def __call__(self, messages, **kwargs):
+        self.calls += 1
+        last = messages[-1]["content"][0]["text"]
+        if self.calls == 1:
+            return self._message("PLAN")
+        if "# Tool List" not in last:
+            return self._message("SUMMARY")
+        self.action_calls += 1
+        if self.action_calls <= self.search_steps:
+            tools = [
+                {"name": "web_search", "arguments": {"query": f"q{self.calls}-{i}"}} for i in range(self.fanout)
+            ]
+        else:
+            tools = [{"name": "final_answer", "arguments": {"answer": "42"}}]
+        return self._message(json.dumps({"think": "thinking", "tools": tools}))
+
+    async def acall(self, messages, **kwargs):
+        self.async_calls += 1
+        await asyncio.sleep(0)
+        return self(messages, **kwargs)
+
+    @staticmethod
+    def _message(content):
+        return ChatMessage(role="assistant", content=content, input_token_count=1, output_token_count=1)
+
+
+def _agent(model, tool, **kwargs):
+    return ToolCallingAgent(
+        tools=[tool],
+        model=model,
+        max_steps=10,
+        verbosity_level=LogLevel.OFF,
+        tool_executor=ToolExecutor(max_workers=8, owner_limit=None),
+        **kwargs,
+    )
+
+
+# ──────────────────────────────────────────────
+# 1. Same trajectory as run
+# ──────────────────────────────────────────────
+class TestTrajectory:
+    def test_matches_sync_run(self):
+        sync_agent = _agent(ScriptedModel(), SleepySearchTool(delay=0))
+        async_agent = _agent(ScriptedModel(), SleepySearchTool(delay=0))
+        assert sync_agent.run("question") == "42"
+        assert asyncio.run(async_agent.arun("question")) == "42"
+
+        sync_steps, async_steps = sync_agent.memory.steps, async_agent.memory.steps
+        assert [type(s) for s in async_steps] == [type(s) for s in sync_steps]
+        assert [type(s) for s in async_steps] == [TaskStep, PlanningStep, ActionStep, ActionStep, ActionStep]
+        for sync_step, async_step in zip(sync_steps, async_steps):
+            if isinstance(sync_step, ActionStep):
+                assert async_step.observations == sync_step.observations
+                assert [tc.name for tc in async_step.tool_calls] == [tc.name for tc in sync_step.tool_calls]
+
+    def test_summary_and_stream(self):
+        model = ScriptedModel(search_steps=3, fanout=1)
+        agent = _agent(model, SleepySearchTool(delay=0), summary_interval=3)
+
+        async def collect():
+            return [step async for step in await agent.arun("question", stream=True)]
+
+        outputs = asyncio.run(collect())
+        assert outputs[-1] == "42"
+        assert any(isinstance(step, SummaryStep) for step in agent.memory.steps)
+        assert model.async_calls == model.calls
+
+
+# ──────────────────────────────────────────────
+# 2./3. Concurrent and native async tools
+# ──────────────────────────────────────────────
+class TestConcurrency:
+    def test_blocking_tools_overlap(self):
+        agent = _agent(ScriptedModel(search_steps=1, fanout=4), SleepySearchTool(delay=0.2))
+        start = time.time()
+        assert asyncio.run(agent.arun("question")) == "42"
+        assert time.time() - start < 0.6
+
+    def test_native_async_tool(self):
+        tool = AsyncSearchTool(delay=0.2)
+        agent = _agent(ScriptedModel(search_steps=1, fanout=4), tool)
+        start = time.time()
+        assert asyncio.run(agent.arun("question")) == "42"
+        assert time.time() - start < 0.6
+        assert tool.async_calls == 4
+
+    def test_agents_share_one_loop(self):
+        agents = [_agent(ScriptedModel(search_steps=1, fanout=2), AsyncSearchTool(delay=0.2)) for _ in range(5)]
+
+        async def run_all():
+            return await asyncio.gather(*(agent.arun(f"question {i}") for i, agent in enumerate(agents)))
+
+        start = time.time()
+        assert asyncio.run(run_all()) == ["42"] * 5
+        assert time.time() - start < 0.6
+
+
+# ──────────────────────────────────────────────
+# 4. Limits
+# ──────────────────────────────────────────────
+class TestAsyncLimit:
+    def test_provider_limit(self):
+        executor = ToolExecutor(provider_limits={"serper": 2})
+        active, peak = 0, 0
+
+        async def call():
+            nonlocal active, peak
+            async with executor.async_limit("web_search"):
+                active += 1
+                peak = max(peak, active)
+                await asyncio.sleep(0.02)
+                active -= 1
+
+        async def run_all():
+            await asyncio.gather(*(call() for _ in range(6)))
+
+        asyncio.run(run_all())
+        assert peak == 2
+
+    def test_tool_error_becomes_observation(self):
+        class BrokenTool(AsyncSearchTool):
+            async def aforward(self, query: str) -> str:
+                raise RuntimeError("search backend down")
+
+        agent = _agent(ScriptedModel(search_steps=1, fanout=1), BrokenTool())
+        assert asyncio.run(agent.arun("question")) == "42"
+        assert "search backend down" in agent.memory.steps[2].observations
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Tests for background summaries (ToolCallingAgent(async_summary=True)).
+
+Covers:
+  1. Summaries overlap with the following action steps
+  2. The staleness policy bounds how many steps run before the summary is inserted
+  3. The asyncio path behaves the same
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+
+import pytest
+
+# Ensure project root is on sys.path
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from FlashOAgents.agents import ToolCallingAgent
+from FlashOAgents.memory import ActionStep, PlanningStep, SummaryStep, TaskStep
+from FlashOAgents.models import ChatMessage
+from FlashOAgents.monitoring import LogLevel
+from FlashOAgents.tool_executor import ToolExecutor
+from FlashOAgents.tools import Tool
+
+
+class EchoTool(Tool):
+    name = "web_search"
+    description = "Fake search tool."
+    inputs = {"query": {"type": "string", "description": "Search query."}}
+    output_type = "string"
+
+    def forward(self, query: str) -> str:
+        time.sleep(0.1)
+        return f"results for {query}"
+
+
+class SlowSummaryModel:
+    """Plans, searches for `search_steps` steps and answers; summary calls take `summary_delay` seconds."""
+
+    model_id = "slow-summary"
+
+    def __init__(self, search_steps: int, summary_delay: float = 0.3):
+        self.search_steps = search_steps
+        self.summary_delay = summary_delay
+        self.calls = 0
+        self.action_calls = 0
+
+    def __call__(self, messages, **kwargs):
+        self.calls += 1
+        last = messages[-1]["content"][0]["text"]
+        if self.calls == 1:
+            return ChatMessage(role="assistant", content="PLAN")
+        if "# Tool List" not in last:
+            time.sleep(self.summary_delay)
+            return ChatMessage(role="assistant", content="SUMMARY")
+        self.action_calls += 1
+        if self.action_calls <= self.search_steps:
+            tools = [{"name": "web_search", "arguments": {"query": f"q{self.action_calls}"}}]
+        else:
+            tools = [{"name": "final_answer", "arguments": {"answer": "42"}}]
+        return ChatMessage(role="assistant", content=json.dumps({"think": "t", "tools": tools}))
+
+    async def acall(self, messages, **kwargs):
+        return await asyncio.to_thread(self, messages, **kwargs)
+
+
+def _agent(model, **kwargs):
+    return ToolCallingAgent(
+        tools=[EchoTool()],
+        model=model,
+        max_steps=10,
+        summary_interval=2,
+        verbosity_level=LogLevel.OFF,
+        tool_executor=ToolExecutor(max_workers=4, owner_limit=None),
+        **kwargs,
+    )
+
+
+def _step_types(agent):
+    return [type(step) for step in agent.memory.steps]
+
+
+# ──────────────────────────────────────────────
+# 1. Overlap
+# ──────────────────────────────────────────────
+class TestOverlap:
+    def test_summary_hidden_behind_action_step(self):
+        blocking = _agent(SlowSummaryModel(search_steps=3))
+        start = time.time()
+        assert blocking.run("question") == "42"
+        blocking_time = time.time() - start
+
+        overlapped = _agent(SlowSummaryModel(search_steps=3), async_summary=True, summary_max_staleness=2)
+        start = time.time()
+        assert overlapped.run("question") == "42"
+        overlapped_time = time.time() - start
+
+        assert overlapped_time < blocking_time - 0.15
+        assert SummaryStep in _step_types(overlapped)
+
+    def test_summary_inserted_after_stale_steps(self):
+        agent = _agent(SlowSummaryModel(search_steps=3), async_summary=True, summary_max_staleness=1)
+        assert agent.run("question") == "42"
+        assert _step_types(agent) == [
+            TaskStep, PlanningStep, ActionStep, ActionStep, SummaryStep, ActionStep, SummaryStep, ActionStep
+        ]
+        summary = agent.memory.steps[4]
+        assert summary.stale_steps == 1
+        # The summary was generated from the snapshot taken before the step it overlapped with.
+        snapshot = str(summary.model_input_messages)
+        assert "results for q1" in snapshot and "results for q2" not in snapshot
+
+
+# ──────────────────────────────────────────────
+# 2. Staleness policy
+# ──────────────────────────────────────────────
+class TestStaleness:
+    def test_zero_staleness_matches_blocking_order(self):
+        blocking = _agent(SlowSummaryModel(search_steps=3, summary_delay=0))
+        blocking.run("question")
+        overlapped = _agent(SlowSummaryModel(search_steps=3, summary_delay=0), async_summary=True, summary_max_staleness=0)
+        overlapped.run("question")
+        assert _step_types(overlapped) == _step_types(blocking)
+        assert all(step.stale_steps == 0 for step in overlapped.memory.steps if isinstance(step, SummaryStep))
+
+    def test_pending_summary_dropped_on_final_answer(self):
+        agent = _agent(SlowSummaryModel(search_steps=1, summary_delay=0.5), async_summary=True, summary_max_staleness=5)
+        assert agent.run("question") == "42"
+        assert SummaryStep not in _step_types(agent)
+
+
+# ──────────────────────────────────────────────
+# 3. Async path
+# ──────────────────────────────────────────────
+class TestAsyncPath:
+    def test_arun(self):
+        agent = _agent(SlowSummaryModel(search_steps=3), async_summary=True, summary_max_staleness=1)
+        assert asyncio.run(agent.arun("question")) == "42"
+        assert _step_types(agent) == [
+            TaskStep, PlanningStep, ActionStep, ActionStep, SummaryStep, ActionStep, SummaryStep, ActionStep
+        ]
+        assert agent.memory.steps[4].stale_steps == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
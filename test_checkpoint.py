@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Tests for step-level checkpoints (ToolCallingAgent(checkpoint_dir=..., checkpoint_callback=...)).
+
+Covers:
+  1. Memory steps survive a checkpoint round trip
+  2. A retry after a generation error resumes from the last completed step
+  3. Checkpoint files let a new agent continue an interrupted run, and are removed when it finishes
+  4. run(reset=True) starts from an empty memory
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+# Ensure project root is on sys.path
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from base_agent import BaseAgent
+from FlashOAgents.agents import ToolCallingAgent
+from FlashOAgents.checkpoint import checkpoint_path, load_checkpoint, make_checkpoint, restore_steps
+from FlashOAgents.memory import ActionStep, PlanningStep, TaskStep
+from FlashOAgents.models import ChatMessage
+from FlashOAgents.monitoring import LogLevel
+from FlashOAgents.tool_executor import ToolExecutor
+from FlashOAgents.tools import Tool
+from FlashOAgents.utils import AgentGenerationError
+
+TASK = "Who wrote the question?"
+
+
+class EchoTool(Tool):
+    name = "web_search"
+    description = "Fake search tool."
+    inputs = {"query": {"type": "string", "description": "Search query."}}
+    output_type = "string"
+
+    def __init__(self):
+        super().__init__()
+        self.queries = []
+
+    def forward(self, query: str) -> str:
+        self.queries.append(query)
+        return f"results for {query}"
+
+
+class FlakyModel:
+    """Plans, searches for `search_steps` steps and answers; the action calls listed in `fail_on` raise once."""
+
+    model_id = "flaky"
+
+    def __init__(self, search_steps=3, fail_on=()):
+        self.search_steps = search_steps
+        self.fail_on = set(fail_on)
+        self.plans = 0
+        self.action_calls = 0
+
+    def __call__(self, messages, **kwargs):
+        if "# Tool List" not in json.dumps(messages):
+            self.plans += 1
+            return ChatMessage(role="assistant", content="PLAN")
+        self.action_calls += 1
+        if self.action_calls in self.fail_on:
+            raise RuntimeError("server overloaded")
+        searches = self.action_calls - len([n for n in self.fail_on if n < self.action_calls])
+        if searches <= self.search_steps:
+            tools = [{"name": "web_search", "arguments": {"query": f"q{searches}"}}]
+        else:
+            tools = [{"name": "final_answer", "arguments": {"answer": "42"}}]
+        return ChatMessage(role="assistant", content=json.dumps({"think": "t", "tools": tools}))
+
+    async def acall(self, messages, **kwargs):
+        return self(messages, **kwargs)
+
+
+def _agent(model, tool=None, **kwargs):
+    return ToolCallingAgent(
+        tools=[tool or EchoTool()],
+        model=model,
+        max_steps=10,
+        verbosity_level=LogLevel.OFF,
+        tool_executor=ToolExecutor(max_workers=2, owner_limit=None),
+        **kwargs,
+    )
+
+
+def _step_types(agent):
+    return [type(step) for step in agent.memory.steps]
+
+
+# ──────────────────────────────────────────────
+# 1. Round trip
+# ──────────────────────────────────────────────
+class TestRoundTrip:
+    def test_steps_restored(self):
+        agent = _agent(FlakyModel(search_steps=2))
+        assert agent.run(TASK) == "42"
+        checkpoint = json.loads(json.dumps(make_checkpoint(TASK, agent.memory.steps, agent.step_number)))
+        steps = restore_steps(checkpoint)
+        assert [type(step) for step in steps] == _step_types(agent)
+        assert steps[2].observations == agent.memory.steps[2].observations
+        assert steps[2].tool_calls[0].arguments == {"query": "q1"}
+        assert steps[2].model_output_messages.content == agent.memory.steps[2].model_output_messages.content
+        assert steps[1].plan == "PLAN"
+
+    def test_error_restored_without_logging(self):
+        step = ActionStep(step_number=1, error=AgentGenerationError.__new__(AgentGenerationError))
+        step.error.message = "boom"
+        restored = restore_steps(make_checkpoint(TASK, [step], 2))[0]
+        assert isinstance(restored.error, AgentGenerationError)
+        assert restored.error.message == "boom"
+
+
+# ──────────────────────────────────────────────
+# 2. Resume after a generation error
+# ──────────────────────────────────────────────
+class TestResume:
+    def test_resume_skips_completed_steps(self):
+        tool = EchoTool()
+        model = FlakyModel(search_steps=3, fail_on={3})
+        agent = _agent(model, tool)
+        with pytest.raises(AgentGenerationError):
+            agent.run(TASK)
+        assert agent.run(TASK, resume=True) == "42"
+        assert model.plans == 1
+        assert tool.queries == ["q1", "q2", "q3"]
+        assert _step_types(agent) == [TaskStep, PlanningStep] + [ActionStep] * 4
+        assert all(step.error is None for step in agent.memory.steps[2:])
+
+    def test_resume_after_plan(self):
+        model = FlakyModel(search_steps=1, fail_on={1})
+        agent = _agent(model)
+        with pytest.raises(AgentGenerationError):
+            agent.run(TASK)
+        assert agent.run(TASK, resume=True) == "42"
+        assert model.plans == 1
+        assert _step_types(agent) == [TaskStep, PlanningStep, ActionStep, ActionStep]
+
+    def test_forward_resumes_on_generation_error(self):
+        tool = EchoTool()
+        model = FlakyModel(search_steps=2, fail_on={2})
+        base = BaseAgent(model)
+        base.agent_fn = _agent(model, tool)
+        result = base.forward(TASK)
+        assert result["agent_result"] == "42"
+        assert model.plans == 1
+        assert tool.queries == ["q1", "q2"]
+        assert [step["name"] for step in result["agent_trajectory"]] == ["plan", "action", "action", "action"]
+
+    def test_callback_checkpoint(self):
+        checkpoints = []
+        model = FlakyModel(search_steps=2, fail_on={2})
+        agent = _agent(model, checkpoint_callback=checkpoints.append)
+        with pytest.raises(AgentGenerationError):
+            agent.run(TASK)
+        assert [c["step_number"] for c in checkpoints] == [1, 2]
+        assert checkpoints[0]["mid_iteration"] and not checkpoints[1]["mid_iteration"]
+
+        resumed = _agent(model)
+        assert resumed.run(TASK, resume=checkpoints[-1]) == "42"
+        assert model.plans == 1
+        assert _step_types(resumed) == [TaskStep, PlanningStep, ActionStep, ActionStep, ActionStep]
+
+    def test_async_resume(self):
+        model = FlakyModel(search_steps=2, fail_on={2})
+        agent = _agent(model)
+        with pytest.raises(AgentGenerationError):
+            asyncio.run(agent.arun(TASK))
+        assert asyncio.run(agent.arun(TASK, resume=True)) == "42"
+        assert model.plans == 1
+        assert _step_types(agent) == [TaskStep, PlanningStep, ActionStep, ActionStep, ActionStep]
+
+
+# ──────────────────────────────────────────────
+# 3. Checkpoint directory
+# ──────────────────────────────────────────────
+class TestCheckpointDir:
+    def test_new_agent_continues_interrupted_run(self, tmp_path):
+        model = FlakyModel(search_steps=3, fail_on={3})
+        with pytest.raises(AgentGenerationError):
+            _agent(model, checkpoint_dir=str(tmp_path)).run(TASK)
+        path = checkpoint_path(str(tmp_path), TASK)
+        checkpoint = load_checkpoint(path)
+        assert checkpoint["task"] == TASK and checkpoint["step_number"] == 3
+
+        tool = EchoTool()
+        agent = _agent(model, tool, checkpoint_dir=str(tmp_path))
+        assert agent.run(TASK, resume=True) == "42"
+        assert model.plans == 1
+        assert tool.queries == ["q3"]
+        assert not os.path.exists(path)
+
+    def test_other_task_not_resumed(self, tmp_path):
+        model = FlakyModel(search_steps=1, fail_on={1})
+        with pytest.raises(AgentGenerationError):
+            _agent(model, checkpoint_dir=str(tmp_path)).run(TASK)
+        agent = _agent(model, checkpoint_dir=str(tmp_path))
+        assert agent.run("Another question", resume=True) == "42"
+        assert model.plans == 2
+        assert os.path.exists(checkpoint_path(str(tmp_path), TASK))
+
+    def test_unreadable_checkpoint_ignored(self, tmp_path):
+        path = checkpoint_path(str(tmp_path), TASK)
+        with open(path, "w") as f:
+            f.write("{not json")
+        assert load_checkpoint(path) is None
+        assert _agent(FlakyModel(search_steps=1), checkpoint_dir=str(tmp_path)).run(TASK, resume=True) == "42"
+
+
+# ──────────────────────────────────────────────
+# 4. Reset
+# ──────────────────────────────────────────────
+class TestReset:
+    def test_reset_clears_memory(self):
+        agent = _agent(FlakyModel(search_steps=1))
+        agent.run(TASK)
+        agent.run(TASK)
+        assert _step_types(agent).count(TaskStep) == 1
+
+    def test_no_reset_keeps_memory(self):
+        agent = _agent(FlakyModel(search_steps=1))
+        agent.run(TASK)
+        agent.run(TASK, reset=False)
+        assert _step_types(agent).count(TaskStep) == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Tests for query-aware chunk selection (FlashOAgents.chunk_ranker) in CrawlPageTool.
+
+Covers:
+  1. Tokenization and chunking of page markdown
+  2. BM25 ranking and selection within a token budget
+  3. CrawlPageTool sends only the selected chunks to the summarizing model
+"""
+
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+# Ensure project root is on sys.path
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from FlashOAgents.chunk_ranker import CHUNK_GAP, bm25_scores, select_relevant_chunks, split_into_chunks, tokenize
+from FlashOAgents.memory import estimate_tokens
+from FlashOAgents.search_tools import CrawlPageTool
+
+FILLER = "The committee met again to review routine administrative matters and budgets. " * 12
+
+
+def _page(sections):
+    return "\n\n".join(f"## {title}\n\n{body}" for title, body in sections)
+
+
+PAGE = _page(
+    [(f"Section {n}", FILLER) for n in range(70)]
+    + [("Awards", "Marie Curie received the Nobel Prize in Physics in 1903 and in Chemistry in 1911.")]
+    + [(f"Appendix {n}", FILLER) for n in range(30)]
+)
+
+
+class RecordingModel:
+    def __init__(self):
+        self.prompts = []
+
+    def __call__(self, messages):
+        self.prompts.append(messages[0]["content"])
+        return SimpleNamespace(content="summary")
+
+    async def acall(self, messages):
+        return self(messages)
+
+
+# ──────────────────────────────────────────────
+# 1. Tokenization and chunking
+# ──────────────────────────────────────────────
+class TestChunking:
+    def test_tokenize(self):
+        assert tokenize("Nobel Prizes, in 1903!") == ["nobel", "prize", "in", "1903"]
+        assert tokenize("居里夫人") == ["居里", "里夫", "夫人"]
+        assert tokenize("class") == ["class"]
+
+    def test_headings_start_chunks(self):
+        chunks = split_into_chunks("# Title\n\nintro\n\n## Early life\n\nborn in Warsaw\n\nmore", max_chars=1000)
+        assert chunks == ["# Title\n\nintro", "## Early life\n\nborn in Warsaw\n\nmore"]
+
+    def test_long_paragraph_split(self):
+        text = " ".join(f"Sentence number {n} is here." for n in range(200))
+        chunks = split_into_chunks(text, max_chars=500)
+        assert len(chunks) > 5 and all(len(chunk) <= 500 for chunk in chunks)
+        assert " ".join(chunks).replace("\n", " ") == text
+
+
+# ──────────────────────────────────────────────
+# 2. Ranking and selection
+# ──────────────────────────────────────────────
+class TestSelection:
+    def test_bm25_prefers_matching_chunk(self):
+        chunks = ["the cat sat on the mat", "nobel prize in physics awarded to curie", "the dog ran"]
+        scores = bm25_scores("Curie Nobel prize", chunks)
+        assert scores.argmax() == 1 and scores[0] == scores[2] == 0
+
+    def test_short_page_unchanged(self):
+        assert select_relevant_chunks("short page", "anything") == "short page"
+
+    def test_relevant_chunk_past_cutoff_selected(self):
+        assert PAGE.index("Nobel") > 60000
+        content = select_relevant_chunks(PAGE, "When did Marie Curie win the Nobel Prize?", token_budget=1000)
+        assert "Nobel Prize in Physics in 1903" in content
+        assert estimate_tokens(content) <= 1000 and content.startswith(CHUNK_GAP.strip("\n"))
+
+    def test_no_match_reads_from_top(self):
+        content = select_relevant_chunks(PAGE, "zebra", token_budget=500)
+        assert content.startswith("## Section 0") and content.endswith(CHUNK_GAP.strip("\n"))
+        assert estimate_tokens(content) <= 500
+
+    def test_selected_chunks_in_page_order(self):
+        text = "\n\n".join(f"## Part {n}\n\n{'apple ' if n in (3, 7) else ''}{FILLER}" for n in range(10))
+        content = select_relevant_chunks(text, "apple", token_budget=700)
+        assert content.index("Part 3") < content.index("Part 7") and "Part 5" not in content
+
+
+# ──────────────────────────────────────────────
+# 3. CrawlPageTool
+# ──────────────────────────────────────────────
+class TestCrawlPageTool:
+    def test_prompt_within_budget(self):
+        model = RecordingModel()
+        tool = CrawlPageTool(model, token_budget=2000)
+        assert tool.extract("https://example.com", "Marie Curie Nobel Prize", PAGE) == "summary"
+        prompt = model.prompts[0]
+        assert "Nobel Prize in Physics" in prompt and estimate_tokens(prompt) < 2200
+
+    def test_async_extract(self):
+        model = RecordingModel()
+        tool = CrawlPageTool(model, token_budget=2000)
+        asyncio.run(tool.aextract("https://example.com", "Marie Curie Nobel Prize", PAGE))
+        assert "Nobel Prize in Physics" in model.prompts[0]
+
+    def test_truncates_by_default(self):
+        model = RecordingModel()
+        CrawlPageTool(model).extract("https://example.com", "Nobel", PAGE)
+        assert "Physics" not in model.prompts[0] and "...(truncated)" in model.prompts[0]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
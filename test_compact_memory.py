@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Tests for compact memory (ToolCallingAgent(compact_memory=True)).
+
+Covers:
+  1. Action and summary steps keep TranscriptRefs that resolve to the messages the model was given
+  2. Raw API responses are dropped unless debugging
+  3. Step classes are slotted; dict() and checkpoints resolve references
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+# Ensure project root is on sys.path
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from FlashOAgents.agents import ToolCallingAgent
+from FlashOAgents.checkpoint import make_checkpoint, restore_steps
+from FlashOAgents.memory import ActionStep, SummaryStep, ToolCall, TranscriptRef
+from FlashOAgents.models import ChatMessage
+from FlashOAgents.monitoring import LogLevel
+from FlashOAgents.tool_executor import ToolExecutor
+from FlashOAgents.tools import Tool
+
+
+class EchoTool(Tool):
+    name = "web_search"
+    description = "Fake search tool."
+    inputs = {"query": {"type": "string", "description": "Search query."}}
+    output_type = "string"
+
+    def forward(self, query: str) -> str:
+        return f"results for {query}"
+
+
+class RecordingModel:
+    """Plans, searches for `search_steps` steps and answers, recording the input of every call."""
+
+    model_id = "recording"
+
+    def __init__(self, search_steps: int = 3):
+        self.search_steps = search_steps
+        self.calls = []
+        self.action_calls = 0
+
+    def __call__(self, messages, **kwargs):
+        self.calls.append(list(messages))
+        raw = {"id": "chatcmpl-1", "usage": {"prompt_tokens": 10}}
+        if "# Tool List" not in messages[-1]["content"][0]["text"]:
+            return ChatMessage(role="assistant", content="PLAN or SUMMARY", raw=raw)
+        self.action_calls += 1
+        if self.action_calls <= self.search_steps:
+            tools = [{"name": "web_search", "arguments": {"query": f"q{self.action_calls}"}}]
+        else:
+            tools = [{"name": "final_answer", "arguments": {"answer": "42"}}]
+        return ChatMessage(role="assistant", content=json.dumps({"think": "t", "tools": tools}), raw=raw)
+
+    async def acall(self, messages, **kwargs):
+        return self(messages, **kwargs)
+
+
+def _agent(model, **kwargs):
+    return ToolCallingAgent(
+        tools=[EchoTool()],
+        model=model,
+        max_steps=10,
+        summary_interval=2,
+        verbosity_level=LogLevel.OFF,
+        tool_executor=ToolExecutor(max_workers=2, owner_limit=None),
+        **kwargs,
+    )
+
+
+def _steps(agent, cls):
+    return [step for step in agent.memory.steps if isinstance(step, cls)]
+
+
+def _action_inputs(model):
+    return [messages for messages in model.calls if "# Tool List" in messages[-1]["content"][0]["text"]]
+
+
+# ──────────────────────────────────────────────
+# 1. Transcript references
+# ──────────────────────────────────────────────
+class TestReferences:
+    def test_action_steps_resolve_to_model_inputs(self):
+        model = RecordingModel()
+        agent = _agent(model, compact_memory=True)
+        assert agent.run("question") == "42"
+        steps = _steps(agent, ActionStep)
+        assert all(isinstance(step.model_input_messages, TranscriptRef) for step in steps)
+        for step, messages in zip(steps, _action_inputs(model)):
+            # The model was given the recorded messages plus the step instruction.
+            assert step.model_input_messages.messages() == messages[:-1]
+            assert len(step.model_input_messages) == len(messages) - 1
+
+    def test_summary_steps_resolve_to_model_inputs(self):
+        model = RecordingModel(search_steps=4)
+        agent = _agent(model, compact_memory=True)
+        assert agent.run("question") == "42"
+        summaries = _steps(agent, SummaryStep)
+        assert summaries
+        for summary in summaries:
+            messages = summary.model_input_messages.messages()
+            assert messages in model.calls
+            assert messages[-1]["content"][0]["text"] == agent.prompt_templates["summary"]["update_post_messages"]
+
+    def test_async_summary_snapshot(self):
+        model = RecordingModel(search_steps=4)
+        agent = _agent(model, compact_memory=True, async_summary=True, summary_max_staleness=1)
+        assert asyncio.run(agent.arun("question")) == "42"
+        for summary in _steps(agent, SummaryStep):
+            assert summary.model_input_messages.messages() in model.calls
+
+    def test_default_mode_keeps_lists(self):
+        model = RecordingModel()
+        agent = _agent(model)
+        assert agent.run("question") == "42"
+        for step, messages in zip(_steps(agent, ActionStep), _action_inputs(model)):
+            assert isinstance(step.model_input_messages, list)
+            assert step.model_input_messages == messages[:-1]
+
+
+# ──────────────────────────────────────────────
+# 2. Raw responses
+# ──────────────────────────────────────────────
+class TestRaw:
+    def test_raw_dropped(self):
+        agent = _agent(RecordingModel(), compact_memory=True)
+        agent.run("question")
+        assert all(step.model_output_messages.raw is None for step in _steps(agent, ActionStep))
+
+    def test_raw_kept_when_debugging(self):
+        agent = _agent(RecordingModel(), compact_memory=True, debug=True)
+        agent.run("question")
+        assert all(step.model_output_messages.raw is not None for step in _steps(agent, ActionStep))
+
+    def test_raw_kept_by_default(self):
+        agent = _agent(RecordingModel())
+        agent.run("question")
+        assert all(step.model_output_messages.raw is not None for step in _steps(agent, ActionStep))
+
+
+# ──────────────────────────────────────────────
+# 3. Slotted steps and serialization
+# ──────────────────────────────────────────────
+class TestSerialization:
+    def test_steps_are_slotted(self):
+        step = ActionStep(step_number=1)
+        assert not hasattr(step, "__dict__")
+        assert not hasattr(ToolCall(name="t", arguments={}, id="1"), "__dict__")
+        with pytest.raises(AttributeError):
+            step.unknown_field = 1
+
+    def test_dict_resolves_references(self):
+        model = RecordingModel(search_steps=2)
+        agent = _agent(model, compact_memory=True)
+        agent.run("question")
+        action = _steps(agent, ActionStep)[0]
+        assert action.dict()["model_input_messages"] == action.model_input_messages.messages()
+        summary = _steps(agent, SummaryStep)[0]
+        data = summary.dict()
+        assert data["model_input_messages"] == summary.model_input_messages.messages()
+        assert data["summary"] == "PLAN or SUMMARY"
+
+    def test_checkpoint_round_trip(self):
+        agent = _agent(RecordingModel(search_steps=2), compact_memory=True)
+        agent.run("question")
+        checkpoint = json.loads(json.dumps(make_checkpoint("question", agent.memory.steps, agent.step_number)))
+        restored = restore_steps(checkpoint)
+        assert [type(step) for step in restored] == [type(step) for step in agent.memory.steps]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
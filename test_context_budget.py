@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Tests for the token-budgeted context of AgentMemory.
+
+Covers:
+  1. Token estimates of the transcript
+  2. Observations covered by a summary are compacted only once the budget is exceeded
+  3. Background summaries do not cover their stale steps; superseded summaries are compacted
+  4. ToolCallingAgent prompts use the compacted transcript
+"""
+
+import json
+import os
+import sys
+
+import pytest
+
+# Ensure project root is on sys.path
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from FlashOAgents.agents import ToolCallingAgent
+from FlashOAgents.memory import (
+    COMPACTED_OBSERVATION,
+    COMPACTED_SUMMARY,
+    ActionStep,
+    AgentMemory,
+    SummaryStep,
+    TaskStep,
+    ToolCall,
+    estimate_tokens,
+)
+from FlashOAgents.models import ChatMessage
+from FlashOAgents.monitoring import LogLevel
+from FlashOAgents.tool_executor import ToolExecutor
+from FlashOAgents.tools import Tool
+
+BIG = "x" * 4000  # about 1000 tokens
+
+
+def _action(step_number, observations=BIG):
+    return ActionStep(
+        step_number=step_number,
+        tool_calls=[ToolCall(name="web_search", arguments={"query": f"q{step_number}"}, id=str(step_number))],
+        observations=observations,
+    )
+
+
+def _summary(stale_steps=0):
+    return SummaryStep(model_input_messages=[], summary="short summary", summary_reasoning="", stale_steps=stale_steps)
+
+
+def _texts(messages):
+    return [part["text"] for message in messages for part in message["content"]]
+
+
+def _memory(budget, *steps):
+    memory = AgentMemory("system prompt", context_budget=budget)
+    memory.steps.extend([TaskStep(task="task"), *steps])
+    return memory
+
+
+# ──────────────────────────────────────────────
+# 1. Estimates
+# ──────────────────────────────────────────────
+class TestEstimate:
+    def test_prompt_tokens(self):
+        memory = _memory(None, _action(1))
+        assert estimate_tokens(BIG) == 1000
+        assert 1000 < memory.prompt_tokens() < 1100
+
+    def test_custom_counter(self):
+        memory = AgentMemory("system prompt", token_counter=lambda text: len(text.split()))
+        memory.steps.append(TaskStep(task="one two three"))
+        assert memory.prompt_tokens() == 2 + 4 + 5 + 4  # "New task:\none two three" and the system prompt
+
+
+# ──────────────────────────────────────────────
+# 2. Compaction
+# ──────────────────────────────────────────────
+class TestCompaction:
+    def test_no_budget_no_compaction(self):
+        memory = _memory(None, _action(1), _action(2), _summary(), _action(3))
+        memory.get_messages()
+        assert memory.tokens_saved == 0
+        assert not any(step.compacted for step in memory.steps[1:])
+
+    def test_within_budget_no_compaction(self):
+        memory = _memory(100000, _action(1), _summary())
+        memory.get_messages()
+        assert memory.budget_stats()["compacted_steps"] == 0
+
+    def test_covered_observations_compacted_oldest_first(self):
+        memory = _memory(2500, _action(1), _action(2), _summary(), _action(3))
+        messages = memory.get_messages()
+        steps = memory.steps
+        assert [steps[1].compacted, steps[2].compacted, steps[4].compacted] == [True, False, False]
+        assert steps[1].observations == BIG  # the step itself keeps its observations
+        texts = _texts(messages)
+        assert any(COMPACTED_OBSERVATION in text for text in texts)
+        assert sum(BIG in text for text in texts) == 2
+        stats = memory.budget_stats()
+        assert stats["tokens_saved"] > 900 and not stats["over_budget"]
+        assert stats["prompt_tokens"] <= 2500
+
+    def test_uncovered_observations_kept_over_budget(self):
+        memory = _memory(500, _action(1), _summary(), _action(2), _action(3))
+        memory.get_messages()
+        assert [step.compacted for step in memory.steps[1:] if isinstance(step, ActionStep)] == [True, False, False]
+        assert memory.budget_stats()["over_budget"]
+
+    def test_message_count_and_earlier_slices_unchanged(self):
+        memory = _memory(None, _action(1), _summary())
+        snapshot = memory.get_messages()
+        count = len(snapshot)
+        memory.context_budget = 100
+        memory.steps.append(_action(2))
+        messages = memory.get_messages()
+        assert len(messages) == count + 2
+        assert BIG in _texts(snapshot)[2]
+        assert COMPACTED_OBSERVATION in _texts(messages)[2]
+
+
+# ──────────────────────────────────────────────
+# 3. Coverage
+# ──────────────────────────────────────────────
+class TestCoverage:
+    def test_stale_steps_not_covered(self):
+        memory = _memory(100, _action(1), _action(2), _summary(stale_steps=1), _action(3))
+        memory.get_messages()
+        assert [memory.steps[1].compacted, memory.steps[2].compacted] == [True, False]
+
+    def test_superseded_summary_compacted(self):
+        memory = _memory(100, _action(1), _summary(), _action(2), _summary())
+        messages = memory.get_messages()
+        assert memory.steps[2].compacted and not memory.steps[4].compacted
+        texts = _texts(messages)
+        assert f"[SUMMARY]:\n{COMPACTED_SUMMARY}" in texts
+        assert "[SUMMARY]:\nshort summary" in texts
+
+
+# ──────────────────────────────────────────────
+# 4. Agent
+# ──────────────────────────────────────────────
+class BigTool(Tool):
+    name = "web_search"
+    description = "Fake search tool."
+    inputs = {"query": {"type": "string", "description": "Search query."}}
+    output_type = "string"
+
+    def forward(self, query: str) -> str:
+        return f"results for {query} " + BIG
+
+
+class RecordingModel:
+    model_id = "recording"
+
+    def __init__(self, search_steps):
+        self.search_steps = search_steps
+        self.calls = 0
+        self.action_calls = 0
+        self.action_prompts = []
+
+    def __call__(self, messages, **kwargs):
+        self.calls += 1
+        last = messages[-1]["content"][0]["text"]
+        if self.calls == 1:
+            return ChatMessage(role="assistant", content="PLAN")
+        if "# Tool List" not in last:
+            return ChatMessage(role="assistant", content="SUMMARY")
+        self.action_calls += 1
+        self.action_prompts.append(json.dumps(messages))
+        if self.action_calls <= self.search_steps:
+            tools = [{"name": "web_search", "arguments": {"query": f"q{self.action_calls}"}}]
+        else:
+            tools = [{"name": "final_answer", "arguments": {"answer": "42"}}]
+        return ChatMessage(role="assistant", content=json.dumps({"think": "t", "tools": tools}))
+
+
+class TestAgent:
+    def test_prompts_compacted(self):
+        model = RecordingModel(search_steps=4)
+        agent = ToolCallingAgent(
+            tools=[BigTool()],
+            model=model,
+            max_steps=10,
+            summary_interval=2,
+            verbosity_level=LogLevel.OFF,
+            tool_executor=ToolExecutor(max_workers=2, owner_limit=None),
+            context_budget=3000,
+        )
+        assert agent.run("question") == "42"
+        assert COMPACTED_OBSERVATION in model.action_prompts[-1]
+        assert "results for q1" not in model.action_prompts[-1]
+        assert "results for q4" in model.action_prompts[-1]
+        assert agent.memory.budget_stats()["tokens_saved"] > 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
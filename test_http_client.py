@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Tests for the shared HTTP client layer (FlashOAgents.http_client).
+
+Covers:
+  1. Requests to one host reuse a keep-alive connection, and the metrics count it
+  2. Async clients are kept per event loop
+  3. Search tools and OpenAI clients go through the shared pool
+"""
+
+import asyncio
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# Ensure project root is on sys.path
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import FlashOAgents.search_tools as search_tools
+from FlashOAgents.http_client import LLM_TIMEOUT, HttpPool, configure_http_pool, get_http_client, http_stats
+from FlashOAgents.models import OpenAIServerModel
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _reply(self, status, body):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.startswith("/missing"):
+            self._reply(404, "not found")
+        else:
+            self._reply(200, f"page {self.path}")
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        query = json.loads(self.rfile.read(length))["q"]
+        self._reply(200, json.dumps({"organic": [{"title": f"about {query}", "link": "https://example.com"}]}))
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+
+@pytest.fixture
+def pool():
+    pool = configure_http_pool(max_connections=4)
+    yield pool
+    pool.close()
+
+
+# ──────────────────────────────────────────────
+# 1. Connection reuse
+# ──────────────────────────────────────────────
+class TestReuse:
+    def test_sequential_requests_reuse_connection(self, server, pool):
+        client = pool.client()
+        for n in range(5):
+            assert client.get(f"{server}/page{n}").text == f"page /page{n}"
+        stats = pool.stats()
+        assert stats["requests"] == 5 and stats["new_connections"] == 1
+        assert stats["connection_reuse_rate"] == pytest.approx(0.8)
+        assert stats["hosts"]["127.0.0.1"]["reused_connections"] == 4
+
+    def test_named_clients_have_own_pools(self, server, pool):
+        assert pool.client("llm") is not pool.client() and pool.client() is pool.client()
+        pool.client().get(server)
+        pool.client("llm").get(server)
+        assert pool.stats()["new_connections"] == 2
+
+    def test_limits_and_http2_fallback(self):
+        pool = HttpPool(max_connections=8, http2=True)
+        assert pool.limits.max_connections == 8 and pool.limits.max_keepalive_connections == 8
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            assert pool.http2 is False
+
+    def test_errors_counted(self, pool):
+        with pytest.raises(Exception):
+            pool.client().get("http://127.0.0.1:1/", timeout=1)
+        assert pool.stats()["hosts"]["127.0.0.1"]["errors"] == 1
+
+
+# ──────────────────────────────────────────────
+# 2. Async clients
+# ──────────────────────────────────────────────
+class TestAsync:
+    def test_client_per_loop(self, server, pool):
+        async def fetch():
+            client = pool.async_client()
+            for _ in range(3):
+                await client.get(server)
+            return client
+
+        first = asyncio.run(fetch())
+        second = asyncio.run(fetch())
+        assert first is not second
+        assert pool.stats()["requests"] == 6 and pool.stats()["new_connections"] == 2
+
+
+# ──────────────────────────────────────────────
+# 3. Tools and models
+# ──────────────────────────────────────────────
+class TestUsers:
+    def test_read_page(self, server, pool, monkeypatch):
+        monkeypatch.setattr(search_tools, "JINA_READER_URL", f"{server}/")
+        assert search_tools.read_page("a") == "page /a"
+        assert search_tools.read_page("b") == "page /b"
+        assert search_tools.read_page("missing").startswith("Error reading page")
+        assert http_stats()["new_connections"] == 1
+
+    def test_serper_search(self, server, pool, monkeypatch):
+        monkeypatch.setattr(search_tools, "SERPER_SEARCH_URL", f"{server}/search")
+        results, error = search_tools.web_search_google_serper("cats")
+        assert error == "" and results[0]["title"] == "about cats"
+        results, _ = asyncio.run(search_tools.aweb_search_google_serper("dogs"))
+        assert results[0]["title"] == "about dogs"
+        assert http_stats()["requests"] == 2
+
+    def test_openai_clients_use_pool(self, pool):
+        model = OpenAIServerModel("fake-model", api_key="test")
+        assert model.client._client is get_http_client("llm")
+
+        async def async_client():
+            return model.async_client
+
+        assert asyncio.run(async_client()) is not asyncio.run(async_client())
+
+    def test_llm_clients_keep_long_timeout(self, pool):
+        model = OpenAIServerModel("fake-model", api_key="test")
+        assert model.client.timeout == LLM_TIMEOUT and model.client.timeout.read == 600
+        assert get_http_client().timeout.read == 30
+
+        async def async_timeout():
+            return model.async_client.timeout
+
+        assert asyncio.run(async_timeout()) == LLM_TIMEOUT
+        configured = configure_http_pool(llm_timeout=1200)
+        assert OpenAIServerModel("fake-model", api_key="test").client.timeout.read == 1200
+        configured.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
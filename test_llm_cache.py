@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Tests for the on-disk completion cache (FlashOAgents.disk_cache and FlashOAgents.llm_cache).
+
+Covers:
+  1. DiskCache: TTL, size-capped LRU eviction and sharing one file between processes
+  2. Completion keys and the read_write / read_only / record_only modes
+  3. OpenAIServerModel answers identical requests from the cache, for plain, streamed and async calls
+"""
+
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+
+# Ensure project root is on sys.path
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import FlashOAgents.disk_cache as disk_cache
+from FlashOAgents.disk_cache import DiskCache
+from FlashOAgents.llm_cache import LLMCache, completion_key
+from FlashOAgents.models import OpenAIServerModel
+
+MESSAGES = [{"role": "user", "content": [{"type": "text", "text": "plan the task"}]}]
+
+
+def _response(content, tool_calls=None):
+    dump = {"role": "assistant", "content": content, "tool_calls": tool_calls}
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(
+            content=content, tool_calls=tool_calls, model_dump=lambda include=None: dict(dump),
+        ))],
+        usage=SimpleNamespace(prompt_tokens=30, completion_tokens=7, prompt_tokens_details=None),
+    )
+
+
+def _chunk(text, usage=None):
+    delta = SimpleNamespace(content=text, tool_calls=None, reasoning_content=None)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta)] if text else [], usage=usage)
+
+
+class CountingCreate:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, stream=False, **kwargs):
+        self.calls += 1
+        if stream:
+            usage = SimpleNamespace(prompt_tokens=30, completion_tokens=7, prompt_tokens_details=None)
+            return iter([_chunk("streamed "), _chunk(f"answer {self.calls}"), _chunk(None, usage)])
+        return _response(f"answer {self.calls}")
+
+
+def _model(cache):
+    create = CountingCreate()
+    model = OpenAIServerModel("fake-model", api_key="test", cache=cache)
+    model.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    return model, create
+
+
+def _write_keys(path, worker, count):
+    cache = DiskCache(path)
+    for n in range(count):
+        cache.set(f"{worker}-{n}", b"x" * 100)
+
+
+# ──────────────────────────────────────────────
+# 1. DiskCache
+# ──────────────────────────────────────────────
+class TestDiskCache:
+    def test_get_set_and_totals(self, tmp_path):
+        cache = DiskCache(str(tmp_path / "c.db"))
+        assert cache.get("k") is None
+        cache.set("k", b"abc")
+        cache.set("k", b"abcdef")
+        assert cache.get("k") == b"abcdef"
+        assert cache.total_bytes() == 6 and len(cache) == 1
+        cache.delete("k")
+        assert cache.total_bytes() == 0
+        stats = cache.stats()
+        assert stats["hits"] == 1 and stats["misses"] == 1 and stats["writes"] == 2
+
+    def test_ttl(self, tmp_path):
+        cache = DiskCache(str(tmp_path / "c.db"), ttl=0.05)
+        cache.set("short", b"v")
+        cache.set("long", b"v", ttl=60)
+        time.sleep(0.06)
+        assert cache.get("short") is None and cache.get("long") == b"v"
+        assert cache.stats()["expired"] == 1
+
+    def test_lru_eviction(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(disk_cache, "_TOUCH_INTERVAL", 0)
+        cache = DiskCache(str(tmp_path / "c.db"), max_bytes=1000)
+        for n in range(9):
+            cache.set(f"k{n}", b"x" * 100)
+            time.sleep(0.002)
+        cache.get("k0")  # recently read, so kept
+        cache.set("k9", b"x" * 200)
+        assert cache.total_bytes() <= 900
+        assert cache.get("k0") is not None and cache.get("k1") is None
+        assert cache.stats()["evictions"] >= 2
+
+    def test_shared_between_processes(self, tmp_path):
+        path = str(tmp_path / "c.db")
+        DiskCache(path)
+        workers = [multiprocessing.Process(target=_write_keys, args=(path, w, 50)) for w in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        assert all(worker.exitcode == 0 for worker in workers)
+        cache = DiskCache(path)
+        assert len(cache) == 200 and cache.total_bytes() == 20000
+
+
+# ──────────────────────────────────────────────
+# 2. Keys and modes
+# ──────────────────────────────────────────────
+class TestKeysAndModes:
+    def test_completion_key(self):
+        kwargs = {"model": "m", "messages": MESSAGES, "temperature": 0.0}
+        assert completion_key(kwargs) == completion_key(dict(reversed(list(kwargs.items()))))
+        assert completion_key(kwargs) == completion_key({**kwargs, "stream": True, "stream_options": {}})
+        assert completion_key(kwargs) != completion_key({**kwargs, "temperature": 0.7})
+        assert completion_key(kwargs) != completion_key({**kwargs, "messages": MESSAGES * 2})
+
+    def test_modes(self, tmp_path):
+        path = str(tmp_path / "llm.db")
+        request = {"model": "m", "messages": MESSAGES}
+        LLMCache(path, mode="read_only").put(request, {"content": "ignored"})
+        assert LLMCache(path).get(request) is None
+        LLMCache(path, mode="record_only").put(request, {"content": "recorded"})
+        assert LLMCache(path, mode="record_only").get(request) is None
+        assert LLMCache(path, mode="read_only").get(request) == {"content": "recorded"}
+        with pytest.raises(ValueError):
+            LLMCache(path, mode="write_only")
+
+
+# ──────────────────────────────────────────────
+# 3. Models
+# ──────────────────────────────────────────────
+class TestModel:
+    def test_identical_calls_hit(self, tmp_path):
+        cache = LLMCache(str(tmp_path / "llm.db"))
+        model, create = _model(cache)
+        first = model(MESSAGES)
+        second = model(MESSAGES)
+        assert create.calls == 1 and second.content == first.content == "answer 1"
+        assert (second.input_token_count, second.output_token_count) == (30, 7)
+        assert model.last_input_token_count == 30 and second.raw is None
+        assert model(MESSAGES, stop_sequences=["x"]).content == "answer 2"
+
+    def test_replay_in_new_process_model(self, tmp_path):
+        path = str(tmp_path / "llm.db")
+        _model(LLMCache(path))[0](MESSAGES)
+        model, create = _model(LLMCache(path, mode="read_only"))
+        assert model(MESSAGES).content == "answer 1" and create.calls == 0
+
+    def test_record_only_calls_model(self, tmp_path):
+        path = str(tmp_path / "llm.db")
+        model, create = _model(LLMCache(path, mode="record_only"))
+        model(MESSAGES)
+        assert model(MESSAGES).content == "answer 2" and create.calls == 2
+        assert _model(LLMCache(path))[0](MESSAGES).content == "answer 2"
+
+    def test_tool_calls_round_trip(self, tmp_path):
+        cache = LLMCache(str(tmp_path / "llm.db"))
+        function = {"name": "web_search", "arguments": {"query": "q"}}
+        tool_calls = [{"id": "call_1", "type": "function", "function": function}]
+        model, create = _model(cache)
+        create_response = _response(None, tool_calls)
+        model.client.chat.completions.create = lambda **kwargs: create_response
+        model(MESSAGES)
+        model.client.chat.completions.create = create
+        cached = model(MESSAGES)
+        assert cached.tool_calls[0].function.name == "web_search"
+        assert cached.tool_calls[0].function.arguments == {"query": "q"}
+
+    def test_stream_hit(self, tmp_path):
+        cache = LLMCache(str(tmp_path / "llm.db"))
+        model, create = _model(cache)
+        assert model.stream(MESSAGES).content == "streamed answer 1"
+        texts = []
+        assert model.stream(MESSAGES, on_text=texts.append).content == "streamed answer 1"
+        assert texts == ["streamed answer 1"] and create.calls == 1
+        assert model(MESSAGES).content == "streamed answer 1"  # streamed and plain calls share entries
+
+    def test_async_hit(self, tmp_path):
+        cache = LLMCache(str(tmp_path / "llm.db"))
+        model, create = _model(cache)
+
+        async def call():
+            async def acreate(**kwargs):
+                return create(**kwargs)
+
+            model._async_clients[asyncio.get_running_loop()] = SimpleNamespace(
+                chat=SimpleNamespace(completions=SimpleNamespace(create=acreate))
+            )
+            return [(await model.acall(MESSAGES)).content for _ in range(3)]
+
+        assert asyncio.run(call()) == ["answer 1"] * 3 and create.calls == 1
+        assert cache.stats()["hits"] == 2
+
+    def test_no_cache_by_default(self):
+        model, create = _model(None)
+        model(MESSAGES)
+        model(MESSAGES)
+        assert model.cache is None and create.calls == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
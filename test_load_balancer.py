@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Tests for multi-endpoint models (FlashOAgents.load_balancer and LoadBalancedModel).
+
+Covers:
+  1. Routing by requests in flight or by latency, and sticky routing by conversation
+  2. Unhealthy replicas are ejected and re-admitted through their endpoint guards
+  3. LoadBalancedModel fails over between replicas, for plain, streamed and async calls
+"""
+
+import asyncio
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+# Ensure project root is on sys.path
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import FlashOAgents.retry as retry
+from FlashOAgents.load_balancer import ReplicaBalancer, affinity_key
+from FlashOAgents.models import LoadBalancedModel
+from FlashOAgents.retry import RetryPolicy
+
+A, B, C = "http://replica-a/v1", "http://replica-b/v1", "http://replica-c/v1"
+
+
+def _messages(task):
+    return [
+        {"role": "system", "content": [{"type": "text", "text": "You are an agent."}]},
+        {"role": "user", "content": [{"type": "text", "text": task}]},
+    ]
+
+
+def _connection_error():
+    return openai.APIConnectionError(request=httpx.Request("POST", "http://replica/v1"))
+
+
+def _response(content):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(
+            content=content, tool_calls=None,
+            model_dump=lambda include=None: {"role": "assistant", "content": content},
+        ))],
+        usage=SimpleNamespace(prompt_tokens=3, completion_tokens=1, prompt_tokens_details=None),
+    )
+
+
+def _chunk(text):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(delta=SimpleNamespace(content=text, tool_calls=None, reasoning_content=None))],
+        usage=None,
+    )
+
+
+class FakeReplica:
+    """`chat.completions.create` of one replica: answers with its name, or raises while `errors` is not empty."""
+
+    def __init__(self, name, errors=()):
+        self.name = name
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self, stream=False, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        if stream:
+            return iter([_chunk(self.name)])
+        return _response(self.name)
+
+
+@pytest.fixture(autouse=True)
+def fresh_guards(monkeypatch):
+    monkeypatch.setattr(retry, "_guards", {})
+    monkeypatch.setattr(retry, "_guard_options", {"failure_threshold": 2, "reset_timeout": 0.05})
+
+
+def _model(replicas, **kwargs):
+    model = LoadBalancedModel(
+        "fake-model",
+        api_bases=list(replicas),
+        api_key="test",
+        retry_policy=RetryPolicy(max_attempts=4, base_delay=0.001, max_delay=0.01),
+        **kwargs,
+    )
+    for endpoint, create in replicas.items():
+        completions = SimpleNamespace(create=create)
+        model.models[endpoint].client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return model
+
+
+def _task_on(model, endpoint):
+    """A task that sticky routing sends to `endpoint`."""
+    for n in range(100):
+        if model.balancer.choose(affinity_key(_messages(f"task {n}"))).endpoint == endpoint:
+            return f"task {n}"
+
+
+# ──────────────────────────────────────────────
+# 1. Routing
+# ──────────────────────────────────────────────
+class TestRouting:
+    def test_least_outstanding(self):
+        balancer = ReplicaBalancer([A, B, C], rng=random.Random(0))
+        a, b, c = balancer.replicas
+        a.outstanding, b.outstanding, c.outstanding = 2, 0, 1
+        assert balancer.choose() is b
+        with balancer.track(b), balancer.track(b):
+            assert balancer.choose() is c
+        assert b.outstanding == 0 and b.requests == 2 and b.latency is not None
+
+    def test_latency(self):
+        balancer = ReplicaBalancer([A, B], routing="latency")
+        a, b = balancer.replicas
+        a.latency, b.latency = 1.0, 3.0
+        assert balancer.choose() is a
+        a.outstanding = 3  # 4 * 1.0 > 1 * 3.0
+        assert balancer.choose() is b
+
+    def test_unmeasured_replicas_tried_first(self):
+        balancer = ReplicaBalancer([A, B], routing="latency")
+        balancer.replicas[0].latency = 0.5
+        assert balancer.choose() is balancer.replicas[1]
+
+    def test_unknown_policy(self):
+        with pytest.raises(ValueError):
+            ReplicaBalancer([A], routing="round_robin")
+
+    def test_sticky_keys(self):
+        balancer = ReplicaBalancer([A, B, C], sticky=True)
+        keys = [affinity_key(_messages(f"task {n}")) for n in range(30)]
+        chosen = {key: balancer.choose(key) for key in keys}
+        assert all(balancer.choose(key) is chosen[key] for key in keys)
+        assert len(set(map(id, chosen.values()))) == 3
+        # Ejecting one replica moves only the conversations it held.
+        ejected = balancer.replicas[0]
+        ejected.guard.record_retry(_connection_error(), 60, 60)
+        moved = [key for key in keys if balancer.choose(key) is not chosen[key]]
+        assert moved == [key for key in keys if chosen[key] is ejected]
+
+    def test_affinity_key_ignores_later_messages(self):
+        messages = _messages("task")
+        longer = messages + [{"role": "assistant", "content": "step 1"}, {"role": "user", "content": "observation"}]
+        assert affinity_key(messages) == affinity_key(longer)
+        assert affinity_key(messages) != affinity_key(_messages("other task"))
+
+
+# ──────────────────────────────────────────────
+# 2. Health
+# ──────────────────────────────────────────────
+class TestHealth:
+    def test_eject_and_readmit(self):
+        balancer = ReplicaBalancer([A, B])
+        a, b = balancer.replicas
+        b.outstanding = 5
+        for _ in range(2):
+            a.guard.acquire()
+            a.guard.record_failure()
+        assert a.guard.state == "open"
+        assert balancer.choose() is b
+        time.sleep(0.06)
+        assert balancer.choose() is a  # re-admitted for a probe
+        a.guard.acquire()
+        assert balancer.choose() is b  # while the probe is in flight
+        a.guard.record_success()
+        assert balancer.choose() is a
+
+    def test_all_ejected_falls_back_to_least_loaded(self):
+        balancer = ReplicaBalancer([A, B])
+        for replica in balancer.replicas:
+            replica.guard.record_retry(_connection_error(), 60, 60)
+        balancer.replicas[0].outstanding = 1
+        assert balancer.choose() is balancer.replicas[1]
+
+    def test_call_reports_to_guard(self):
+        balancer = ReplicaBalancer([A])
+        assert balancer.call(lambda endpoint: endpoint) == A
+        with pytest.raises(RuntimeError):
+            balancer.call(lambda endpoint: (_ for _ in ()).throw(RuntimeError("down")))
+        stats = balancer.replicas[0].guard.stats()
+        assert stats["successes"] == 1 and stats["failures"] == 1
+        assert balancer.stats()[A]["failures"] == 1
+
+
+# ──────────────────────────────────────────────
+# 3. LoadBalancedModel
+# ──────────────────────────────────────────────
+class TestModel:
+    def test_spreads_calls(self):
+        replicas = {A: FakeReplica("a"), B: FakeReplica("b")}
+        model = _model(replicas)
+        answers = {model(_messages(f"task {n}")).content for n in range(20)}
+        assert answers == {"a", "b"}
+        assert model.last_output_token_count == 1
+
+    def test_sticky_model(self):
+        replicas = {A: FakeReplica("a"), B: FakeReplica("b"), C: FakeReplica("c")}
+        model = _model(replicas, sticky=True)
+        for n in range(5):
+            messages = _messages(f"task {n}")
+            first = model(messages).content
+            messages = messages + [{"role": "assistant", "content": first}, {"role": "user", "content": "go on"}]
+            assert model(messages).content == first
+
+    def test_fails_over_without_backoff(self):
+        replicas = {A: FakeReplica("a", [_connection_error()] * 3), B: FakeReplica("b")}
+        model = _model(replicas, sticky=True)
+        task = _task_on(model, A)
+        assert model(_messages(task)).content == "b"
+        assert model(_messages(task)).content == "b"
+        assert model.balancer.replicas[0].guard.state == "open"  # ejected after two failures
+        assert model(_messages(task)).content == "b" and replicas[A].calls == 2
+        time.sleep(0.06)
+        assert model(_messages(task)).content == "b"  # the probe fails once more
+        time.sleep(0.06)
+        assert model(_messages(task)).content == "a"  # re-admitted
+
+    def test_client_errors_not_failed_over(self):
+        error = openai.BadRequestError(
+            "bad", response=httpx.Response(400, request=httpx.Request("POST", A)), body=None
+        )
+        replicas = {A: FakeReplica("a", [error]), B: FakeReplica("b", [error])}
+        model = _model(replicas)
+        with pytest.raises(openai.BadRequestError):
+            model(_messages("task"))
+        assert replicas[A].calls + replicas[B].calls == 1
+
+    def test_exhaustion_raises(self):
+        replicas = {A: FakeReplica("a", [_connection_error()] * 9), B: FakeReplica("b", [_connection_error()] * 9)}
+        model = _model(replicas)
+        with pytest.raises(openai.APIConnectionError):
+            model(_messages("task"))
+        assert replicas[A].calls + replicas[B].calls == 4
+
+    def test_stream_fails_over_before_text(self):
+        replicas = {A: FakeReplica("a", [_connection_error()]), B: FakeReplica("b")}
+        model = _model(replicas, sticky=True)
+        task = _task_on(model, A)
+        texts = []
+        assert model.stream(_messages(task), on_text=texts.append).content == "b"
+        assert texts == ["b"]
+
+    def test_async_fails_over(self):
+        replicas = {A: FakeReplica("a", [_connection_error()]), B: FakeReplica("b")}
+        model = _model(replicas, sticky=True)
+        task = _task_on(model, A)
+
+        async def call():
+            for endpoint, create in replicas.items():
+                async def acreate(create=create, **kwargs):
+                    return create(**kwargs)
+
+                model.models[endpoint]._async_clients[asyncio.get_running_loop()] = SimpleNamespace(
+                    chat=SimpleNamespace(completions=SimpleNamespace(create=acreate))
+                )
+            return await model.acall(_messages(task))
+
+        assert asyncio.run(call()).content == "b"
+        stats = model.replica_stats()
+        assert stats[A]["failures"] == 1 and stats[B]["requests"] == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Tests for the incremental transcript cached by AgentMemory.
+
+Covers:
+  1. Each step is rendered exactly once across repeated reads
+  2. Transcript contents match a full re-render
+  3. Invalidation on reset, truncation, replaced steps and explicit invalidate_transcript
+"""
+
+import os
+import sys
+
+import pytest
+
+# Ensure project root is on sys.path
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from FlashOAgents.memory import ActionStep, AgentMemory, PlanningStep, SummaryStep, TaskStep, ToolCall
+
+
+def _make_action(step_number: int, observations: str = "obs") -> ActionStep:
+    tc = ToolCall(name="web_search", arguments={"query": f"q{step_number}"}, id=f"t{step_number}")
+    return ActionStep(step_number=step_number, tool_calls=[tc], observations=observations, action_think="think")
+
+
+def _full_render(memory: AgentMemory) -> list:
+    messages = []
+    for step in memory.steps:
+        messages.extend(step.to_messages(summary_mode=False))
+    return messages
+
+
+@pytest.fixture
+def memory():
+    mem = AgentMemory(system_prompt="system")
+    mem.steps.append(TaskStep(task="task"))
+    mem.steps.append(PlanningStep(model_input_messages=[], plan="plan", plan_think="", plan_reasoning=""))
+    return mem
+
+
+# ──────────────────────────────────────────────
+# 1. Render-once behaviour
+# ──────────────────────────────────────────────
+class TestRenderOnce:
+    def test_steps_rendered_once(self, memory, monkeypatch):
+        calls = []
+        original = ActionStep.to_messages
+
+        def counting_to_messages(self, *args, **kwargs):
+            calls.append(self.step_number)
+            return original(self, *args, **kwargs)
+
+        monkeypatch.setattr(ActionStep, "to_messages", counting_to_messages)
+        for i in range(1, 6):
+            memory.steps.append(_make_action(i))
+            memory.get_messages()
+            memory.get_messages()
+        assert calls == [1, 2, 3, 4, 5]
+
+    def test_matches_full_render(self, memory):
+        for i in range(1, 4):
+            memory.steps.append(_make_action(i))
+            assert memory.get_messages() == _full_render(memory)
+        memory.steps.append(SummaryStep(model_input_messages=[], summary="summary", summary_reasoning=""))
+        assert memory.get_messages() == _full_render(memory)
+
+    def test_returns_new_list(self, memory):
+        first = memory.get_messages()
+        first.append({"role": "user", "content": []})
+        assert len(memory.get_messages()) == len(first) - 1
+
+    def test_slices_by_step(self, memory):
+        memory.steps.append(_make_action(1))
+        task_and_plan = memory.get_messages(0, 2)
+        assert task_and_plan == _full_render(memory)[:3]
+        assert memory.get_messages(2) == memory.steps[2].to_messages()
+        assert memory.get_messages(3) == []
+
+
+# ──────────────────────────────────────────────
+# 2. Invalidation
+# ──────────────────────────────────────────────
+class TestInvalidation:
+    def test_reset(self, memory):
+        memory.get_messages()
+        memory.reset()
+        assert memory.get_messages() == []
+
+    def test_truncated_steps(self, memory):
+        memory.steps.append(_make_action(1))
+        memory.get_messages()
+        del memory.steps[-1]
+        assert memory.get_messages() == _full_render(memory)
+
+    def test_replaced_step(self, memory):
+        memory.steps.append(_make_action(1, observations="old"))
+        memory.get_messages()
+        memory.steps[-1] = _make_action(1, observations="new")
+        assert "new" in memory.get_messages()[-1]["content"][0]["text"]
+
+    def test_explicit_invalidate(self, memory):
+        step = _make_action(1, observations="old")
+        memory.steps.append(step)
+        memory.get_messages()
+        step.observations = "new"
+        memory.invalidate_transcript(2)
+        assert memory.get_messages() == _full_render(memory)
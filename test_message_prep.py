@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Tests for the copy-free get_clean_message_list.
+
+Covers:
+  1. Input messages are never mutated
+  2. Content blocks are shared, merged content lists are new
+  3. Role conversion, merging and flattening behave as before
+  4. Image blocks are encoded into new blocks
+"""
+
+import os
+import sys
+from copy import deepcopy
+
+import pytest
+from PIL import Image
+
+# Ensure project root is on sys.path
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from FlashOAgents.models import MessageRole, get_clean_message_list, tool_role_conversions
+
+
+def _text(role, text):
+    return {"role": role, "content": [{"type": "text", "text": text}]}
+
+
+@pytest.fixture
+def history():
+    return [
+        _text(MessageRole.SYSTEM, "system"),
+        _text(MessageRole.USER, "task"),
+        _text(MessageRole.TOOL_CALL, "call"),
+        _text(MessageRole.TOOL_RESPONSE, "observation"),
+        _text(MessageRole.USER, "instruction"),
+    ]
+
+
+# ──────────────────────────────────────────────
+# 1. No mutation, structural sharing
+# ──────────────────────────────────────────────
+class TestStructuralSharing:
+    def test_input_not_mutated(self, history):
+        snapshot = deepcopy(history)
+        get_clean_message_list(history, role_conversions=tool_role_conversions)
+        assert history == snapshot
+
+    def test_content_blocks_shared(self, history):
+        output = get_clean_message_list(history, role_conversions=tool_role_conversions)
+        assert output[0]["content"] is history[0]["content"]
+        assert output[3]["content"][0] is history[3]["content"][0]
+
+    def test_merged_content_is_new_list(self, history):
+        output = get_clean_message_list(history, role_conversions=tool_role_conversions)
+        merged = output[3]["content"]
+        assert merged is not history[3]["content"]
+        assert [block["text"] for block in merged] == ["observation", "instruction"]
+        assert len(history[3]["content"]) == 1
+
+    def test_repeated_calls_identical(self, history):
+        first = get_clean_message_list(history, role_conversions=tool_role_conversions)
+        second = get_clean_message_list(history, role_conversions=tool_role_conversions)
+        assert first == second
+
+
+# ──────────────────────────────────────────────
+# 2. Conversion behaviour
+# ──────────────────────────────────────────────
+class TestConversion:
+    def test_roles_converted(self, history):
+        output = get_clean_message_list(history, role_conversions=tool_role_conversions)
+        assert [m["role"] for m in output] == ["system", "user", "assistant", "user"]
+
+    def test_flatten(self, history):
+        output = get_clean_message_list(
+            history, role_conversions=tool_role_conversions, flatten_messages_as_text=True
+        )
+        assert output[-1]["content"] == "observationinstruction"
+        assert history[3]["content"][0]["text"] == "observation"
+
+    def test_invalid_role(self):
+        with pytest.raises(ValueError):
+            get_clean_message_list([_text("robot", "x")])
+
+    def test_image_encoded_without_mutation(self):
+        image = Image.new("RGB", (2, 2))
+        messages = [{"role": MessageRole.USER, "content": [{"type": "image", "image": image}]}]
+        output = get_clean_message_list(messages, convert_images_to_image_urls=True)
+        block = output[0]["content"][0]
+        assert block["type"] == "image_url"
+        assert block["image_url"]["url"].startswith("data:image/png;base64,")
+        assert messages[0]["content"][0] == {"type": "image", "image": image}
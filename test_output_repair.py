@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Tests for in-step regeneration of malformed model output (ToolCallingAgent(max_output_repairs=...)).
+
+Covers:
+  1. Outputs without a usable tool-call structure are rejected by the parser
+  2. A malformed output is regenerated with a repair hint instead of failing the run
+  3. Steps that stay malformed record an AgentParsingError and the run goes on
+  4. response_format is passed with action-step model calls
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+# Ensure project root is on sys.path
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from FlashOAgents.agents import OUTPUT_REPAIR_HINT, ToolCallingAgent
+from FlashOAgents.memory import ActionStep
+from FlashOAgents.models import ChatMessage
+from FlashOAgents.monitoring import LogLevel
+from FlashOAgents.tool_executor import ToolExecutor
+from FlashOAgents.tools import Tool
+from FlashOAgents.utils import AgentParsingError
+
+
+class EchoTool(Tool):
+    name = "web_search"
+    description = "Fake search tool."
+    inputs = {"query": {"type": "string", "description": "Search query."}}
+    output_type = "string"
+
+    def forward(self, query: str) -> str:
+        return f"results for {query}"
+
+
+def _response(*tools):
+    return json.dumps({"think": "t", "tools": list(tools)})
+
+
+SEARCH = {"name": "web_search", "arguments": {"query": "a"}}
+FINAL = {"name": "final_answer", "arguments": {"answer": "42"}}
+
+
+class ScriptedModel:
+    """Plans, then returns `responses` one per action-step call, recording the messages and kwargs of each call."""
+
+    model_id = "scripted"
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.action_calls = []
+
+    def __call__(self, messages, **kwargs):
+        if "# Tool List" not in json.dumps(messages):
+            return ChatMessage(role="assistant", content="PLAN")
+        self.action_calls.append((messages, kwargs))
+        return ChatMessage(
+            role="assistant", content=self.responses.pop(0), input_token_count=10, output_token_count=5
+        )
+
+    async def acall(self, messages, **kwargs):
+        return self(messages, **kwargs)
+
+
+def _agent(model, **kwargs):
+    return ToolCallingAgent(
+        tools=[EchoTool()],
+        model=model,
+        max_steps=5,
+        verbosity_level=LogLevel.OFF,
+        tool_executor=ToolExecutor(max_workers=2, owner_limit=None),
+        **kwargs,
+    )
+
+
+def _action_steps(agent):
+    return [step for step in agent.memory.steps if isinstance(step, ActionStep)]
+
+
+# ──────────────────────────────────────────────
+# 1. Parser
+# ──────────────────────────────────────────────
+class TestParser:
+    @pytest.mark.parametrize(
+        "content,names",
+        [
+            (_response(SEARCH, FINAL), ["web_search", "final_answer"]),
+            ('[{"think": "t", "tools": {"name": "final_answer", "arguments": {}}}]', ["final_answer"]),
+            ('[{"name": "web_search", "arguments": {}}]', ["web_search"]),
+            ('{"think": "nothing to do", "tools": []}', []),
+        ],
+    )
+    def test_accepts(self, content, names):
+        _, tool_calls = ToolCallingAgent._parse_model_output(content)
+        assert [tool_call["name"] for tool_call in tool_calls] == names
+
+    @pytest.mark.parametrize(
+        "content",
+        ["I will search for it now.", "[]", '{"think": "t"}', '{"tools": ["web_search"]}', '{"tools": 3}', ""],
+    )
+    def test_rejects(self, content):
+        with pytest.raises(ValueError):
+            ToolCallingAgent._parse_model_output(content)
+
+
+# ──────────────────────────────────────────────
+# 2. Repair
+# ──────────────────────────────────────────────
+class TestRepair:
+    def test_malformed_output_regenerated(self):
+        model = ScriptedModel(["Let me search.", _response(SEARCH), _response(FINAL)])
+        agent = _agent(model)
+        assert agent.run("question") == "42"
+        first = _action_steps(agent)[0]
+        assert first.parse_failures == 1 and first.error is None
+        assert "results for a" in first.observations
+        assert (first.input_tokens, first.output_tokens) == (20, 10)
+
+        repair_messages = model.action_calls[1][0]
+        assert repair_messages[-2]["content"][0]["text"] == "Let me search."
+        assert repair_messages[-1]["content"][0]["text"] == OUTPUT_REPAIR_HINT.format(error="no JSON object in response")
+        # The next step's prompt does not carry the failed attempt.
+        assert "Let me search." not in json.dumps(model.action_calls[2][0])
+        assert agent.parse_stats() == {"parse_failures": 1, "repaired_steps": 1, "unrepaired_steps": 0}
+
+    def test_async_repair(self):
+        model = ScriptedModel(["[]", _response(FINAL)])
+        agent = _agent(model)
+        assert asyncio.run(agent.arun("question")) == "42"
+        assert _action_steps(agent)[0].parse_failures == 1
+
+
+# ──────────────────────────────────────────────
+# 3. Bounded retries
+# ──────────────────────────────────────────────
+class TestBound:
+    def test_unrepaired_step_records_error(self):
+        model = ScriptedModel(["oops", "still oops", _response(FINAL)])
+        agent = _agent(model, max_output_repairs=1)
+        assert agent.run("question") == "42"
+        first, second = _action_steps(agent)
+        assert isinstance(first.error, AgentParsingError)
+        assert first.parse_failures == 2 and first.tool_calls == []
+        assert len(model.action_calls) == 3
+        assert second.error is None
+        assert agent.parse_stats() == {"parse_failures": 2, "repaired_steps": 0, "unrepaired_steps": 1}
+
+    def test_no_repairs(self):
+        model = ScriptedModel(["oops", _response(FINAL)])
+        agent = _agent(model, max_output_repairs=0)
+        assert agent.run("question") == "42"
+        assert isinstance(_action_steps(agent)[0].error, AgentParsingError)
+        assert len(model.action_calls) == 2
+
+
+# ──────────────────────────────────────────────
+# 4. response_format
+# ──────────────────────────────────────────────
+class TestResponseFormat:
+    def test_passed_to_action_calls(self):
+        model = ScriptedModel([_response(FINAL)])
+        agent = _agent(model, response_format={"type": "json_object"})
+        assert agent.run("question") == "42"
+        assert model.action_calls[0][1] == {"response_format": {"type": "json_object"}}
+
+    def test_not_passed_by_default(self):
+        model = ScriptedModel([_response(FINAL)])
+        assert _agent(model).run("question") == "42"
+        assert model.action_calls[0][1] == {}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
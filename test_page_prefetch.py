@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Tests for background prefetching of top search results (FlashOAgents.page_prefetch).
+
+Covers:
+  1. Scheduling: top-N, skipping stored and queued pages, concurrency, eviction of unclaimed pages
+  2. read_page / aread_page serve finished prefetches and join ones in flight
+  3. WebSearchTool starts prefetches and crawl_page skips the fetch
+"""
+
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import wait
+
+import httpx
+import pytest
+
+# Ensure project root is on sys.path
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import FlashOAgents.search_tools as search_tools
+from FlashOAgents.page_prefetch import PagePrefetcher, configure_page_prefetcher, page_prefetch_stats
+from FlashOAgents.page_store import configure_page_store
+
+URLS = [f"https://example.com/{n}" for n in range(5)]
+
+
+class SlowFetch:
+    """Fetch function that records its calls and the most calls running at once."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, url):
+        with self.lock:
+            self.calls.append(url)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+        return f"content of {url}"
+
+
+class FakeWeb:
+    """Stands in for the shared HTTP client: Serper returns URLS, Jina returns a page after `delay`."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.reads = []
+
+    def post(self, url, headers=None, content=None, timeout=None):
+        organic = [{"title": f"result {n}", "link": link} for n, link in enumerate(URLS)]
+        request = httpx.Request("POST", url)
+        return httpx.Response(200, content=json.dumps({"organic": organic}).encode(), request=request)
+
+    def get(self, url, headers=None, timeout=None):
+        self.reads.append(url)
+        time.sleep(self.delay)
+        page = url[len(search_tools.JINA_READER_URL):]
+        return httpx.Response(200, text=f"page {page}", request=httpx.Request("GET", url))
+
+
+@pytest.fixture
+def web(monkeypatch):
+    fake = FakeWeb()
+    monkeypatch.setattr(search_tools, "get_http_client", lambda name="default": fake)
+    return fake
+
+
+@pytest.fixture
+def prefetcher():
+    prefetcher = configure_page_prefetcher(top_n=2)
+    yield prefetcher
+    configure_page_prefetcher(0)
+
+
+def _wait_idle(prefetcher):
+    deadline = time.time() + 5
+    while prefetcher.stats()["pending"] and time.time() < deadline:
+        time.sleep(0.01)
+    wait(list(prefetcher._pages.values()), timeout=5)
+    # Done callbacks run right after the futures' waiters are woken.
+    while time.time() < deadline and any(
+        future.done() and key not in prefetcher._held for key, future in list(prefetcher._pages.items())
+    ):
+        time.sleep(0.01)
+
+
+# ──────────────────────────────────────────────
+# 1. Scheduling
+# ──────────────────────────────────────────────
+class TestScheduling:
+    def test_top_n_and_dedup(self):
+        prefetcher, fetch = PagePrefetcher(top_n=3), SlowFetch()
+        assert prefetcher.schedule(URLS + ["ftp://example.com/x"], fetch) == 3
+        assert prefetcher.schedule(["https://example.com/0#top"], fetch) == 0
+        _wait_idle(prefetcher)
+        assert sorted(fetch.calls) == URLS[:3] and prefetcher.stats()["fetched"] == 3
+        prefetcher.shutdown()
+
+    def test_concurrency_limit(self):
+        prefetcher, fetch = PagePrefetcher(top_n=5, max_concurrency=2), SlowFetch(delay=0.05)
+        prefetcher.schedule(URLS, fetch)
+        _wait_idle(prefetcher)
+        assert fetch.peak == 2 and len(fetch.calls) == 5
+        prefetcher.shutdown()
+
+    def test_unclaimed_pages_evicted(self):
+        prefetcher, fetch = PagePrefetcher(top_n=5, max_concurrency=1, max_bytes=70), SlowFetch()
+        for url in URLS:  # 32 bytes each
+            prefetcher.schedule([url], fetch)
+            _wait_idle(prefetcher)
+        stats = prefetcher.stats()
+        assert stats["evicted"] == 3 and stats["held_bytes"] == 64
+        assert prefetcher.claim(URLS[0]) is None and prefetcher.claim(URLS[4]).result() == f"content of {URLS[4]}"
+        assert prefetcher.stats()["held_bytes"] == 32
+        prefetcher.shutdown()
+
+    def test_stored_pages_not_held(self, tmp_path):
+        configure_page_store(str(tmp_path))
+        try:
+            prefetcher, fetch = PagePrefetcher(top_n=2), SlowFetch()
+            prefetcher.schedule(URLS, fetch)
+            _wait_idle(prefetcher)
+            assert prefetcher.stats()["held_bytes"] == 0 and prefetcher._pages == {}
+            prefetcher.shutdown()
+        finally:
+            configure_page_store(None)
+
+    def test_full_queue_drops(self):
+        prefetcher, fetch = PagePrefetcher(top_n=5, max_concurrency=1), SlowFetch(delay=0.05)
+        prefetcher.schedule(URLS, fetch)
+        assert prefetcher.stats()["skipped_busy"] == 1
+        prefetcher.shutdown()
+
+    def test_stored_pages_skipped(self, tmp_path):
+        store = configure_page_store(str(tmp_path))
+        try:
+            store.put(URLS[0], "already here")
+            prefetcher, fetch = PagePrefetcher(top_n=2), SlowFetch()
+            assert prefetcher.schedule(URLS, fetch) == 1 and prefetcher.stats()["skipped_stored"] == 1
+            prefetcher.shutdown(wait=True)
+        finally:
+            configure_page_store(None)
+
+
+# ──────────────────────────────────────────────
+# 2. read_page
+# ──────────────────────────────────────────────
+class TestReadPage:
+    def test_finished_prefetch_served_once(self, web, prefetcher):
+        prefetcher.schedule(URLS, search_tools._prefetch_page)
+        _wait_idle(prefetcher)
+        assert search_tools.read_page(URLS[0]) == f"page {URLS[0]}" and len(web.reads) == 2
+        search_tools.read_page(URLS[0])  # handed out once; without a page store this reads again
+        assert len(web.reads) == 3 and prefetcher.stats()["hits"] == 1
+
+    def test_in_flight_prefetch_joined(self, web, prefetcher):
+        web.delay = 0.1
+        prefetcher.schedule(URLS[:1], search_tools._prefetch_page)
+        time.sleep(0.02)
+        assert search_tools.read_page(URLS[0]) == f"page {URLS[0]}"
+        assert len(web.reads) == 1 and prefetcher.stats()["joined"] == 1
+
+    def test_async_read(self, web, prefetcher):
+        web.delay = 0.05
+        prefetcher.schedule(URLS, search_tools._prefetch_page)
+        assert asyncio.run(search_tools.aread_page(URLS[1])) == f"page {URLS[1]}" and len(web.reads) == 2
+
+    def test_failed_prefetch_falls_back(self, prefetcher, monkeypatch):
+        class Flaky(FakeWeb):
+            def get(self, url, headers=None, timeout=None):
+                self.reads.append(url)
+                status = 500 if len(self.reads) == 1 else 200
+                return httpx.Response(status, text="page", request=httpx.Request("GET", url))
+
+        fake = Flaky()
+        monkeypatch.setattr(search_tools, "get_http_client", lambda name="default": fake)
+        prefetcher.schedule(URLS[:1], search_tools._prefetch_page)
+        _wait_idle(prefetcher)
+        assert search_tools.read_page(URLS[0]) == "page" and prefetcher.stats()["failed"] == 1
+
+
+# ──────────────────────────────────────────────
+# 3. Search tools
+# ──────────────────────────────────────────────
+class TestSearchTool:
+    def test_search_then_crawl_skips_fetch(self, web, prefetcher, tmp_path):
+        configure_page_store(str(tmp_path))
+        try:
+            search_tools.WebSearchTool().forward("query")
+            _wait_idle(prefetcher)
+            assert sorted(web.reads) == [search_tools.JINA_READER_URL + url for url in URLS[:2]]
+            assert search_tools.read_page(URLS[1]) == f"page {URLS[1]}" and len(web.reads) == 2
+        finally:
+            configure_page_store(None)
+
+    def test_async_search_prefetches(self, web, prefetcher, monkeypatch):
+        class AsyncClient:
+            async def post(self, *args, **kwargs):
+                return web.post(*args, **kwargs)
+
+        monkeypatch.setattr(search_tools, "get_async_http_client", lambda name="default": AsyncClient())
+        asyncio.run(search_tools.WebSearchTool().aforward("query"))
+        _wait_idle(prefetcher)
+        assert len(web.reads) == 2 and page_prefetch_stats()["fetched"] == 2
+
+    def test_off_by_default(self, web):
+        search_tools.WebSearchTool().forward("query")
+        assert web.reads == [] and page_prefetch_stats() is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Tests for the local page store (FlashOAgents.page_store).
+
+Covers:
+  1. Canonical URLs
+  2. Compressed, content-addressed storage, streamed reads and LRU eviction
+  3. read_page / aread_page serve repeated crawls from the store and revalidate stale pages
+"""
+
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+
+import httpx
+import pytest
+
+# Ensure project root is on sys.path
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import FlashOAgents.search_tools as search_tools
+from FlashOAgents.page_store import PageStore, canonical_url, configure_page_store, page_store_stats
+
+PAGE = "# Albert Einstein\n\n" + "Einstein developed the theory of relativity. Ünïcödé ✓\n" * 2000
+
+
+class FakeJina:
+    """Stands in for the shared HTTP client; answers with a page carrying an ETag, or 304 if it matches."""
+
+    def __init__(self, text=PAGE, etag='"v1"'):
+        self.text = text
+        self.etag = etag
+        self.requests = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests.append((url, dict(headers or {})))
+        request = httpx.Request("GET", url)
+        if self.etag and (headers or {}).get("If-None-Match") == self.etag:
+            return httpx.Response(304, request=request)
+        return httpx.Response(200, text=self.text, headers={"ETag": self.etag or ""}, request=request)
+
+
+@pytest.fixture
+def jina(monkeypatch):
+    fake = FakeJina()
+    monkeypatch.setattr(search_tools, "get_http_client", lambda name="default": fake)
+
+    class AsyncClient:
+        async def get(self, *args, **kwargs):
+            return fake.get(*args, **kwargs)
+
+    monkeypatch.setattr(search_tools, "get_async_http_client", lambda name="default": AsyncClient())
+    return fake
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = configure_page_store(str(tmp_path / "pages"))
+    yield store
+    configure_page_store(None)
+
+
+def _put_from_process(root, url):
+    PageStore(root).put(url, "from worker")
+
+
+# ──────────────────────────────────────────────
+# 1. Canonical URLs
+# ──────────────────────────────────────────────
+class TestCanonicalUrl:
+    def test_equivalent_urls(self):
+        url = "https://en.wikipedia.org/wiki/Albert_Einstein"
+        assert canonical_url("HTTPS://EN.Wikipedia.org:443/wiki/Albert_Einstein/#Early_life") == url
+        assert canonical_url("https://en.m.wikipedia.org/wiki/Albert_Einstein") == url
+        assert canonical_url("https://en.wikipedia.org/wiki/%41lbert_Einstein") == url
+        assert canonical_url("https://www.example.com//a/b/?utm_source=x&b=2&a=1&fbclid=y") == (
+            "https://example.com/a/b?a=1&b=2"
+        )
+
+    def test_distinct_urls(self):
+        assert canonical_url("http://example.com/a") != canonical_url("https://example.com/a")
+        assert canonical_url("https://example.com:8443/a") == "https://example.com:8443/a"
+        assert canonical_url("https://example.com/a?id=1") != canonical_url("https://example.com/a?id=2")
+        assert canonical_url("https://example.com") == "https://example.com/"
+
+
+# ──────────────────────────────────────────────
+# 2. Storage
+# ──────────────────────────────────────────────
+class TestPageStore:
+    def test_round_trip_compressed(self, tmp_path):
+        store = PageStore(str(tmp_path))
+        store.put("https://en.wikipedia.org/wiki/Albert_Einstein", PAGE, etag='"v1"')
+        assert store.get("https://en.m.wikipedia.org/wiki/Albert_Einstein#History") == PAGE
+        page = store.lookup("https://en.wikipedia.org/wiki/Albert_Einstein")
+        assert page.etag == '"v1"' and page.fresh and page.validators() == {"If-None-Match": '"v1"'}
+        stats = store.stats()
+        assert stats["pages"] == 1 and stats["compression_ratio"] > 10 and stats["hits"] == 1
+
+    def test_identical_bodies_share_blob(self, tmp_path):
+        store = PageStore(str(tmp_path))
+        store.put("https://a.example/page", PAGE)
+        store.put("https://b.example/mirror", PAGE)
+        stats = store.stats()
+        assert stats["pages"] == 2 and stats["raw_bytes"] == len(PAGE.encode())
+
+    def test_iter_text_streams(self, tmp_path):
+        store = PageStore(str(tmp_path))
+        page = store.put("https://example.com/big", PAGE)
+        chunks = list(store.iter_text(page, chunk_bytes=1024))
+        assert "".join(chunks) == PAGE and len(chunks) > 2
+
+    def test_lru_eviction(self, tmp_path):
+        store = PageStore(str(tmp_path), max_bytes=4000)
+        pages = [os.urandom(1500).hex() for _ in range(5)]  # hex text compresses only to about half
+        for n, text in enumerate(pages):
+            store.put(f"https://example.com/{n}", text)
+            time.sleep(0.002)
+            store.get("https://example.com/0")  # kept hot
+        assert store.total_bytes() <= 4000
+        assert store.get("https://example.com/0") == pages[0] and store.get("https://example.com/1") is None
+        assert store.stats()["evictions"] >= 1
+        blobs = [name for _, _, files in os.walk(tmp_path / "blobs") for name in files]
+        assert len(blobs) == store.stats()["pages"]
+
+    def test_missing_blob_is_a_miss(self, tmp_path):
+        store = PageStore(str(tmp_path))
+        page = store.put("https://example.com/a", "text")
+        os.remove(store._blob_path(page.digest, page.codec))
+        assert store.get("https://example.com/a") is None and store.lookup("https://example.com/a") is None
+        assert store.stats()["stored_bytes"] == 0
+
+    def test_missing_blob_rewritten_with_own_codec(self, tmp_path):
+        store = PageStore(str(tmp_path))
+        page = store.put("https://example.com/a", PAGE)
+        # As left by a process with another codec whose blob file was then evicted.
+        store._connection().execute(
+            "UPDATE blobs SET codec = 'other', stored_bytes = 1 WHERE digest = ?", (page.digest,)
+        )
+        os.remove(store._blob_path(page.digest, page.codec))
+        rewritten = store.put("https://example.com/b", PAGE)
+        assert rewritten.codec == store.codec and store.get("https://example.com/b") == PAGE
+        assert store.get("https://example.com/a") == PAGE
+        assert store.total_bytes() == rewritten.stored_bytes > 1
+
+    def test_shared_between_processes(self, tmp_path):
+        PageStore(str(tmp_path))
+        worker = multiprocessing.Process(target=_put_from_process, args=(str(tmp_path), "https://example.com/w"))
+        worker.start()
+        worker.join()
+        assert PageStore(str(tmp_path)).get("https://example.com/w") == "from worker"
+
+
+# ──────────────────────────────────────────────
+# 3. read_page
+# ──────────────────────────────────────────────
+class TestReadPage:
+    def test_repeated_crawl_hits(self, jina, store):
+        assert search_tools.read_page("https://en.wikipedia.org/wiki/Albert_Einstein") == PAGE
+        assert search_tools.read_page("https://en.m.wikipedia.org/wiki/Albert_Einstein") == PAGE
+        assert len(jina.requests) == 1
+        assert jina.requests[0][0] == search_tools.JINA_READER_URL + "https://en.wikipedia.org/wiki/Albert_Einstein"
+
+    def test_stale_page_revalidated(self, jina, tmp_path):
+        configure_page_store(str(tmp_path), max_age=0.01)
+        try:
+            search_tools.read_page("https://example.com/a")
+            time.sleep(0.02)
+            assert search_tools.read_page("https://example.com/a") == PAGE
+            assert jina.requests[1][1]["If-None-Match"] == '"v1"'
+            stats = page_store_stats()
+            assert stats["revalidated"] == 1 and stats["writes"] == 1
+            jina.etag, jina.text = '"v2"', "changed"
+            time.sleep(0.02)
+            assert search_tools.read_page("https://example.com/a") == "changed"
+        finally:
+            configure_page_store(None)
+
+    def test_errors_not_stored(self, store, monkeypatch):
+        class Failing:
+            def get(self, url, headers=None, timeout=None):
+                return httpx.Response(422, request=httpx.Request("GET", url))
+
+        monkeypatch.setattr(search_tools, "get_http_client", lambda name="default": Failing())
+        assert search_tools.read_page("https://example.com/x").startswith("Error reading page")
+        assert store.stats()["pages"] == 0
+
+    def test_async_shares_store(self, jina, store):
+        search_tools.read_page("https://example.com/a")
+        assert asyncio.run(search_tools.aread_page("https://example.com/a/")) == PAGE
+        asyncio.run(search_tools.aread_page("https://example.com/b"))
+        assert search_tools.read_page("https://example.com/b") == PAGE
+        assert len(jina.requests) == 2
+
+    def test_no_store_by_default(self, jina):
+        search_tools.read_page("https://example.com/a")
+        search_tools.read_page("https://example.com/a")
+        assert len(jina.requests) == 2 and page_store_stats() is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Tests for the prefix-cache-friendly prompt layout and cached-token instrumentation.
+
+Covers:
+  1. Stable tool-schema rendering
+  2. Consecutive step prompts share everything but the newest messages as a prefix
+  3. cached_tokens flows from the API usage to ChatMessage, the steps and the trajectory
+"""
+
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+# Ensure project root is on sys.path
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from base_agent import BaseAgent
+from FlashOAgents.agents import PREFIX_CACHE_STEP_CUE, ToolCallingAgent, get_tool_functions_json
+from FlashOAgents.models import ChatMessage, OpenAIServerModel
+from FlashOAgents.monitoring import LogLevel
+from FlashOAgents.search_tools import CrawlPageTool, WebSearchTool
+from FlashOAgents.tool_executor import ToolExecutor
+from FlashOAgents.tools import Tool
+
+
+class EchoTool(Tool):
+    name = "web_search"
+    description = "Fake search tool."
+    inputs = {"query": {"type": "string", "description": "Search query."}}
+    output_type = "string"
+
+    def forward(self, query: str) -> str:
+        return f"results for {query}"
+
+
+class RecordingModel:
+    model_id = "recording"
+
+    def __init__(self, search_steps):
+        self.search_steps = search_steps
+        self.calls = 0
+        self.action_calls = 0
+        self.action_prompts = []
+
+    def __call__(self, messages, **kwargs):
+        self.calls += 1
+        if self.calls == 1:
+            return ChatMessage(role="assistant", content="PLAN", cached_token_count=0)
+        if "# Tool List" not in json.dumps(messages):
+            return ChatMessage(role="assistant", content="SUMMARY", cached_token_count=5)
+        self.action_calls += 1
+        self.action_prompts.append(messages)
+        if self.action_calls <= self.search_steps:
+            tools = [{"name": "web_search", "arguments": {"query": f"q{self.action_calls}"}}]
+        else:
+            tools = [{"name": "final_answer", "arguments": {"answer": "42"}}]
+        return ChatMessage(
+            role="assistant", content=json.dumps({"think": "t", "tools": tools}), cached_token_count=100 * self.action_calls
+        )
+
+
+def _agent(model, **kwargs):
+    return ToolCallingAgent(
+        tools=[EchoTool()],
+        model=model,
+        max_steps=10,
+        verbosity_level=LogLevel.OFF,
+        tool_executor=ToolExecutor(max_workers=2, owner_limit=None),
+        **kwargs,
+    )
+
+
+def _dump(messages):
+    return [json.dumps(message, sort_keys=True) for message in messages]
+
+
+# ──────────────────────────────────────────────
+# 1. Tool schemas
+# ──────────────────────────────────────────────
+class TestStableSchemas:
+    def test_order_independent(self):
+        model = SimpleNamespace()
+        first = get_tool_functions_json([WebSearchTool(), CrawlPageTool(model)], stable=True)
+        second = get_tool_functions_json([CrawlPageTool(model), WebSearchTool()], stable=True)
+        assert first is second
+        schemas = json.loads(first)
+        assert [schema["name"] for schema in schemas] == ["crawl_page", "web_search"]
+        assert list(schemas[0]) == sorted(schemas[0])
+
+
+# ──────────────────────────────────────────────
+# 2. Layout
+# ──────────────────────────────────────────────
+class TestLayout:
+    def test_prompts_extend_previous_prefix(self):
+        model = RecordingModel(search_steps=3)
+        agent = _agent(model, prefix_cache_layout=True)
+        assert agent.run("question") == "42"
+        prompts = [_dump(prompt) for prompt in model.action_prompts]
+        for previous, current in zip(prompts, prompts[1:]):
+            assert json.loads(previous[-1])["content"][0]["text"] == PREFIX_CACHE_STEP_CUE
+            assert current[:len(previous) - 1] == previous[:-1]
+        # system, task, plan request, plan, step instruction
+        assert "# Tool List" in prompts[0][4]
+
+    def test_summaries_keep_prefix(self):
+        model = RecordingModel(search_steps=4)
+        agent = _agent(model, prefix_cache_layout=True, summary_interval=2)
+        assert agent.run("question") == "42"
+        prompts = [_dump(prompt) for prompt in model.action_prompts]
+        assert all(prompt[:5] == prompts[0][:5] for prompt in prompts)
+
+    def test_default_layout_unchanged(self):
+        model = RecordingModel(search_steps=1)
+        agent = _agent(model)
+        assert agent.run("question") == "42"
+        assert "# Tool List" in model.action_prompts[0][-1]["content"][0]["text"]
+
+
+# ──────────────────────────────────────────────
+# 3. cached_tokens
+# ──────────────────────────────────────────────
+class TestCachedTokens:
+    def test_chat_message_from_usage(self):
+        model = OpenAIServerModel("fake-model", api_key="test")
+        usage = SimpleNamespace(prompt_tokens=10, completion_tokens=2, prompt_tokens_details=SimpleNamespace(cached_tokens=8))
+        message = SimpleNamespace(content="hi", model_dump=lambda include: {"role": "assistant", "content": "hi"})
+        response = SimpleNamespace(usage=usage, choices=[SimpleNamespace(message=message)])
+        assert model._to_chat_message(response).cached_token_count == 8
+
+        usage_without_details = SimpleNamespace(prompt_tokens=10, completion_tokens=2)
+        response = SimpleNamespace(usage=usage_without_details, choices=[SimpleNamespace(message=message)])
+        assert model._to_chat_message(response).cached_token_count is None
+
+    def test_steps_and_trajectory(self):
+        model = RecordingModel(search_steps=1)
+        base = BaseAgent(model)
+        base.agent_fn = _agent(model)
+        assert base.agent_fn.run("question") == "42"
+        trajectory = base.capture_trajectory()["agent_trajectory"]
+        assert [entry["cached_tokens"] for entry in trajectory] == [0, 100, 200]
+        assert base.agent_fn.memory.steps[2].dict()["cached_tokens"] == 100
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
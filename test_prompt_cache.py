@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Tests for the process-wide prompt-template and tool-schema caches.
+
+Covers:
+  1. Compiled Jinja templates are reused across populate_template calls
+  2. Prompt sets are parsed once and handed out as independent copies
+  3. The rendered tool-schema block is cached per tool set and matches a fresh render
+  4. ToolCallingAgent renders its step instruction once per task
+"""
+
+import os
+import sys
+
+import pytest
+
+# Ensure project root is on sys.path
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from FlashOAgents.agents import (
+    ToolCallingAgent,
+    _cached_tool_functions_json,
+    compile_template,
+    get_tool_functions_json,
+    load_prompt_templates,
+    populate_template,
+    render_tool_functions_json,
+)
+from FlashOAgents.monitoring import LogLevel
+from FlashOAgents.search_tools import WebSearchTool, WikiSearchTool
+from FlashOAgents.tools import FinalAnswerTool
+
+
+# ──────────────────────────────────────────────
+# 1. Templates
+# ──────────────────────────────────────────────
+class TestTemplateCache:
+    def test_compiled_once(self):
+        assert compile_template("Hello {{ name }}") is compile_template("Hello {{ name }}")
+
+    def test_populate_template(self):
+        assert populate_template("Hello {{ name }}", {"name": "agent"}) == "Hello agent"
+
+    def test_missing_variable_still_raises(self):
+        with pytest.raises(Exception):
+            populate_template("Hello {{ missing }}", {})
+
+
+# ──────────────────────────────────────────────
+# 2. Prompt sets
+# ──────────────────────────────────────────────
+class TestPromptSetCache:
+    def test_copies_are_independent(self):
+        first = load_prompt_templates("default")
+        first["system_prompt"] = "changed"
+        second = load_prompt_templates("default")
+        assert second["system_prompt"] != "changed"
+        assert "pre_messages" in second["step"]
+
+
+# ──────────────────────────────────────────────
+# 3. Tool-schema block
+# ──────────────────────────────────────────────
+class TestToolSchemaCache:
+    def test_cached_per_tool_set(self):
+        tools = [WebSearchTool(), FinalAnswerTool()]
+        first = get_tool_functions_json(tools)
+        assert get_tool_functions_json([WebSearchTool(), FinalAnswerTool()]) is first
+        assert first == render_tool_functions_json(tools)
+
+    def test_different_tool_sets(self):
+        assert get_tool_functions_json([WebSearchTool()]) != get_tool_functions_json([WikiSearchTool()])
+
+    def test_cache_bounded(self):
+        for n in range(100):
+            tool = FinalAnswerTool()
+            tool.description = f"Answer number {n}."
+            assert f"Answer number {n}." in get_tool_functions_json([tool])
+        assert _cached_tool_functions_json.cache_info().currsize <= 64
+
+
+# ──────────────────────────────────────────────
+# 4. Agent step instruction
+# ──────────────────────────────────────────────
+class TestStepInstruction:
+    def test_rendered_once_per_task(self):
+        agent = ToolCallingAgent(tools=[WebSearchTool()], model=None, verbosity_level=LogLevel.OFF)
+        agent.task = "first task"
+        instruction = agent.get_step_instruction()
+        assert "first task" in instruction
+        assert agent.get_step_instruction() is instruction
+        agent.task = "second task"
+        assert "second task" in agent.get_step_instruction()
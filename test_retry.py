@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Tests for adaptive retries of model requests (FlashOAgents.retry and OpenAIServerModel).
+
+Covers:
+  1. Jittered exponential backoff and Retry-After parsing
+  2. Circuit breaker, shared Retry-After hold and token-bucket rate limit of an endpoint
+  3. OpenAIServerModel retries retryable errors only and raises once the attempts are used up
+"""
+
+import asyncio
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+# Ensure project root is on sys.path
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import FlashOAgents.retry as retry
+from FlashOAgents.models import OpenAIServerModel
+from FlashOAgents.retry import (
+    EndpointGuard,
+    RetryPolicy,
+    TokenBucket,
+    configure_endpoint_guards,
+    endpoint_stats,
+    get_endpoint_guard,
+    retry_after_seconds,
+)
+
+MESSAGES = [{"role": "user", "content": [{"type": "text", "text": "hello"}]}]
+
+
+def _status_error(cls, status, headers=None):
+    response = httpx.Response(status, headers=headers or {}, request=httpx.Request("POST", "http://llm/v1"))
+    return cls(f"status {status}", response=response, body=None)
+
+
+def _connection_error():
+    return openai.APIConnectionError(request=httpx.Request("POST", "http://llm/v1"))
+
+
+def _response(content="hi"):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(
+            content=content, tool_calls=None,
+            model_dump=lambda include=None: {"role": "assistant", "content": content},
+        ))],
+        usage=SimpleNamespace(prompt_tokens=3, completion_tokens=1, prompt_tokens_details=None),
+    )
+
+
+class ScriptedCreate:
+    """`chat.completions.create` raising the scripted errors in turn, then answering."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return _response()
+
+
+def _model(create, max_attempts=4, **guard_kwargs):
+    model = OpenAIServerModel(
+        "fake-model",
+        api_key="test",
+        retry_policy=RetryPolicy(max_attempts=max_attempts, base_delay=0.001, max_delay=0.01),
+        endpoint_guard=EndpointGuard("test", **guard_kwargs),
+    )
+    model.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    return model
+
+
+# ──────────────────────────────────────────────
+# 1. Backoff
+# ──────────────────────────────────────────────
+class TestBackoff:
+    def test_full_jitter_bounds(self):
+        policy = RetryPolicy(base_delay=1.0, max_delay=10.0, rng=random.Random(0))
+        for attempt in range(8):
+            delays = [policy.backoff(attempt) for _ in range(200)]
+            assert all(0 <= delay <= min(10.0, 2 ** attempt) for delay in delays)
+            assert len(set(delays)) > 100  # callers failing together do not retry together
+
+    def test_retry_after_replaces_backoff(self):
+        policy = RetryPolicy(max_retry_after=30.0)
+        assert policy.backoff(5, retry_after=2.5) == 2.5
+        assert policy.backoff(0, retry_after=600) == 30.0
+        assert policy.backoff(0, retry_after=-1) == 0.0
+
+    def test_retry_after_headers(self):
+        assert retry_after_seconds(_status_error(openai.RateLimitError, 429, {"retry-after": "7"})) == 7.0
+        assert retry_after_seconds(_status_error(openai.RateLimitError, 429, {"retry-after-ms": "250"})) == 0.25
+        date = _status_error(openai.RateLimitError, 429, {"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"})
+        assert retry_after_seconds(date) < 0
+        assert retry_after_seconds(_status_error(openai.RateLimitError, 429)) is None
+        assert retry_after_seconds(_connection_error()) is None
+
+
+# ──────────────────────────────────────────────
+# 2. Endpoint guard
+# ──────────────────────────────────────────────
+class TestEndpointGuard:
+    def test_breaker_opens_and_probes(self):
+        guard = EndpointGuard("e", failure_threshold=2, reset_timeout=0.05)
+        for _ in range(2):
+            assert guard.acquire() == 0
+            guard.record_failure()
+        assert guard.state == "open" and guard.acquire() > 0
+        time.sleep(0.06)
+        assert guard.acquire() == 0 and guard.state == "half_open"
+        assert guard.acquire() > 0  # a single probe at a time
+        guard.record_failure()
+        assert guard.state == "open"
+        time.sleep(0.06)
+        assert guard.acquire() == 0
+        guard.record_success()
+        assert guard.state == "closed" and guard.stats()["breaker_opens"] == 2
+
+    def test_rate_limiting_does_not_trip(self):
+        guard = EndpointGuard("e", failure_threshold=1)
+        guard.acquire()
+        guard.record_failure(trip=False)
+        assert guard.state == "closed"
+
+    def test_retry_after_holds_back_all_callers(self):
+        guard = EndpointGuard("e")
+        guard.record_retry(_status_error(openai.RateLimitError, 429), 0.2, 0.2)
+        assert 0.1 < guard.acquire() <= 0.2
+        assert guard.stats()["retry_after_used"] == 1
+
+    def test_token_bucket(self):
+        bucket = TokenBucket(rate=10, burst=2)
+        now = time.monotonic()
+        assert bucket.take(now) == 0 and bucket.take(now) == 0
+        assert bucket.take(now) == pytest.approx(0.1, rel=0.01)
+        assert bucket.take(now + 0.1) == 0
+
+    def test_guards_shared_per_endpoint(self, monkeypatch):
+        monkeypatch.setattr(retry, "_guards", {})
+        monkeypatch.setattr(retry, "_guard_options", {"rate": 5})
+        assert get_endpoint_guard("http://a") is get_endpoint_guard("http://a")
+        assert get_endpoint_guard("http://a") is not get_endpoint_guard("http://b")
+        assert get_endpoint_guard("http://a").bucket.rate == 5
+
+    def test_reconfigure_keeps_existing_guards(self, monkeypatch):
+        monkeypatch.setattr(retry, "_guards", {})
+        monkeypatch.setattr(retry, "_guard_options", {"rate": 5})
+        guard = get_endpoint_guard("http://a")
+        guard.record_success()
+        configure_endpoint_guards(rate=7)
+        assert get_endpoint_guard("http://a") is guard and guard.bucket.rate == 5
+        assert get_endpoint_guard("http://b").bucket.rate == 7
+        assert endpoint_stats()["http://a"]["successes"] == 1
+
+
+# ──────────────────────────────────────────────
+# 3. OpenAIServerModel
+# ──────────────────────────────────────────────
+class TestModelRetries:
+    def test_openai_client_does_not_retry(self):
+        assert OpenAIServerModel("fake-model", api_key="test").client.max_retries == 0
+
+    def test_transient_errors_retried(self):
+        create = ScriptedCreate(
+            _connection_error(),
+            _status_error(openai.InternalServerError, 503),
+            _status_error(openai.RateLimitError, 429),
+        )
+        model = _model(create)
+        assert model(MESSAGES).content == "hi"
+        stats = model.retry_stats()
+        assert create.calls == 4 and stats["attempts"] == 4 and stats["successes"] == 1
+        assert stats["retries_by_error"] == {"APIConnectionError": 1, "InternalServerError": 1, "RateLimitError": 1}
+
+    def test_retry_after_honoured(self):
+        create = ScriptedCreate(_status_error(openai.RateLimitError, 429, {"retry-after": "0.2"}))
+        model = _model(create)
+        start = time.perf_counter()
+        model(MESSAGES)
+        assert time.perf_counter() - start >= 0.2
+        assert model.retry_stats()["retry_after_used"] == 1
+
+    def test_exhaustion_raises(self):
+        create = ScriptedCreate(*[_status_error(openai.InternalServerError, 500) for _ in range(5)])
+        model = _model(create, max_attempts=3)
+        with pytest.raises(openai.InternalServerError):
+            model(MESSAGES)
+        assert create.calls == 3
+
+    @pytest.mark.parametrize("cls,status", [(openai.AuthenticationError, 401), (openai.BadRequestError, 400)])
+    def test_client_errors_not_retried(self, cls, status):
+        create = ScriptedCreate(_status_error(cls, status))
+        model = _model(create, failure_threshold=1)
+        with pytest.raises(cls):
+            model(MESSAGES)
+        assert create.calls == 1 and model.endpoint_guard.state == "closed"
+
+    def test_breaker_opens_on_outage(self):
+        create = ScriptedCreate(*[_connection_error() for _ in range(5)])
+        model = _model(create, max_attempts=2, failure_threshold=2, reset_timeout=60)
+        with pytest.raises(openai.APIConnectionError):
+            model(MESSAGES)
+        assert model.endpoint_guard.state == "open"
+        assert model.endpoint_guard.acquire() > 0
+
+    def test_async_retries(self):
+        create = ScriptedCreate(_connection_error(), _status_error(openai.RateLimitError, 429))
+
+        async def acreate(**kwargs):
+            return create(**kwargs)
+
+        model = _model(create)
+
+        async def call():
+            model._async_clients[asyncio.get_running_loop()] = SimpleNamespace(
+                chat=SimpleNamespace(completions=SimpleNamespace(create=acreate))
+            )
+            return await model.acall(MESSAGES)
+
+        assert asyncio.run(call()).content == "hi"
+        assert create.calls == 3 and model.retry_stats()["retries"] == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Tests for the shared search-result cache (FlashOAgents.search_cache).
+
+Covers:
+  1. Query normalization and cache keys (result count, location)
+  2. web_search_google_serper and its async counterpart answer repeated queries from the cache
+  3. TTL, stats and sharing the cache file between processes
+"""
+
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import httpx
+import pytest
+
+# Ensure project root is on sys.path
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import FlashOAgents.search_tools as search_tools
+from FlashOAgents.search_cache import SearchCache, configure_search_cache, normalize_search_query, search_cache_stats
+
+
+class FakeSerper:
+    """Stands in for the shared HTTP client; answers every search with one result naming the query."""
+
+    def __init__(self, organic=True):
+        self.organic = organic
+        self.posts = []
+
+    def _response(self, content):
+        query = json.loads(content)["q"]
+        organic = [{"title": f"about {query}", "link": "https://example.com"}] if self.organic else []
+        request = httpx.Request("POST", search_tools.SERPER_SEARCH_URL)
+        return httpx.Response(200, content=json.dumps({"organic": organic}).encode(), request=request)
+
+    def post(self, url, headers=None, content=None, timeout=None):
+        self.posts.append(json.loads(content))
+        return self._response(content)
+
+    async def apost(self, url, headers=None, content=None, timeout=None):
+        return self.post(url, headers=headers, content=content, timeout=timeout)
+
+
+@pytest.fixture
+def serper(monkeypatch):
+    fake = FakeSerper()
+    monkeypatch.setattr(search_tools, "get_http_client", lambda name="default": fake)
+    async_client = type("AsyncClient", (), {"post": lambda self, *args, **kwargs: fake.apost(*args, **kwargs)})()
+    monkeypatch.setattr(search_tools, "get_async_http_client", lambda name="default": async_client)
+    return fake
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = configure_search_cache(str(tmp_path / "search.db"))
+    yield cache
+    configure_search_cache(None)
+
+
+def _put_from_process(path, query):
+    SearchCache(path).put(query, 5, "United States", json.dumps({"organic": [{"title": "from worker"}]}).encode())
+
+
+# ──────────────────────────────────────────────
+# 1. Normalization
+# ──────────────────────────────────────────────
+class TestNormalization:
+    def test_case_whitespace_punctuation(self):
+        assert normalize_search_query("  Who founded   OpenAI? ") == "who founded openai"
+        assert normalize_search_query("Einstein, Albert (physicist).") == "einstein albert physicist"
+        assert normalize_search_query("ＦＵＬＬ width") == "full width"
+
+    def test_operators_kept(self):
+        assert normalize_search_query('"Exact Phrase" site:en.wikipedia.org -movie') == (
+            '"exact phrase" site:en.wikipedia.org -movie'
+        )
+        assert normalize_search_query("node.js 2.0 release") == "node.js 2.0 release"
+
+    def test_key_includes_count_and_location(self):
+        key = SearchCache.key("Query", 5, "United States")
+        assert key == SearchCache.key("query?", 5, "united states")
+        assert key != SearchCache.key("query", 3, "United States")
+        assert key != SearchCache.key("query", 5, "Germany")
+
+
+# ──────────────────────────────────────────────
+# 2. Search functions
+# ──────────────────────────────────────────────
+class TestSearch:
+    def test_repeated_query_hits(self, serper, cache):
+        first, _ = search_tools.web_search_google_serper("Marie Curie", serp_num=5)
+        second, error = search_tools.web_search_google_serper("marie curie?", serp_num=5)
+        assert error == "" and second == first and len(serper.posts) == 1
+        search_tools.web_search_google_serper("Marie Curie", serp_num=3)
+        search_tools.web_search_google_serper("Marie Curie", serp_num=5, location="France")
+        assert len(serper.posts) == 3
+        stats = search_cache_stats()
+        assert stats["hits"] == 1 and stats["misses"] == 3 and stats["entries"] == 3
+
+    def test_empty_results_not_cached(self, cache, monkeypatch):
+        fake = FakeSerper(organic=False)
+        monkeypatch.setattr(search_tools, "get_http_client", lambda name="default": fake)
+        for _ in range(2):
+            results, error = search_tools.web_search_google_serper("nothing here")
+            assert results == [] and error.startswith("No results")
+        assert len(fake.posts) == 2
+
+    def test_async_shares_cache(self, serper, cache):
+        search_tools.web_search_google_serper("Ada Lovelace", serp_num=5)
+        results, _ = asyncio.run(search_tools.aweb_search_google_serper("ada  lovelace", serp_num=5))
+        assert results[0]["title"] == "about Ada Lovelace" and len(serper.posts) == 1
+        asyncio.run(search_tools.aweb_search_google_serper("Alan Turing", serp_num=5))
+        search_tools.web_search_google_serper("alan turing", serp_num=5)
+        assert len(serper.posts) == 2
+
+    def test_no_cache_by_default(self, serper):
+        search_tools.web_search_google_serper("q")
+        search_tools.web_search_google_serper("q")
+        assert len(serper.posts) == 2 and search_cache_stats() is None
+
+
+# ──────────────────────────────────────────────
+# 3. Expiry and processes
+# ──────────────────────────────────────────────
+class TestSharing:
+    def test_ttl(self, serper, tmp_path):
+        configure_search_cache(str(tmp_path / "search.db"), ttl=0.05)
+        try:
+            search_tools.web_search_google_serper("q")
+            time.sleep(0.06)
+            search_tools.web_search_google_serper("q")
+            assert len(serper.posts) == 2 and search_cache_stats()["expired"] == 1
+        finally:
+            configure_search_cache(None)
+
+    def test_entries_from_other_process(self, serper, cache):
+        worker = multiprocessing.Process(target=_put_from_process, args=(cache.store.path, "Shared Query"))
+        worker.start()
+        worker.join()
+        results, _ = search_tools.web_search_google_serper("shared query", serp_num=5)
+        assert results[0]["title"] == "from worker" and not serper.posts
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Tests for speculative first-round search (ToolCallingAgent(speculative_search=True)).
+
+Covers:
+  1. Speculative queries and query overlap
+  2. The first web_search is answered from the search run during planning
+  3. Overlapping queries and prefetched pages are reused, in the first action step only
+  4. Failed prefetches fall back to a normal tool call
+"""
+
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# Ensure project root is on sys.path
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import FlashOAgents.prefetch as prefetch
+from FlashOAgents.agents import ToolCallingAgent
+from FlashOAgents.models import ChatMessage
+from FlashOAgents.monitoring import LogLevel
+from FlashOAgents.prefetch import SpeculativePrefetcher, query_overlap, speculative_queries
+from FlashOAgents.tool_executor import ToolExecutor
+from FlashOAgents.tools import Tool
+
+TASK = "Who founded the company that makes the Model S electric car?"
+
+
+class FakeSearchTool(Tool):
+    name = "web_search"
+    description = "Fake search tool."
+    inputs = {"query": {"type": "string", "description": "Search query."}}
+    output_type = "string"
+
+    def __init__(self, delay: float = 0.3, fail: bool = False):
+        super().__init__()
+        self.delay = delay
+        self.fail = fail
+        self.queries = []
+        self.lock = threading.Lock()
+
+    def search(self, query):
+        with self.lock:
+            self.queries.append(query)
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("search backend down")
+        result = {"idx": 1, "title": f"result for {query}", "link": "https://example.com/page", "date": "", "source": "",
+                  "snippet": "s"}
+        return [result], ""
+
+    def forward(self, query: str) -> str:
+        search_results, _ = self.search(query)
+        return f"live results for {query}: {search_results[0]['title']}"
+
+
+class FakeCrawlTool(Tool):
+    name = "crawl_page"
+    description = "Fake crawl tool."
+    inputs = {
+        "url": {"type": "string", "description": "URL."},
+        "query": {"type": "string", "description": "Query."},
+    }
+    output_type = "string"
+
+    def __init__(self):
+        super().__init__()
+        self.forward_calls = 0
+        self.extracted = []
+
+    def forward(self, url: str, query: str) -> str:
+        self.forward_calls += 1
+        return f"crawled {url}"
+
+    def extract(self, url, query, page_content):
+        self.extracted.append(page_content)
+        return f"extracted {query} from {page_content}"
+
+    async def aextract(self, url, query, page_content):
+        return self.extract(url, query, page_content)
+
+
+class PlanningModel:
+    """Takes `plan_delay` seconds to plan, issues `first_tools` and any `later_tools` one step each, then answers."""
+
+    model_id = "planning"
+
+    def __init__(self, first_tools, plan_delay=0.3, later_tools=()):
+        self.steps = [first_tools, *later_tools]
+        self.plan_delay = plan_delay
+        self.calls = 0
+
+    def __call__(self, messages, **kwargs):
+        self.calls += 1
+        if self.calls == 1:
+            time.sleep(self.plan_delay)
+            return ChatMessage(role="assistant", content="PLAN")
+        step = self.calls - 2
+        tools = self.steps[step] if step < len(self.steps) else [
+            {"name": "final_answer", "arguments": {"answer": "42"}}
+        ]
+        return ChatMessage(role="assistant", content=json.dumps({"think": "t", "tools": tools}))
+
+
+def _agent(model, search_tool, crawl_tool=None, **kwargs):
+    tools = [search_tool] + ([crawl_tool] if crawl_tool else [])
+    return ToolCallingAgent(
+        tools=tools,
+        model=model,
+        max_steps=5,
+        verbosity_level=LogLevel.OFF,
+        tool_executor=ToolExecutor(max_workers=4, owner_limit=None),
+        speculative_search=True,
+        **kwargs,
+    )
+
+
+def _search(query):
+    return {"name": "web_search", "arguments": {"query": query}}
+
+
+# ──────────────────────────────────────────────
+# 1. Queries
+# ──────────────────────────────────────────────
+class TestQueries:
+    def test_speculative_queries(self):
+        queries = speculative_queries(TASK)
+        assert queries[0] == TASK
+        assert queries[1] == "founded company makes Model S electric car"
+        assert len(speculative_queries("x " * 400, max_query_chars=50)[0]) <= 50
+
+    def test_overlap(self):
+        assert query_overlap("Model S founder", "founder of the Model S") == 1.0
+        assert query_overlap("Model S founder", "weather in Paris") == 0.0
+
+
+# ──────────────────────────────────────────────
+# 2. First-step search hit
+# ──────────────────────────────────────────────
+class TestFirstStep:
+    def test_exact_query_reused(self):
+        search_tool = FakeSearchTool()
+        agent = _agent(PlanningModel([_search(TASK)]), search_tool)
+        assert agent.run(TASK) == "42"
+        step = agent.memory.steps[2]
+        assert "result for " + TASK in step.observations
+        assert "live results" not in step.observations
+        assert len(search_tool.queries) == 2  # only the speculative queries
+        assert step.tool_calls[0].duration < 0.2
+        assert agent.prefetcher.stats()["search_hits"] == 1
+
+    def test_async_path(self):
+        search_tool = FakeSearchTool()
+        agent = _agent(PlanningModel([_search(TASK)]), search_tool)
+        assert asyncio.run(agent.arun(TASK)) == "42"
+        assert "result for " + TASK in agent.memory.steps[2].observations
+        assert len(search_tool.queries) == 2
+
+    def test_disabled_by_default(self):
+        search_tool = FakeSearchTool(delay=0)
+        agent = ToolCallingAgent(
+            tools=[search_tool], model=PlanningModel([_search(TASK)], plan_delay=0), max_steps=5,
+            verbosity_level=LogLevel.OFF,
+        )
+        assert agent.run(TASK) == "42"
+        assert agent.prefetcher is None
+        assert "live results" in agent.memory.steps[2].observations
+
+
+# ──────────────────────────────────────────────
+# 3. Overlapping queries and pages
+# ──────────────────────────────────────────────
+class TestReuse:
+    def test_overlapping_query(self):
+        search_tool = FakeSearchTool()
+        agent = _agent(PlanningModel([_search("Model S electric car company founded")]), search_tool)
+        assert agent.run(TASK) == "42"
+        observations = agent.memory.steps[2].observations
+        assert f"Results for the related query '{TASK}'" in observations
+        assert agent.prefetcher.stats()["overlap_hits"] == 1
+
+    def test_unrelated_query_runs_normally(self):
+        search_tool = FakeSearchTool(delay=0.05)
+        agent = _agent(PlanningModel([_search("weather in Paris")]), search_tool)
+        assert agent.run(TASK) == "42"
+        assert "live results for weather in Paris" in agent.memory.steps[2].observations
+
+    def test_later_steps_search_live(self):
+        search_tool = FakeSearchTool(delay=0.05)
+        model = PlanningModel([_search("weather in Paris")], later_tools=[[_search("news")], [_search(TASK)]])
+        agent = _agent(model, search_tool)
+        assert agent.run(TASK) == "42"
+        assert "live results for " + TASK in agent.memory.steps[4].observations
+        assert search_tool.queries.count(TASK) == 2  # the speculative search and the step-3 one
+        assert agent.prefetcher.stats()["search_hits"] == 0
+
+    def test_prefetched_page(self, monkeypatch):
+        fetched = []
+        monkeypatch.setattr(prefetch, "read_page", lambda url: fetched.append(url) or "PAGE BODY")
+        crawl_tool = FakeCrawlTool()
+        tools = [{"name": "crawl_page", "arguments": {"url": "https://example.com/page", "query": "founder"}}]
+        agent = _agent(PlanningModel(tools), FakeSearchTool(delay=0.05), crawl_tool, speculative_crawl_top_k=1)
+        assert agent.run(TASK) == "42"
+        assert fetched == ["https://example.com/page"]
+        assert crawl_tool.forward_calls == 0
+        assert "extracted founder from PAGE BODY" in agent.memory.steps[2].observations
+
+
+# ──────────────────────────────────────────────
+# 4. Fallback
+# ──────────────────────────────────────────────
+class TestFallback:
+    def test_failed_prefetch_falls_back(self):
+        search_tool = FakeSearchTool(delay=0.05, fail=True)
+        agent = _agent(PlanningModel([_search(TASK)]), search_tool)
+        search_tool_forward = search_tool.forward
+        search_tool.forward = lambda query: (setattr(search_tool, "fail", False), search_tool_forward(query))[1]
+        assert agent.run(TASK) == "42"
+        assert "live results for " + TASK in agent.memory.steps[2].observations
+
+    def test_failed_page_prefetch_falls_back(self, monkeypatch):
+        monkeypatch.setattr(prefetch, "read_page", lambda url: "Error: 404")
+        crawl_tool = FakeCrawlTool()
+        tools = [{"name": "crawl_page", "arguments": {"url": "https://example.com/page", "query": "founder"}}]
+        agent = _agent(PlanningModel(tools), FakeSearchTool(delay=0.05), crawl_tool, speculative_crawl_top_k=1)
+        assert asyncio.run(agent.arun(TASK)) == "42"
+        assert crawl_tool.forward_calls == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
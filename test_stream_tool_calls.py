@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Tests for streamed tool-call dispatch.
+
+Covers:
+  1. IncrementalToolCallParser emits each tool call as soon as its object closes
+  2. OpenAIServerModel.stream accumulates deltas, usage and reasoning
+  3. ToolCallingAgent starts tools before the model finishes generating
+  4. final_answer and calls the full parse does not confirm are not executed
+"""
+
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+# Ensure project root is on sys.path
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from FlashOAgents.agents import ToolCallingAgent
+from FlashOAgents.models import ChatMessage, OpenAIServerModel
+from FlashOAgents.monitoring import LogLevel
+from FlashOAgents.stream_parser import IncrementalToolCallParser
+from FlashOAgents.tool_executor import ToolExecutor
+from FlashOAgents.tools import Tool
+
+
+def _feed_in_chunks(parser, text, size=3):
+    emitted = []
+    for i in range(0, len(text), size):
+        emitted.append(parser.feed(text[i:i + size]))
+    return emitted
+
+
+# ──────────────────────────────────────────────
+# 1. Parser
+# ──────────────────────────────────────────────
+class TestParser:
+    def test_emits_when_object_closes(self):
+        first = '{"think": "a } tricky \\" [string", "tools": [{"name": "web_search", "arguments": {"query": "x}"}}'
+        rest = ', {"name": "crawl_page", "arguments": {"url": "u"}}]}'
+        parser = IncrementalToolCallParser()
+        assert parser.feed(first) == [{"name": "web_search", "arguments": {"query": "x}"}}]
+        assert parser.feed(rest) == [{"name": "crawl_page", "arguments": {"url": "u"}}]
+        assert parser.num_calls == 2
+        assert parser.done
+
+    @pytest.mark.parametrize(
+        "text,names",
+        [
+            ('```json\n{"think": "t", "tools": {"name": "final_answer", "arguments": {"answer": "42"}}}\n```', ["final_answer"]),
+            ('[{"think": "t", "tools": [{"name": "a", "arguments": {"tools": [{"name": "no"}]}}, {"name": "b"}]}]', ["a", "b"]),
+            ('[{"name": "a", "arguments": {"x": [1, {"y": 2}]}}, {"name": "b", "arguments": {}}]', ["a", "b"]),
+            ('{"tools": [], "think": "nothing to do"}', []),
+        ],
+    )
+    def test_layouts(self, text, names):
+        parser = IncrementalToolCallParser()
+        calls = [call for chunk in _feed_in_chunks(parser, text) for call in chunk]
+        assert [call.get("name") for call in calls] == names
+
+
+# ──────────────────────────────────────────────
+# 2. OpenAIServerModel.stream
+# ──────────────────────────────────────────────
+def _chunk(content=None, reasoning=None, usage=None):
+    choices = [] if content is None and reasoning is None else [
+        SimpleNamespace(delta=SimpleNamespace(role="assistant", content=content, reasoning_content=reasoning))
+    ]
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+class TestModelStream:
+    def test_stream_accumulates(self):
+        model = OpenAIServerModel("fake-model", api_key="test")
+        chunks = [
+            _chunk(reasoning="hmm"),
+            _chunk(content='{"tools": '),
+            _chunk(content="[]}"),
+            _chunk(usage=SimpleNamespace(prompt_tokens=7, completion_tokens=3)),
+        ]
+        calls = []
+
+        def create(**kwargs):
+            calls.append(kwargs)
+            return iter(chunks)
+
+        model.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        deltas = []
+        message = model.stream([{"role": "user", "content": [{"type": "text", "text": "hi"}]}], on_text=deltas.append)
+        assert deltas == ['{"tools": ', "[]}"]
+        assert message.content == '{"tools": []}'
+        assert message.reasoning_content == "hmm"
+        assert (message.input_token_count, message.output_token_count) == (7, 3)
+        assert calls[0]["stream"] is True
+
+
+# ──────────────────────────────────────────────
+# 3./4. Agent dispatch
+# ──────────────────────────────────────────────
+class RecordingTool(Tool):
+    name = "web_search"
+    description = "Fake search tool."
+    inputs = {"query": {"type": "string", "description": "Search query."}}
+    output_type = "string"
+
+    def __init__(self):
+        super().__init__()
+        self.started = {}
+        self.runs = []
+        self.lock = threading.Lock()
+
+    def forward(self, query: str) -> str:
+        with self.lock:
+            self.started[query] = time.time()
+            self.runs.append(query)
+        return f"results for {query}"
+
+
+class StreamingModel:
+    """Plans, then streams `responses` one per step, sleeping between chunks to mimic decoding."""
+
+    model_id = "streaming"
+
+    def __init__(self, responses, chunk_delay=0.02):
+        self.responses = list(responses)
+        self.chunk_delay = chunk_delay
+        self.calls = 0
+        self.generation_end = []
+
+    def __call__(self, messages, **kwargs):
+        self.calls += 1
+        if self.calls == 1:
+            return ChatMessage(role="assistant", content="PLAN")
+        return ChatMessage(role="assistant", content=self.responses.pop(0))
+
+    def stream(self, messages, on_text=None, **kwargs):
+        self.calls += 1
+        content = self.responses.pop(0)
+        for i in range(0, len(content), 20):
+            on_text(content[i:i + 20])
+            time.sleep(self.chunk_delay)
+        self.generation_end.append(time.time())
+        return ChatMessage(role="assistant", content=content)
+
+    async def astream(self, messages, on_text=None, **kwargs):
+        return self.stream(messages, on_text=on_text, **kwargs)
+
+
+def _response(*tools, think="x" * 100):
+    return json.dumps({"tools": list(tools), "think": think})
+
+
+def _search(query):
+    return {"name": "web_search", "arguments": {"query": query}}
+
+
+FINAL = {"name": "final_answer", "arguments": {"answer": "42"}}
+
+
+def _agent(model, tool):
+    return ToolCallingAgent(
+        tools=[tool],
+        model=model,
+        max_steps=5,
+        verbosity_level=LogLevel.OFF,
+        stream_tool_calls=True,
+        tool_executor=ToolExecutor(max_workers=4, owner_limit=None),
+    )
+
+
+class TestAgentDispatch:
+    def test_tools_start_before_generation_ends(self):
+        tool = RecordingTool()
+        model = StreamingModel([_response(_search("a"), _search("b")), _response(FINAL)])
+        agent = _agent(model, tool)
+        assert agent.run("question") == "42"
+        assert max(tool.started.values()) < model.generation_end[0]
+        observations = agent.memory.steps[2].observations
+        assert "results for a" in observations and "results for b" in observations
+        assert agent.memory.steps[2].tool_calls[0].duration is not None
+
+    def test_async_tools_start_before_generation_ends(self):
+        tool = RecordingTool()
+        model = StreamingModel([_response(_search("a")), _response(FINAL)])
+        agent = _agent(model, tool)
+        assert asyncio.run(agent.arun("question")) == "42"
+        assert "results for a" in agent.memory.steps[2].observations
+
+    def test_final_answer_stops_dispatch(self):
+        tool = RecordingTool()
+        model = StreamingModel([_response(FINAL, _search("late"))], chunk_delay=0)
+        agent = _agent(model, tool)
+        assert agent.run("question") == "42"
+        time.sleep(0.05)
+        assert tool.started == {}
+
+    def test_calls_in_one_chunk_claimed_once(self):
+        class OneChunkModel(StreamingModel):
+            def stream(self, messages, on_text=None, **kwargs):
+                self.calls += 1
+                content = self.responses.pop(0)
+                on_text(content)
+                return ChatMessage(role="assistant", content=content)
+
+        tool = RecordingTool()
+        model = OneChunkModel([_response(_search("a"), _search("b"), _search("c")), _response(FINAL)])
+        agent = _agent(model, tool)
+        assert agent.run("question") == "42"
+        assert sorted(tool.runs) == ["a", "b", "c"]
+        observations = agent.memory.steps[2].observations
+        assert all(f"results for {query}" in observations for query in "abc")
+
+    def test_plain_model_still_works(self):
+        class PlainModel:
+            model_id = "plain"
+
+            def __init__(self, responses):
+                self.inner = StreamingModel(responses)
+
+            def __call__(self, messages, **kwargs):
+                return self.inner(messages, **kwargs)
+
+        agent = _agent(PlainModel([_response(_search("a")), _response(FINAL)]), RecordingTool())
+        assert agent.run("question") == "42"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
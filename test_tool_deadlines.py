@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Tests for per-tool and per-step deadlines of ToolCallingAgent.
+
+Covers:
+  1. A straggler past its tool deadline becomes a timeout observation without holding back the step
+  2. step_timeout bounds the whole batch
+  3. Late results are added to the next step, or discarded
+  4. The asyncio path behaves the same
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+
+import pytest
+
+# Ensure project root is on sys.path
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from FlashOAgents.agents import ToolCallingAgent
+from FlashOAgents.models import ChatMessage
+from FlashOAgents.monitoring import LogLevel
+from FlashOAgents.tool_executor import ToolExecutor
+from FlashOAgents.tools import Tool
+
+
+class DelayTool(Tool):
+    """Sleeps for the number of seconds given as query, e.g. "0.5"."""
+
+    name = "web_search"
+    description = "Fake search tool."
+    inputs = {"query": {"type": "string", "description": "Search query."}}
+    output_type = "string"
+
+    def forward(self, query: str) -> str:
+        time.sleep(float(query))
+        return f"slept {query}"
+
+
+class CrawlTool(DelayTool):
+    name = "crawl_page"
+
+
+class ScriptedModel:
+    """Plans, then issues one batch of calls per entry of `batches`, then answers."""
+
+    model_id = "scripted"
+
+    def __init__(self, batches, step_delay=0.0):
+        self.batches = batches
+        self.step_delay = step_delay
+        self.calls = 0
+
+    def __call__(self, messages, **kwargs):
+        self.calls += 1
+        if self.calls == 1:
+            return ChatMessage(role="assistant", content="PLAN")
+        time.sleep(self.step_delay)
+        index = self.calls - 2
+        if index < len(self.batches):
+            tools = [{"name": name, "arguments": {"query": delay}} for name, delay in self.batches[index]]
+        else:
+            tools = [{"name": "final_answer", "arguments": {"answer": "42"}}]
+        return ChatMessage(role="assistant", content=json.dumps({"think": "t", "tools": tools}))
+
+
+def _agent(model, **kwargs):
+    return ToolCallingAgent(
+        tools=[DelayTool(), CrawlTool()],
+        model=model,
+        max_steps=10,
+        verbosity_level=LogLevel.OFF,
+        tool_executor=ToolExecutor(max_workers=8, owner_limit=None),
+        **kwargs,
+    )
+
+
+# ──────────────────────────────────────────────
+# 1./2. Deadlines
+# ──────────────────────────────────────────────
+class TestDeadlines:
+    def test_tool_deadline(self):
+        model = ScriptedModel([[("web_search", "0.05"), ("crawl_page", "1.0")]])
+        agent = _agent(model, tool_timeouts={"crawl_page": 0.2}, carry_over_late_results=False)
+        start = time.time()
+        assert agent.run("question") == "42"
+        assert time.time() - start < 0.8
+        step = agent.memory.steps[2]
+        assert "slept 0.05" in step.observations
+        assert "timed out after 0.2s" in step.observations
+        assert [call.timed_out for call in step.tool_calls] == [False, True]
+
+    def test_default_deadline_and_step_timeout(self):
+        model = ScriptedModel([[("web_search", "0.05"), ("web_search", "1.0"), ("crawl_page", "1.0")]])
+        agent = _agent(model, tool_timeouts={"*": 5}, step_timeout=0.2, carry_over_late_results=False)
+        start = time.time()
+        assert agent.run("question") == "42"
+        assert time.time() - start < 0.8
+        assert agent.memory.steps[2].observations.count("timed out") == 2
+
+    def test_no_deadline_waits(self):
+        agent = _agent(ScriptedModel([[("web_search", "0.3")]]))
+        assert agent.run("question") == "42"
+        assert "slept 0.3" in agent.memory.steps[2].observations
+
+
+# ──────────────────────────────────────────────
+# 3. Late results
+# ──────────────────────────────────────────────
+class TestLateResults:
+    def test_carried_to_next_step(self):
+        model = ScriptedModel([[("crawl_page", "0.4")], [("web_search", "0.3")]])
+        agent = _agent(model, tool_timeouts={"crawl_page": 0.1})
+        assert agent.run("question") == "42"
+        first, second = agent.memory.steps[2], agent.memory.steps[3]
+        assert "will be added to a later step" in first.observations
+        assert "slept 0.3" in second.observations
+        assert "[Late result of a tool call that timed out in an earlier step]" in second.observations
+        assert "slept 0.4" in second.observations
+
+    def test_discarded(self):
+        model = ScriptedModel([[("crawl_page", "0.4")], [("web_search", "0.5")]])
+        agent = _agent(model, tool_timeouts={"crawl_page": 0.1}, carry_over_late_results=False)
+        assert agent.run("question") == "42"
+        assert "slept 0.4" not in agent.memory.steps[3].observations
+
+
+# ──────────────────────────────────────────────
+# 4. Async path
+# ──────────────────────────────────────────────
+class TestAsyncPath:
+    def test_deadline_and_carry_over(self):
+        model = ScriptedModel([[("web_search", "0.05"), ("crawl_page", "0.4")], [("web_search", "0.5")]])
+        agent = _agent(model, tool_timeouts={"crawl_page": 0.1})
+        start = time.time()
+        assert asyncio.run(agent.arun("question")) == "42"
+        first, second = agent.memory.steps[2], agent.memory.steps[3]
+        assert "slept 0.05" in first.observations and "timed out after 0.1s" in first.observations
+        assert "slept 0.4" in second.observations
+        assert time.time() - start < 1.2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
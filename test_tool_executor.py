@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Tests for the shared ToolExecutor.
+
+Covers:
+  1. Results and exceptions are delivered through futures
+  2. Per-tool, per-provider and per-owner concurrency limits
+  3. Round-robin fairness between owners
+  4. Cancellation of pending calls and queue-depth metrics
+"""
+
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# Ensure project root is on sys.path
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from FlashOAgents.tool_executor import ToolExecutor
+
+
+class ConcurrencyProbe:
+    """Callable that records the peak number of concurrent invocations."""
+
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, value=None):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+        return value
+
+
+@pytest.fixture
+def executor():
+    ex = ToolExecutor(max_workers=8, provider_limits={"serper": 100, "jina": 100}, owner_limit=None)
+    yield ex
+    ex.shutdown(wait=True)
+
+
+# ──────────────────────────────────────────────
+# 1. Futures
+# ──────────────────────────────────────────────
+class TestFutures:
+    def test_result(self, executor):
+        assert executor.submit(lambda x: x * 2, 21).result(timeout=5) == 42
+
+    def test_exception(self, executor):
+        def boom():
+            raise ValueError("bad tool")
+
+        with pytest.raises(ValueError, match="bad tool"):
+            executor.submit(boom).result(timeout=5)
+        assert executor.stats()["failed"] == 1
+
+
+# ──────────────────────────────────────────────
+# 2. Limits
+# ──────────────────────────────────────────────
+class TestLimits:
+    def test_tool_limit(self):
+        ex = ToolExecutor(max_workers=8, tool_limits={"crawl_page": 2}, owner_limit=None)
+        probe = ConcurrencyProbe()
+        futures = [ex.submit(probe, i, tool_name="crawl_page") for i in range(6)]
+        assert [f.result(timeout=5) for f in futures] == list(range(6))
+        assert probe.peak == 2
+        ex.shutdown()
+
+    def test_provider_limit(self):
+        ex = ToolExecutor(max_workers=8, provider_limits={"serper": 3}, owner_limit=None)
+        probe = ConcurrencyProbe()
+        futures = [ex.submit(probe, tool_name="web_search", owner=i % 2) for i in range(9)]
+        for f in futures:
+            f.result(timeout=5)
+        assert probe.peak == 3
+        ex.shutdown()
+
+    def test_owner_limit(self):
+        ex = ToolExecutor(max_workers=8, owner_limit=2)
+        probe = ConcurrencyProbe()
+        futures = [ex.submit(probe, owner="agent") for _ in range(6)]
+        for f in futures:
+            f.result(timeout=5)
+        assert probe.peak == 2
+        ex.shutdown()
+
+    def test_provider_rate_spaces_starts(self):
+        ex = ToolExecutor(max_workers=4, provider_rates={"serper": 20.0}, owner_limit=None)
+        starts = []
+        futures = [ex.submit(lambda: starts.append(time.time()), tool_name="web_search") for _ in range(4)]
+        for f in futures:
+            f.result(timeout=5)
+        starts.sort()
+        assert starts[-1] - starts[0] >= 0.12
+        ex.shutdown()
+
+
+# ──────────────────────────────────────────────
+# 3. Fairness
+# ──────────────────────────────────────────────
+class TestFairness:
+    def test_round_robin_between_owners(self):
+        ex = ToolExecutor(max_workers=1, owner_limit=None)
+        gate = threading.Event()
+        order = []
+        blocker = ex.submit(gate.wait, owner="blocker")
+        futures = [ex.submit(order.append, f"a{i}", owner="a") for i in range(3)]
+        futures += [ex.submit(order.append, f"b{i}", owner="b") for i in range(3)]
+        gate.set()
+        for f in [blocker] + futures:
+            f.result(timeout=5)
+        assert order == ["a0", "b0", "a1", "b1", "a2", "b2"]
+        ex.shutdown()
+
+
+# ──────────────────────────────────────────────
+# 4. Cancellation and metrics
+# ──────────────────────────────────────────────
+class TestCancellationAndMetrics:
+    def test_cancel_pending(self):
+        ex = ToolExecutor(max_workers=1, owner_limit=None)
+        gate = threading.Event()
+        blocker = ex.submit(gate.wait)
+        pending = ex.submit(lambda: "never")
+        time.sleep(0.05)
+        assert ex.queue_depth == 1
+        assert pending.cancel()
+        gate.set()
+        blocker.result(timeout=5)
+        ex.submit(lambda: None).result(timeout=5)
+        stats = ex.stats()
+        assert stats["cancelled"] == 1
+        assert stats["queue_depth"] == 0
+        assert stats["max_queue_depth"] >= 1
+        ex.shutdown()
+
+    def test_submit_after_shutdown(self):
+        ex = ToolExecutor(max_workers=1)
+        ex.shutdown()
+        with pytest.raises(RuntimeError):
+            ex.submit(lambda: None)
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Tests for per-run tool-call memoization (MultiStepAgent(memoize_tool_calls=True)).
+
+Covers:
+  1. Key normalization
+  2. Memo hits, failures and hit-rate stats
+  3. Duplicates in one step's batch share a single in-flight call, sync and async
+  4. The memo is reset for every run
+"""
+
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# Ensure project root is on sys.path
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from FlashOAgents.agents import ToolCallingAgent
+from FlashOAgents.models import ChatMessage
+from FlashOAgents.monitoring import LogLevel
+from FlashOAgents.tool_executor import ToolExecutor
+from FlashOAgents.tool_memo import MEMO_NOTE, ToolCallMemo, tool_call_key
+from FlashOAgents.tools import Tool
+
+
+class CountingTool(Tool):
+    name = "web_search"
+    description = "Fake search tool."
+    inputs = {"query": {"type": "string", "description": "Search query."}}
+    output_type = "string"
+
+    def __init__(self, delay: float = 0.0):
+        super().__init__()
+        self.delay = delay
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def forward(self, query: str) -> str:
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return f"results for {query}"
+
+
+class ScriptedModel:
+    """Plans, then issues one batch of tool calls per entry of `batches`, then answers."""
+
+    model_id = "scripted"
+
+    def __init__(self, batches):
+        self.batches = batches
+        self.calls = 0
+
+    def __call__(self, messages, **kwargs):
+        self.calls += 1
+        if self.calls == 1:
+            return ChatMessage(role="assistant", content="PLAN")
+        index = self.calls - 2
+        if index < len(self.batches):
+            tools = [{"name": "web_search", "arguments": {"query": query}} for query in self.batches[index]]
+        else:
+            tools = [{"name": "final_answer", "arguments": {"answer": "42"}}]
+        return ChatMessage(role="assistant", content=json.dumps({"think": "t", "tools": tools}))
+
+
+def _agent(model, tool, **kwargs):
+    return ToolCallingAgent(
+        tools=[tool],
+        model=model,
+        max_steps=10,
+        verbosity_level=LogLevel.OFF,
+        tool_executor=ToolExecutor(max_workers=4, owner_limit=None),
+        memoize_tool_calls=True,
+        **kwargs,
+    )
+
+
+# ──────────────────────────────────────────────
+# 1. Keys
+# ──────────────────────────────────────────────
+class TestKeys:
+    def test_normalization(self):
+        assert tool_call_key("web_search", {"query": "  Moon  Distance"}) == tool_call_key(
+            "Web_Search ", {"Query": "moon distance"}
+        )
+        assert tool_call_key("crawl_page", {"url": "https://a.com/X/#top"}) == tool_call_key(
+            "crawl_page", {"url": "https://a.com/X"}
+        )
+        assert tool_call_key("crawl_page", {"url": "https://a.com/X"}) != tool_call_key(
+            "crawl_page", {"url": "https://a.com/x"}
+        )
+
+    def test_case_folded_only_for_queries(self):
+        assert tool_call_key("wiki_search", {"query": "Moon"}) == tool_call_key("wiki_search", {"query": "moon"})
+        assert tool_call_key("inspect_file_as_text", {"file_path": "data/Report.pdf"}) != tool_call_key(
+            "inspect_file_as_text", {"file_path": "data/report.pdf"}
+        )
+        assert tool_call_key("crawl_page", {"url": "https://a.com", "query": "ID aB3"}) != tool_call_key(
+            "crawl_page", {"url": "https://a.com", "query": "id ab3"}
+        )
+
+
+# ──────────────────────────────────────────────
+# 2. Memo
+# ──────────────────────────────────────────────
+class TestMemo:
+    def test_hit_returns_noted_observation(self):
+        memo = ToolCallMemo()
+        calls = []
+        execute = lambda name, args: calls.append(args) or f"obs {args['query']}"
+        assert memo.call("web_search", {"query": "x"}, execute) == "obs x"
+        assert memo.call("web_search", {"query": " X "}, execute) == f"{MEMO_NOTE}\nobs x"
+        assert len(calls) == 1
+        stats = memo.stats()
+        assert (stats["calls"], stats["hits"], stats["hit_rate"]) == (2, 1, 0.5)
+        assert stats["per_tool"]["web_search"] == {"calls": 2, "saved": 1}
+
+    def test_failures_are_retried(self):
+        memo = ToolCallMemo()
+
+        def failing(name, args):
+            raise RuntimeError("down")
+
+        with pytest.raises(RuntimeError):
+            memo.call("web_search", {"query": "x"}, failing)
+        assert memo.call("web_search", {"query": "x"}, lambda n, a: "Error: 503") == "Error: 503"
+        assert memo.call("web_search", {"query": "x"}, lambda n, a: "ok") == "ok"
+
+    def test_final_answer_not_memoized(self):
+        assert not ToolCallMemo().memoizes("final_answer")
+        assert not ToolCallMemo(tools=["crawl_page"]).memoizes("web_search")
+
+
+# ──────────────────────────────────────────────
+# 3. Agent
+# ──────────────────────────────────────────────
+class TestAgent:
+    def test_duplicates_across_steps(self):
+        tool = CountingTool()
+        agent = _agent(ScriptedModel([["moon distance"], ["Moon distance "]]), tool)
+        assert agent.run("question") == "42"
+        assert tool.calls == 1
+        assert MEMO_NOTE in agent.memory.steps[3].observations
+
+    def test_batch_duplicates_coalesced(self):
+        tool = CountingTool(delay=0.2)
+        agent = _agent(ScriptedModel([["a", "a", "A", "b"]]), tool)
+        assert agent.run("question") == "42"
+        assert tool.calls == 2
+        assert agent.tool_memo.stats()["coalesced"] == 2
+        assert agent.memory.steps[2].observations.count("results for a") == 3
+
+    def test_async_batch_duplicates_coalesced(self):
+        tool = CountingTool(delay=0.2)
+        agent = _agent(ScriptedModel([["a", "a", "b"]]), tool)
+        assert asyncio.run(agent.arun("question")) == "42"
+        assert tool.calls == 2
+        assert agent.tool_memo.stats()["coalesced"] == 1
+
+    def test_reset_per_run(self):
+        tool = CountingTool()
+        agent = _agent(ScriptedModel([["a"]]), tool)
+        agent.run("question")
+        agent.model = ScriptedModel([["a"]])
+        agent.run("question")
+        assert tool.calls == 2
+
+    def test_disabled_by_default(self):
+        tool = CountingTool()
+        agent = ToolCallingAgent(
+            tools=[tool], model=ScriptedModel([["a"], ["a"]]), max_steps=10, verbosity_level=LogLevel.OFF
+        )
+        agent.run("question")
+        assert tool.calls == 2 and agent.tool_memo is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Tests for tracing (FlashOAgents.tracing).
+
+Covers:
+  1. Spans nest, record errors and reach hooks; without a tracer nothing is recorded
+  2. Agent runs produce item -> plan/step -> tool spans, across tool executor threads and asyncio tasks
+  3. OpenAIServerModel records llm -> http spans with token counts
+  4. Chrome trace and OTLP/JSON export
+"""
+
+import asyncio
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+# Ensure project root is on sys.path
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from base_agent import BaseAgent
+from FlashOAgents.agents import ToolCallingAgent
+from FlashOAgents.models import ChatMessage, OpenAIServerModel
+from FlashOAgents.monitoring import LogLevel
+from FlashOAgents.tool_executor import ToolExecutor
+from FlashOAgents.tools import Tool
+from FlashOAgents.tracing import TraceHook, Tracer, set_tracer, trace_span
+
+
+@pytest.fixture
+def tracer():
+    tracer = Tracer()
+    set_tracer(tracer)
+    yield tracer
+    set_tracer(None)
+
+
+def _by_name(tracer):
+    spans = {}
+    for span in tracer.spans():
+        spans.setdefault(span.name, []).append(span)
+    return spans
+
+
+# ──────────────────────────────────────────────
+# 1. Tracer
+# ──────────────────────────────────────────────
+class RecordingHook(TraceHook):
+    def __init__(self):
+        self.events = []
+
+    def on_span_start(self, span):
+        self.events.append(("start", span.name))
+
+    def on_span_end(self, span):
+        self.events.append(("end", span.name))
+
+
+class TestTracer:
+    def test_nesting_and_hooks(self, tracer):
+        hook = RecordingHook()
+        tracer.add_hook(hook)
+        with trace_span("outer", kind="item", task="t") as outer:
+            with trace_span("inner", kind="step") as inner:
+                inner.set_attribute("n", 1)
+        assert inner.parent_id == outer.span_id and inner.trace_id == outer.trace_id
+        assert outer.parent_id is None
+        assert inner.attributes == {"n": 1} and outer.attributes == {"task": "t"}
+        assert hook.events == [("start", "outer"), ("start", "inner"), ("end", "inner"), ("end", "outer")]
+        assert [span.name for span in tracer.spans()] == ["inner", "outer"]
+
+    def test_error_recorded(self, tracer):
+        with pytest.raises(ValueError):
+            with trace_span("failing"):
+                raise ValueError("boom")
+        assert tracer.spans()[0].error == "ValueError: boom"
+
+    def test_failing_hook_ignored(self, tracer):
+        class BrokenHook(TraceHook):
+            def on_span_end(self, span):
+                raise RuntimeError("hook failed")
+
+        tracer.add_hook(BrokenHook())
+        with trace_span("ok"):
+            pass
+        assert len(tracer.spans()) == 1
+
+    def test_no_tracer(self):
+        set_tracer(None)
+        with trace_span("ignored") as span:
+            span.set_attribute("x", 1)
+
+
+# ──────────────────────────────────────────────
+# 2. Agent spans
+# ──────────────────────────────────────────────
+class EchoTool(Tool):
+    name = "web_search"
+    description = "Fake search tool."
+    inputs = {"query": {"type": "string", "description": "Search query."}}
+    output_type = "string"
+
+    def forward(self, query: str) -> str:
+        with trace_span("fake.http", kind="http"):
+            return f"results for {query}"
+
+
+class ScriptedModel:
+    model_id = "scripted"
+
+    def __init__(self):
+        self.action_calls = 0
+
+    def __call__(self, messages, **kwargs):
+        if "# Tool List" not in json.dumps(messages):
+            return ChatMessage(role="assistant", content="PLAN", input_token_count=7, output_token_count=3)
+        self.action_calls += 1
+        if self.action_calls == 1:
+            tools = [{"name": "web_search", "arguments": {"query": "a"}}, {"name": "web_search", "arguments": {"query": "b"}}]
+        else:
+            tools = [{"name": "final_answer", "arguments": {"answer": "42"}}]
+        return ChatMessage(
+            role="assistant", content=json.dumps({"think": "t", "tools": tools}), input_token_count=10,
+            output_token_count=5,
+        )
+
+    async def acall(self, messages, **kwargs):
+        return self(messages, **kwargs)
+
+
+def _base_agent():
+    model = ScriptedModel()
+    base = BaseAgent(model)
+    base.agent_fn = ToolCallingAgent(
+        tools=[EchoTool()],
+        model=model,
+        max_steps=5,
+        verbosity_level=LogLevel.OFF,
+        tool_executor=ToolExecutor(max_workers=4, owner_limit=None),
+    )
+    return base
+
+
+class TestAgentSpans:
+    def _check_tree(self, tracer):
+        spans = _by_name(tracer)
+        (item,) = spans["item"]
+        (plan,) = spans["plan"]
+        steps = spans["step"]
+        tools = spans["tool:web_search"]
+        assert plan.parent_id == item.span_id
+        assert [step.parent_id for step in steps] == [item.span_id, item.span_id]
+        assert plan.attributes["input_tokens"] == 7
+        assert steps[0].attributes["tool_calls"] == 2 and steps[0].attributes["input_tokens"] == 10
+        assert len(tools) == 2 and all(tool.parent_id == steps[0].span_id for tool in tools)
+        https = spans["fake.http"]
+        assert {http.parent_id for http in https} == {tool.span_id for tool in tools}
+        assert len({span.trace_id for span in tracer.spans()}) == 1
+
+    def test_thread_pool_run(self, tracer):
+        assert _base_agent().forward("question")["agent_result"] == "42"
+        self._check_tree(tracer)
+
+    def test_async_run(self, tracer):
+        assert asyncio.run(_base_agent().aforward("question"))["agent_result"] == "42"
+        self._check_tree(tracer)
+
+
+# ──────────────────────────────────────────────
+# 3. Model spans
+# ──────────────────────────────────────────────
+class TestModelSpans:
+    def test_llm_and_http_spans(self, tracer):
+        model = OpenAIServerModel("fake-model", api_key="test")
+        response = SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(
+                content="hi", tool_calls=None,
+                model_dump=lambda include=None: {"role": "assistant", "content": "hi"},
+            ))],
+            usage=SimpleNamespace(prompt_tokens=11, completion_tokens=2, prompt_tokens_details=None),
+        )
+        model.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=lambda **kwargs: response)))
+        with trace_span("step", kind="step") as step:
+            model([{"role": "user", "content": [{"type": "text", "text": "hello"}]}])
+        spans = _by_name(tracer)
+        (llm,) = spans["llm"]
+        (http,) = spans["chat.completions"]
+        assert llm.parent_id == step.span_id and http.parent_id == llm.span_id
+        assert llm.attributes["model"] == "fake-model"
+        assert (llm.attributes["input_tokens"], llm.attributes["output_tokens"]) == (11, 2)
+        assert http.kind == "http" and http.attributes["attempt"] == 0
+
+
+# ──────────────────────────────────────────────
+# 4. Export
+# ──────────────────────────────────────────────
+class TestExport:
+    def test_chrome_trace(self, tracer, tmp_path):
+        with trace_span("item", kind="item", task="t"):
+            with trace_span("step", kind="step"):
+                pass
+        path = tmp_path / "trace.json"
+        tracer.export_chrome_trace(str(path))
+        events = json.loads(path.read_text())["traceEvents"]
+        complete = {event["name"]: event for event in events if event["ph"] == "X"}
+        assert set(complete) == {"item", "step"}
+        assert complete["step"]["cat"] == "step" and complete["item"]["args"]["task"] == "t"
+        assert complete["step"]["args"]["parent_id"] == complete["item"]["args"]["span_id"]
+        assert complete["item"]["dur"] >= complete["step"]["dur"] >= 0
+        assert any(event["ph"] == "M" and event["name"] == "thread_name" for event in events)
+
+    def test_otlp_json(self, tracer, tmp_path):
+        with trace_span("item", kind="item", attempts=2):
+            with pytest.raises(RuntimeError):
+                with trace_span("llm", kind="llm"):
+                    raise RuntimeError("down")
+        path = tmp_path / "trace.otlp.json"
+        tracer.export_otlp_json(str(path))
+        request = json.loads(path.read_text().strip())
+        (resource_spans,) = request["resourceSpans"]
+        spans = {span["name"]: span for span in resource_spans["scopeSpans"][0]["spans"]}
+        item, llm = spans["item"], spans["llm"]
+        assert len(item["traceId"]) == 32 and len(item["spanId"]) == 16
+        assert llm["parentSpanId"] == item["spanId"] and "parentSpanId" not in item
+        assert llm["kind"] == 3 and item["kind"] == 1
+        assert llm["status"] == {"code": 2, "message": "RuntimeError: down"}
+        assert {"key": "attempts", "value": {"intValue": "2"}} in item["attributes"]
+        assert int(item["endTimeUnixNano"]) >= int(llm["endTimeUnixNano"])
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
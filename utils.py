@@ -14,10 +14,32 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
 import json
+import hashlib
+import logging
+import threading
 import yaml
-from typing import List, Dict
+from typing import List, Dict, Tuple
 from openai import OpenAI, OpenAIError
+from FlashOAgents import AgentLogger, LoadBalancedModel, LogLevel, OpenAIServerModel, RetryPolicy, Tracer, configure_endpoint_guards, configure_http_pool, configure_llm_cache, configure_page_prefetcher, configure_page_store, configure_search_cache, endpoint_stats, http_stats, llm_cache_stats, page_prefetch_stats, page_store_stats, search_cache_stats, set_tracer
+from FlashOAgents.http_client import get_http_client
+
+logger = logging.getLogger(__name__)
+
+_openai_clients: Dict[Tuple[str, str], OpenAI] = {}
+_openai_clients_lock = threading.Lock()
+
+
+def get_openai_client(api_key: str, base_url: str) -> OpenAI:
+    """One `OpenAI` client per key and endpoint, on the shared keep-alive connection pool."""
+    with _openai_clients_lock:
+        client = _openai_clients.get((api_key, base_url))
+        if client is None:
+            client = _openai_clients[(api_key, base_url)] = OpenAI(
+                api_key=api_key, base_url=base_url, http_client=get_http_client("llm")
+            )
+    return client
 
 def read_jsonl(infile):
     data = []
@@ -80,10 +102,7 @@ def openai_service(
         raise ValueError(f"Missing required parameters: {', '.join(missing)}")
 
     try:
-        client = OpenAI(
-            api_key=api_key,
-            base_url=base_url
-        )
+        client = get_openai_client(api_key, base_url)
 
         response = client.chat.completions.create(
             model=model,
@@ -175,5 +194,140 @@ def run_llm_msg(model, msg, prompt, developer_prompt=None, only_return_msg=False
             except Exception as e:
                 last_error = f"[run_llm_msg] error: {e}"
         raise Exception(str(last_error))
-        
 
+
+# Shared setup of the run_flash_searcher*.py entry points, from their command-line arguments.
+
+def agent_options(args):
+    return {
+        "stream_tool_calls": args.stream_tool_calls,
+        "async_summary": args.async_summary,
+        "summary_max_staleness": args.summary_max_staleness,
+        "speculative_search": args.speculative_search,
+        "speculative_crawl_top_k": args.speculative_crawl_top_k,
+        "context_budget": args.context_budget,
+        "prefix_cache_layout": args.prefix_cache_layout,
+        "memoize_tool_calls": args.memoize_tool_calls,
+        "tool_timeouts": {"*": args.tool_timeout} if args.tool_timeout else None,
+        "step_timeout": args.step_timeout,
+        "carry_over_late_results": not args.drop_late_results,
+        "checkpoint_dir": args.checkpoint_dir,
+        "max_output_repairs": args.max_output_repairs,
+        "response_format": {"type": "json_object"} if args.json_response_format else None,
+        "compact_memory": args.compact_memory,
+        "crawl_token_budget": args.crawl_token_budget or None,
+        "log_options": {
+            "log_dir": args.log_dir,
+            "log_level": args.log_level,
+            "log_jsonl": args.log_jsonl,
+            "background_logging": args.background_logging,
+        },
+    }
+
+
+def item_logger(question, log_dir=None, log_level="info", log_jsonl=False, background_logging=False):
+    """Logger of one item: a file per question under `log_dir` if set, the terminal otherwise."""
+    log_file = None
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+        digest = hashlib.sha256(question.encode("utf-8")).hexdigest()[:16]
+        log_file = os.path.join(log_dir, f"{digest}.{'jsonl' if log_jsonl else 'log'}")
+    return AgentLogger(
+        level=LogLevel[log_level.upper()], log_file=log_file, jsonl=log_jsonl, background=background_logging
+    )
+
+
+def setup_tracing(args):
+    if not (args.trace_file or args.otlp_file):
+        return None
+    tracer = Tracer()
+    set_tracer(tracer)
+    return tracer
+
+
+def setup_http_pool(args):
+    """Sizes the shared keep-alive pools to the agents in flight and the tool workers; models built later use them."""
+    configure_http_pool(max_connections=args.http_pool_size or 2 * max(args.concurrency, args.tool_workers))
+
+
+def setup_llm_endpoints(args):
+    """Rate limit and circuit breaker shared by every model client of an endpoint."""
+    configure_endpoint_guards(rate=args.llm_rate_limit, failure_threshold=args.llm_failure_threshold)
+
+
+def setup_llm_cache(args):
+    """Completion cache on disk, shared by the models of this run, its worker processes and later runs."""
+    if args.llm_cache:
+        max_bytes = args.llm_cache_size_mb * 1024 * 1024 if args.llm_cache_size_mb else None
+        configure_llm_cache(args.llm_cache, mode=args.llm_cache_mode, max_bytes=max_bytes)
+
+
+def setup_search_cache(args):
+    """Search results on disk, shared by the worker processes of this run and by later runs."""
+    configure_search_cache(args.search_cache, ttl=args.search_cache_ttl_hours * 3600)
+
+
+def setup_page_store(args):
+    """Compressed page content on disk, shared by the worker processes of this run and by later runs."""
+    if args.page_store:
+        configure_page_store(
+            args.page_store, max_bytes=args.page_store_size_mb * 1024 * 1024, max_age=args.page_max_age_hours * 3600
+        )
+
+
+def setup_page_prefetch(args):
+    """Background reads of the top results of every search, shared by all agents of this process."""
+    configure_page_prefetcher(
+        top_n=args.prefetch_top_n,
+        max_concurrency=args.prefetch_concurrency,
+        max_bytes=args.prefetch_budget_mb * 1024 * 1024,
+    )
+
+
+def export_traces(tracer, args):
+    if tracer is None:
+        return
+    if args.trace_file:
+        tracer.export_chrome_trace(args.trace_file)
+    if args.otlp_file:
+        tracer.export_otlp_json(args.otlp_file)
+    logger.info(f"Exported {len(tracer.spans())} trace spans")
+
+
+def log_run_stats(args, model):
+    """Logs the stats of the process-wide HTTP pool, endpoint guards, caches and prefetcher, and of `model`."""
+    logger.info(f"HTTP pool stats: {http_stats()}")
+    logger.info(f"LLM endpoint stats: {endpoint_stats()}")
+    if args.llm_cache:
+        logger.info(f"LLM cache stats: {llm_cache_stats()}")
+    if args.search_cache:
+        logger.info(f"Search cache stats: {search_cache_stats()}")
+    if args.page_store:
+        logger.info(f"Page store stats: {page_store_stats()}")
+    if args.prefetch_top_n:
+        logger.info(f"Page prefetch stats: {page_prefetch_stats()}")
+    if args.llm_endpoints:
+        logger.info(f"LLM replica stats: {model.replica_stats()}")
+
+
+def build_model(args):
+    custom_role_conversions = {"tool-call": "assistant", "tool-response": "user"}
+    if args.llm_endpoints:
+        return LoadBalancedModel(
+            os.environ.get("DEFAULT_MODEL"),
+            api_bases=args.llm_endpoints,
+            api_key=os.environ.get("OPENAI_API_KEY"),
+            routing=args.llm_routing,
+            sticky=args.llm_sticky,
+            retry_policy=RetryPolicy(max_attempts=args.llm_max_attempts),
+            custom_role_conversions=custom_role_conversions,
+            max_completion_tokens=32768,
+        )
+    return OpenAIServerModel(
+        os.environ.get("DEFAULT_MODEL"),
+        custom_role_conversions=custom_role_conversions,
+        max_completion_tokens=32768,
+        api_key=os.environ.get("OPENAI_API_KEY"),
+        api_base=os.environ.get("OPENAI_API_BASE"),
+        retry_policy=RetryPolicy(max_attempts=args.llm_max_attempts),
+    )